@@ -2,15 +2,64 @@
 API server for the Claude SDK.
 """
 
+import hashlib
+import json
 import os
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import (
+    FastAPI,
+    HTTPException,
+    Depends,
+    BackgroundTasks,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from starlette.background import BackgroundTask
 from typing import List, Optional, Dict, Any, Union
 
-from claude_sdk import Claude
+from claude_sdk import AsyncClaude
+from claude_sdk.broadcast import StreamBroadcaster, stream_key
+from claude_sdk.concurrency import AdaptiveLimiter
+from claude_sdk.eventloop import LoopLagMonitor, Offloader, estimate_size
+from claude_sdk.exceptions import (
+    BudgetExceededError,
+    ClaudeAPIError,
+    DeadlineExceededError,
+    IdempotencyConflictError,
+    QueueFullError,
+)
+from claude_sdk.idempotency import IdempotencyStore, SQLiteIdempotencyStore
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+from claude_sdk.scheduler import FairScheduler
+from claude_sdk.sessions import SessionStore
+from claude_sdk.usage import JSONLSink, SQLiteSink, UsageTracker
+from claude_sdk.warmup import ConnectionWarmer
+
+# "performance" serves with uvloop and httptools, encodes responses with orjson
+# and turns off access logs; needs pip install 'claude-sdk[server]'
+SERVER_PROFILE = os.environ.get("SERVER_PROFILE", "default")
+if SERVER_PROFILE not in ("default", "performance"):
+    raise ValueError(f"Unknown SERVER_PROFILE {SERVER_PROFILE!r}")
+PERFORMANCE = SERVER_PROFILE == "performance"
+
+if PERFORMANCE:
+    try:
+        from fastapi.responses import ORJSONResponse as ResponseClass
+        from orjson import loads
+    except ImportError as e:
+        raise ImportError(
+            "The performance profile requires orjson, uvloop and httptools. "
+            "Install them with: pip install 'claude-sdk[server]'"
+        ) from e
+else:
+    ResponseClass = JSONResponse
+    loads = json.loads
 
-app = FastAPI(title="Claude SDK API Server")
+app = FastAPI(title="Claude SDK API Server", default_response_class=ResponseClass)
 
 # Add CORS middleware
 app.add_middleware(
@@ -26,8 +75,122 @@ API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 if not API_KEY:
     raise ValueError("ANTHROPIC_API_KEY environment variable must be set")
 
-# Create a Claude client
-claude = Claude(api_key=API_KEY)
+# Upstream API, overridable to point the proxy at a gateway or a local stub
+BASE_URL = os.environ.get("BASE_URL", "https://api.anthropic.com")
+
+# Optional adaptive limit on requests in flight upstream: "aimd" or "gradient"
+CONCURRENCY_LIMITER = os.environ.get("CONCURRENCY_LIMITER")
+
+# Optional log of the usage and cost of every call, as JSONL or a SQLite database
+USAGE_LOG = os.environ.get("USAGE_LOG")
+
+metrics = MetricsCollector()
+limiter = AdaptiveLimiter(CONCURRENCY_LIMITER) if CONCURRENCY_LIMITER else None
+usage_sink = None
+if USAGE_LOG:
+    sink_class = JSONLSink if USAGE_LOG.endswith(".jsonl") else SQLiteSink
+    usage_sink = sink_class(USAGE_LOG)
+usage_tracker = UsageTracker(sink=usage_sink)
+
+# Bodies and frames of at least this many bytes are decoded, validated and
+# encoded on worker threads, upstream requests included, so they do not stall
+# other requests
+OFFLOAD_THRESHOLD = int(os.environ.get("OFFLOAD_THRESHOLD", str(256 * 1024)))
+
+# Worker threads for large bodies
+OFFLOAD_WORKERS = int(os.environ.get("OFFLOAD_WORKERS", "4"))
+
+offloader = Offloader(
+    threshold=OFFLOAD_THRESHOLD,
+    workers=OFFLOAD_WORKERS,
+    instrumentation=Instrumentation([metrics]),
+)
+
+# Create an async Claude client, so upstream calls do not block the event loop
+claude = AsyncClaude(
+    api_key=API_KEY,
+    base_url=BASE_URL,
+    instrumentation=Instrumentation([metrics]),
+    concurrency_limiter=limiter,
+    usage_tracker=usage_tracker,
+    offloader=offloader,
+)
+
+# Upstream connections opened at startup and kept warm; 0 disables warming
+WARM_CONNECTIONS = int(os.environ.get("WARM_CONNECTIONS", "8"))
+
+# Seconds between the pings that keep warm connections from idling out
+WARM_INTERVAL = float(os.environ.get("WARM_INTERVAL", "10"))
+
+warmer = ConnectionWarmer(claude, connections=WARM_CONNECTIONS, interval=WARM_INTERVAL)
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """
+    Parse tenant weights given as "tenant=weight,tenant=weight".
+    """
+    weights = {}
+    for item in filter(None, value.split(",")):
+        tenant, _, weight = item.partition("=")
+        weights[tenant.strip()] = float(weight)
+    return weights
+
+# Requests sent upstream at once, unless the adaptive limiter decides
+SCHEDULER_CONCURRENCY = int(os.environ.get("SCHEDULER_CONCURRENCY", "64"))
+
+# Fair-share weights of tenants, e.g. "dashboard=4,backfill=1"
+TENANT_WEIGHTS = parse_weights(os.environ.get("TENANT_WEIGHTS", ""))
+
+# Interactive requests go first; tenants share each priority class by weight
+scheduler = FairScheduler(
+    concurrency=(lambda: limiter.limit) if limiter else SCHEDULER_CONCURRENCY,
+    weights=TENANT_WEIGHTS,
+    instrumentation=Instrumentation([metrics]),
+)
+if limiter:
+    # Start queued requests as soon as the limiter allows more
+    limiter.add_limit_callback(lambda limit: scheduler.dispatch())
+
+# Share upstream streams between identical requests at temperature 0
+STREAM_FANOUT = os.environ.get("STREAM_FANOUT", "1").lower() not in ("0", "false", "no")
+
+# Bytes of events a shared stream keeps for replay to late subscribers
+STREAM_REPLAY_BYTES = int(os.environ.get("STREAM_REPLAY_BYTES", str(1024 * 1024)))
+
+broadcaster = StreamBroadcaster(
+    max_replay_bytes=STREAM_REPLAY_BYTES,
+    instrumentation=Instrumentation([metrics]),
+)
+
+# Optional SQLite database sharing idempotency keys between worker processes
+IDEMPOTENCY_STORE = os.environ.get("IDEMPOTENCY_STORE")
+
+# Seconds the response of a request with an idempotency key is replayed
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", str(24 * 3600)))
+
+if IDEMPOTENCY_STORE:
+    idempotency = SQLiteIdempotencyStore(IDEMPOTENCY_STORE, ttl=IDEMPOTENCY_TTL)
+else:
+    idempotency = IdempotencyStore(ttl=IDEMPOTENCY_TTL)
+
+# Most chat sessions kept for /ws/messages clients; the least recent go first
+SESSION_MAX = int(os.environ.get("SESSION_MAX", "10000"))
+
+# Seconds an idle chat session can still be resumed
+SESSION_TTL = float(os.environ.get("SESSION_TTL", "1800"))
+
+sessions = SessionStore(
+    max_sessions=SESSION_MAX,
+    ttl=SESSION_TTL,
+    instrumentation=Instrumentation([metrics]),
+)
+
+# Event-loop lag at or above this many seconds counts as a stall in /metrics
+LOOP_STALL_THRESHOLD = float(os.environ.get("LOOP_STALL_THRESHOLD", "0.1"))
+
+lag_monitor = LoopLagMonitor(
+    stall_threshold=LOOP_STALL_THRESHOLD,
+    instrumentation=Instrumentation([metrics]),
+)
 
 class GenerateRequest(BaseModel):
     """
@@ -53,6 +216,18 @@ class MessageRequest(BaseModel):
     tools: Optional[List[Dict[str, Any]]] = None
     stream: bool = False
 
+class SessionRequest(BaseModel):
+    """
+    First frame of a /ws/messages connection, starting or resuming a session.
+    """
+    session_id: Optional[str] = None
+    model: Optional[str] = None
+    messages: List[Dict[str, Any]] = []
+    max_tokens: int = 1000
+    temperature: float = 0.7
+    system: Optional[str] = None
+    tools: Optional[List[Dict[str, Any]]] = None
+
 class ComputeUseRequest(BaseModel):
     """
     Request model for the compute_use endpoint.
@@ -63,13 +238,177 @@ class ComputeUseRequest(BaseModel):
     temperature: float = 0.7
     system_prompt: Optional[str] = None
 
+def decode(model, body: Union[bytes, str]):
+    """
+    Parse and validate a JSON body.
+    """
+    return model(**loads(body))
+
+def json_body(model):
+    """
+    Dependency parsing a request body into a model, on a worker thread if the
+    body is large. The parsed body is kept for idempotency fingerprints.
+    """
+    async def dependency(http_request: Request):
+        body = await http_request.body()
+        try:
+            request = await offloader.run(len(body), decode, model, body)
+        except ValidationError as e:
+            errors = [{**error, "loc": ("body", *error["loc"])} for error in e.errors()]
+            raise RequestValidationError(errors)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+        http_request.state.body = request
+        return request
+    return dependency
+
+async def json_response(result: Any):
+    """
+    Encode a response, on a worker thread if it is large.
+    """
+    size = estimate_size(result, limit=OFFLOAD_THRESHOLD)
+    return await offloader.run(size, ResponseClass, result)
+
+async def receive_frame(websocket: WebSocket) -> Any:
+    """
+    Receive a JSON frame, decoded on a worker thread if it is large.
+    """
+    text = await websocket.receive_text()
+    return await offloader.run(len(text), loads, text)
+
+def tenant_of(http_request: Request) -> str:
+    """
+    Tenant of a request, from its X-Tenant-ID header, a hash of its X-API-Key
+    header or the client address.
+    """
+    headers = http_request.headers
+    tenant = headers.get("x-tenant-id")
+    if tenant:
+        return tenant
+    key = headers.get("x-api-key")
+    if key:
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
+    return http_request.client.host if http_request.client else "anonymous"
+
+def schedule(http_request: Request):
+    """
+    Scheduler slot for a request, from its tenant and its X-Priority and
+    X-Request-Timeout headers.
+    """
+    headers = http_request.headers
+    tenant = tenant_of(http_request)
+    priority = headers.get("x-priority", "default")
+    if priority not in scheduler.classes:
+        raise HTTPException(status_code=400, detail=f"Unknown priority {priority}")
+    try:
+        timeout = headers.get("x-request-timeout")
+        timeout = float(timeout) if timeout else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid X-Request-Timeout")
+    return scheduler.slot(tenant=tenant, priority=priority, timeout=timeout)
+
+def idempotency_key(http_request: Request) -> Optional[str]:
+    """
+    Idempotency key of a request, from its Idempotency-Key header, scoped to
+    its tenant and endpoint.
+    """
+    key = http_request.headers.get("idempotency-key")
+    if not key:
+        return None
+    return f"{tenant_of(http_request)}:{http_request.url.path}:{key}"
+
+def fanout_key(http_request: Request, request: BaseModel) -> Optional[str]:
+    """
+    Key under which identical streaming requests share one upstream stream, or
+    None if the request must get its own. Streams are only shared within a
+    tenant and usage tag, which the upstream call is accounted to.
+    """
+    if not STREAM_FANOUT or request.temperature != 0:
+        return None
+    return stream_key(
+        http_request.url.path,
+        tenant_of(http_request),
+        http_request.headers.get("x-usage-tag"),
+        request.dict(),
+    )
+
+async def server_sent_events(subscription):
+    """
+    Relay the events of a stream, ending with an error event if it fails.
+    """
+    try:
+        async for data in subscription:
+            yield f"data: {data}\n\n"
+    except Exception as e:
+        error_type = e.error_type if isinstance(e, ClaudeAPIError) else "api_error"
+        error = {"type": "error", "error": {"type": error_type, "message": str(e)}}
+        yield f"event: error\ndata: {json.dumps(error)}\n\n"
+    finally:
+        await subscription.aclose()
+
+async def proxy(
+    http_request: Request, call, stream: bool = False, key: Optional[str] = None
+):
+    """
+    Run an upstream call in a scheduler slot and map errors to HTTP errors.
+
+    Streams hold their slot until they end and are relayed as server-sent
+    events; streams with the same key share one upstream call. Other requests
+    with the same idempotency key run once.
+    """
+    slot = schedule(http_request)
+
+    async def run():
+        async with slot:
+            return await call()
+
+    async def upstream():
+        # Closing the stream when the last client leaves stops generation
+        async with slot, await call() as events:
+            async for data in events:
+                yield data
+
+    try:
+        if not stream:
+            idempotent = idempotency_key(http_request)
+            if idempotent is None:
+                result = await run()
+            else:
+                body = http_request.state.body.dict()
+                result = await idempotency.arun(
+                    idempotent, body, run, Instrumentation([metrics])
+                )
+            # A response object skips FastAPI's encoding of the upstream JSON
+            return await json_response(result)
+        subscription = await broadcaster.subscribe(key, upstream)
+    except HTTPException:
+        raise
+    except (
+        QueueFullError,
+        DeadlineExceededError,
+        BudgetExceededError,
+        IdempotencyConflictError,
+    ) as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    # Also leave the stream if the client disconnects before it is relayed
+    return StreamingResponse(
+        server_sent_events(subscription),
+        media_type="text/event-stream",
+        background=BackgroundTask(subscription.aclose),
+    )
+
 @app.post("/generate")
-async def generate(request: GenerateRequest):
+async def generate(
+    http_request: Request, request: GenerateRequest = Depends(json_body(GenerateRequest))
+):
     """
     Generate a response from Claude.
     """
-    try:
-        response = claude.generate(
+    return await proxy(
+        http_request,
+        lambda: claude.generate(
             model=request.model,
             prompt=request.prompt,
             max_tokens=request.max_tokens,
@@ -77,18 +416,21 @@ async def generate(request: GenerateRequest):
             system_prompt=request.system_prompt,
             stream=request.stream,
             tools=request.tools,
-        )
-        return response
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        ),
+        stream=request.stream,
+        key=fanout_key(http_request, request),
+    )
 
 @app.post("/messages")
-async def messages(request: MessageRequest):
+async def messages(
+    http_request: Request, request: MessageRequest = Depends(json_body(MessageRequest))
+):
     """
     Create a message using the Claude API.
     """
-    try:
-        response = claude.messages_create(
+    return await proxy(
+        http_request,
+        lambda: claude.messages_create(
             model=request.model,
             messages=request.messages,
             max_tokens=request.max_tokens,
@@ -96,27 +438,174 @@ async def messages(request: MessageRequest):
             system=request.system,
             tools=request.tools,
             stream=request.stream,
+            tenant=tenant_of(http_request),
+            tag=http_request.headers.get("x-usage-tag"),
+        ),
+        stream=request.stream,
+        key=fanout_key(http_request, request),
+    )
+
+def error_frame(error_type: str, message: str) -> Dict[str, Any]:
+    """
+    Error frame of a /ws/messages connection.
+    """
+    return {"type": "error", "error": {"type": error_type, "message": message}}
+
+@app.websocket("/ws/messages")
+async def chat(websocket: WebSocket):
+    """
+    Chat over one connection, with the conversation kept on the server.
+
+    The first frame is a session request: {"model": ...} with the options of
+    /messages starts a session, {"session_id": ...} resumes one. The server
+    answers {"type": "session", "session_id": ..., "messages": n}. Each
+    following frame, {"content": ...}, is one user turn, answered with the
+    streamed events of the reply, ending with message_stop or an error.
+    """
+    await websocket.accept()
+    tenant = tenant_of(websocket)
+    try:
+        try:
+            request = SessionRequest(**await receive_frame(websocket))
+        except (ValueError, TypeError) as e:
+            await websocket.send_json(error_frame("invalid_request_error", str(e)))
+            await websocket.close(code=4400)
+            return
+        if request.session_id is not None:
+            session = sessions.get(request.session_id)
+            # Other tenants' sessions are reported as unknown
+            if session is None or session.tenant != tenant:
+                await websocket.send_json(
+                    error_frame("session_not_found", "Session expired or unknown")
+                )
+                await websocket.close(code=4404)
+                return
+        elif request.model is None:
+            await websocket.send_json(
+                error_frame("invalid_request_error", "model or session_id required")
+            )
+            await websocket.close(code=4400)
+            return
+        else:
+            session = sessions.create(
+                request.model,
+                messages=request.messages,
+                max_tokens=request.max_tokens,
+                temperature=request.temperature,
+                system=request.system,
+                tools=request.tools,
+                tenant=tenant,
+            )
+        await websocket.send_json(
+            {
+                "type": "session",
+                "session_id": session.session_id,
+                "messages": len(session.messages),
+            }
         )
-        return response
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        while True:
+            try:
+                frame = await receive_frame(websocket)
+            except ValueError as e:
+                await websocket.send_json(error_frame("invalid_request_error", str(e)))
+                continue
+            content = frame.get("content") if isinstance(frame, dict) else None
+            if not content:
+                await websocket.send_json(
+                    error_frame("invalid_request_error", "content required")
+                )
+                continue
+            turn = session.turn(
+                claude,
+                content,
+                tenant=tenant,
+                tag=websocket.headers.get("x-usage-tag"),
+            )
+            try:
+                async with schedule(websocket):
+                    async for data in turn:
+                        await websocket.send_text(data)
+            except WebSocketDisconnect:
+                raise
+            except HTTPException as e:
+                await websocket.send_json(error_frame("invalid_request_error", e.detail))
+            except Exception as e:
+                error_type = e.error_type if isinstance(e, ClaudeAPIError) else "api_error"
+                await websocket.send_json(error_frame(error_type, str(e)))
+            finally:
+                # Closes the upstream stream if the client left mid-turn
+                await turn.aclose()
+            sessions.touch(session)
+    except WebSocketDisconnect:
+        # The session stays resumable until it expires
+        pass
 
 @app.post("/compute_use")
-async def compute_use(request: ComputeUseRequest):
+async def compute_use(
+    http_request: Request,
+    request: ComputeUseRequest = Depends(json_body(ComputeUseRequest)),
+):
     """
     Use Claude's computer use feature to perform desktop automation.
     """
-    try:
-        response = claude.compute_use(
+    return await proxy(
+        http_request,
+        lambda: claude.compute_use(
             model=request.model,
             prompt=request.prompt,
             max_tokens=request.max_tokens,
             temperature=request.temperature,
             system_prompt=request.system_prompt,
-        )
-        return response
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        ),
+    )
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Client metrics, the concurrency limit, scheduler queues, shared streams,
+    usage per model, idempotency keys, chat sessions, offloaded payloads and
+    event-loop lag.
+    """
+    snapshot = metrics.snapshot()
+    if limiter is not None:
+        snapshot["concurrency"] = {
+            "limit": limiter.limit,
+            "in_flight": limiter.in_flight,
+            "waiting": limiter.waiting,
+        }
+    snapshot["scheduler"] = scheduler.stats()
+    snapshot["streams"] = broadcaster.stats()
+    snapshot["usage"] = usage_tracker.totals(by=("model",))
+    snapshot["idempotency"] = idempotency.stats()
+    snapshot["warmup"] = warmer.stats()
+    snapshot["sessions"] = sessions.stats()
+    snapshot["offload"] = offloader.stats()
+    snapshot["event_loop"] = lag_monitor.stats()
+    return snapshot
+
+@app.on_event("startup")
+async def startup():
+    """
+    Open the upstream connections before the first request, and keep them warm.
+    Start measuring event-loop lag.
+    """
+    await lag_monitor.start()
+    if WARM_CONNECTIONS > 0:
+        await warmer.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """
+    Stop the warm-up pings and the lag monitor, close the upstream
+    connections, flush the usage log and close the idempotency store and the
+    offload threads.
+    """
+    await warmer.stop()
+    await lag_monitor.stop()
+    await claude.aclose()
+    usage_tracker.close()
+    idempotency.close()
+    offloader.close()
 
 @app.get("/")
 async def root():
@@ -128,6 +617,33 @@ async def root():
         "docs": "/docs",
     }
 
+def server_options() -> Dict[str, Any]:
+    """
+    uvicorn settings of the server profile, from the HOST, PORT and WORKERS
+    environment variables.
+    """
+    options: Dict[str, Any] = {
+        "host": os.environ.get("HOST", "0.0.0.0"),
+        "port": int(os.environ.get("PORT", "8000")),
+        # One worker per CPU in the performance profile; each has its own pool
+        "workers": int(
+            os.environ.get("WORKERS", str(os.cpu_count() or 1) if PERFORMANCE else "1")
+        ),
+    }
+    if PERFORMANCE:
+        options.update(
+            loop="uvloop",
+            http="httptools",
+            access_log=False,
+            # Room for bursts of new connections, and keep-alive longer than
+            # the usual 60 second idle timeout of load balancers in front
+            backlog=4096,
+            timeout_keep_alive=75,
+        )
+    return options
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    options = server_options()
+    # Workers import the app themselves, so it is passed by name
+    uvicorn.run("api_server:app" if options["workers"] > 1 else app, **options)
@@ -0,0 +1,3 @@
+"""
+Benchmarks for the Claude SDK, run against the local stub server.
+"""
@@ -0,0 +1,176 @@
+"""
+Drive Claude, AsyncClaude and api_server.py against the local stub server and
+report throughput, p50/p99 latency, time to first token and memory.
+
+Usage::
+
+    python -m benchmarks.bench_clients --requests 500 --concurrency 32 \\
+        --latency lognormal:-3,0.5 --tokens-per-second 400
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+import aiohttp
+
+from claude_sdk import AsyncClaude, Claude
+from claude_sdk.stub_server import add_stub_arguments
+
+from .common import BenchResult, ServerThread, StubProcess, report, track
+
+API_KEY = "sk-benchmark"
+MODEL = "claude-3-7-sonnet-20250219"
+SCENARIOS = ("sync", "sync-stream", "async", "async-stream", "server")
+
+
+def _messages(i: int) -> List[Dict[str, Any]]:
+    return [{"role": "user", "content": f"Benchmark request number {i}."}]
+
+
+def _is_first_token(chunk: Any) -> bool:
+    return "content_block_delta" in str(chunk)
+
+
+def run_sync(
+    base_url: str, result: BenchResult, requests: int, concurrency: int, stream: bool
+) -> None:
+    client = Claude(api_key=API_KEY, base_url=base_url)
+
+    def one(i: int) -> None:
+        start = time.perf_counter()
+        try:
+            response = client.messages_create(
+                model=MODEL, messages=_messages(i), max_tokens=1024, stream=stream
+            )
+            if stream:
+                first = True
+                for chunk in response:
+                    if first and _is_first_token(chunk):
+                        result.ttfts.append(time.perf_counter() - start)
+                        first = False
+            result.latencies.append(time.perf_counter() - start)
+        except Exception:
+            result.errors += 1
+
+    with client, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+
+
+async def run_async(
+    base_url: str, result: BenchResult, requests: int, concurrency: int, stream: bool
+) -> None:
+    client = AsyncClaude(api_key=API_KEY, base_url=base_url)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.messages_create(
+                    model=MODEL, messages=_messages(i), max_tokens=1024, stream=stream
+                )
+                if stream:
+                    first = True
+                    async for chunk in response:
+                        if first and _is_first_token(chunk):
+                            result.ttfts.append(time.perf_counter() - start)
+                            first = False
+                result.latencies.append(time.perf_counter() - start)
+            except Exception:
+                result.errors += 1
+
+    async with client:
+        await asyncio.gather(*(one(i) for i in range(requests)))
+
+
+async def run_server(
+    server_url: str, result: BenchResult, requests: int, concurrency: int
+) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def one(i: int) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    async with session.post(
+                        f"{server_url}/messages",
+                        json={"model": MODEL, "messages": _messages(i)},
+                    ) as response:
+                        await response.read()
+                        if response.status >= 400:
+                            raise RuntimeError(response.status)
+                    result.latencies.append(time.perf_counter() - start)
+                except Exception:
+                    result.errors += 1
+
+        await asyncio.gather(*(one(i) for i in range(requests)))
+
+
+def load_api_server(base_url: str) -> Any:
+    """
+    Import api_server.py configured to proxy to the stub.
+    """
+    os.environ["ANTHROPIC_API_KEY"] = API_KEY
+    os.environ["BASE_URL"] = base_url
+    return importlib.import_module("api_server").app
+
+
+def run(args: argparse.Namespace) -> List[BenchResult]:
+    results = []
+    runners: Dict[str, Callable[[str, BenchResult], None]] = {
+        "sync": lambda url, r: run_sync(
+            url, r, args.requests, args.concurrency, stream=False
+        ),
+        "sync-stream": lambda url, r: run_sync(
+            url, r, args.requests, args.concurrency, stream=True
+        ),
+        "async": lambda url, r: asyncio.run(
+            run_async(url, r, args.requests, args.concurrency, stream=False)
+        ),
+        "async-stream": lambda url, r: asyncio.run(
+            run_async(url, r, args.requests, args.concurrency, stream=True)
+        ),
+    }
+
+    with StubProcess(args) as stub:
+        for name in args.scenarios:
+            result = BenchResult(name)
+            if name == "server":
+                with ServerThread(load_api_server(stub.url)) as server:
+                    with track(result, args.trace_memory):
+                        asyncio.run(
+                            run_server(
+                                server.url, result, args.requests, args.concurrency
+                            )
+                        )
+            else:
+                with track(result, args.trace_memory):
+                    runners[name](stub.url, result)
+            results.append(result)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--trace-memory", action="store_true")
+    parser.add_argument("--json", action="store_true")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    report(run(args), as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare HTTP/1.1 connection pooling with HTTP/2 multiplexing for high fan-out
+AsyncClaude workloads against the local stub server.
+
+Each scenario gets its own stub process so the number of connections it opened
+can be reported next to throughput and latency. Requires ``claude-sdk[http2]``.
+
+Usage::
+
+    python -m benchmarks.bench_http2 --requests 2000 --concurrency 256 \\
+        --latency 0.05 --tokens-per-second 500 --stream
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Callable, Dict, List
+
+from claude_sdk import AsyncClaude
+from claude_sdk.stub_server import add_stub_arguments
+from claude_sdk.transport import AiohttpTransport, AsyncHTTPXTransport
+
+from .common import BenchResult, StubProcess, report, track
+
+API_KEY = "sk-benchmark"
+MODEL = "claude-3-7-sonnet-20250219"
+
+
+async def drive(
+    client: AsyncClaude,
+    result: BenchResult,
+    requests: int,
+    concurrency: int,
+    stream: bool,
+) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.messages_create(
+                    model=MODEL,
+                    messages=[{"role": "user", "content": f"Request {i}"}],
+                    stream=stream,
+                )
+                if stream:
+                    first = True
+                    async for chunk in response:
+                        if first and "content_block_delta" in chunk:
+                            result.ttfts.append(time.perf_counter() - start)
+                            first = False
+                result.latencies.append(time.perf_counter() - start)
+            except Exception:
+                result.errors += 1
+
+    async with client:
+        await asyncio.gather(*(one(i) for i in range(requests)))
+
+
+def run(args: argparse.Namespace) -> List[BenchResult]:
+    pool = args.concurrency
+    scenarios: Dict[str, Any] = {
+        "aiohttp-http1.1": (False, lambda: AiohttpTransport(limit=pool)),
+        "httpx-http1.1": (
+            False,
+            lambda: AsyncHTTPXTransport(http2=False, max_connections=pool),
+        ),
+        "httpx-http2": (
+            True,
+            lambda: AsyncHTTPXTransport(
+                http1=False, max_connections=args.h2_connections
+            ),
+        ),
+    }
+    results = []
+    for name, (http2, make_transport) in scenarios.items():
+        factory: Callable[[], Any] = make_transport
+        result = BenchResult(name)
+        with StubProcess(args, http2=http2) as stub:
+            client = AsyncClaude(
+                api_key=API_KEY, base_url=stub.url, transport=factory()
+            )
+            with track(result, args.trace_memory):
+                asyncio.run(
+                    drive(client, result, args.requests, args.concurrency, args.stream)
+                )
+            result.extra["connections"] = stub.stats()["connections"] - 1
+        results.append(result)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=128)
+    parser.add_argument("--h2-connections", type=int, default=2)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--trace-memory", action="store_true")
+    parser.add_argument("--json", action="store_true")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    report(run(args), as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
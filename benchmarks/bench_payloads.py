@@ -0,0 +1,122 @@
+"""
+Measure how large request bodies sent to api_server.py delay small requests,
+with large bodies handled on the event loop and offloaded to worker threads.
+
+Each scenario starts its own stub and server process. One client keeps
+sending ``/messages`` requests with a long conversation of ``--large-mb``
+megabytes, one at a time, while ``--concurrency`` clients send small
+requests. The results show the latency of the small requests, the number of
+large ones served and the event-loop lag reported by ``/metrics``.
+
+Usage::
+
+    python -m benchmarks.bench_payloads --duration 10 --concurrency 16 \\
+        --large-mb 4 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List
+
+import aiohttp
+
+from claude_sdk.stub_server import add_stub_arguments
+
+from .bench_server import MODEL, ServerProcess
+from .common import BenchResult, StubProcess, report
+
+# OFFLOAD_THRESHOLD of each scenario
+SCENARIOS = {
+    "inline": str(2**62),
+    "offload": str(256 * 1024),
+}
+
+
+def conversation(megabytes: float) -> List[Dict[str, Any]]:
+    """
+    Build a conversation of about ``megabytes`` of JSON, in turns of 2 KB.
+    """
+    turns = max(1, int(megabytes * 1024 * 1024 / 2048)) | 1
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": "word " * 400}
+        for i in range(turns)
+    ]
+
+
+async def drive(
+    server_url: str, result: BenchResult, args: argparse.Namespace
+) -> Dict[str, Any]:
+    large = {"model": MODEL, "max_tokens": 16, "messages": conversation(args.large_mb)}
+    deadline = time.perf_counter() + args.duration
+    connector = aiohttp.TCPConnector(limit=args.concurrency + 1)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def small(i: int) -> None:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                payload = {
+                    "model": MODEL,
+                    "max_tokens": 16,
+                    "messages": [{"role": "user", "content": f"Request {i}"}],
+                }
+                try:
+                    async with session.post(
+                        f"{server_url}/messages", json=payload
+                    ) as response:
+                        await response.read()
+                        if response.status >= 400:
+                            raise RuntimeError(response.status)
+                    result.latencies.append(time.perf_counter() - start)
+                except Exception:
+                    result.errors += 1
+
+        async def big() -> None:
+            sent = 0
+            while time.perf_counter() < deadline:
+                async with session.post(f"{server_url}/messages", json=large) as r:
+                    await r.read()
+                sent += 1
+            result.extra["large_requests"] = sent
+
+        start = time.perf_counter()
+        await asyncio.gather(big(), *(small(i) for i in range(args.concurrency)))
+        result.elapsed = time.perf_counter() - start
+        async with session.get(f"{server_url}/metrics") as response:
+            return await response.json()
+
+
+def run(args: argparse.Namespace) -> List[BenchResult]:
+    results = []
+    for name in args.scenarios:
+        result = BenchResult(name)
+        with StubProcess(args) as stub:
+            server = ServerProcess(stub.url, "default", 0)
+            server.env["OFFLOAD_THRESHOLD"] = SCENARIOS[name]
+            with server:
+                metrics = asyncio.run(drive(server.url, result, args))
+        loop = metrics["event_loop"]
+        result.extra["loop_lag_p99_ms"] = loop["lag_p99"] * 1000
+        result.extra["loop_lag_max_ms"] = loop["lag_max"] * 1000
+        result.extra["stall_seconds"] = loop["stall_time"]
+        results.append(result)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--large-mb", type=float, default=4.0)
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--json", action="store_true")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    report(run(args), as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
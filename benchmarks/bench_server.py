@@ -0,0 +1,194 @@
+"""
+Compare api_server.py with and without connection pre-warming, under the
+default and the performance server profile, against the local stub server.
+
+Each scenario starts its own stub and server process. It first sends a burst
+of concurrent requests right after startup, which pays for any upstream
+connections that are not open yet, then measures steady-state throughput.
+The stub serves plain HTTP on the loopback interface, so a cold connection
+costs a TCP handshake only; against the real API it also costs a TLS
+handshake over the network. The performance profile needs
+``claude-sdk[server]`` and is skipped without it.
+
+Usage::
+
+    python -m benchmarks.bench_server --requests 2000 --concurrency 64 \\
+        --burst 32 --latency 0.05 --tokens-per-second 400
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from claude_sdk.stub_server import add_stub_arguments
+
+from .common import BenchResult, StubProcess, free_port, percentile, report
+
+API_KEY = "sk-benchmark"
+MODEL = "claude-3-7-sonnet-20250219"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Profile and number of warm upstream connections of each scenario
+SCENARIOS = {
+    "default-cold": ("default", 0),
+    "default-warm": ("default", None),
+    "performance-cold": ("performance", 0),
+    "performance-warm": ("performance", None),
+}
+
+
+class ServerProcess:
+    """
+    Run api_server.py in a separate process.
+
+    Args:
+        base_url (str): Upstream base URL.
+        profile (str): Server profile.
+        warm_connections (int): Upstream connections warmed at startup.
+    """
+
+    def __init__(self, base_url: str, profile: str, warm_connections: int):
+        self.port = free_port()
+        self.env = {
+            **os.environ,
+            "ANTHROPIC_API_KEY": API_KEY,
+            "BASE_URL": base_url,
+            "SERVER_PROFILE": profile,
+            "WARM_CONNECTIONS": str(warm_connections),
+            "HOST": "127.0.0.1",
+            "PORT": str(self.port),
+            "WORKERS": "1",
+        }
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "ServerProcess":
+        self.process = subprocess.Popen(
+            [sys.executable, "api_server.py"],
+            cwd=ROOT,
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        # uvicorn listens once the startup phase, including warming, is done
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and self.process.poll() is None:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), 0.1).close()
+                return self
+            except OSError:
+                time.sleep(0.05)
+        self.__exit__()
+        raise RuntimeError("api_server.py did not start")
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+
+
+async def drive(
+    server_url: str,
+    result: BenchResult,
+    requests: int,
+    concurrency: int,
+    burst: int,
+) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=max(concurrency, burst))
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def one(i: int, latencies: List[float]) -> None:
+            start = time.perf_counter()
+            try:
+                async with session.post(
+                    f"{server_url}/messages",
+                    json={
+                        "model": MODEL,
+                        "messages": [{"role": "user", "content": f"Request {i}"}],
+                    },
+                ) as response:
+                    await response.read()
+                    if response.status >= 400:
+                        raise RuntimeError(response.status)
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                result.errors += 1
+
+        async def limited(i: int) -> None:
+            async with semaphore:
+                await one(i, result.latencies)
+
+        first: List[float] = []
+        await asyncio.gather(*(one(i, first) for i in range(burst)))
+        result.extra["burst_p50_ms"] = percentile(first, 50) * 1000
+        result.extra["burst_p99_ms"] = percentile(first, 99) * 1000
+
+        start = time.perf_counter()
+        await asyncio.gather(*(limited(i) for i in range(requests)))
+        result.elapsed = time.perf_counter() - start
+
+
+def available(profile: str) -> bool:
+    if profile == "default":
+        return True
+    modules = ("uvloop", "httptools", "orjson")
+    return all(importlib.util.find_spec(name) for name in modules)
+
+
+def run(args: argparse.Namespace) -> List[BenchResult]:
+    results = []
+    for name in args.scenarios:
+        profile, warm = SCENARIOS[name]
+        if not available(profile):
+            print(f"Skipping {name}: pip install 'claude-sdk[server]'", file=sys.stderr)
+            continue
+        warm = args.burst if warm is None else warm
+        result = BenchResult(name)
+        with StubProcess(args) as stub:
+            with ServerProcess(stub.url, profile, warm) as server:
+                asyncio.run(
+                    drive(
+                        server.url, result, args.requests, args.concurrency, args.burst
+                    )
+                )
+            # One connection is the stats request itself
+            result.extra["upstream_connections"] = stub.stats()["connections"] - 1
+        results.append(result)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--burst",
+        type=int,
+        default=16,
+        help="concurrent requests sent right after startup; also the number "
+        "of connections warm scenarios open",
+    )
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--json", action="store_true")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    report(run(args), as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Compare validating tool inputs against large nested schemas with compiled
+validators, a validator that walks the schema on every call, and the
+jsonschema package when it is installed.
+
+The schema is a tree of objects ``--depth`` levels deep with ``--breadth``
+properties per level, arrays of sub-objects and ``$ref`` pointers, like the
+input schemas of tools that take structured documents. Scenarios:
+
+- ``compile``: compiling the schema, which the registry does once per schema.
+- ``walk``: re-walking the schema dictionary for every input.
+- ``compiled``: the cached compiled validator.
+- ``streaming``: the compiled validator fed the input in 16-character chunks.
+- ``jsonschema``: ``jsonschema.Draft202012Validator``, if installed.
+
+Usage::
+
+    python -m benchmarks.bench_tools --depth 4 --breadth 6 --iterations 500
+"""
+
+import argparse
+import importlib.util
+import json
+import re
+import time
+from typing import Any, Callable, Dict, List
+
+from claude_sdk.tools import Validator, compile_schema, schema_hash
+
+from .common import BenchResult, report, track
+
+
+def nested_schema(depth: int, breadth: int) -> Dict[str, Any]:
+    """
+    Build an object schema ``depth`` levels deep.
+    """
+
+    def level(d: int) -> Dict[str, Any]:
+        properties: Dict[str, Any] = {
+            "id": {"type": "string", "pattern": "^[a-z]+-[0-9]+$"},
+            "kind": {"enum": ["leaf", "branch", "root"]},
+            "weight": {"type": "number", "minimum": 0, "maximum": 1000},
+            "tags": {"$ref": "#/$defs/tags"},
+        }
+        for i in range(breadth):
+            properties[f"field_{i}"] = {"type": "string", "maxLength": 200}
+        if d > 0:
+            properties["children"] = {"type": "array", "items": level(d - 1)}
+        return {
+            "type": "object",
+            "properties": properties,
+            "required": ["id", "kind"],
+            "additionalProperties": False,
+        }
+
+    schema = level(depth)
+    schema["$defs"] = {
+        "tags": {"type": "array", "items": {"type": "string"}, "uniqueItems": True}
+    }
+    return schema
+
+
+def nested_input(depth: int, breadth: int, fanout: int = 2) -> Dict[str, Any]:
+    """
+    Build a valid input for :func:`nested_schema`.
+    """
+    value: Dict[str, Any] = {
+        "id": f"node-{depth}",
+        "kind": "branch" if depth else "leaf",
+        "weight": depth * 1.5,
+        "tags": ["a", "b", "c"],
+    }
+    for i in range(breadth):
+        value[f"field_{i}"] = f"value {i}"
+    if depth > 0:
+        value["children"] = [nested_input(depth - 1, breadth) for _ in range(fanout)]
+    return value
+
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool,
+}
+
+
+def walk(schema: Dict[str, Any], value: Any, root: Dict[str, Any]) -> List[str]:
+    """
+    Validate by interpreting the schema dictionary, as ad-hoc validators do.
+    """
+    errors: List[str] = []
+    if "$ref" in schema:
+        target: Any = root
+        for part in schema["$ref"][2:].split("/"):
+            target = target[part]
+        return walk(target, value, root)
+    kind = schema.get("type")
+    if kind is not None and not isinstance(value, _TYPES[kind]):
+        return [f"not {kind}"]
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append("enum")
+    if isinstance(value, dict):
+        for name in schema.get("required", ()):
+            if name not in value:
+                errors.append(f"missing {name}")
+        properties = schema.get("properties", {})
+        for key, item in value.items():
+            if key in properties:
+                errors.extend(walk(properties[key], item, root))
+            elif schema.get("additionalProperties", True) is False:
+                errors.append(f"unexpected {key}")
+    elif isinstance(value, list):
+        if "items" in schema:
+            for item in value:
+                errors.extend(walk(schema["items"], item, root))
+        if schema.get("uniqueItems") and len(set(map(json.dumps, value))) < len(value):
+            errors.append("unique")
+    elif isinstance(value, str):
+        if "pattern" in schema and not re.search(schema["pattern"], value):
+            errors.append("pattern")
+        if "maxLength" in schema and len(value) > schema["maxLength"]:
+            errors.append("maxLength")
+    elif isinstance(value, (int, float)):
+        if "minimum" in schema and value < schema["minimum"]:
+            errors.append("minimum")
+        if "maximum" in schema and value > schema["maximum"]:
+            errors.append("maximum")
+    return errors
+
+
+def timed(name: str, iterations: int, one: Callable[[], Any]) -> BenchResult:
+    result = BenchResult(name)
+    with track(result):
+        for _ in range(iterations):
+            start = time.perf_counter()
+            one()
+            result.latencies.append(time.perf_counter() - start)
+    return result
+
+
+def run(args: argparse.Namespace) -> List[BenchResult]:
+    schema = nested_schema(args.depth, args.breadth)
+    value = nested_input(args.depth, args.breadth)
+    text = json.dumps(value)
+    validator = compile_schema(schema)
+    assert validator.validate(value) == [] and walk(schema, value, schema) == []
+
+    def stream() -> None:
+        streaming = validator.streaming()
+        for start in range(0, len(text), 16):
+            streaming.feed(text[start : start + 16])
+        streaming.close()
+
+    results = [
+        timed("compile", max(1, args.iterations // 10), lambda: Validator(schema)),
+        timed("cached-lookup", args.iterations, lambda: compile_schema(schema)),
+        timed("walk", args.iterations, lambda: walk(schema, value, schema)),
+        timed("compiled", args.iterations, lambda: validator.validate(value)),
+        timed("streaming", args.iterations, stream),
+    ]
+    if importlib.util.find_spec("jsonschema") is not None:
+        import jsonschema
+
+        reference = jsonschema.Draft202012Validator(schema)
+        errors = lambda: list(reference.iter_errors(value))  # noqa: E731
+        results.append(timed("jsonschema", args.iterations, errors))
+    for result in results:
+        result.extra["input_bytes"] = len(text)
+        result.extra["schema"] = schema_hash(schema)[:12]
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--breadth", type=int, default=6)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    report(run(args), as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Shared helpers for the benchmark suite: timing statistics, memory tracking,
+running the stub server in its own process and running ASGI apps in a
+background thread.
+"""
+
+import argparse
+import json
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from claude_sdk.stub_server import add_stub_arguments
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Return the q-th percentile (0-100) of values using nearest-rank.
+
+    Args:
+        values (List[float]): Samples.
+        q (float): Percentile to compute.
+
+    Returns:
+        float: The percentile, or 0.0 when there are no samples.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def free_port() -> int:
+    """
+    Return a TCP port that is currently free on the loopback interface.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def max_rss_mb() -> float:
+    """
+    Return the peak resident set size of this process in MiB.
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class BenchResult:
+    """
+    Measurements of one benchmark scenario.
+
+    Args:
+        name (str): Scenario name.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.ttfts: List[float] = []
+        self.errors = 0
+        self.elapsed = 0.0
+        self.peak_memory_mb: Optional[float] = None
+        self.extra: Dict[str, Any] = {}
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the scenario.
+
+        Returns:
+            Dict[str, Any]: Throughput, latency percentiles, TTFT and memory.
+        """
+        done = len(self.latencies)
+        summary = {
+            "scenario": self.name,
+            "requests": done,
+            "errors": self.errors,
+            "throughput_rps": done / self.elapsed if self.elapsed else 0.0,
+            "p50_ms": percentile(self.latencies, 50) * 1000,
+            "p99_ms": percentile(self.latencies, 99) * 1000,
+            "ttft_p50_ms": percentile(self.ttfts, 50) * 1000 if self.ttfts else None,
+            "ttft_p99_ms": percentile(self.ttfts, 99) * 1000 if self.ttfts else None,
+            "peak_memory_mb": self.peak_memory_mb,
+            "max_rss_mb": max_rss_mb(),
+        }
+        summary.update(self.extra)
+        return summary
+
+
+@contextmanager
+def track(result: BenchResult, trace_memory: bool = False) -> Iterator[BenchResult]:
+    """
+    Time a scenario and optionally record its peak Python heap usage.
+
+    Args:
+        result (BenchResult): Result to fill in.
+        trace_memory (bool, optional): Whether to trace allocations with
+            tracemalloc. Tracing slows the scenario down noticeably.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result.elapsed = time.perf_counter() - start
+        if trace_memory:
+            result.peak_memory_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+
+
+def report(results: List[BenchResult], as_json: bool = False) -> None:
+    """
+    Print scenario summaries as a table or as JSON lines.
+
+    Args:
+        results (List[BenchResult]): Results to print.
+        as_json (bool, optional): Print one JSON object per scenario.
+    """
+    rows = [r.summary() for r in results]
+    if as_json:
+        for row in rows:
+            print(json.dumps(row))
+        return
+
+    columns = ["scenario", "requests", "errors", "throughput_rps", "p50_ms", "p99_ms"]
+    columns += ["ttft_p50_ms", "ttft_p99_ms", "peak_memory_mb", "max_rss_mb"]
+    for row in rows:
+        columns += [key for key in row if key not in columns]
+
+    def fmt(value: Any) -> str:
+        if value is None:
+            return "-"
+        if isinstance(value, float):
+            return f"{value:.1f}"
+        return str(value)
+
+    widths = [max(len(c), *(len(fmt(row.get(c))) for row in rows)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(fmt(row.get(c)).ljust(w) for c, w in zip(columns, widths)))
+
+
+class ServerThread:
+    """
+    Run an ASGI app with uvicorn in a background thread.
+
+    Args:
+        app: ASGI application.
+        port (int, optional): Port to listen on. Defaults to a free port.
+        **config: Extra keyword arguments for ``uvicorn.Config``.
+    """
+
+    def __init__(self, app: Any, port: Optional[int] = None, **config: Any):
+        import uvicorn
+
+        self.port = port or free_port()
+        config.setdefault("log_level", "warning")
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=self.port, **config)
+        )
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "ServerThread":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def stub_argv(args: argparse.Namespace) -> List[str]:
+    """
+    Turn the parsed stub options back into command line arguments.
+
+    Args:
+        args (argparse.Namespace): Arguments added by ``add_stub_arguments``.
+
+    Returns:
+        List[str]: Arguments for ``python -m claude_sdk.stub_server``.
+    """
+    argv = []
+    for action in add_stub_arguments(argparse.ArgumentParser())._actions:
+        value = getattr(args, action.dest, None)
+        if action.option_strings and action.dest != "help" and value is not None:
+            argv += [action.option_strings[0], str(value)]
+    return argv
+
+
+class StubProcess:
+    """
+    Run the stub server in a separate process, so that it does not compete with
+    the client under test for the GIL.
+
+    Args:
+        args (argparse.Namespace): Stub options added by ``add_stub_arguments``.
+        http2 (bool, optional): Serve cleartext HTTP/2 instead of HTTP/1.1.
+    """
+
+    def __init__(self, args: argparse.Namespace, http2: bool = False):
+        self.port = free_port()
+        self.http2 = http2
+        self.argv = [sys.executable, "-m", "claude_sdk.stub_server"]
+        self.argv += ["--port", str(self.port)] + stub_argv(args)
+        if http2:
+            self.argv.append("--http2")
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the number of requests and connections the stub has served.
+        """
+        if self.http2:
+            import httpx
+
+            with httpx.Client(http1=False, http2=True) as client:
+                return client.get(f"{self.url}/_stub/stats").json()
+        import requests
+
+        return requests.get(f"{self.url}/_stub/stats").json()
+
+    def __enter__(self) -> "StubProcess":
+        self.process = subprocess.Popen(self.argv, stdout=subprocess.DEVNULL)
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), 0.1).close()
+                return self
+            except OSError:
+                time.sleep(0.05)
+        self.__exit__()
+        raise RuntimeError("Stub server did not start")
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
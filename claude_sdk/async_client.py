@@ -2,13 +2,38 @@
 Asynchronous client for interacting with Anthropic's Claude AI models.
 """
 
+import asyncio
 import os
 import json
-import aiohttp
-from typing import Dict, List, Optional, Union, Any, AsyncGenerator
+import time
+import weakref
+from typing import Callable, Dict, List, Optional, Sequence, Union, Any, AsyncGenerator
 
+from .circuit_breaker import CircuitBreaker
+from .compression import RequestCompression
+from .concurrency import AdaptiveLimiter, Permit
+from .context import ContextWindow, estimate_tokens
+from .encoding import encode_request
+from .eventloop import Offloader, estimate_size
 from .exceptions import handle_api_error
-from .utils import validate_api_key
+from .fallback import FallbackPolicy
+from .idempotency import IdempotencyStore
+from .instrumentation import Instrumentation
+from .load_balancer import Lease, LoadBalancer
+from .prompt_cache import PromptCache
+from .streaming import AsyncStream
+from .transport import (
+    AiohttpTransport,
+    AsyncHTTPXTransport,
+    AsyncTransport,
+    TransportRequest,
+)
+from .usage import UsageTracker
+from .utils import beta_headers, validate_api_key
+
+
+def _encode_json(payload: Dict[str, Any]) -> bytes:
+    return json.dumps(payload).encode("utf-8")
 
 
 class AsyncClaude:
@@ -19,13 +44,54 @@ class AsyncClaude:
         api_key (str, optional): Anthropic API key. If not provided, it will be read from
             the ANTHROPIC_API_KEY environment variable.
         base_url (str, optional): Base URL for the Anthropic API.
+        transport (AsyncTransport, optional): Transport used to send requests.
+            Defaults to a pooled :class:`~claude_sdk.transport.AiohttpTransport`.
+        http2 (bool, optional): Use an HTTP/2 transport that multiplexes concurrent
+            requests over a few connections, when no transport is given.
+        compression (RequestCompression, optional): Compress request bodies above a
+            size threshold.
+        instrumentation (Instrumentation, optional): Receives events such as
+            request compression statistics.
+        circuit_breaker (CircuitBreaker, optional): Fail fast while the endpoint
+            and model of a request are failing. Can be shared between clients.
+        load_balancer (LoadBalancer, optional): Route each request to one of a
+            pool of API keys and base URLs instead of api_key and base_url.
+        fallback (FallbackPolicy, optional): Models ``messages_create`` falls back
+            to when the requested one is overloaded or too slow.
+        cache (PromptCache, optional): Answer non-streaming ``messages_create``
+            calls with ``temperature=0`` from the responses of near-duplicate
+            earlier requests.
+        usage_tracker (UsageTracker, optional): Record the token usage and cost
+            of ``messages_create`` and ``generate`` calls and enforce budgets
+            before sending them.
+        idempotency (IdempotencyStore, optional): Store of the responses of
+            ``messages_create`` calls with an ``idempotency_key``, so that
+            retried requests run once. Can be shared between clients.
+        concurrency_limiter (AdaptiveLimiter, optional): Limit requests in flight
+            to a limit adapted to the observed latency and rejections.
+        offloader (Offloader, optional): Serialize request payloads above its
+            size threshold on a worker thread instead of the event loop.
     """
 
     def __init__(
         self,
         api_key: Optional[str] = None,
         base_url: str = "https://api.anthropic.com",
+        transport: Optional[AsyncTransport] = None,
+        http2: bool = False,
+        compression: Optional[RequestCompression] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        load_balancer: Optional[LoadBalancer] = None,
+        fallback: Optional[FallbackPolicy] = None,
+        cache: Optional[PromptCache] = None,
+        usage_tracker: Optional[UsageTracker] = None,
+        idempotency: Optional[IdempotencyStore] = None,
+        concurrency_limiter: Optional[AdaptiveLimiter] = None,
+        offloader: Optional[Offloader] = None,
     ):
+        if api_key is None and load_balancer is not None:
+            api_key = load_balancer.targets[0].api_key
         self.api_key = validate_api_key(api_key)
         self.base_url = base_url
         self.headers = {
@@ -33,6 +99,228 @@ class AsyncClaude:
             "anthropic-version": "2023-06-01",
             "content-type": "application/json",
         }
+        if transport is None:
+            transport = AsyncHTTPXTransport() if http2 else AiohttpTransport()
+        self.transport = transport
+        self.compression = compression
+        self.instrumentation = instrumentation or Instrumentation()
+        self.circuit_breaker = circuit_breaker
+        self.load_balancer = load_balancer
+        self.fallback = fallback
+        self.cache = cache
+        self.usage_tracker = usage_tracker
+        self.idempotency = idempotency
+        self.concurrency_limiter = concurrency_limiter
+        self.offloader = offloader
+
+    async def aclose(self) -> None:
+        """
+        Close the underlying transport and its pooled connections.
+        """
+        await self.transport.aclose()
+
+    async def __aenter__(self) -> "AsyncClaude":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def _send(
+        self,
+        request: TransportRequest,
+        base_url: str,
+        model: str,
+        lease: Optional[Lease] = None,
+        permit: Optional[Permit] = None,
+    ) -> Any:
+        """
+        Send a request through the circuit breaker, if one is configured, and
+        record the outcome on the load balancer lease and concurrency permit.
+
+        Args:
+            request (TransportRequest): The request.
+            base_url (str): Base URL the request is sent to.
+            model (str): Model the request is for.
+            lease (Lease, optional): Load balancer lease of the request.
+            permit (Permit, optional): Concurrency limiter permit of the request.
+
+        Returns:
+            Any: The transport response.
+        """
+        breaker = self.circuit_breaker
+        circuit = None
+        if breaker is not None:
+            circuit = breaker.acquire(base_url, model, self.instrumentation)
+        start = time.monotonic()
+        try:
+            response = await self.transport.send(request)
+        except Exception:
+            if circuit is not None:
+                circuit.breaker.record(circuit, False, self.instrumentation)
+            if lease is not None:
+                lease.record(None)
+            if permit is not None:
+                permit.record(time.monotonic() - start, dropped=True)
+            raise
+        except BaseException:
+            if circuit is not None:
+                circuit.breaker.release(circuit)
+            raise
+        if circuit is not None:
+            circuit.breaker.record(
+                circuit, response.status_code < 500, self.instrumentation
+            )
+        if lease is not None:
+            lease.record(response.status_code, response.headers)
+        if permit is not None:
+            permit.record(
+                time.monotonic() - start, response.status_code in (429, 503, 529)
+            )
+        return response
+
+    async def _post(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        stream: bool = False,
+        extra_headers: Optional[Dict[str, str]] = None,
+    ) -> Union[Dict[str, Any], AsyncStream]:
+        """
+        Send a request to the API and handle errors.
+
+        Args:
+            path (str): API path, e.g. "/v1/messages".
+            payload (Dict[str, Any]): JSON payload.
+            stream (bool, optional): Whether to stream the response.
+            extra_headers (Dict[str, str], optional): Headers sent on top of the
+                client's.
+
+        Returns:
+            Union[Dict[str, Any], AsyncStream]: Response data or a
+                stream of the response's events.
+        """
+        if stream:
+            payload["stream"] = True
+        permit = None
+        if self.concurrency_limiter is not None:
+            permit = await self.concurrency_limiter.acquire(self.instrumentation)
+        base_url, headers, lease = self.base_url, self.headers, None
+        if self.load_balancer is not None:
+            lease = self.load_balancer.acquire(self.instrumentation)
+            base_url = lease.target.base_url
+            headers = {**headers, "x-api-key": lease.target.api_key}
+        if extra_headers:
+            headers = {**headers, **extra_headers}
+        releases = [r.release for r in (lease, permit) if r is not None]
+
+        try:
+            request = TransportRequest(
+                "POST", f"{base_url}{path}", headers, json=payload, stream=stream
+            )
+            encode_request(request, self.compression, self.instrumentation)
+            if self.offloader is not None and request.content is None:
+                size = estimate_size(payload, limit=self.offloader.threshold)
+                if size >= self.offloader.threshold:
+                    request.content = await self.offloader.run(
+                        size, _encode_json, payload
+                    )
+            response = await self._send(
+                request, base_url, payload.get("model", ""), lease, permit
+            )
+
+            if stream:
+                if response.status_code >= 400:
+                    try:
+                        error_data = await response.json()
+                    finally:
+                        await response.aclose()
+                    handle_api_error(response.status_code, error_data)
+
+                generator = self._handle_streaming_response(response, releases)
+                # Also release streams that are dropped without being consumed
+                for release in releases:
+                    weakref.finalize(generator, release)
+                stream_releases, releases = releases, []
+
+                async def close() -> None:
+                    # A generator closed before its first chunk skips its finally
+                    await response.aclose()
+                    for release in stream_releases:
+                        release()
+
+                return AsyncStream(generator, close, self.instrumentation)
+
+            response_data: Dict[str, Any] = await response.json()
+        finally:
+            for release in releases:
+                release()
+
+        if response.status_code >= 400:
+            handle_api_error(response.status_code, response_data)
+
+        return response_data
+
+    async def _post_with_fallback(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        stream: bool,
+        policy: Optional[FallbackPolicy],
+        extra_headers: Optional[Dict[str, str]] = None,
+    ) -> Union[Dict[str, Any], AsyncStream]:
+        """
+        Send a request, falling back to other models according to a policy.
+
+        Args:
+            path (str): API path, e.g. "/v1/messages".
+            payload (Dict[str, Any]): JSON payload including the model.
+            stream (bool): Whether to stream the response.
+            policy (FallbackPolicy, optional): Fallback policy.
+            extra_headers (Dict[str, str], optional): Headers sent on top of the
+                client's.
+
+        Returns:
+            Union[Dict[str, Any], AsyncStream]: Response data or a
+                stream of the response's events.
+        """
+        if policy is None:
+            return await self._post(
+                path, payload, stream=stream, extra_headers=extra_headers
+            )
+
+        requested = payload["model"]
+        models = policy.models(requested)
+        for attempt, model in enumerate(models, 1):
+            last = attempt == len(models)
+            request = self._post(
+                path,
+                {**payload, "model": model},
+                stream=stream,
+                extra_headers=extra_headers,
+            )
+            try:
+                if last or policy.latency_budget is None:
+                    result = await request
+                else:
+                    result = await asyncio.wait_for(request, policy.latency_budget)
+            except Exception as e:
+                reason = None if last else policy.reason(e)
+                if reason is None:
+                    raise
+                self.instrumentation.emit(
+                    "model.fallback",
+                    model=model,
+                    fallback_model=models[attempt],
+                    reason=reason,
+                )
+                continue
+            break
+
+        policy.record(model, attempt)
+        self.instrumentation.emit(
+            "model.served", requested_model=requested, model=model, attempts=attempt
+        )
+        return result
 
     async def generate(
         self,
@@ -43,7 +331,7 @@ class AsyncClaude:
         system_prompt: Optional[str] = None,
         stream: bool = False,
         tools: Optional[List[Dict[str, Any]]] = None,
-    ) -> Union[Dict[str, Any], AsyncGenerator[str, None]]:
+    ) -> Union[Dict[str, Any], AsyncStream]:
         """
         Asynchronously generate a response from Claude.
 
@@ -57,8 +345,8 @@ class AsyncClaude:
             tools (List[Dict[str, Any]], optional): List of tools for Claude to use.
 
         Returns:
-            Union[Dict[str, Any], AsyncGenerator[str, None]]: Response from Claude or a generator
-                that yields streamed responses.
+            Union[Dict[str, Any], AsyncStream]: Response from Claude or a
+                stream of the response's events.
         """
         messages = [{"role": "user", "content": prompt}]
 
@@ -75,59 +363,59 @@ class AsyncClaude:
         if tools:
             payload["tools"] = tools
 
-        endpoint = f"{self.base_url}/v1/messages"
-
-        async with aiohttp.ClientSession() as session:
-            if stream:
-                payload["stream"] = True
-                async with session.post(
-                    endpoint, json=payload, headers=self.headers
-                ) as response:
-                    if response.status >= 400:
-                        error_data = await response.json()
-                        handle_api_error(response.status, error_data)
-
-                    return self._handle_streaming_response(response)
-            else:
-                async with session.post(
-                    endpoint, json=payload, headers=self.headers
-                ) as response:
-                    response_data = await response.json()
-
-                    if response.status >= 400:
-                        handle_api_error(response.status, response_data)
-
-                    return response_data
+        # Accounted and budgeted like messages_create
+        tracker = self.usage_tracker
+        if tracker is not None:
+            model = tracker.check(model, None, None, self.instrumentation)
+            payload["model"] = model
+        response = await self._post("/v1/messages", payload, stream=stream)
+        if tracker is not None:
+            tracker.track(response, model)
+        return response
 
     async def _handle_streaming_response(
-        self, response: aiohttp.ClientResponse
+        self, response: Any, releases: Sequence[Callable[[], None]] = ()
     ) -> AsyncGenerator[str, None]:
         """
         Handle streaming response from Claude.
 
         Args:
-            response: Streaming response from aiohttp.
+            response: Streaming response from the transport.
+            releases (Sequence[Callable[[], None]], optional): Called when the
+                stream ends, e.g. to release its load balancer lease.
 
         Yields:
             str: Response chunks.
         """
-        async for line in response.content:
-            line = line.decode("utf-8").strip()
-            if line.startswith("data: "):
-                data = line[6:]  # Remove "data: " prefix
-                if data != "[DONE]":
-                    yield data
+        try:
+            async for raw in response.iter_lines():
+                line = raw.decode("utf-8").strip()
+                if line.startswith("data: "):
+                    data = line[6:]  # Remove "data: " prefix
+                    if data != "[DONE]":
+                        yield data
+        finally:
+            await response.aclose()
+            for release in releases:
+                release()
 
     async def messages_create(
         self,
         model: str,
-        messages: List[Dict[str, Union[str, List[Dict[str, str]]]]],
+        messages: Union[
+            List[Dict[str, Union[str, List[Dict[str, str]]]]], ContextWindow
+        ],
         max_tokens: int = 1000,
         temperature: float = 0.7,
         system: Optional[str] = None,
         tools: Optional[List[Dict[str, Any]]] = None,
         stream: bool = False,
-    ) -> Union[Dict[str, Any], AsyncGenerator[str, None]]:
+        fallback: Optional[FallbackPolicy] = None,
+        tenant: Optional[str] = None,
+        tag: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        betas: Optional[List[str]] = None,
+    ) -> Union[Dict[str, Any], AsyncStream]:
         """
         Asynchronously create a message using the Claude API.
 
@@ -135,17 +423,36 @@ class AsyncClaude:
 
         Args:
             model (str): The Claude model to use.
-            messages (List[Dict]): The messages to send to Claude.
+            messages (Union[List[Dict], ContextWindow]): The messages to send to
+                Claude. A :class:`~claude_sdk.context.ContextWindow` is compacted
+                to its token budget first, and the reply is appended to it.
             max_tokens (int, optional): Maximum number of tokens to generate.
             temperature (float, optional): Sampling temperature.
             system (str, optional): System prompt to guide Claude's behavior.
             tools (List[Dict], optional): List of tools for Claude to use.
             stream (bool, optional): Whether to stream the response.
+            fallback (FallbackPolicy, optional): Fallback policy for this call,
+                overriding the client's.
+            tenant (str, optional): Tenant the usage tracker accounts the call to.
+            tag (str, optional): Tag the usage tracker accounts the call to.
+            idempotency_key (str, optional): Key identifying the request across
+                retries. A non-streaming call with the key of an earlier call
+                returns its response, or waits for it while it is in flight,
+                instead of calling the API again. Needs a client with an
+                ``idempotency`` store.
+            betas (List[str], optional): Betas to enable for this call, e.g.
+                "computer-use-2025-01-24", on top of those in the client's
+                ``anthropic-beta`` header.
 
         Returns:
-            Union[Dict[str, Any], AsyncGenerator[str, None]]: Response from Claude or a generator
-                that yields streamed responses.
+            Union[Dict[str, Any], AsyncStream]: Response from Claude or a
+                stream of the response's events.
         """
+        window = messages if isinstance(messages, ContextWindow) else None
+        if window is not None:
+            overhead = estimate_tokens(system) + estimate_tokens(tools)
+            messages = await window.prepare_async(overhead, max_tokens)
+
         payload = {
             "model": model,
             "messages": messages,
@@ -159,26 +466,114 @@ class AsyncClaude:
         if tools:
             payload["tools"] = tools
 
-        endpoint = f"{self.base_url}/v1/messages"
-
-        async with aiohttp.ClientSession() as session:
+        extra_headers = beta_headers(self.headers, betas) if betas else None
+        if idempotency_key is None:
+            response = await self._create_message(
+                payload, stream, fallback, tenant, tag, extra_headers
+            )
+        else:
             if stream:
-                payload["stream"] = True
-                async with session.post(
-                    endpoint, json=payload, headers=self.headers
-                ) as response:
-                    if response.status >= 400:
-                        error_data = await response.json()
-                        handle_api_error(response.status, error_data)
+                raise ValueError("Idempotency keys are not supported for streams")
+            if self.idempotency is None:
+                raise ValueError("Idempotency keys need a client with a store")
+            response = await self.idempotency.arun(
+                idempotency_key,
+                payload,
+                lambda: self._create_message(
+                    payload, stream, fallback, tenant, tag, extra_headers
+                ),
+                self.instrumentation,
+            )
+        if window is not None:
+            window.record(response)
+        return response
+
+    async def compute_use(
+        self,
+        model: str,
+        prompt: str,
+        max_tokens: int = 1000,
+        temperature: float = 0.7,
+        system_prompt: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Asynchronously use Claude's computer use feature to perform desktop
+        automation.
+
+        Args:
+            model (str): The Claude model to use (must support computer use).
+            prompt (str): The user prompt instructing Claude what to do.
+            max_tokens (int, optional): Maximum number of tokens to generate.
+            temperature (float, optional): Sampling temperature.
+            system_prompt (str, optional): System prompt to guide Claude's behavior.
 
-                    return self._handle_streaming_response(response)
-            else:
-                async with session.post(
-                    endpoint, json=payload, headers=self.headers
-                ) as response:
-                    response_data = await response.json()
+        Returns:
+            Dict[str, Any]: Response from Claude.
+        """
+        messages = [{"role": "user", "content": prompt}]
+
+        payload = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "computer_use": True,
+        }
+
+        if system_prompt:
+            payload["system"] = system_prompt
+
+        response = await self._post("/v1/messages", payload)
+        if not isinstance(response, dict):
+            raise TypeError("Expected a JSON response")
+        return response
+
+    async def _create_message(
+        self,
+        payload: Dict[str, Any],
+        stream: bool,
+        fallback: Optional[FallbackPolicy],
+        tenant: Optional[str],
+        tag: Optional[str],
+        extra_headers: Optional[Dict[str, str]] = None,
+    ) -> Union[Dict[str, Any], AsyncStream]:
+        """
+        Send a message request through the usage tracker and the cache.
+
+        Args:
+            payload (Dict[str, Any]): JSON payload including the model.
+            stream (bool): Whether to stream the response.
+            fallback (FallbackPolicy, optional): Fallback policy of the call.
+            tenant (str, optional): Tenant the usage tracker accounts the call to.
+            tag (str, optional): Tag the usage tracker accounts the call to.
+            extra_headers (Dict[str, str], optional): Headers sent on top of the
+                client's.
+
+        Returns:
+            Union[Dict[str, Any], AsyncStream]: Response data or a
+                stream of the response's events.
+        """
+        model = payload["model"]
+        tracker = self.usage_tracker
+        if tracker is not None:
+            model = tracker.check(model, tenant, tag, self.instrumentation)
+            payload["model"] = model
 
-                    if response.status >= 400:
-                        handle_api_error(response.status, response_data)
+        # Sampled answers are not reused; only deterministic requests are cached
+        cache = self.cache if not stream and payload.get("temperature") == 0 else None
+        if cache is not None:
+            cached = cache.lookup(payload)
+            if cached is not None:
+                hit, similarity = cached
+                self.instrumentation.emit("cache.hit", similarity=similarity)
+                return hit
+            self.instrumentation.emit("cache.miss")
 
-                    return response_data
+        response = await self._post_with_fallback(
+            "/v1/messages", payload, stream, fallback or self.fallback, extra_headers
+        )
+        if cache is not None and isinstance(response, dict):
+            cache.store(payload, response)
+        if tracker is not None:
+            tracker.track(response, model, tenant, tag)
+        return response
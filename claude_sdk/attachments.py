@@ -0,0 +1,246 @@
+"""
+Memory-efficient image and document attachments.
+
+Attachments are built from a file path or an in-memory buffer and placed
+directly in message content blocks. Files are memory-mapped rather than read,
+and the base64 encoding is produced chunk by chunk while the request body is
+being sent, so a request never holds the encoded file as one string. Identical
+content within a process is deduplicated by its SHA-256 digest and shares one
+buffer.
+
+Example:
+    >>> from claude_sdk.attachments import document, image
+    >>> client.messages_create(
+    ...     model="claude-3-7-sonnet-20250219",
+    ...     messages=[{
+    ...         "role": "user",
+    ...         "content": [
+    ...             image("screenshot.png"),
+    ...             document("report.pdf"),
+    ...             {"type": "text", "text": "Summarize these."},
+    ...         ],
+    ...     }],
+    ... )
+"""
+
+import base64
+import hashlib
+import json
+import mimetypes
+import mmap
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+from .encoding import StreamingJSON
+
+# Multiple of 3 so that every chunk encodes to base64 without padding
+_CHUNK_SIZE = 3 * 64 * 1024
+
+# Number of file digests remembered by (device, inode, size, mtime)
+_DIGEST_CACHE_SIZE = 4096
+
+_MAGIC = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+)
+
+Source = Union[str, "os.PathLike[str]", bytes, bytearray, memoryview, "Attachment"]
+
+
+def sniff_media_type(data: Any) -> Optional[str]:
+    """
+    Guess a media type from the first bytes of a buffer.
+
+    Args:
+        data: Bytes-like object.
+
+    Returns:
+        str, optional: The media type, or None if it is not recognized.
+    """
+    head = bytes(memoryview(data)[:16])
+    for magic, media_type in _MAGIC:
+        if head.startswith(magic):
+            return media_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class Attachment(StreamingJSON):
+    """
+    Binary content serialized as a base64 ``source`` of a content block.
+
+    Use :meth:`from_path` or :meth:`from_buffer` rather than the constructor,
+    so that identical content is shared.
+
+    Args:
+        buffer: Bytes-like object holding the content, e.g. an mmap.
+        media_type (str): Media type, e.g. "image/png" or "application/pdf".
+        sha256 (str): Hex digest of the content.
+    """
+
+    _cache: "weakref.WeakValueDictionary[Tuple[str, str], Attachment]" = (
+        weakref.WeakValueDictionary()
+    )
+    _digests: "OrderedDict[Tuple[int, int, int, int], str]" = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, buffer: Any, media_type: str, sha256: str):
+        self._buffer = buffer
+        self.media_type = media_type
+        self.sha256 = sha256
+        self.size = len(memoryview(buffer))
+
+    @classmethod
+    def _shared(cls, buffer: Any, media_type: str, sha256: str) -> "Attachment":
+        with cls._lock:
+            existing = cls._cache.get((sha256, media_type))
+            if existing is not None:
+                return existing
+            attachment = cls(buffer, media_type, sha256)
+            cls._cache[(sha256, media_type)] = attachment
+            return attachment
+
+    @staticmethod
+    def _digest(buffer: Any) -> str:
+        digest = hashlib.sha256()
+        view = memoryview(buffer)
+        for start in range(0, len(view), _CHUNK_SIZE):
+            digest.update(view[start : start + _CHUNK_SIZE])
+        return digest.hexdigest()
+
+    @classmethod
+    def from_path(
+        cls, path: Union[str, "os.PathLike[str]"], media_type: Optional[str] = None
+    ) -> "Attachment":
+        """
+        Create an attachment backed by a memory-mapped file.
+
+        The file is hashed once; later attachments of the same unchanged file
+        reuse the digest without reading it again.
+
+        Args:
+            path (str): Path of the file.
+            media_type (str, optional): Media type. Guessed from the file name or
+                contents if not provided.
+
+        Returns:
+            Attachment: The attachment, shared with any identical one still alive.
+        """
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            buffer: Any = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if stat.st_size
+                else b""
+            )
+        if media_type is None:
+            media_type = mimetypes.guess_type(str(path))[0] or sniff_media_type(buffer)
+        if media_type is None:
+            raise ValueError(f"Cannot determine the media type of {path}")
+
+        key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with cls._lock:
+            sha256 = cls._digests.get(key)
+        if sha256 is None:
+            sha256 = cls._digest(buffer)
+            with cls._lock:
+                cls._digests[key] = sha256
+                if len(cls._digests) > _DIGEST_CACHE_SIZE:
+                    cls._digests.popitem(last=False)
+
+        attachment = cls._shared(buffer, media_type, sha256)
+        if attachment._buffer is not buffer and isinstance(buffer, mmap.mmap):
+            buffer.close()
+        return attachment
+
+    @classmethod
+    def from_buffer(cls, data: Any, media_type: Optional[str] = None) -> "Attachment":
+        """
+        Create an attachment from an in-memory buffer, without copying it.
+
+        Args:
+            data: Bytes-like object, e.g. bytes, bytearray, memoryview or mmap.
+            media_type (str, optional): Media type. Sniffed from the contents if
+                not provided.
+
+        Returns:
+            Attachment: The attachment, shared with any identical one still alive.
+        """
+        media_type = media_type or sniff_media_type(data)
+        if media_type is None:
+            raise ValueError("Cannot determine the media type of the buffer")
+        return cls._shared(data, media_type, cls._digest(data))
+
+    @property
+    def encoded_size(self) -> int:
+        """
+        Length of the base64 encoding of the content.
+        """
+        return 4 * ((self.size + 2) // 3)
+
+    def iter_base64(self) -> Iterator[bytes]:
+        """
+        Yield the base64 encoding of the content in chunks.
+        """
+        view = memoryview(self._buffer)
+        for start in range(0, len(view), _CHUNK_SIZE):
+            yield base64.b64encode(view[start : start + _CHUNK_SIZE])
+
+    def iter_json(self) -> Iterator[str]:
+        yield '{"type":"base64","media_type":'
+        yield json.dumps(self.media_type)
+        yield ',"data":"'
+        for chunk in self.iter_base64():
+            yield chunk.decode("ascii")
+        yield '"}'
+
+    def __repr__(self) -> str:
+        return (
+            f"Attachment(media_type={self.media_type!r}, size={self.size}, "
+            f"sha256={self.sha256!r})"
+        )
+
+
+def _attachment(source: Source, media_type: Optional[str]) -> Attachment:
+    if isinstance(source, Attachment):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        return Attachment.from_buffer(source, media_type)
+    return Attachment.from_path(source, media_type)
+
+
+def image(source: Source, media_type: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build an image content block from a file path, buffer or attachment.
+
+    Args:
+        source: Path of the image, bytes-like buffer or :class:`Attachment`.
+        media_type (str, optional): Media type, guessed if not provided.
+
+    Returns:
+        Dict[str, Any]: Content block whose base64 data is streamed when sent.
+    """
+    return {"type": "image", "source": _attachment(source, media_type)}
+
+
+def document(
+    source: Source, media_type: Optional[str] = "application/pdf"
+) -> Dict[str, Any]:
+    """
+    Build a document content block from a file path, buffer or attachment.
+
+    Args:
+        source: Path of the document, bytes-like buffer or :class:`Attachment`.
+        media_type (str, optional): Media type. Defaults to "application/pdf".
+
+    Returns:
+        Dict[str, Any]: Content block whose base64 data is streamed when sent.
+    """
+    return {"type": "document", "source": _attachment(source, media_type)}
@@ -0,0 +1,378 @@
+"""
+Running large JSONL batches of message requests through an async client.
+
+A :class:`BatchRunner` reads one request per line, sends them with bounded
+concurrency, an optional request rate limit and retries of transient errors,
+and writes one result line per request, in input order or as completed.
+
+Progress can be checkpointed to a file, so an interrupted job resumes where
+it stopped. The checkpoint records the offset of the output written so far
+and the requests it holds. It is updated after the output is flushed to disk.
+On resume the output is truncated to the recorded offset, and only requests
+missing from it are sent again. Every request then appears exactly once in
+the output, however often the job is interrupted. Only requests that were in
+flight at the interruption are sent twice.
+
+Input lines are either the keyword arguments of ``messages_create``, or a
+Message Batches API request::
+
+    {"custom_id": "q1", "params": {"model": "...", "messages": [...]}}
+
+Output lines hold the line index of the request, its ``custom_id`` if any,
+and either the ``response`` or the ``error``.
+
+Example:
+    >>> runner = BatchRunner(client, concurrency=32, checkpoint="out.checkpoint")
+    >>> with open("in.jsonl") as source, open("out.jsonl", "ab") as sink:
+    ...     stats = await runner.run(source, sink)
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+from typing import IO, Any, AsyncIterator, Callable, Dict, Optional, Set
+
+import aiohttp
+
+from .exceptions import ClaudeAPIError, RateLimitError, ServiceUnavailableError
+from .instrumentation import Instrumentation
+
+# Bytes of input read per call in the reader thread
+_READ_SIZE = 1 << 16
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether a failed request may succeed when sent again.
+
+    Rate limits, overloaded or unavailable servers, timeouts and connection
+    errors are retried. Other API errors, such as invalid requests, are not.
+    """
+    if isinstance(error, (RateLimitError, ServiceUnavailableError)):
+        return True
+    if isinstance(error, ClaudeAPIError):
+        return False
+    return isinstance(error, (OSError, asyncio.TimeoutError, aiohttp.ClientError))
+
+
+class RateLimiter:
+    """
+    Token bucket limiting the rate of requests.
+
+    Args:
+        rate (float): Requests per second.
+        burst (int, optional): Requests that may be sent at once after an idle
+            period. Defaults to one second's worth.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = float(burst or max(1, int(rate)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self) -> None:
+        """
+        Wait until a request may be sent.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class BatchRunner:
+    """
+    Sends JSONL requests through an :class:`~claude_sdk.AsyncClaude` and
+    writes their results as JSONL.
+
+    Args:
+        client (AsyncClaude): Client the requests are sent with.
+        concurrency (int, optional): Requests in flight at once.
+        rate (float, optional): Most requests sent per second, including
+            retries. Unlimited by default.
+        max_retries (int, optional): Retries of a request failing with a
+            retryable error, see :func:`is_retryable`.
+        backoff (float, optional): Seconds before the first retry. Doubles
+            with every retry, with jitter, up to ``max_backoff``.
+        max_backoff (float, optional): Most seconds between retries.
+        ordered (bool, optional): Write results in input order. Otherwise
+            results are written as they complete.
+        window (int, optional): How far past the oldest unfinished request
+            new requests may start, which bounds the results held back for
+            ordering and the size of the checkpoint. Defaults to 16 times the
+            concurrency.
+        checkpoint (str, optional): Path of the checkpoint file. The output
+            must then be a seekable file.
+        checkpoint_interval (float, optional): Seconds between checkpoints.
+        defaults (Dict[str, Any], optional): Arguments of ``messages_create``
+            used when a request does not set them, e.g. the model.
+        instrumentation (Instrumentation, optional): Receives a
+            ``batch.completed`` event when a run ends. Defaults to the
+            client's.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        concurrency: int = 16,
+        rate: Optional[float] = None,
+        max_retries: int = 5,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        ordered: bool = True,
+        window: Optional[int] = None,
+        checkpoint: Optional[str] = None,
+        checkpoint_interval: float = 5.0,
+        defaults: Optional[Dict[str, Any]] = None,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.client = client
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate) if rate else None
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.ordered = ordered
+        self.window = window or concurrency * 16
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.defaults = dict(defaults or {})
+        self.instrumentation = instrumentation or client.instrumentation
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.retries = 0
+        self.started = 0.0
+        # Every request before _next is in the output, as are those in _done.
+        # Results in _held wait for the requests before them, when ordered.
+        self._next = 0
+        self._done: Set[int] = set()
+        self._held: Dict[int, bytes] = {}
+        self._sink: Optional[IO[bytes]] = None
+        self._name: Optional[str] = None
+        self._saved = 0.0
+        self._advanced: Optional[asyncio.Event] = None
+
+    def _load(self) -> None:
+        sink = self._sink
+        assert sink is not None
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return
+        with open(self.checkpoint, encoding="utf-8") as f:
+            state = json.load(f)
+        if self._name is not None and state.get("input") not in (None, self._name):
+            raise ValueError(
+                f"Checkpoint {self.checkpoint} belongs to input {state['input']!r}"
+            )
+        if sink.seek(0, os.SEEK_END) < state["offset"]:
+            raise ValueError(f"Output is shorter than checkpoint {self.checkpoint}")
+        self._next = state["next"]
+        self._done = set(state["done"])
+        sink.seek(state["offset"])
+        sink.truncate()
+
+    def _save(self) -> None:
+        sink = self._sink
+        assert sink is not None
+        sink.flush()
+        self._saved = time.monotonic()
+        if self.checkpoint is None:
+            return
+        os.fsync(sink.fileno())
+        state = {
+            "input": self._name,
+            "next": self._next,
+            "done": sorted(self._done),
+            "offset": sink.tell(),
+        }
+        temporary = self.checkpoint + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.checkpoint)
+
+    def _advance(self) -> None:
+        assert self._sink is not None
+        start = self._next
+        while True:
+            if self._next in self._done:
+                self._done.remove(self._next)
+            elif self._next in self._held:
+                self._sink.write(self._held.pop(self._next))
+            else:
+                break
+            self._next += 1
+        if self._next != start and self._advanced is not None:
+            self._advanced.set()
+
+    def _finish(self, index: int, record: Optional[Dict[str, Any]]) -> None:
+        assert self._sink is not None
+        if record is None:
+            self._done.add(index)
+        else:
+            line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+            if self.ordered:
+                self._held[index] = line
+            else:
+                self._sink.write(line)
+                self._done.add(index)
+        self._advance()
+        if time.monotonic() - self._saved >= self.checkpoint_interval:
+            self._save()
+
+    def _request(self, line: str) -> Dict[str, Any]:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("Request must be a JSON object")
+        custom_id = request.pop("custom_id", None)
+        params = request.get("params", request)
+        return {"custom_id": custom_id, "params": {**self.defaults, **params}}
+
+    async def _send(self, params: Dict[str, Any]) -> Any:
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                await self.limiter.acquire()
+            try:
+                return await self.client.messages_create(**params)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = getattr(e, "retry_after", None)
+                if delay is None:
+                    delay = min(self.max_backoff, self.backoff * 2**attempt)
+                    delay *= random.uniform(0.5, 1.0)
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+    async def _process(
+        self, index: int, line: str, semaphore: asyncio.Semaphore
+    ) -> None:
+        record: Dict[str, Any] = {"index": index}
+        try:
+            request = self._request(line)
+            if request["custom_id"] is not None:
+                record["custom_id"] = request["custom_id"]
+            record["response"] = await self._send(request["params"])
+            self.succeeded += 1
+        except Exception as e:
+            record["error"] = {
+                "type": getattr(e, "error_type", None) or type(e).__name__,
+                "message": str(e),
+                "status_code": getattr(e, "status_code", None),
+            }
+            self.failed += 1
+        finally:
+            semaphore.release()
+        self._finish(index, record)
+
+    async def _lines(self, source: IO[str]) -> AsyncIterator[str]:
+        # Reading stdin may block, so read in a thread, a chunk at a time
+        loop = asyncio.get_event_loop()
+        while True:
+            lines = await loop.run_in_executor(None, source.readlines, _READ_SIZE)
+            if not lines:
+                return
+            for line in lines:
+                yield line
+
+    async def run(
+        self,
+        source: IO[str],
+        sink: IO[bytes],
+        name: Optional[str] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Send every request of the source and write the results to the sink.
+
+        Args:
+            source (IO[str]): Text file of JSONL requests.
+            sink (IO[bytes]): Binary file the results are written to. With a
+                checkpoint it is truncated to the output of the last run.
+            name (str, optional): Name of the input, stored in the checkpoint
+                and checked when resuming.
+            progress (Callable, optional): Called with :meth:`stats` after
+                every request finished or skipped.
+
+        Returns:
+            Dict[str, Any]: The final :meth:`stats`.
+
+        Raises:
+            ValueError: If the checkpoint belongs to another input.
+        """
+        self._sink = sink
+        self._name = name
+        self._advanced = asyncio.Event()
+        self._load()
+        self.started = time.monotonic()
+        self._saved = self.started
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks: Set["asyncio.Future[None]"] = set()
+        index = -1
+        try:
+            async for line in self._lines(source):
+                index += 1
+                if index < self._next or index in self._done:
+                    self.skipped += 1
+                elif not line.strip():
+                    self._finish(index, None)
+                else:
+                    while index >= self._next + self.window:
+                        self._advanced.clear()
+                        await self._advanced.wait()
+                    await semaphore.acquire()
+                    task = asyncio.ensure_future(self._process(index, line, semaphore))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    if progress is not None:
+                        task.add_done_callback(lambda _: progress(self.stats()))
+                    continue
+                if progress is not None:
+                    progress(self.stats())
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            self._save()
+        stats = self.stats()
+        self.instrumentation.emit("batch.completed", **stats)
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the progress of the current run.
+
+        Returns:
+            Dict[str, Any]: Requests succeeded, failed, skipped because an
+                earlier run finished them, and retried; seconds elapsed and
+                requests finished per second.
+        """
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        finished = self.succeeded + self.failed
+        return {
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "retries": self.retries,
+            "elapsed": elapsed,
+            "rate": finished / elapsed if elapsed > 0 else 0.0,
+        }
@@ -0,0 +1,320 @@
+"""
+Fan-out of one streamed response to several subscribers.
+
+Identical streaming requests, such as a dashboard prompt sent at temperature 0
+by many viewers, do not each need their own upstream stream. A
+:class:`StreamBroadcaster` runs one upstream stream per key; later subscribers
+with the same key replay the events buffered so far and then receive live
+events. Memory is bounded: the replay buffer holds at most
+``max_replay_bytes``, after which the stream stops accepting new subscribers
+and only keeps the events its slowest subscriber has yet to read. Slow
+subscribers exert backpressure on the upstream stream, and one that stays
+``max_lag`` events behind while others keep up is dropped after
+``slow_timeout`` seconds.
+
+Example:
+    >>> broadcaster = StreamBroadcaster()
+    >>> key = stream_key("/v1/messages", payload)
+    >>> subscription = await broadcaster.subscribe(
+    ...     key, lambda: client.messages_create(**payload, stream=True)
+    ... )
+    >>> async for event in subscription:
+    ...     print(event)
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Union,
+)
+
+from .exceptions import SlowSubscriberError
+from .instrumentation import Instrumentation
+
+Source = Callable[[], Union[AsyncIterator[str], Awaitable[AsyncIterator[str]]]]
+
+
+def stream_key(*parts: Any) -> str:
+    """
+    Build the key of a stream from the parts identifying its request.
+
+    Args:
+        *parts: JSON-serializable parts, e.g. the path and the payload.
+
+    Returns:
+        str: SHA-256 hex digest of the canonical JSON encoding of the parts.
+    """
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class Subscription:
+    """
+    A subscriber's view of a broadcast stream, returned by
+    :meth:`StreamBroadcaster.subscribe`.
+
+    Iterating yields every event of the stream from the first one. An error of
+    the upstream stream is raised after the events received before it. Close
+    the subscription with :meth:`aclose` when leaving early; the upstream
+    stream is closed once its last subscriber has left.
+    """
+
+    def __init__(self, broadcast: "_Broadcast"):
+        self._broadcast = broadcast
+        self.position = 0
+        self.dropped = False
+        self.closed = False
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> str:
+        broadcast = self._broadcast
+        while True:
+            if self.dropped:
+                raise SlowSubscriberError(
+                    f"Dropped {broadcast.head - self.position} events behind"
+                )
+            index = self.position - broadcast.offset
+            if index < len(broadcast.events):
+                self.position += 1
+                broadcast._consumed.set()
+                return broadcast.events[index]
+            if broadcast.done:
+                await self.aclose()
+                if broadcast.error is not None:
+                    raise broadcast.error
+                raise StopAsyncIteration
+            await broadcast._published.wait()
+
+    async def aclose(self) -> None:
+        """
+        Leave the stream.
+        """
+        if not self.closed:
+            self.closed = True
+            self._broadcast._unsubscribe(self)
+
+
+class _Broadcast:
+    """
+    One upstream stream and the events its subscribers have yet to read.
+    """
+
+    def __init__(
+        self, key: Optional[str], source: Source, broadcaster: "StreamBroadcaster"
+    ):
+        self.key = key
+        self.broadcaster = broadcaster
+        # events[0] is event number `offset` of the stream
+        self.events: List[str] = []
+        self.offset = 0
+        self.size = 0
+        self.joinable = key is not None
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers: List[Subscription] = []
+        self._published = asyncio.Event()
+        self._consumed = asyncio.Event()
+        self._task = asyncio.create_task(self._pump(source))
+
+    @property
+    def head(self) -> int:
+        return self.offset + len(self.events)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self)
+        self.subscribers.append(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        self.subscribers.remove(subscription)
+        self._consumed.set()
+        if not self.subscribers and not self.done:
+            self.broadcaster._retire(self)
+            self._task.cancel()
+
+    async def _ready(self, subscription: Subscription) -> None:
+        # Surface errors of opening the stream, e.g. a full queue, to the caller
+        while not self.head and not self.done:
+            await self._published.wait()
+        if not self.head and self.error is not None:
+            await subscription.aclose()
+            raise self.error
+
+    async def _pump(self, source: Source) -> None:
+        stream: Any = None
+        try:
+            stream = source()
+            if not hasattr(stream, "__anext__"):
+                stream = await stream
+            async for event in stream:
+                self._append(event)
+                await self._wait_for_space()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self.broadcaster._finish(self)
+            self._publish()
+            if hasattr(stream, "aclose"):
+                await stream.aclose()
+
+    def _publish(self) -> None:
+        self._published.set()
+        self._published = asyncio.Event()
+
+    def _append(self, event: str) -> None:
+        self.events.append(event)
+        self.size += len(event)
+        if self.joinable and self.size > self.broadcaster.max_replay_bytes:
+            # Too long to replay; new subscribers start their own stream
+            self.broadcaster._retire(self)
+        if not self.joinable:
+            self._trim()
+        self._publish()
+
+    def _trim(self) -> None:
+        slowest = min((s.position for s in self.subscribers), default=self.head)
+        consumed = slowest - self.offset
+        # Trim in batches, so that appending stays amortized O(1)
+        if consumed and consumed * 2 >= len(self.events):
+            del self.events[:consumed]
+            self.offset += consumed
+
+    async def _wait_for_space(self) -> None:
+        max_lag = self.broadcaster.max_lag
+        while self.subscribers:
+            if self.head - min(s.position for s in self.subscribers) < max_lag:
+                return
+            self._consumed.clear()
+            try:
+                await asyncio.wait_for(
+                    self._consumed.wait(), self.broadcaster.slow_timeout
+                )
+            except asyncio.TimeoutError:
+                lagging = [
+                    s for s in self.subscribers if self.head - s.position >= max_lag
+                ]
+                # Only drop subscribers holding back others; alone they set the pace
+                if len(lagging) < len(self.subscribers):
+                    for subscription in lagging:
+                        self._drop(subscription)
+
+    def _drop(self, subscription: Subscription) -> None:
+        self.broadcaster.instrumentation.emit(
+            "broadcast.dropped", lag=self.head - subscription.position
+        )
+        subscription.dropped = True
+        subscription.closed = True
+        self.subscribers.remove(subscription)
+        self._publish()
+
+
+class StreamBroadcaster:
+    """
+    Shares upstream streams between subscribers with the same key.
+
+    Emits ``broadcast.started`` when an upstream stream is opened,
+    ``broadcast.joined`` when a subscriber attaches to a running one, with the
+    number of events it replays, and ``broadcast.dropped`` for dropped slow
+    subscribers. A broadcaster must only be used from one event loop.
+
+    Args:
+        max_replay_bytes (int, optional): Size of the events a stream buffers
+            for late subscribers. Once exceeded, subscribers with the same key
+            open a new stream.
+        max_lag (int, optional): Events a subscriber may fall behind before the
+            upstream stream waits for it.
+        slow_timeout (float, optional): Seconds a subscriber may hold back the
+            stream for others before it is dropped. None never drops.
+        instrumentation (Instrumentation, optional): Receives the events.
+    """
+
+    def __init__(
+        self,
+        max_replay_bytes: int = 1024 * 1024,
+        max_lag: int = 256,
+        slow_timeout: Optional[float] = 30.0,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        self.max_replay_bytes = max_replay_bytes
+        self.max_lag = max(1, max_lag)
+        self.slow_timeout = slow_timeout
+        self.instrumentation = instrumentation or Instrumentation()
+        self._joinable: Dict[str, _Broadcast] = {}
+        self._running: Set[_Broadcast] = set()
+
+    async def subscribe(self, key: Optional[str], source: Source) -> Subscription:
+        """
+        Subscribe to the running stream with a key, or start one.
+
+        Waits until the stream has produced its first event, so that errors of
+        opening it are raised here rather than while iterating.
+
+        Args:
+            key (str, optional): Key of identical requests, see
+                :func:`stream_key`. None never shares the stream.
+            source (Callable): Called without arguments to open the upstream
+                stream; returns an async iterator of events, or an awaitable of
+                one such as ``AsyncClaude.messages_create(..., stream=True)``.
+
+        Returns:
+            Subscription: Async iterator over the events of the stream.
+        """
+        broadcast = self._joinable.get(key) if key is not None else None
+        if broadcast is None:
+            broadcast = _Broadcast(key, source, self)
+            self._running.add(broadcast)
+            if key is not None:
+                self._joinable[key] = broadcast
+            self.instrumentation.emit("broadcast.started", shared=key is not None)
+        else:
+            self.instrumentation.emit(
+                "broadcast.joined",
+                subscribers=len(broadcast.subscribers) + 1,
+                replayed=broadcast.head,
+            )
+        subscription = broadcast.subscribe()
+        try:
+            await broadcast._ready(subscription)
+        except BaseException:
+            # A caller cancelled while waiting must not hold the stream open
+            await subscription.aclose()
+            raise
+        return subscription
+
+    def _retire(self, broadcast: _Broadcast) -> None:
+        broadcast.joinable = False
+        if broadcast.key is not None and self._joinable.get(broadcast.key) is broadcast:
+            del self._joinable[broadcast.key]
+
+    def _finish(self, broadcast: _Broadcast) -> None:
+        self._retire(broadcast)
+        self._running.discard(broadcast)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the current fan-out state.
+
+        Returns:
+            Dict[str, int]: Running upstream streams, those still accepting
+                subscribers, subscribers and buffered events.
+        """
+        return {
+            "streams": len(self._running),
+            "joinable": len(self._joinable),
+            "subscribers": sum(len(b.subscribers) for b in self._running),
+            "buffered_events": sum(len(b.events) for b in self._running),
+        }
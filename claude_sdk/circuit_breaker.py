@@ -0,0 +1,333 @@
+"""
+Circuit breaking per endpoint and model.
+
+During an upstream incident every request would otherwise wait for a timeout or
+a 5xx response before failing. A :class:`CircuitBreaker` tracks the failure
+rate of each (base_url, model) pair over a sliding time window. Once the rate
+crosses the threshold the circuit opens and requests fail immediately with
+:class:`~claude_sdk.exceptions.CircuitOpenError`, without touching the network.
+After a cool-down a few trial requests are let through (half-open); if they
+succeed the circuit closes again, otherwise it re-opens.
+
+Example:
+    >>> breaker = CircuitBreaker(failure_threshold=0.5, minimum_calls=20)
+    >>> client = Claude(circuit_breaker=breaker)
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .exceptions import CircuitOpenError
+from .instrumentation import Instrumentation
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+Key = Tuple[str, str]
+
+
+class Circuit:
+    """
+    State of the circuit for a single (base_url, model) pair.
+
+    Outcomes are counted in ``buckets`` time slots covering ``window`` seconds,
+    so recording a call and computing the failure rate are O(buckets) with no
+    per-call allocation.
+
+    Args:
+        breaker (CircuitBreaker): Breaker owning this circuit and its policy.
+        key (Tuple[str, str]): The (base_url, model) pair.
+    """
+
+    def __init__(self, breaker: "CircuitBreaker", key: Key):
+        self.breaker = breaker
+        self.key = key
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        self._epochs = [-1] * breaker.buckets
+        self._calls = [0] * breaker.buckets
+        self._failures = [0] * breaker.buckets
+
+    def _slot(self, now: float) -> int:
+        epoch = int(now / self.breaker._bucket_width)
+        slot = epoch % self.breaker.buckets
+        if self._epochs[slot] != epoch:
+            self._epochs[slot] = epoch
+            self._calls[slot] = 0
+            self._failures[slot] = 0
+        return slot
+
+    def _counts(self, now: float) -> Tuple[int, int]:
+        oldest = int(now / self.breaker._bucket_width) - self.breaker.buckets
+        calls = failures = 0
+        for slot, epoch in enumerate(self._epochs):
+            if epoch > oldest:
+                calls += self._calls[slot]
+                failures += self._failures[slot]
+        return calls, failures
+
+    def _reset_window(self) -> None:
+        self._epochs = [-1] * self.breaker.buckets
+
+    def failure_rate(self, now: Optional[float] = None) -> float:
+        """
+        Failure rate over the current window.
+
+        Args:
+            now (float, optional): Monotonic time. Defaults to the current time.
+
+        Returns:
+            float: Failed calls divided by all calls, or 0.0 without calls.
+        """
+        calls, failures = self._counts(time.monotonic() if now is None else now)
+        return failures / calls if calls else 0.0
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker keyed by base URL and model.
+
+    A call counts as failed when the transport raises (connection errors,
+    timeouts) or the API answers with a 5xx status such as 529 overloaded.
+    Client errors, including 429 rate limits, show that the service is up and
+    count as successes.
+
+    State changes are reported as ``circuit.state_change`` events and rejected
+    calls as ``circuit.rejected`` events through the client's instrumentation.
+
+    Args:
+        failure_threshold (float, optional): Failure rate, between 0 and 1, at
+            which the circuit opens.
+        minimum_calls (int, optional): Calls required in the window before the
+            failure rate is acted upon.
+        window (float, optional): Length of the sliding window in seconds.
+        buckets (int, optional): Number of time slots the window is divided
+            into; more slots make it slide more smoothly.
+        open_duration (float, optional): Seconds an open circuit rejects calls
+            before letting trial calls through.
+        half_open_calls (int, optional): Trial calls allowed while half-open. All
+            of them must succeed to close the circuit.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: float = 0.5,
+        minimum_calls: int = 20,
+        window: float = 10.0,
+        buckets: int = 10,
+        open_duration: float = 30.0,
+        half_open_calls: int = 1,
+    ):
+        if not 0 < failure_threshold <= 1:
+            raise ValueError("failure_threshold must be in (0, 1]")
+        if buckets < 1 or window <= 0:
+            raise ValueError("window and buckets must be positive")
+        self.failure_threshold = failure_threshold
+        self.minimum_calls = max(1, minimum_calls)
+        self.window = window
+        self.buckets = buckets
+        self.open_duration = open_duration
+        self.half_open_calls = max(1, half_open_calls)
+        self._bucket_width = window / buckets
+        self._circuits: Dict[Key, Circuit] = {}
+        self._lock = threading.Lock()
+
+    def circuit(self, base_url: str, model: str) -> Circuit:
+        """
+        Return the circuit for a base URL and model, creating it if needed.
+
+        Args:
+            base_url (str): Base URL of the API.
+            model (str): Model name.
+
+        Returns:
+            Circuit: The circuit.
+        """
+        key = (base_url, model)
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            with self._lock:
+                circuit = self._circuits.setdefault(key, Circuit(self, key))
+        return circuit
+
+    def state(self, base_url: str, model: str) -> str:
+        """
+        Current state of a circuit: "closed", "open" or "half_open".
+
+        An open circuit whose cool-down has elapsed is reported as half-open.
+
+        Args:
+            base_url (str): Base URL of the API.
+            model (str): Model name.
+
+        Returns:
+            str: The state.
+        """
+        circuit = self.circuit(base_url, model)
+        with self._lock:
+            if circuit.state == OPEN and self._cooled_down(circuit, time.monotonic()):
+                return HALF_OPEN
+            return circuit.state
+
+    def states(self) -> Dict[Key, str]:
+        """
+        Return the stored state of every known circuit.
+
+        Returns:
+            Dict[Tuple[str, str], str]: State by (base_url, model).
+        """
+        with self._lock:
+            return {key: circuit.state for key, circuit in self._circuits.items()}
+
+    def reset(self) -> None:
+        """
+        Forget all circuits, closing them.
+        """
+        with self._lock:
+            self._circuits.clear()
+
+    def _cooled_down(self, circuit: Circuit, now: float) -> bool:
+        return now - circuit.opened_at >= self.open_duration
+
+    def _transition(
+        self,
+        circuit: Circuit,
+        state: str,
+        now: float,
+        events: List[Tuple[str, Dict[str, Any]]],
+    ) -> None:
+        previous, circuit.state = circuit.state, state
+        if state == OPEN:
+            circuit.opened_at = now
+        circuit._trials = circuit._trial_successes = 0
+        if state == CLOSED:
+            circuit._reset_window()
+        events.append(
+            (
+                "circuit.state_change",
+                {
+                    "base_url": circuit.key[0],
+                    "model": circuit.key[1],
+                    "state": state,
+                    "previous_state": previous,
+                },
+            )
+        )
+
+    @staticmethod
+    def _emit(
+        instrumentation: Optional[Instrumentation],
+        events: List[Tuple[str, Dict[str, Any]]],
+    ) -> None:
+        if instrumentation is not None:
+            for event, fields in events:
+                instrumentation.emit(event, **fields)
+
+    def acquire(
+        self,
+        base_url: str,
+        model: str,
+        instrumentation: Optional[Instrumentation] = None,
+    ) -> Circuit:
+        """
+        Admit a call, or fail fast if the circuit is open.
+
+        Every admitted call must be followed by exactly one :meth:`record` or
+        :meth:`release`.
+
+        Args:
+            base_url (str): Base URL of the API.
+            model (str): Model name.
+            instrumentation (Instrumentation, optional): Receives state changes.
+
+        Returns:
+            Circuit: The circuit to record the outcome on.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with all trial
+                calls in flight.
+        """
+        circuit = self.circuit(base_url, model)
+        if circuit.state == CLOSED:
+            return circuit
+
+        events: List[Tuple[str, Dict[str, Any]]] = []
+        with self._lock:
+            now = time.monotonic()
+            if circuit.state == OPEN and self._cooled_down(circuit, now):
+                self._transition(circuit, HALF_OPEN, now, events)
+            admitted = circuit.state == CLOSED or (
+                circuit.state == HALF_OPEN and circuit._trials < self.half_open_calls
+            )
+            if admitted and circuit.state == HALF_OPEN:
+                circuit._trials += 1
+            retry_after = max(0.0, circuit.opened_at + self.open_duration - now)
+            state = circuit.state
+        self._emit(instrumentation, events)
+
+        if not admitted:
+            if instrumentation is not None:
+                instrumentation.emit(
+                    "circuit.rejected", base_url=base_url, model=model, state=state
+                )
+            raise CircuitOpenError(
+                f"Circuit for {model} at {base_url} is {state.replace('_', '-')}",
+                base_url=base_url,
+                model=model,
+                retry_after=retry_after,
+            )
+        return circuit
+
+    def record(
+        self,
+        circuit: Circuit,
+        success: bool,
+        instrumentation: Optional[Instrumentation] = None,
+    ) -> None:
+        """
+        Record the outcome of an admitted call.
+
+        Args:
+            circuit (Circuit): Circuit returned by :meth:`acquire`.
+            success (bool): Whether the call succeeded.
+            instrumentation (Instrumentation, optional): Receives state changes.
+        """
+        events: List[Tuple[str, Dict[str, Any]]] = []
+        with self._lock:
+            now = time.monotonic()
+            if circuit.state == HALF_OPEN:
+                if not success:
+                    self._transition(circuit, OPEN, now, events)
+                else:
+                    circuit._trial_successes += 1
+                    if circuit._trial_successes >= self.half_open_calls:
+                        self._transition(circuit, CLOSED, now, events)
+            elif circuit.state == CLOSED:
+                slot = circuit._slot(now)
+                circuit._calls[slot] += 1
+                if not success:
+                    circuit._failures[slot] += 1
+                    calls, failures = circuit._counts(now)
+                    if (
+                        calls >= self.minimum_calls
+                        and failures / calls >= self.failure_threshold
+                    ):
+                        self._transition(circuit, OPEN, now, events)
+                        events[-1][1]["failure_rate"] = failures / calls
+        self._emit(instrumentation, events)
+
+    def release(self, circuit: Circuit) -> None:
+        """
+        Give back an admitted call that finished without an outcome, e.g.
+        because it was cancelled.
+
+        Args:
+            circuit (Circuit): Circuit returned by :meth:`acquire`.
+        """
+        with self._lock:
+            if circuit.state == HALF_OPEN and circuit._trials > 0:
+                circuit._trials -= 1
@@ -0,0 +1,190 @@
+"""
+The ``claude-sdk`` command.
+
+Requires click and rich: ``pip install 'claude-sdk[cli]'``.
+
+Example:
+    $ claude-sdk run requests.jsonl -o results.jsonl --model claude-3-7-sonnet-20250219
+"""
+
+import asyncio
+import os
+import sys
+from typing import IO, Any, Dict, Optional
+
+try:
+    import click
+    from rich.console import Console
+    from rich.progress import BarColumn, Progress, TextColumn, TimeRemainingColumn
+except ImportError as e:
+    raise ImportError(
+        "The claude-sdk command requires click and rich. "
+        "Install them with: pip install 'claude-sdk[cli]'"
+    ) from e
+
+from .async_client import AsyncClaude
+from .batch import BatchRunner
+from .version import __version__
+
+
+def count_lines(path: str) -> int:
+    """
+    Count the lines of a file, including a last line without a newline.
+    """
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            lines += chunk.count(b"\n")
+            last = chunk[-1:]
+    return lines + (last != b"\n")
+
+
+@click.group()
+@click.version_option(__version__)
+def main() -> None:
+    """
+    Command line tools of the Claude SDK.
+    """
+
+
+@main.command()
+@click.argument("input", default="-", type=click.Path(allow_dash=True, dir_okay=False))
+@click.option(
+    "-o", "--output", default="-", type=click.Path(allow_dash=True, dir_okay=False)
+)
+@click.option("--model", help="Model of requests that do not set one.")
+@click.option("--max-tokens", type=int, help="max_tokens of requests without one.")
+@click.option(
+    "--concurrency", default=16, show_default=True, help="Requests in flight."
+)
+@click.option("--rate", type=float, help="Most requests per second.")
+@click.option("--max-retries", default=5, show_default=True)
+@click.option(
+    "--ordered/--as-completed",
+    default=True,
+    show_default=True,
+    help="Write results in input order, or as they complete.",
+)
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False),
+    help="Checkpoint file. Defaults to OUTPUT.checkpoint when OUTPUT is a file.",
+)
+@click.option(
+    "--restart",
+    is_flag=True,
+    help="Discard the checkpoint and the output of an earlier run.",
+)
+@click.option("--base-url", envvar="BASE_URL", default="https://api.anthropic.com")
+@click.option(
+    "--progress/--no-progress",
+    default=None,
+    help="Show throughput and ETA. Defaults to on when stderr is a terminal.",
+)
+def run(
+    input: str,
+    output: str,
+    model: Optional[str],
+    max_tokens: Optional[int],
+    concurrency: int,
+    rate: Optional[float],
+    max_retries: int,
+    ordered: bool,
+    checkpoint: Optional[str],
+    restart: bool,
+    base_url: str,
+    progress: Optional[bool],
+) -> None:
+    """
+    Send the JSONL requests of INPUT and write the results to OUTPUT.
+
+    Each line of INPUT holds the arguments of messages_create, or a
+    Message Batches API request with a custom_id and params. Each line of
+    OUTPUT holds the index of the request, its custom_id and its response or
+    error. An interrupted run resumes from its checkpoint when run again.
+    """
+    console = Console(stderr=True)
+    if output == "-":
+        if checkpoint is not None:
+            raise click.UsageError("--checkpoint needs an --output file")
+    elif checkpoint is None:
+        checkpoint = output + ".checkpoint"
+    if restart and checkpoint is not None and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    resuming = checkpoint is not None and os.path.exists(checkpoint)
+
+    defaults: Dict[str, Any] = {}
+    if model is not None:
+        defaults["model"] = model
+    if max_tokens is not None:
+        defaults["max_tokens"] = max_tokens
+
+    source: IO[str] = sys.stdin
+    sink: IO[bytes] = sys.stdout.buffer
+    if input != "-":
+        source = open(input, encoding="utf-8")
+    if output != "-":
+        sink = open(output, "ab" if resuming else "wb")
+    total = None if input == "-" else count_lines(input)
+    if progress is None:
+        progress = console.is_terminal
+
+    bar = Progress(
+        TextColumn("[bold]{task.description}"),
+        BarColumn(),
+        TextColumn("{task.completed}/{task.fields[total_label]}"),
+        TextColumn("{task.fields[rate]:.1f} req/s"),
+        TextColumn("{task.fields[failed]} failed"),
+        TimeRemainingColumn(),
+        console=console,
+        disable=not progress,
+    )
+    task = bar.add_task(
+        "Running", total=total, total_label=total or "?", rate=0.0, failed=0
+    )
+
+    def update(stats: Dict[str, Any]) -> None:
+        bar.update(
+            task,
+            completed=stats["succeeded"] + stats["failed"] + stats["skipped"],
+            rate=stats["rate"],
+            failed=stats["failed"],
+        )
+
+    async def batch() -> Dict[str, Any]:
+        async with AsyncClaude(base_url=base_url) as client:
+            runner = BatchRunner(
+                client,
+                concurrency=concurrency,
+                rate=rate,
+                max_retries=max_retries,
+                ordered=ordered,
+                checkpoint=checkpoint,
+                defaults=defaults,
+            )
+            name = None if input == "-" else os.path.abspath(input)
+            return await runner.run(source, sink, name=name, progress=update)
+
+    try:
+        with bar:
+            stats = asyncio.run(batch())
+    except KeyboardInterrupt:
+        console.print("Interrupted. Run the same command again to resume.")
+        sys.exit(130)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout.buffer:
+            sink.close()
+    console.print(
+        f"{stats['succeeded']} succeeded, {stats['failed']} failed, "
+        f"{stats['skipped']} resumed, {stats['retries']} retries "
+        f"in {stats['elapsed']:.1f}s ({stats['rate']:.1f} req/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
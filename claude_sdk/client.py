@@ -4,11 +4,44 @@ Claude client for interacting with Anthropic's Claude AI models.
 
 import os
 import json
-import requests
-from typing import Dict, List, Optional, Union, Any, Generator
-
+import threading
+import weakref
+from concurrent.futures import Future
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    Any,
+    Generator,
+)
+
+from .async_client import AsyncClaude
+from .circuit_breaker import CircuitBreaker
+from .compression import RequestCompression
+from .context import ContextWindow, estimate_tokens
+from .encoding import encode_request
+from .engine import EventLoopThread, shared_loop
 from .exceptions import handle_api_error
-from .utils import validate_api_key
+from .fallback import FallbackPolicy
+from .idempotency import IdempotencyStore
+from .instrumentation import Instrumentation
+from .load_balancer import Lease, LoadBalancer
+from .prompt_cache import PromptCache
+from .streaming import AsyncStream, Stream
+from .transport import (
+    AsyncTransport,
+    HTTPXTransport,
+    RequestsTransport,
+    Transport,
+    TransportRequest,
+)
+from .usage import UsageTracker
+from .utils import beta_headers, validate_api_key
 
 
 class Claude:
@@ -19,13 +52,58 @@ class Claude:
         api_key (str, optional): Anthropic API key. If not provided, it will be read from
             the ANTHROPIC_API_KEY environment variable.
         base_url (str, optional): Base URL for the Anthropic API.
+        transport (Union[Transport, AsyncTransport], optional): Transport used to
+            send requests. Defaults to a pooled
+            :class:`~claude_sdk.transport.RequestsTransport`, or to the default
+            transport of :class:`~claude_sdk.AsyncClaude` with ``engine``, which
+            needs an :class:`~claude_sdk.transport.AsyncTransport`.
+        http2 (bool, optional): Use an HTTP/2 transport that multiplexes concurrent
+            requests over a few connections, when no transport is given.
+        compression (RequestCompression, optional): Compress request bodies above a
+            size threshold.
+        instrumentation (Instrumentation, optional): Receives events such as
+            request compression statistics.
+        circuit_breaker (CircuitBreaker, optional): Fail fast while the endpoint
+            and model of a request are failing. Can be shared between clients.
+        load_balancer (LoadBalancer, optional): Route each request to one of a
+            pool of API keys and base URLs instead of api_key and base_url.
+        fallback (FallbackPolicy, optional): Models ``messages_create`` falls back
+            to when the requested one is overloaded or too slow.
+        cache (PromptCache, optional): Answer non-streaming ``messages_create``
+            calls with ``temperature=0`` from the responses of near-duplicate
+            earlier requests.
+        usage_tracker (UsageTracker, optional): Record the token usage and cost
+            of ``messages_create`` and ``generate`` calls and enforce budgets
+            before sending them.
+        idempotency (IdempotencyStore, optional): Store of the responses of
+            ``messages_create`` calls with an ``idempotency_key``, so that
+            retried requests run once. Can be shared between clients.
+        engine (Union[bool, EventLoopThread], optional): Send requests through an
+            :class:`~claude_sdk.AsyncClaude` on a background event loop instead
+            of blocking a thread per request, so that threads share one pooled
+            connection pool and :meth:`submit` can return futures. ``True``
+            uses the loop shared by the process; an
+            :class:`~claude_sdk.engine.EventLoopThread` uses that loop.
     """
 
     def __init__(
         self,
         api_key: Optional[str] = None,
         base_url: str = "https://api.anthropic.com",
+        transport: Optional[Union[Transport, AsyncTransport]] = None,
+        http2: bool = False,
+        compression: Optional[RequestCompression] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        load_balancer: Optional[LoadBalancer] = None,
+        fallback: Optional[FallbackPolicy] = None,
+        cache: Optional[PromptCache] = None,
+        usage_tracker: Optional[UsageTracker] = None,
+        idempotency: Optional[IdempotencyStore] = None,
+        engine: Union[bool, EventLoopThread] = False,
     ):
+        if api_key is None and load_balancer is not None:
+            api_key = load_balancer.targets[0].api_key
         self.api_key = validate_api_key(api_key)
         self.base_url = base_url
         self.headers = {
@@ -33,6 +111,324 @@ class Claude:
             "anthropic-version": "2023-06-01",
             "content-type": "application/json",
         }
+        self.http2 = http2
+        self.compression = compression
+        self.instrumentation = instrumentation or Instrumentation()
+        self.circuit_breaker = circuit_breaker
+        self.load_balancer = load_balancer
+        self.fallback = fallback
+        self.cache = cache
+        self.usage_tracker = usage_tracker
+        self.idempotency = idempotency
+        self.engine = engine
+        self.async_client: Optional[AsyncClaude] = None
+        self._engine_transport: Optional[AsyncTransport] = None
+        self._engine_loop: Optional[EventLoopThread] = None
+        self._engine_lock = threading.Lock()
+        self.transport: Any
+        if engine:
+            if transport is not None and not isinstance(transport, AsyncTransport):
+                raise TypeError("A client with an engine needs an AsyncTransport")
+            self._engine_transport = transport
+            self.transport = self._engine()[0].transport
+            return
+        if transport is None:
+            transport = HTTPXTransport() if http2 else RequestsTransport()
+        self.transport = transport
+
+    def _engine(self) -> Tuple[AsyncClaude, EventLoopThread]:
+        """
+        Return the async client of an engine client and the loop it runs on.
+
+        The async client is rebuilt when the loop changes, e.g. in a forked
+        child process, since its connections belong to the old loop.
+        """
+        if isinstance(self.engine, EventLoopThread):
+            loop = self.engine
+        else:
+            loop = shared_loop()
+        client = self.async_client
+        if client is not None and loop is self._engine_loop:
+            return client, loop
+        with self._engine_lock:
+            if self.async_client is not None and loop is self._engine_loop:
+                return self.async_client, loop
+            client = AsyncClaude(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                transport=self._engine_transport,
+                http2=self.http2,
+                compression=self.compression,
+                instrumentation=self.instrumentation,
+                circuit_breaker=self.circuit_breaker,
+                load_balancer=self.load_balancer,
+                fallback=self.fallback,
+                cache=self.cache,
+                usage_tracker=self.usage_tracker,
+                idempotency=self.idempotency,
+            )
+            self.async_client, self._engine_loop = client, loop
+            self.transport = client.transport
+        return client, loop
+
+    async def _run_async(
+        self, coroutine: Awaitable[Union[Dict[str, Any], AsyncStream]]
+    ) -> Union[Dict[str, Any], Stream]:
+        result = await coroutine
+        if isinstance(result, AsyncStream):
+            return self._sync_stream(result)
+        return result
+
+    def _sync_stream(self, stream: AsyncStream) -> Stream:
+        """
+        Wrap a stream of the async client in a stream that sync code can
+        iterate, pulling each event from the engine's loop.
+        """
+        loop = self._engine()[1]
+        # The sync stream reports stream.stopped, not the inner one
+        stream.instrumentation = Instrumentation()
+
+        def events() -> Generator[str, None, None]:
+            while True:
+                try:
+                    yield loop.run(stream.__anext__())
+                except StopAsyncIteration:
+                    return
+
+        return Stream(events(), lambda: loop.run(stream.aclose()), self.instrumentation)
+
+    def submit(self, method: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """
+        Start a call on the engine without waiting for it.
+
+        Example:
+            >>> futures = [client.submit(client.messages_create, model, m) for m in batch]
+            >>> responses = [future.result() for future in futures]
+
+        Args:
+            method (Callable): ``generate`` or ``messages_create`` of this
+                client.
+            *args: Positional arguments of the call.
+            **kwargs: Keyword arguments of the call.
+
+        Returns:
+            Future: Resolves to what the call would return. Cancelling it
+                cancels the request.
+        """
+        name = getattr(method, "__name__", None)
+        if not self.engine:
+            raise RuntimeError("submit() needs a client created with engine=True")
+        if getattr(method, "__self__", None) is not self or name not in (
+            "generate",
+            "messages_create",
+        ):
+            raise TypeError("submit() takes a request method of this client")
+        client, loop = self._engine()
+        coroutine = getattr(client, name)(*args, **kwargs)
+        future: Future = loop.submit(self._run_async(coroutine))
+        return future
+
+    def _call(
+        self, name: str, *args: Any, **kwargs: Any
+    ) -> Union[Dict[str, Any], Stream]:
+        client, loop = self._engine()
+        return loop.run(self._run_async(getattr(client, name)(*args, **kwargs)))
+
+    def close(self) -> None:
+        """
+        Close the underlying transport and its pooled connections.
+        """
+        if self.engine:
+            client, loop = self.async_client, self._engine_loop
+            if client is not None and loop is not None and loop.running:
+                loop.run(client.aclose())
+            return
+        self.transport.close()
+
+    def __enter__(self) -> "Claude":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _send(
+        self,
+        request: TransportRequest,
+        base_url: str,
+        model: str,
+        lease: Optional[Lease] = None,
+    ) -> Any:
+        """
+        Send a request through the circuit breaker, if one is configured, and
+        record the outcome on the load balancer lease.
+
+        Args:
+            request (TransportRequest): The request.
+            base_url (str): Base URL the request is sent to.
+            model (str): Model the request is for.
+            lease (Lease, optional): Load balancer lease of the request.
+
+        Returns:
+            Any: The transport response.
+        """
+        breaker = self.circuit_breaker
+        circuit = None
+        if breaker is not None:
+            circuit = breaker.acquire(base_url, model, self.instrumentation)
+        try:
+            response = self.transport.send(request)
+        except Exception:
+            if circuit is not None:
+                circuit.breaker.record(circuit, False, self.instrumentation)
+            if lease is not None:
+                lease.record(None)
+            raise
+        except BaseException:
+            if circuit is not None:
+                circuit.breaker.release(circuit)
+            raise
+        if circuit is not None:
+            circuit.breaker.record(
+                circuit, response.status_code < 500, self.instrumentation
+            )
+        if lease is not None:
+            lease.record(response.status_code, response.headers)
+        return response
+
+    def _post(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        stream: bool = False,
+        timeout: Optional[float] = None,
+        extra_headers: Optional[Dict[str, str]] = None,
+    ) -> Union[Dict[str, Any], Stream]:
+        """
+        Send a request to the API and handle errors.
+
+        Args:
+            path (str): API path, e.g. "/v1/messages".
+            payload (Dict[str, Any]): JSON payload.
+            stream (bool, optional): Whether to stream the response.
+            timeout (float, optional): Transport timeout in seconds.
+            extra_headers (Dict[str, str], optional): Headers sent on top of the
+                client's.
+
+        Returns:
+            Union[Dict[str, Any], Stream]: Response data or a
+                stream of the response's events.
+        """
+        if stream:
+            payload["stream"] = True
+        base_url, headers, lease = self.base_url, self.headers, None
+        if self.load_balancer is not None:
+            lease = self.load_balancer.acquire(self.instrumentation)
+            base_url = lease.target.base_url
+            headers = {**headers, "x-api-key": lease.target.api_key}
+        if extra_headers:
+            headers = {**headers, **extra_headers}
+        releases = [lease.release] if lease is not None else []
+
+        try:
+            request = TransportRequest(
+                "POST",
+                f"{base_url}{path}",
+                headers,
+                json=payload,
+                stream=stream,
+                timeout=timeout,
+            )
+            encode_request(request, self.compression, self.instrumentation)
+            response = self._send(request, base_url, payload.get("model", ""), lease)
+
+            if stream:
+                if response.status_code >= 400:
+                    try:
+                        error_data = response.json()
+                    finally:
+                        response.close()
+                    handle_api_error(response.status_code, error_data)
+
+                generator = self._handle_streaming_response(response, releases)
+                # Also release streams that are dropped without being consumed
+                for release in releases:
+                    weakref.finalize(generator, release)
+                stream_releases, releases = releases, []
+
+                def close() -> None:
+                    # A generator closed before its first chunk skips its finally
+                    response.close()
+                    for release in stream_releases:
+                        release()
+
+                return Stream(generator, close, self.instrumentation)
+
+            response_data: Dict[str, Any] = response.json()
+        finally:
+            for release in releases:
+                release()
+
+        if response.status_code >= 400:
+            handle_api_error(response.status_code, response_data)
+
+        return response_data
+
+    def _post_with_fallback(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        stream: bool,
+        policy: Optional[FallbackPolicy],
+        extra_headers: Optional[Dict[str, str]] = None,
+    ) -> Union[Dict[str, Any], Stream]:
+        """
+        Send a request, falling back to other models according to a policy.
+
+        Args:
+            path (str): API path, e.g. "/v1/messages".
+            payload (Dict[str, Any]): JSON payload including the model.
+            stream (bool): Whether to stream the response.
+            policy (FallbackPolicy, optional): Fallback policy.
+            extra_headers (Dict[str, str], optional): Headers sent on top of the
+                client's.
+
+        Returns:
+            Union[Dict[str, Any], Stream]: Response data or a
+                stream of the response's events.
+        """
+        if policy is None:
+            return self._post(path, payload, stream=stream, extra_headers=extra_headers)
+
+        requested = payload["model"]
+        models = policy.models(requested)
+        for attempt, model in enumerate(models, 1):
+            last = attempt == len(models)
+            try:
+                result = self._post(
+                    path,
+                    {**payload, "model": model},
+                    stream=stream,
+                    timeout=None if last else policy.latency_budget,
+                    extra_headers=extra_headers,
+                )
+            except Exception as e:
+                reason = None if last else policy.reason(e)
+                if reason is None:
+                    raise
+                self.instrumentation.emit(
+                    "model.fallback",
+                    model=model,
+                    fallback_model=models[attempt],
+                    reason=reason,
+                )
+                continue
+            break
+
+        policy.record(model, attempt)
+        self.instrumentation.emit(
+            "model.served", requested_model=requested, model=model, attempts=attempt
+        )
+        return result
 
     def generate(
         self,
@@ -43,7 +439,7 @@ class Claude:
         system_prompt: Optional[str] = None,
         stream: bool = False,
         tools: Optional[List[Dict[str, Any]]] = None,
-    ) -> Union[Dict[str, Any], Generator[str, None, None]]:
+    ) -> Union[Dict[str, Any], Stream]:
         """
         Generate a response from Claude.
 
@@ -57,9 +453,20 @@ class Claude:
             tools (List[Dict[str, Any]], optional): List of tools for Claude to use.
 
         Returns:
-            Union[Dict[str, Any], Generator[str, None, None]]: Response from Claude or a generator
-                that yields streamed responses.
+            Union[Dict[str, Any], Stream]: Response from Claude or a
+                stream of the response's events.
         """
+        if self.engine:
+            return self._call(
+                "generate",
+                model,
+                prompt,
+                max_tokens,
+                temperature,
+                system_prompt,
+                stream,
+                tools,
+            )
         messages = [{"role": "user", "content": prompt}]
 
         payload = {
@@ -75,56 +482,60 @@ class Claude:
         if tools:
             payload["tools"] = tools
 
-        endpoint = f"{self.base_url}/v1/messages"
-
-        if stream:
-            payload["stream"] = True
-            response = requests.post(
-                endpoint, json=payload, headers=self.headers, stream=True
-            )
-
-            if response.status_code >= 400:
-                error_data = response.json()
-                handle_api_error(response.status_code, error_data)
-
-            return self._handle_streaming_response(response)
-        else:
-            response = requests.post(endpoint, json=payload, headers=self.headers)
-            response_data = response.json()
-
-            if response.status_code >= 400:
-                handle_api_error(response.status_code, response_data)
-
-            return response_data
-
-    def _handle_streaming_response(self, response) -> Generator[str, None, None]:
+        # Accounted and budgeted like messages_create
+        tracker = self.usage_tracker
+        if tracker is not None:
+            model = tracker.check(model, None, None, self.instrumentation)
+            payload["model"] = model
+        response = self._post("/v1/messages", payload, stream=stream)
+        if tracker is not None:
+            tracker.track(response, model)
+        return response
+
+    def _handle_streaming_response(
+        self, response: Any, releases: Sequence[Callable[[], None]] = ()
+    ) -> Generator[str, None, None]:
         """
         Handle streaming response from Claude.
 
         Args:
-            response: Streaming response from requests.
+            response: Streaming response from the transport.
+            releases (Sequence[Callable[[], None]], optional): Called when the
+                stream ends, e.g. to release its load balancer lease.
 
         Yields:
             str: Response chunks.
         """
-        for line in response.iter_lines():
-            if line:
-                data = line.decode("utf-8")
-                if data.startswith("data: "):
-                    data = data[6:]  # Remove "data: " prefix
-                    if data != "[DONE]":
-                        yield data
+        try:
+            for line in response.iter_lines():
+                if line:
+                    data = line.decode("utf-8")
+                    if data.startswith("data: "):
+                        data = data[6:]  # Remove "data: " prefix
+                        if data != "[DONE]":
+                            yield data
+        finally:
+            response.close()
+            for release in releases:
+                release()
 
     def messages_create(
         self,
         model: str,
-        messages: List[Dict[str, Union[str, List[Dict[str, str]]]]],
+        messages: Union[
+            List[Dict[str, Union[str, List[Dict[str, str]]]]], ContextWindow
+        ],
         max_tokens: int = 1000,
         temperature: float = 0.7,
         system: Optional[str] = None,
         tools: Optional[List[Dict[str, Any]]] = None,
         stream: bool = False,
-    ) -> Union[Dict[str, Any], Generator[str, None, None]]:
+        fallback: Optional[FallbackPolicy] = None,
+        tenant: Optional[str] = None,
+        tag: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        betas: Optional[List[str]] = None,
+    ) -> Union[Dict[str, Any], Stream]:
         """
         Create a message using the Claude API.
 
@@ -132,17 +543,52 @@ class Claude:
 
         Args:
             model (str): The Claude model to use.
-            messages (List[Dict]): The messages to send to Claude.
+            messages (Union[List[Dict], ContextWindow]): The messages to send to
+                Claude. A :class:`~claude_sdk.context.ContextWindow` is compacted
+                to its token budget first, and the reply is appended to it.
             max_tokens (int, optional): Maximum number of tokens to generate.
             temperature (float, optional): Sampling temperature.
             system (str, optional): System prompt to guide Claude's behavior.
             tools (List[Dict], optional): List of tools for Claude to use.
             stream (bool, optional): Whether to stream the response.
+            fallback (FallbackPolicy, optional): Fallback policy for this call,
+                overriding the client's.
+            tenant (str, optional): Tenant the usage tracker accounts the call to.
+            tag (str, optional): Tag the usage tracker accounts the call to.
+            idempotency_key (str, optional): Key identifying the request across
+                retries. A non-streaming call with the key of an earlier call
+                returns its response, or waits for it while it is in flight,
+                instead of calling the API again. Needs a client with an
+                ``idempotency`` store.
+            betas (List[str], optional): Betas to enable for this call, e.g.
+                "computer-use-2025-01-24", on top of those in the client's
+                ``anthropic-beta`` header.
 
         Returns:
-            Union[Dict[str, Any], Generator[str, None, None]]: Response from Claude or a generator
-                that yields streamed responses.
+            Union[Dict[str, Any], Stream]: Response from Claude or a
+                stream of the response's events.
         """
+        if self.engine:
+            return self._call(
+                "messages_create",
+                model,
+                messages,
+                max_tokens,
+                temperature,
+                system,
+                tools,
+                stream,
+                fallback,
+                tenant,
+                tag,
+                idempotency_key,
+                betas,
+            )
+        window = messages if isinstance(messages, ContextWindow) else None
+        if window is not None:
+            overhead = estimate_tokens(system) + estimate_tokens(tools)
+            messages = window.prepare(overhead, max_tokens)
+
         payload = {
             "model": model,
             "messages": messages,
@@ -156,27 +602,77 @@ class Claude:
         if tools:
             payload["tools"] = tools
 
-        endpoint = f"{self.base_url}/v1/messages"
-
-        if stream:
-            payload["stream"] = True
-            response = requests.post(
-                endpoint, json=payload, headers=self.headers, stream=True
+        extra_headers = beta_headers(self.headers, betas) if betas else None
+        if idempotency_key is None:
+            response = self._create_message(
+                payload, stream, fallback, tenant, tag, extra_headers
             )
-
-            if response.status_code >= 400:
-                error_data = response.json()
-                handle_api_error(response.status_code, error_data)
-
-            return self._handle_streaming_response(response)
         else:
-            response = requests.post(endpoint, json=payload, headers=self.headers)
-            response_data = response.json()
+            if stream:
+                raise ValueError("Idempotency keys are not supported for streams")
+            if self.idempotency is None:
+                raise ValueError("Idempotency keys need a client with a store")
+            response = self.idempotency.run(
+                idempotency_key,
+                payload,
+                lambda: self._create_message(
+                    payload, stream, fallback, tenant, tag, extra_headers
+                ),
+                self.instrumentation,
+            )
+        if window is not None:
+            window.record(response)
+        return response
+
+    def _create_message(
+        self,
+        payload: Dict[str, Any],
+        stream: bool,
+        fallback: Optional[FallbackPolicy],
+        tenant: Optional[str],
+        tag: Optional[str],
+        extra_headers: Optional[Dict[str, str]] = None,
+    ) -> Union[Dict[str, Any], Stream]:
+        """
+        Send a message request through the usage tracker and the cache.
 
-            if response.status_code >= 400:
-                handle_api_error(response.status_code, response_data)
+        Args:
+            payload (Dict[str, Any]): JSON payload including the model.
+            stream (bool): Whether to stream the response.
+            fallback (FallbackPolicy, optional): Fallback policy of the call.
+            tenant (str, optional): Tenant the usage tracker accounts the call to.
+            tag (str, optional): Tag the usage tracker accounts the call to.
+            extra_headers (Dict[str, str], optional): Headers sent on top of the
+                client's.
 
-            return response_data
+        Returns:
+            Union[Dict[str, Any], Stream]: Response data or a
+                stream of the response's events.
+        """
+        model = payload["model"]
+        tracker = self.usage_tracker
+        if tracker is not None:
+            model = tracker.check(model, tenant, tag, self.instrumentation)
+            payload["model"] = model
+
+        # Sampled answers are not reused; only deterministic requests are cached
+        cache = self.cache if not stream and payload.get("temperature") == 0 else None
+        if cache is not None:
+            cached = cache.lookup(payload)
+            if cached is not None:
+                hit, similarity = cached
+                self.instrumentation.emit("cache.hit", similarity=similarity)
+                return hit
+            self.instrumentation.emit("cache.miss")
+
+        response = self._post_with_fallback(
+            "/v1/messages", payload, stream, fallback or self.fallback, extra_headers
+        )
+        if cache is not None and isinstance(response, dict):
+            cache.store(payload, response)
+        if tracker is not None:
+            tracker.track(response, model, tenant, tag)
+        return response
 
     def compute_use(
         self,
@@ -212,11 +708,11 @@ class Claude:
         if system_prompt:
             payload["system"] = system_prompt
 
-        endpoint = f"{self.base_url}/v1/messages"
-        response = requests.post(endpoint, json=payload, headers=self.headers)
-        response_data = response.json()
-
-        if response.status_code >= 400:
-            handle_api_error(response.status_code, response_data)
-
-        return response_data
+        if self.engine:
+            client, loop = self._engine()
+            response = loop.run(self._run_async(client._post("/v1/messages", payload)))
+        else:
+            response = self._post("/v1/messages", payload)
+        if not isinstance(response, dict):
+            raise TypeError("Expected a JSON response")
+        return response
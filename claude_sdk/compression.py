@@ -0,0 +1,143 @@
+"""
+Opt-in compression of large request bodies.
+
+Long conversations, documents and screenshot-heavy histories produce
+multi-megabyte JSON bodies. With a :class:`RequestCompression` configured, the
+clients encode payloads incrementally and, once the encoded size passes the
+threshold, compress the rest on the fly while the transport streams it out, so
+no second full copy of the body is built in memory.
+"""
+
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from .encoding import iter_json
+
+ENCODINGS = ("gzip", "zstd")
+
+
+def _compressor(encoding: str, level: Optional[int]) -> Any:
+    if encoding == "gzip":
+        return zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+    if encoding == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError(
+                "zstd request compression requires the 'zstandard' package. "
+                "Install it with: pip install 'claude-sdk[zstd]'"
+            ) from e
+        return zstandard.ZstdCompressor(
+            level=3 if level is None else level
+        ).compressobj()
+    raise ValueError(f"Unsupported encoding {encoding!r}, expected one of {ENCODINGS}")
+
+
+class RequestCompression:
+    """
+    Compression policy for request bodies.
+
+    Args:
+        encoding (str, optional): "gzip" or "zstd".
+        threshold (int, optional): Bodies smaller than this many bytes are sent
+            uncompressed.
+        level (int, optional): Compression level. Defaults to 6 for gzip and 3
+            for zstd.
+        chunk_size (int, optional): Size of the chunks fed to the compressor.
+        accept_encoding (str, optional): Accept-Encoding header sent so that
+            responses can come back compressed too.
+    """
+
+    def __init__(
+        self,
+        encoding: str = "gzip",
+        threshold: int = 64 * 1024,
+        level: Optional[int] = None,
+        chunk_size: int = 64 * 1024,
+        accept_encoding: str = "gzip, deflate",
+    ):
+        # Fail early on unknown encodings or a missing zstandard package
+        _compressor(encoding, level)
+        self.encoding = encoding
+        self.threshold = threshold
+        self.level = level
+        self.chunk_size = chunk_size
+        self.accept_encoding = accept_encoding
+
+    def encode(
+        self,
+        payload: Any,
+        on_complete: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Tuple[Dict[str, str], Union[bytes, Iterator[bytes]]]:
+        """
+        Encode a payload, compressing it if it is larger than the threshold.
+
+        Args:
+            payload (Any): JSON-serializable payload.
+            on_complete (Callable, optional): Called with the byte counts and CPU
+                time once a compressed body has been fully produced.
+
+        Returns:
+            Tuple[Dict[str, str], Union[bytes, Iterator[bytes]]]: Extra headers and
+                the body, either as bytes or as an iterator of compressed chunks.
+        """
+        chunks = iter_json(payload, self.chunk_size)
+        head: List[bytes] = []
+        size = 0
+        for chunk in chunks:
+            head.append(chunk)
+            size += len(chunk)
+            if size >= self.threshold:
+                break
+        else:
+            return {}, b"".join(head)
+
+        headers = {"content-encoding": self.encoding}
+        return headers, self._compress(head, chunks, on_complete)
+
+    def _compress(
+        self,
+        head: List[bytes],
+        rest: Iterator[bytes],
+        on_complete: Optional[Callable[[Dict[str, Any]], None]],
+    ) -> Iterator[bytes]:
+        compressor = _compressor(self.encoding, self.level)
+        bytes_in = bytes_out = 0
+        cpu = 0.0
+
+        def feed(chunk: bytes) -> bytes:
+            nonlocal bytes_in, bytes_out, cpu
+            start = time.thread_time()
+            out: bytes = compressor.compress(chunk)
+            cpu += time.thread_time() - start
+            bytes_in += len(chunk)
+            bytes_out += len(out)
+            return out
+
+        head.reverse()
+        while head:
+            out = feed(head.pop())
+            if out:
+                yield out
+        for chunk in rest:
+            out = feed(chunk)
+            if out:
+                yield out
+
+        start = time.thread_time()
+        tail = compressor.flush()
+        cpu += time.thread_time() - start
+        bytes_out += len(tail)
+        yield tail
+
+        if on_complete is not None:
+            on_complete(
+                {
+                    "encoding": self.encoding,
+                    "bytes_in": bytes_in,
+                    "bytes_out": bytes_out,
+                    "bytes_saved": bytes_in - bytes_out,
+                    "cpu_seconds": cpu,
+                }
+            )
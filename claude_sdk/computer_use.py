@@ -0,0 +1,409 @@
+"""
+Agent loop for Claude's computer-use tool.
+
+A :class:`ComputerUseSession` sends a task to Claude together with a
+screenshot, performs the actions Claude asks for on a :class:`Computer`, and
+answers every action with a new screenshot until Claude stops using the tool.
+It keeps the cost of every step flat however long the session runs:
+
+- Screenshots are downscaled to fit a target resolution and recompressed as
+  JPEG or WebP. Claude sees the downscaled screen, and the coordinates of its
+  actions are scaled back to screen pixels before they are performed.
+- A screenshot whose perceptual hash matches the last one sent is not sent
+  again. Claude gets a short note that the screen has not changed instead.
+- Only the last ``keep_images`` screenshots stay in the conversation. Older
+  ones are replaced with a text placeholder.
+
+Requires Pillow: ``pip install 'claude-sdk[computer-use]'``.
+
+Example:
+    >>> session = ComputerUseSession(client, MyComputer(), model=model)
+    >>> response = session.run("Open the settings and enable dark mode.")
+"""
+
+import io
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .attachments import Attachment, image
+from .instrumentation import Instrumentation
+
+# Beta that enables the computer-use tool type below
+COMPUTER_USE_BETA = "computer-use-2025-01-24"
+TOOL_TYPE = "computer_20250124"
+
+# Keys of tool inputs holding screen coordinates
+_COORDINATE_KEYS = ("coordinate", "start_coordinate")
+
+_FORMATS = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+
+def _import_pil() -> Any:
+    try:
+        from PIL import Image
+    except ImportError as e:
+        raise ImportError(
+            "Computer-use sessions require Pillow. "
+            "Install it with: pip install 'claude-sdk[computer-use]'"
+        ) from e
+    return Image
+
+
+def perceptual_hash(image: Any, hash_size: int = 16) -> int:
+    """
+    Compute the difference hash of an image.
+
+    The image is shrunk to ``hash_size + 1`` by ``hash_size`` grayscale
+    pixels, and every bit tells whether a pixel is brighter than its right
+    neighbour. Visually similar images have hashes that differ in few bits.
+
+    Args:
+        image (PIL.Image.Image): The image.
+        hash_size (int, optional): Rows of the hash; the hash has
+            ``hash_size ** 2`` bits.
+
+    Returns:
+        int: The hash.
+    """
+    Image = _import_pil()
+    small = image.convert("L").resize(
+        (hash_size + 1, hash_size), Image.Resampling.BILINEAR
+    )
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        start = row * (hash_size + 1)
+        for column in range(start, start + hash_size):
+            value = (value << 1) | (pixels[column] > pixels[column + 1])
+    return value
+
+
+def hash_distance(a: int, b: int) -> int:
+    """
+    Return the number of bits in which two perceptual hashes differ.
+    """
+    return bin(a ^ b).count("1")
+
+
+class Computer:
+    """
+    Environment a :class:`ComputerUseSession` operates.
+
+    Subclass it to drive a real or virtual display, e.g. with xdotool or a
+    VNC client.
+    """
+
+    def screenshot(self) -> Any:
+        """
+        Capture the screen.
+
+        Returns:
+            Any: A ``PIL.Image.Image``, or the encoded image as bytes.
+        """
+        raise NotImplementedError
+
+    def perform(self, action: Dict[str, Any]) -> Optional[str]:
+        """
+        Perform an action of the computer-use tool other than ``screenshot``,
+        e.g. ``{"action": "left_click", "coordinate": [640, 400]}``.
+        Coordinates are in screen pixels.
+
+        Args:
+            action (Dict[str, Any]): Input of the tool call.
+
+        Returns:
+            str, optional: Text output of the action, passed on to Claude.
+        """
+        raise NotImplementedError
+
+
+class ScreenshotEncoder:
+    """
+    Downscales and recompresses screenshots, and detects unchanged ones.
+
+    Args:
+        max_size (Tuple[int, int], optional): Width and height screenshots are
+            downscaled to fit, keeping their aspect ratio. Claude recommends
+            at most 1280x800 for computer use.
+        format (str, optional): "JPEG", "WEBP" or "PNG".
+        quality (int, optional): JPEG or WebP quality, 1-95.
+        hash_size (int, optional): Size of the perceptual hash. Changes much
+            smaller than ``1 / hash_size`` of the screen, such as a single
+            typed character, may go unnoticed; raise it to catch them.
+        max_distance (int, optional): Hashes differing in at most this many
+            bits count as the same screen. Zero only skips screens that look
+            identical at the hash's resolution.
+    """
+
+    def __init__(
+        self,
+        max_size: Tuple[int, int] = (1280, 800),
+        format: str = "JPEG",
+        quality: int = 75,
+        hash_size: int = 16,
+        max_distance: int = 0,
+    ):
+        format = format.upper()
+        if format not in _FORMATS:
+            raise ValueError(f"Unsupported screenshot format {format!r}")
+        self.max_size = max_size
+        self.format = format
+        self.media_type = _FORMATS[format]
+        self.quality = quality
+        self.hash_size = hash_size
+        self.max_distance = max_distance
+        self.screen_size: Optional[Tuple[int, int]] = None
+        self.size: Optional[Tuple[int, int]] = None
+        self._last_hash: Optional[int] = None
+
+    @property
+    def scale(self) -> float:
+        """
+        Ratio of the size of the screenshots sent to the size of the screen.
+        """
+        if self.size is None or self.screen_size is None:
+            return 1.0
+        return self.size[0] / self.screen_size[0]
+
+    def _downscale(self, screenshot: Any) -> Any:
+        Image = _import_pil()
+        if isinstance(screenshot, (bytes, bytearray, memoryview)):
+            screenshot = Image.open(io.BytesIO(screenshot))
+        self.screen_size = screenshot.size
+        if screenshot.format == "JPEG":
+            # Decode at a reduced size right away
+            screenshot.draft("RGB", self.max_size)
+        image = screenshot.convert("RGB")
+        # Shrinks by an integer factor first, then resamples the rest
+        image.thumbnail(self.max_size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        self.size = image.size
+        return image
+
+    def encode(self, screenshot: Any) -> Optional[Attachment]:
+        """
+        Prepare a screenshot for sending.
+
+        Args:
+            screenshot (Any): A ``PIL.Image.Image`` or encoded image bytes.
+
+        Returns:
+            Attachment, optional: The downscaled, recompressed screenshot, or
+                None if it matches the last screenshot returned.
+        """
+        image = self._downscale(screenshot)
+        digest = perceptual_hash(image, self.hash_size)
+        last = self._last_hash
+        if last is not None and hash_distance(digest, last) <= self.max_distance:
+            return None
+        self._last_hash = digest
+        buffer = io.BytesIO()
+        options: Dict[str, Any] = {}
+        if self.format != "PNG":
+            options["quality"] = self.quality
+        if self.format == "JPEG":
+            options["optimize"] = True
+        image.save(buffer, self.format, **options)
+        return Attachment.from_buffer(buffer.getvalue(), self.media_type)
+
+    def reset(self) -> None:
+        """
+        Forget the last screenshot, so that the next one is always sent.
+        """
+        self._last_hash = None
+
+    def to_screen(self, point: List[int]) -> List[int]:
+        """
+        Map a point of a screenshot sent to screen pixels.
+        """
+        if self.screen_size is None:
+            return list(point)
+        scale = self.scale
+        width, height = self.screen_size
+        x = min(width - 1, max(0, round(point[0] / scale)))
+        y = min(height - 1, max(0, round(point[1] / scale)))
+        return [x, y]
+
+
+class ComputerUseSession:
+    """
+    Runs a computer-use task to completion.
+
+    Requests enable the computer-use beta on top of any betas in the
+    client's headers, which are left unchanged.
+
+    Args:
+        client (Claude): Client used to call the API.
+        computer (Computer): Environment the actions are performed on.
+        model (str): Model with computer-use support.
+        encoder (ScreenshotEncoder, optional): Prepares screenshots. Defaults
+            to 1280x800 JPEG at quality 75.
+        keep_images (int, optional): Screenshots kept in the conversation;
+            older ones are replaced with a placeholder.
+        max_steps (int, optional): Most requests made by :meth:`run`.
+        max_tokens (int, optional): Maximum number of tokens per response.
+        system (str, optional): System prompt.
+        action_delay (float, optional): Seconds to wait after an action
+            before taking the screenshot that answers it.
+        instrumentation (Instrumentation, optional): Receives a
+            ``computer_use.step`` event for every request. Defaults to the
+            client's.
+    """
+
+    placeholder = "[Earlier screenshot removed.]"
+    unchanged = "The screen has not changed since the last screenshot."
+
+    def __init__(
+        self,
+        client: Any,
+        computer: Computer,
+        model: str,
+        encoder: Optional[ScreenshotEncoder] = None,
+        keep_images: int = 3,
+        max_steps: int = 50,
+        max_tokens: int = 4096,
+        system: Optional[str] = None,
+        action_delay: float = 0.0,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        self.client = client
+        self.computer = computer
+        self.model = model
+        self.encoder = encoder or ScreenshotEncoder()
+        self.keep_images = keep_images
+        self.max_steps = max_steps
+        self.max_tokens = max_tokens
+        self.system = system
+        self.action_delay = action_delay
+        self.instrumentation = instrumentation or client.instrumentation
+        self.messages: List[Dict[str, Any]] = []
+        self.steps = 0
+        self.skipped = 0
+        # Lists holding the image blocks still in the conversation, with
+        # their index, oldest first
+        self._images: Deque[Tuple[List[Dict[str, Any]], int]] = deque()
+
+    def tool(self) -> Dict[str, Any]:
+        """
+        Return the definition of the computer-use tool, with the size of the
+        screenshots Claude sees.
+        """
+        width, height = self.encoder.size or self.encoder.max_size
+        return {
+            "type": TOOL_TYPE,
+            "name": "computer",
+            "display_width_px": width,
+            "display_height_px": height,
+        }
+
+    def _screenshot(self, blocks: List[Dict[str, Any]]) -> int:
+        """
+        Append the current screen to content blocks, and return the bytes
+        uploaded for it.
+        """
+        attachment = self.encoder.encode(self.computer.screenshot())
+        if attachment is None:
+            self.skipped += 1
+            blocks.append({"type": "text", "text": self.unchanged})
+            return 0
+        blocks.append(image(attachment))
+        self._images.append((blocks, len(blocks) - 1))
+        while len(self._images) > self.keep_images:
+            old_blocks, index = self._images.popleft()
+            old_blocks[index] = {"type": "text", "text": self.placeholder}
+        return attachment.encoded_size
+
+    def _perform(self, tool_use: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        action = dict(tool_use.get("input") or {})
+        content: List[Dict[str, Any]] = []
+        result = {"type": "tool_result", "tool_use_id": tool_use["id"]}
+        if action.get("action") != "screenshot":
+            for key in _COORDINATE_KEYS:
+                if key in action:
+                    action[key] = self.encoder.to_screen(action[key])
+            try:
+                output = self.computer.perform(action)
+            except Exception as e:
+                result["content"] = [{"type": "text", "text": str(e)}]
+                result["is_error"] = True
+                return result, 0
+            if output:
+                content.append({"type": "text", "text": output})
+            if self.action_delay:
+                time.sleep(self.action_delay)
+        uploaded = self._screenshot(content)
+        result["content"] = content
+        return result, uploaded
+
+    def step(self, content: List[Dict[str, Any]], uploaded: int = 0) -> Dict[str, Any]:
+        """
+        Send a user turn and return Claude's response.
+
+        Args:
+            content (List[Dict[str, Any]]): Content blocks of the turn.
+            uploaded (int, optional): Bytes of new screenshots in the turn.
+
+        Returns:
+            Dict[str, Any]: The response.
+        """
+        self.messages.append({"role": "user", "content": content})
+        started = time.perf_counter()
+        response: Dict[str, Any] = self.client.messages_create(
+            self.model,
+            self.messages,
+            max_tokens=self.max_tokens,
+            system=self.system,
+            tools=[self.tool()],
+            betas=[COMPUTER_USE_BETA],
+        )
+        self.steps += 1
+        self.messages.append({"role": "assistant", "content": response["content"]})
+        self.instrumentation.emit(
+            "computer_use.step",
+            step=self.steps,
+            uploaded_bytes=uploaded,
+            images=len(self._images),
+            skipped=self.skipped,
+            latency=time.perf_counter() - started,
+        )
+        return response
+
+    def run(self, task: str) -> Dict[str, Any]:
+        """
+        Work on a task until Claude stops using the computer, or for at most
+        ``max_steps`` requests.
+
+        Args:
+            task (str): The task.
+
+        Returns:
+            Dict[str, Any]: The last response.
+        """
+        content: List[Dict[str, Any]] = [{"type": "text", "text": task}]
+        self.encoder.reset()
+        uploaded = self._screenshot(content)
+        response = self.step(content, uploaded)
+        while self.steps < self.max_steps and response.get("stop_reason") == "tool_use":
+            results = []
+            uploaded = 0
+            for block in response["content"]:
+                if block.get("type") == "tool_use":
+                    result, size = self._perform(block)
+                    results.append(result)
+                    uploaded += size
+            response = self.step(results, uploaded)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the number of steps, screenshots skipped and images kept.
+
+        Returns:
+            Dict[str, Any]: Steps, skipped screenshots and the number of
+                screenshots still in the conversation.
+        """
+        return {
+            "steps": self.steps,
+            "skipped": self.skipped,
+            "images": len(self._images),
+        }
@@ -0,0 +1,297 @@
+"""
+Adaptive concurrency limiting.
+
+A fixed cap on requests in flight is either too low, wasting throughput, or
+too high, causing storms of 429 responses, depending on how much capacity the
+API has at the moment. An :class:`AdaptiveLimiter` adjusts the cap from what
+it observes: the latency of every request and whether it was rejected with a
+429, 529 or 503 or timed out. Two algorithms are available:
+
+* :class:`AIMD` grows the limit by one per successful request while the limit
+  is being used and cuts it multiplicatively on every rejection.
+* :class:`Gradient` compares short-term latency with its long-term baseline and
+  shrinks the limit as soon as queueing makes requests slower, before the API
+  starts rejecting them.
+
+Example:
+    >>> limiter = AdaptiveLimiter("gradient", initial_limit=20)
+    >>> client = AsyncClaude(concurrency_limiter=limiter)
+    >>> limiter.limit
+    20
+"""
+
+import asyncio
+import math
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Type, Union
+
+from .instrumentation import Instrumentation
+
+
+class LimitAlgorithm:
+    """
+    Base class for algorithms computing a new limit from a latency sample.
+    """
+
+    def update(self, limit: float, rtt: float, in_flight: int, dropped: bool) -> float:
+        """
+        Compute the new limit after a request completed.
+
+        Args:
+            limit (float): Current limit.
+            rtt (float): Latency of the request in seconds.
+            in_flight (int): Requests in flight when it completed, itself
+                included.
+            dropped (bool): Whether the request was rejected or timed out.
+
+        Returns:
+            float: The new limit, before clamping to the limiter's bounds.
+        """
+        raise NotImplementedError
+
+
+class AIMD(LimitAlgorithm):
+    """
+    Additive increase, multiplicative decrease.
+
+    Args:
+        backoff_ratio (float, optional): Factor applied to the limit on every
+            dropped request.
+        timeout (float, optional): Latency in seconds above which a request
+            counts as dropped.
+    """
+
+    def __init__(self, backoff_ratio: float = 0.9, timeout: Optional[float] = None):
+        self.backoff_ratio = backoff_ratio
+        self.timeout = timeout
+
+    def update(self, limit: float, rtt: float, in_flight: int, dropped: bool) -> float:
+        if dropped or (self.timeout is not None and rtt > self.timeout):
+            return limit * self.backoff_ratio
+        # Only grow while the current limit is actually being used
+        if in_flight * 2 >= limit:
+            return limit + 1
+        return limit
+
+
+class Gradient(LimitAlgorithm):
+    """
+    Latency gradient, after the Gradient2 limiter of Netflix concurrency-limits.
+
+    A long-term exponential average of the latency serves as the no-load
+    baseline. The ratio of that baseline to the short-term average, capped to
+    [0.5, 1], scales the limit, and a queue allowance of sqrt(limit) lets it
+    grow while latency stays flat.
+
+    Args:
+        tolerance (float, optional): How much slower than the baseline requests
+            may get before the limit shrinks.
+        short_window (int, optional): Samples in the short-term average.
+        long_window (int, optional): Samples in the long-term average.
+        smoothing (float, optional): Weight of every new limit estimate.
+        backoff_ratio (float, optional): Factor applied to the limit on every
+            dropped request.
+    """
+
+    def __init__(
+        self,
+        tolerance: float = 1.5,
+        short_window: int = 10,
+        long_window: int = 600,
+        smoothing: float = 0.2,
+        backoff_ratio: float = 0.9,
+    ):
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.backoff_ratio = backoff_ratio
+        self._short_factor = 2.0 / (short_window + 1)
+        self._long_factor = 2.0 / (long_window + 1)
+        self.short_rtt = 0.0
+        self.long_rtt = 0.0
+
+    def update(self, limit: float, rtt: float, in_flight: int, dropped: bool) -> float:
+        if dropped:
+            return limit * self.backoff_ratio
+        if not self.long_rtt:
+            self.short_rtt = self.long_rtt = rtt
+            return limit
+        self.short_rtt += (rtt - self.short_rtt) * self._short_factor
+        self.long_rtt += (rtt - self.long_rtt) * self._long_factor
+        # Let the baseline recover quickly after a period of high latency
+        if self.long_rtt > 2 * self.short_rtt:
+            self.long_rtt *= 0.95
+
+        # Latency measured without using the limit says nothing about it
+        if in_flight * 2 < limit:
+            return limit
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt))
+        estimate = limit * gradient + math.sqrt(limit)
+        return limit * (1 - self.smoothing) + estimate * self.smoothing
+
+
+ALGORITHMS: Dict[str, Type[LimitAlgorithm]] = {"aimd": AIMD, "gradient": Gradient}
+
+
+class Permit:
+    """
+    Permission to send one request, returned by :meth:`AdaptiveLimiter.acquire`.
+
+    Record the outcome with :meth:`record` and call :meth:`release` when the
+    request, including any stream, is done. Releasing twice is a no-op.
+    """
+
+    def __init__(
+        self,
+        limiter: "AdaptiveLimiter",
+        instrumentation: Optional[Instrumentation],
+    ):
+        self.limiter = limiter
+        self._instrumentation = instrumentation
+        self._released = False
+
+    def record(self, rtt: float, dropped: bool = False) -> None:
+        """
+        Feed the latency and outcome of the request to the limit algorithm.
+
+        Args:
+            rtt (float): Latency in seconds.
+            dropped (bool, optional): Whether the request was rejected with a
+                429, 529 or 503, or timed out.
+        """
+        self.limiter._record(rtt, dropped, self._instrumentation)
+
+    def release(self) -> None:
+        """
+        Mark the request as no longer in flight, letting a waiting one start.
+        """
+        if not self._released:
+            self._released = True
+            self.limiter._release()
+
+
+class AdaptiveLimiter:
+    """
+    Limits requests in flight to a limit adjusted by a :class:`LimitAlgorithm`.
+
+    Requests above the limit wait in FIFO order. Limit changes are emitted as
+    ``concurrency.limit`` events with the new ``limit`` and the current
+    ``in_flight`` count. A limiter must only be used from one event loop at a
+    time.
+
+    Args:
+        algorithm (Union[str, LimitAlgorithm], optional): "gradient", "aimd" or
+            an algorithm instance.
+        initial_limit (int, optional): Limit to start with.
+        min_limit (int, optional): Lowest limit.
+        max_limit (int, optional): Highest limit.
+    """
+
+    def __init__(
+        self,
+        algorithm: Union[str, LimitAlgorithm] = "gradient",
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 1000,
+    ):
+        if isinstance(algorithm, str):
+            if algorithm not in ALGORITHMS:
+                raise ValueError(
+                    f"Unknown algorithm {algorithm!r}, "
+                    f"expected one of {tuple(ALGORITHMS)}"
+                )
+            algorithm = ALGORITHMS[algorithm]()
+        self.algorithm = algorithm
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+        self._callbacks: List[Callable[[int], None]] = []
+
+    @property
+    def limit(self) -> int:
+        """
+        Current limit on requests in flight.
+        """
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Requests currently in flight.
+        """
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        """
+        Requests waiting for a permit.
+        """
+        return len(self._waiters)
+
+    def add_limit_callback(self, callback: Callable[[int], None]) -> None:
+        """
+        Register a function called with the new limit whenever it changes.
+
+        Args:
+            callback (Callable[[int], None]): Function to call, e.g. the
+                :meth:`~claude_sdk.scheduler.FairScheduler.dispatch` of a
+                scheduler using this limit.
+        """
+        self._callbacks.append(callback)
+
+    async def acquire(
+        self, instrumentation: Optional[Instrumentation] = None
+    ) -> Permit:
+        """
+        Wait until a request may be sent.
+
+        Args:
+            instrumentation (Instrumentation, optional): Receives limit changes.
+
+        Returns:
+            Permit: The permit, to be recorded and released.
+        """
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return Permit(self, instrumentation)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just before the cancellation; hand it on
+                self._release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        return Permit(self, instrumentation)
+
+    def _wake(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._wake()
+
+    def _record(
+        self, rtt: float, dropped: bool, instrumentation: Optional[Instrumentation]
+    ) -> None:
+        previous = self.limit
+        limit = self.algorithm.update(self._limit, rtt, self._in_flight, dropped)
+        self._limit = min(max(limit, self.min_limit), self.max_limit)
+        if self.limit != previous:
+            if instrumentation is not None:
+                instrumentation.emit(
+                    "concurrency.limit", limit=self.limit, in_flight=self._in_flight
+                )
+            self._wake()
+            for callback in self._callbacks:
+                callback(self.limit)
@@ -0,0 +1,581 @@
+"""
+Context-window management for long conversations.
+
+A :class:`ContextWindow` holds the messages of a conversation together with a
+running token estimate, updated as each message is appended, so checking the
+size of the prompt never rescans the history. Before a request is sent, it
+applies compaction policies in order until the prompt fits a target budget:
+stripping tool results or images from older turns, replacing older turns with
+a summary that is computed once and reused, and dropping the oldest turns.
+Every message is compacted at most once, so the work per appended message is
+constant on average.
+
+Pass the window as ``messages`` to ``messages_create``. The client compacts it
+before sending, appends the assistant's reply, and calibrates the estimate with
+the input tokens the API reports. A prompt that cannot be made to fit raises
+:class:`~claude_sdk.exceptions.ContextWindowExceededError` without a round
+trip.
+
+Example:
+    >>> window = ContextWindow(target_tokens=50_000)
+    >>> window.append({"role": "user", "content": "Hello"})
+    >>> client.messages_create(model, window)
+    >>> window.append({"role": "user", "content": "Tell me more."})
+"""
+
+import inspect
+import json
+import math
+from collections import deque
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Generator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from .attachments import Attachment
+from .exceptions import ContextWindowExceededError
+
+# Rough cost of an image; the API charges about width * height / 750 tokens
+IMAGE_TOKENS = 1600
+
+# Tokens per kilobyte of a PDF document, counting its text and page images
+DOCUMENT_TOKENS_PER_KB = 25
+
+# Overhead of a message's role and framing
+MESSAGE_TOKENS = 4
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(content: Any) -> int:
+    """
+    Roughly estimate the tokens of a message, content block, list of blocks,
+    system prompt or tool definition.
+
+    Args:
+        content (Any): The value to estimate.
+
+    Returns:
+        int: Estimated token count.
+    """
+    if content is None:
+        return 0
+    if isinstance(content, str):
+        return math.ceil(len(content) / CHARS_PER_TOKEN)
+    if isinstance(content, (list, tuple)):
+        return sum(estimate_tokens(item) for item in content)
+    if not isinstance(content, Mapping):
+        return estimate_tokens(str(content))
+    if "role" in content:
+        return MESSAGE_TOKENS + estimate_tokens(content.get("content"))
+    kind = content.get("type")
+    if kind == "text":
+        return estimate_tokens(content.get("text"))
+    if kind == "image":
+        return IMAGE_TOKENS
+    if kind == "document":
+        source = content.get("source")
+        if isinstance(source, Attachment):
+            return max(1, source.size * DOCUMENT_TOKENS_PER_KB // 1024)
+        if isinstance(source, Mapping) and source.get("type") == "base64":
+            size = len(source.get("data") or "") * 3 // 4
+            return max(1, size * DOCUMENT_TOKENS_PER_KB // 1024)
+        if isinstance(source, Mapping):
+            return estimate_tokens(source.get("data"))
+    if kind == "tool_use":
+        return estimate_tokens(content.get("name")) + estimate_tokens(
+            json.dumps(content.get("input"))
+        )
+    if kind == "tool_result":
+        return MESSAGE_TOKENS + estimate_tokens(content.get("content"))
+    return estimate_tokens(json.dumps(content, default=str))
+
+
+def _starts_turn(message: Mapping[str, Any]) -> bool:
+    # A turn starts with a user message that is not only answering tool calls
+    if message.get("role") != "user":
+        return False
+    content = message.get("content")
+    if isinstance(content, list):
+        return not all(
+            isinstance(block, Mapping) and block.get("type") == "tool_result"
+            for block in content
+        )
+    return True
+
+
+class _Entry:
+    __slots__ = ("message", "tokens")
+
+    def __init__(self, message: Dict[str, Any], tokens: int):
+        self.message = message
+        self.tokens = tokens
+
+
+class CompactionPolicy:
+    """
+    Base class for ways to shrink a context window.
+
+    :meth:`apply` is only called while the window is over its target, and may
+    return an awaitable when it needs to do I/O, such as asking a model for a
+    summary; :meth:`ContextWindow.prepare_async` awaits it.
+    """
+
+    def apply(self, window: "ContextWindow", target: int) -> Optional[Awaitable[None]]:
+        """
+        Shrink the window towards ``target`` estimated tokens.
+
+        Args:
+            window (ContextWindow): The window.
+            target (int): Estimated tokens the messages should fit in.
+
+        Returns:
+            Awaitable[None], optional: Work left to await, if any.
+        """
+        raise NotImplementedError
+
+
+class _StripBlocks(CompactionPolicy):
+    """
+    Replaces content blocks of older turns with a short placeholder.
+    """
+
+    kinds: Tuple[str, ...] = ()
+
+    def __init__(self, keep_recent: int = 2):
+        self.keep_recent = keep_recent
+
+    def _strip(self, block: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _strip_content(self, content: Any) -> Any:
+        # Returns the content itself when there is nothing to strip
+        if not isinstance(content, list) or not any(
+            isinstance(block, Mapping) and block.get("type") in self.kinds
+            for block in content
+        ):
+            return content
+        stripped = []
+        for block in content:
+            if isinstance(block, Mapping):
+                replacement = self._strip(block)
+                if replacement is not None:
+                    block = replacement
+            stripped.append(block)
+        return stripped
+
+    def apply(self, window: "ContextWindow", target: int) -> Optional[Awaitable[None]]:
+        # Messages before the cursor have been stripped already
+        offset = window._offset
+        end = window.turn_start(self.keep_recent)
+        start = max(window._cursors.get(self, 0) - offset, 0)
+        for index in range(start, end):
+            message = window[index]
+            content = self._strip_content(message.get("content"))
+            if content is not message.get("content"):
+                window.replace(index, {**message, "content": content})
+        window._cursors[self] = offset + max(start, end)
+        return None
+
+
+class StripToolResults(_StripBlocks):
+    """
+    Replaces the content of tool results older than the most recent turns.
+
+    Args:
+        keep_recent (int, optional): Recent turns whose tool results are kept.
+    """
+
+    kinds = ("tool_result",)
+    placeholder = "[Tool result removed to save context.]"
+
+    def _strip(self, block: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+        if block.get("type") != "tool_result":
+            return None
+        return {**block, "content": self.placeholder}
+
+
+class StripImages(_StripBlocks):
+    """
+    Replaces images and documents older than the most recent turns, including
+    those inside tool results, with a text placeholder.
+
+    Args:
+        keep_recent (int, optional): Recent turns whose images are kept.
+    """
+
+    kinds = ("image", "document", "tool_result")
+    placeholder = "[Attachment removed to save context.]"
+
+    def _strip(self, block: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+        kind = block.get("type")
+        if kind in ("image", "document"):
+            return {"type": "text", "text": self.placeholder}
+        if kind == "tool_result" and isinstance(block.get("content"), list):
+            return {**block, "content": self._strip_content(block["content"])}
+        return None
+
+
+class DropOldestTurns(CompactionPolicy):
+    """
+    Drops the oldest turns until the window fits its target.
+
+    Args:
+        keep_recent (int, optional): Turns that are never dropped.
+    """
+
+    def __init__(self, keep_recent: int = 1):
+        self.keep_recent = keep_recent
+
+    def apply(self, window: "ContextWindow", target: int) -> Optional[Awaitable[None]]:
+        while window.estimated_tokens > target and window.turns > self.keep_recent:
+            window.drop_turns(1)
+        return None
+
+
+class _Pending:
+    """
+    Awaits the result of a policy's I/O, then hands it to a callback.
+    """
+
+    def __init__(self, awaitable: Awaitable[Any], done: Callable[[Any], None]):
+        self.awaitable = awaitable
+        self.done = done
+
+    def __await__(self) -> Generator[Any, None, None]:
+        result = yield from self.awaitable.__await__()
+        self.done(result)
+
+    def close(self) -> None:
+        close = getattr(self.awaitable, "close", None)
+        if close is not None:
+            close()
+
+
+Summarizer = Callable[[List[Dict[str, Any]]], Union[str, Awaitable[str]]]
+
+
+class Summarize(CompactionPolicy):
+    """
+    Replaces the turns before the most recent ones with a summary.
+
+    The summary is kept in the window and reused by later requests; when the
+    window outgrows its target again, the previous summary is summarized
+    together with the turns that followed it.
+
+    Args:
+        summarize (Summarizer): Returns a summary of a list of messages, or an
+            awaitable of one, e.g. by asking a small model for it.
+        keep_recent (int, optional): Turns that are never summarized.
+    """
+
+    def __init__(self, summarize: Summarizer, keep_recent: int = 4):
+        self.summarize = summarize
+        self.keep_recent = keep_recent
+
+    def apply(self, window: "ContextWindow", target: int) -> Optional[Awaitable[None]]:
+        count = window.turns - self.keep_recent
+        if count <= 0:
+            return None
+        messages = window.messages(turns=count)
+        summary = self.summarize(messages)
+        if inspect.isawaitable(summary):
+            return _Pending(summary, lambda text: window.set_summary(text, count))
+        window.set_summary(summary, count)
+        return None
+
+
+DEFAULT_POLICIES = (
+    StripToolResults(keep_recent=2),
+    StripImages(keep_recent=2),
+    DropOldestTurns(keep_recent=1),
+)
+
+
+class ContextWindow:
+    """
+    Messages of a conversation, kept under a token budget.
+
+    Args:
+        messages (Sequence[Dict[str, Any]], optional): Initial messages.
+        target_tokens (int, optional): Estimated prompt tokens, including the
+            system prompt and tools, that compaction aims for.
+        context_window (int, optional): Tokens the model accepts for the prompt
+            and the response together.
+        policies (Sequence[CompactionPolicy], optional): Policies applied in
+            order while the prompt is over ``target_tokens``. Defaults to
+            stripping tool results and images from all but the last two turns,
+            then dropping the oldest turns.
+    """
+
+    summary_prefix = "Summary of the earlier conversation:\n"
+
+    def __init__(
+        self,
+        messages: Sequence[Dict[str, Any]] = (),
+        target_tokens: int = 100_000,
+        context_window: int = 200_000,
+        policies: Optional[Sequence[CompactionPolicy]] = None,
+    ):
+        self.target_tokens = target_tokens
+        self.context_window = context_window
+        self.policies = list(DEFAULT_POLICIES if policies is None else policies)
+        self.scale = 1.0
+        self.summary: Optional[str] = None
+        self._summary_tokens = 0
+        self._entries: Deque[_Entry] = deque()
+        self._turn_starts: Deque[int] = deque()
+        self._offset = 0
+        self._tokens = 0
+        self._sent: Optional[int] = None
+        self._cursors: Dict[CompactionPolicy, int] = {}
+        for message in messages:
+            self.append(message)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        return self._entries[index].message
+
+    @property
+    def turns(self) -> int:
+        """
+        Number of turns, each starting with a user message that is not only
+        tool results.
+        """
+        return len(self._turn_starts)
+
+    @property
+    def estimated_tokens(self) -> int:
+        """
+        Estimated tokens of the messages and the summary, before calibration.
+        Compaction targets are given in the same units.
+        """
+        return self._tokens + self._summary_tokens
+
+    @property
+    def tokens(self) -> int:
+        """
+        Estimated tokens of the messages and the summary, calibrated by the
+        input tokens reported for earlier requests.
+        """
+        return math.ceil(self.estimated_tokens * self.scale)
+
+    def append(self, message: Dict[str, Any]) -> None:
+        """
+        Append a message.
+
+        Args:
+            message (Dict[str, Any]): Message with a role and content.
+        """
+        index = self._offset + len(self._entries)
+        if _starts_turn(message) or not self._turn_starts:
+            self._turn_starts.append(index)
+        tokens = estimate_tokens(message)
+        self._entries.append(_Entry(message, tokens))
+        self._tokens += tokens
+
+    def replace(self, index: int, message: Dict[str, Any]) -> None:
+        """
+        Replace a message, e.g. with a stripped-down copy.
+
+        Args:
+            index (int): Position of the message in the window.
+            message (Dict[str, Any]): The new message.
+        """
+        entry = self._entries[index]
+        tokens = estimate_tokens(message)
+        self._tokens += tokens - entry.tokens
+        entry.message, entry.tokens = message, tokens
+
+    def turn_start(self, recent: int) -> int:
+        """
+        Position in the window of the first message of the last ``recent``
+        turns.
+
+        Args:
+            recent (int): Number of recent turns.
+
+        Returns:
+            int: The position, which is 0 if there are no more turns than
+                ``recent`` and the number of messages if ``recent`` is 0.
+        """
+        if recent <= 0:
+            return len(self._entries)
+        if len(self._turn_starts) <= recent:
+            return 0
+        return self._turn_starts[len(self._turn_starts) - recent] - self._offset
+
+    def drop_turns(self, count: int) -> List[Dict[str, Any]]:
+        """
+        Remove the oldest turns.
+
+        Args:
+            count (int): Number of turns to remove.
+
+        Returns:
+            List[Dict[str, Any]]: The removed messages.
+        """
+        count = min(count, len(self._turn_starts))
+        if count == len(self._turn_starts):
+            end = self._offset + len(self._entries)
+        else:
+            end = self._turn_starts[count]
+        for _ in range(count):
+            self._turn_starts.popleft()
+        dropped = []
+        while self._offset < end:
+            entry = self._entries.popleft()
+            self._tokens -= entry.tokens
+            self._offset += 1
+            dropped.append(entry.message)
+        return dropped
+
+    def set_summary(self, summary: str, turns: int) -> None:
+        """
+        Replace the summary and the oldest turns with a new summary.
+
+        Args:
+            summary (str): Summary of the old summary and the turns.
+            turns (int): Number of oldest turns the summary covers.
+        """
+        self.drop_turns(turns)
+        self.summary = summary
+        self._summary_tokens = estimate_tokens(self.summary_prefix + summary)
+
+    def messages(self, turns: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Return the messages to send, with the summary prepended to the first.
+
+        Args:
+            turns (int, optional): Only return the oldest turns.
+
+        Returns:
+            List[Dict[str, Any]]: The messages.
+        """
+        if turns is None or turns >= len(self._turn_starts):
+            end = len(self._entries)
+        else:
+            end = self._turn_starts[turns] - self._offset
+        messages = [self._entries[i].message for i in range(end)]
+        if self.summary is not None and messages:
+            first = messages[0]
+            content = first.get("content")
+            if isinstance(content, str):
+                content = [{"type": "text", "text": content}]
+            text = {"type": "text", "text": self.summary_prefix + self.summary}
+            messages[0] = {**first, "content": [text, *(content or [])]}
+        return messages
+
+    def _overflow(self, overhead: int, max_output: int) -> List[Dict[str, Any]]:
+        needed = math.ceil((self.estimated_tokens + overhead) * self.scale)
+        if needed + max_output > self.context_window:
+            raise ContextWindowExceededError(
+                f"Prompt of about {needed} tokens and {max_output} output tokens "
+                f"exceed the context window of {self.context_window} tokens",
+                estimated_tokens=needed,
+            )
+        self._sent = self.estimated_tokens + overhead
+        return self.messages()
+
+    def _target(self, overhead: int) -> int:
+        # The target in uncalibrated units, leaving room for the overhead
+        return max(0, math.floor(self.target_tokens / self.scale) - overhead)
+
+    def prepare(self, overhead: int = 0, max_output: int = 0) -> List[Dict[str, Any]]:
+        """
+        Compact the window to its target and return the messages to send.
+
+        Args:
+            overhead (int, optional): Estimated tokens of the system prompt and
+                tools sent along.
+            max_output (int, optional): Maximum tokens of the response.
+
+        Returns:
+            List[Dict[str, Any]]: The messages.
+
+        Raises:
+            ContextWindowExceededError: If the prompt and the response cannot
+                fit the context window.
+            TypeError: If a policy returns an awaitable; use
+                :meth:`prepare_async`.
+        """
+        target = self._target(overhead)
+        for policy in self.policies:
+            if self.estimated_tokens <= target:
+                break
+            pending = policy.apply(self, target)
+            if pending is not None:
+                close = getattr(pending, "close", None)
+                if close is not None:
+                    close()
+                raise TypeError(
+                    f"{type(policy).__name__} is asynchronous; use prepare_async()"
+                )
+        return self._overflow(overhead, max_output)
+
+    async def prepare_async(
+        self, overhead: int = 0, max_output: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Like :meth:`prepare`, awaiting asynchronous policies.
+
+        Args:
+            overhead (int, optional): Estimated tokens of the system prompt and
+                tools sent along.
+            max_output (int, optional): Maximum tokens of the response.
+
+        Returns:
+            List[Dict[str, Any]]: The messages.
+        """
+        target = self._target(overhead)
+        for policy in self.policies:
+            if self.estimated_tokens <= target:
+                break
+            pending = policy.apply(self, target)
+            if pending is not None:
+                await pending
+        return self._overflow(overhead, max_output)
+
+    def record(self, response: Any) -> None:
+        """
+        Append the assistant's reply, once a stream has ended, and calibrate
+        the token estimate with the input tokens reported for the prompt.
+
+        Args:
+            response (Any): A response dictionary, or a
+                :class:`~claude_sdk.streaming.Stream` or
+                :class:`~claude_sdk.streaming.AsyncStream`.
+        """
+        if isinstance(response, dict):
+            self._record(response.get("content"), response.get("usage") or {})
+        else:
+            response.add_done_callback(
+                lambda stream: self._record(stream.message.content, stream.usage)
+            )
+
+    def _record(self, content: Any, usage: Mapping[str, Any]) -> None:
+        actual = sum(
+            usage.get(name) or 0
+            for name in (
+                "input_tokens",
+                "cache_creation_input_tokens",
+                "cache_read_input_tokens",
+            )
+        )
+        if actual and self._sent:
+            self.scale = min(4.0, max(0.25, actual / self._sent))
+        self._sent = None
+        if content:
+            self.append({"role": "assistant", "content": content})
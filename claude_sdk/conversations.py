@@ -0,0 +1,390 @@
+"""
+Persistent, append-only conversation store.
+
+A :class:`ConversationStore` keeps the messages of many conversations in one
+log file. Each message is appended as a record with a small header and a
+CRC32. An in-memory index maps each conversation to the offsets of its records,
+so resuming a conversation reads just those records through a memory map and
+decodes them with a single ``json.loads`` call. Nothing else in the file is
+parsed. Records appended since the log was mapped are read with ``pread``,
+and the map is only grown once that tail is as large as the mapped part.
+
+Appends are crash-safe. A record is written with one ``write`` call. On
+opening, a torn or corrupt record at the end of the log is detected by its
+length and checksum and truncated, so the store always reopens to the last
+complete append. With ``sync=True`` every append is also flushed to disk
+before it returns. Deleted conversations stay in the log until
+:meth:`ConversationStore.compact` rewrites it.
+
+The store is safe to share between threads but not between processes.
+
+Example:
+    >>> store = ConversationStore("conversations")
+    >>> messages = store.messages(session_id)
+    >>> messages.append({"role": "user", "content": text})
+    >>> response = client.messages_create(model, messages)
+    >>> store.extend(session_id, [messages[-1], response_message(response)])
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Payload length, CRC32 of the key and payload, key length, flags
+_HEADER = struct.Struct("<IIHB")
+
+_MESSAGE = 0
+_DELETE = 1
+# Set on every record of a batch but the last, which commits the batch
+_CONTINUED = 2
+
+_LOG_NAME = "conversations.log"
+
+# Unmapped bytes at the end of the log read with pread before remapping
+_MIN_REMAP = 1024 * 1024
+
+
+def response_message(response: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return the assistant message of a response, for storing with the rest of
+    its conversation.
+
+    Args:
+        response (Dict[str, Any]): Response of ``messages_create``.
+
+    Returns:
+        Dict[str, Any]: Message with the response's role and content.
+    """
+    return {"role": response.get("role", "assistant"), "content": response["content"]}
+
+
+class _Index:
+    __slots__ = ("offsets", "lengths")
+
+    def __init__(self) -> None:
+        # Payload offsets and lengths of the conversation's records
+        self.offsets = array("Q")
+        self.lengths = array("I")
+
+
+class ConversationStore:
+    """
+    Append-only log of conversations with an offset index.
+
+    Args:
+        directory (str): Directory of the log, created if it does not exist.
+        sync (bool, optional): Flush every append to disk before returning.
+            Without it, a crash of the machine (not of the process) can lose the
+            latest appends, but never corrupts earlier ones.
+    """
+
+    def __init__(self, directory: str, sync: bool = False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, _LOG_NAME)
+        self.sync = sync
+        self._lock = threading.Lock()
+        self._index: Dict[str, _Index] = {}
+        self._map: Optional[mmap.mmap] = None
+        self._live = 0
+        self._fd = -1
+        self._open()
+
+    def _open(self) -> None:
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._size = os.fstat(self._fd).st_size
+        self._index.clear()
+        self._live = 0
+        self._remap()
+        end = self._scan()
+        if end < self._size:
+            # A torn or corrupt record at the tail from an interrupted append
+            self._unmap()
+            os.ftruncate(self._fd, end)
+            os.fsync(self._fd)
+            self._size = end
+            self._remap()
+
+    def _remap(self) -> None:
+        self._unmap()
+        if self._size:
+            self._map = mmap.mmap(self._fd, self._size, access=mmap.ACCESS_READ)
+
+    def _grow(self, end: int) -> None:
+        """
+        Remap the log if reading up to ``end`` needs it. Remapping on every
+        read after an append would cost a syscall pair per read, so the tail is
+        read with pread until it is as large as the mapped part.
+        """
+        mapped = len(self._map) if self._map is not None else 0
+        if end <= mapped:
+            return
+        if not hasattr(os, "pread") or self._size - mapped >= max(mapped, _MIN_REMAP):
+            self._remap()
+
+    def _read(self, offset: int, length: int) -> bytes:
+        data = self._map
+        if data is not None and offset + length <= len(data):
+            return data[offset : offset + length]
+        return os.pread(self._fd, length, offset)
+
+    def _unmap(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _scan(self) -> int:
+        """
+        Index the records of the log and return where the valid ones end.
+        """
+        data, size, offset = self._map, self._size, 0
+        committed = 0
+        batch: List[Tuple[str, int, int, int]] = []
+        while offset + _HEADER.size <= size:
+            assert data is not None
+            length, crc, key_length, flags = _HEADER.unpack_from(data, offset)
+            start = offset + _HEADER.size
+            end = start + key_length + length
+            if end > size or zlib.crc32(data[start:end]) != crc:
+                break
+            key = data[start : start + key_length].decode("utf-8")
+            batch.append((key, flags & ~_CONTINUED, start + key_length, length))
+            offset = end
+            if not flags & _CONTINUED:
+                for record in batch:
+                    self._apply(*record)
+                batch.clear()
+                committed = offset
+        return committed
+
+    def _apply(self, key: str, flags: int, offset: int, length: int) -> None:
+        if flags == _DELETE:
+            index = self._index.pop(key, None)
+            if index is not None:
+                self._live -= len(index.offsets)
+            return
+        index = self._index.get(key)
+        if index is None:
+            index = self._index[key] = _Index()
+        index.offsets.append(offset)
+        index.lengths.append(length)
+        self._live += 1
+
+    @staticmethod
+    def _record(key: str, flags: int, payload: bytes) -> Tuple[bytes, int]:
+        encoded_key = key.encode("utf-8")
+        if len(encoded_key) > 0xFFFF:
+            raise ValueError("Conversation IDs are limited to 65535 bytes")
+        body = encoded_key + payload
+        header = _HEADER.pack(len(payload), zlib.crc32(body), len(encoded_key), flags)
+        return header + body, _HEADER.size + len(encoded_key)
+
+    def _write(self, records: List[Tuple[str, int, bytes]]) -> None:
+        chunks = []
+        # Payload positions relative to the start of this write
+        positions = []
+        offset = 0
+        for i, (key, flags, payload) in enumerate(records, 1):
+            if i < len(records):
+                flags |= _CONTINUED
+            record, payload_start = self._record(key, flags, payload)
+            chunks.append(record)
+            positions.append((key, flags, offset + payload_start, len(payload)))
+            offset += len(record)
+        buffer = b"".join(chunks)
+        with self._lock:
+            if self._fd < 0:
+                raise ValueError("Conversation store is closed")
+            base = self._size
+            written = os.write(self._fd, buffer)
+            if written != len(buffer):
+                # Leave no partial record for the next append to follow
+                os.ftruncate(self._fd, base)
+                raise OSError(f"Short write to {self.path}")
+            if self.sync:
+                os.fsync(self._fd)
+            self._size += len(buffer)
+            for key, flags, position, length in positions:
+                self._apply(key, flags & ~_CONTINUED, base + position, length)
+
+    def append(self, conversation_id: str, message: Dict[str, Any]) -> None:
+        """
+        Append a message to a conversation, creating it if needed.
+
+        Args:
+            conversation_id (str): ID of the conversation.
+            message (Dict[str, Any]): Message with a role and content.
+        """
+        self.extend(conversation_id, [message])
+
+    def extend(self, conversation_id: str, messages: Iterable[Dict[str, Any]]) -> None:
+        """
+        Append messages to a conversation in one write, so that either all or
+        none of them survive a crash.
+
+        Args:
+            conversation_id (str): ID of the conversation.
+            messages (Iterable[Dict[str, Any]]): Messages with a role and content.
+        """
+        records = [
+            (conversation_id, _MESSAGE, json.dumps(message).encode("utf-8"))
+            for message in messages
+        ]
+        if records:
+            self._write(records)
+
+    def replace(self, conversation_id: str, messages: Iterable[Dict[str, Any]]) -> None:
+        """
+        Replace the messages of a conversation, e.g. after compacting it with a
+        :class:`~claude_sdk.context.ContextWindow`. The old messages are
+        removed by the next compaction.
+
+        Args:
+            conversation_id (str): ID of the conversation.
+            messages (Iterable[Dict[str, Any]]): The new messages.
+        """
+        records = [(conversation_id, _DELETE, b"")]
+        records.extend(
+            (conversation_id, _MESSAGE, json.dumps(message).encode("utf-8"))
+            for message in messages
+        )
+        self._write(records)
+
+    def delete(self, conversation_id: str) -> None:
+        """
+        Delete a conversation. Its records are removed by the next compaction.
+
+        Args:
+            conversation_id (str): ID of the conversation.
+        """
+        if conversation_id in self._index:
+            self._write([(conversation_id, _DELETE, b"")])
+
+    def messages(
+        self, conversation_id: str, last: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Read the messages of a conversation.
+
+        Args:
+            conversation_id (str): ID of the conversation.
+            last (int, optional): Only read this many of the latest messages.
+
+        Returns:
+            List[Dict[str, Any]]: The messages, oldest first; empty for an
+                unknown conversation.
+        """
+        with self._lock:
+            index = self._index.get(conversation_id)
+            if index is None:
+                return []
+            start = 0 if last is None else max(0, len(index.offsets) - last)
+            end = index.offsets[-1] + index.lengths[-1]
+            self._grow(end)
+            payloads = [
+                self._read(offset, length)
+                for offset, length in zip(index.offsets[start:], index.lengths[start:])
+            ]
+        messages: List[Dict[str, Any]] = json.loads(b"[" + b",".join(payloads) + b"]")
+        return messages
+
+    def __contains__(self, conversation_id: str) -> bool:
+        return conversation_id in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def conversations(self) -> List[str]:
+        """
+        Return the IDs of the stored conversations.
+
+        Returns:
+            List[str]: The IDs, in order of creation.
+        """
+        with self._lock:
+            return list(self._index)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the size of the log and how much of it compaction would free.
+
+        Returns:
+            Dict[str, Any]: Conversations, live messages, log bytes and the
+                bytes still used by live messages.
+        """
+        with self._lock:
+            live_bytes = sum(
+                len(index.lengths) * (_HEADER.size + len(key.encode("utf-8")))
+                + sum(index.lengths)
+                for key, index in self._index.items()
+            )
+            return {
+                "conversations": len(self._index),
+                "messages": self._live,
+                "bytes": self._size,
+                "live_bytes": live_bytes,
+            }
+
+    def compact(self) -> None:
+        """
+        Rewrite the log without deleted conversations.
+
+        The new log is written next to the old one, flushed, and atomically
+        renamed over it, so a crash during compaction leaves either log intact.
+        """
+        with self._lock:
+            if self._fd < 0:
+                raise ValueError("Conversation store is closed")
+            if self._map is None or len(self._map) < self._size:
+                self._remap()
+            data = self._map
+            temporary = self.path + ".compact"
+            with open(temporary, "wb") as f:
+                for key, index in self._index.items():
+                    encoded_key = key.encode("utf-8")
+                    for offset, length in zip(index.offsets, index.lengths):
+                        assert data is not None
+                        start = offset - len(encoded_key)
+                        f.write(data[start - _HEADER.size : offset + length])
+                f.flush()
+                os.fsync(f.fileno())
+            self._unmap()
+            os.close(self._fd)
+            os.replace(temporary, self.path)
+            self._fsync_directory()
+            self._open()
+
+    def _fsync_directory(self) -> None:
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def close(self) -> None:
+        """
+        Flush and close the log.
+        """
+        with self._lock:
+            if self._fd < 0:
+                return
+            self._unmap()
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = -1
+
+    def __enter__(self) -> "ConversationStore":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
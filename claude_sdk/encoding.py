@@ -0,0 +1,147 @@
+"""
+Incremental JSON encoding of request payloads.
+
+Payloads normally go to the transport as a dictionary and are serialized in
+one shot. When request compression is enabled, or the payload contains objects
+that serialize themselves as a stream (such as file attachments), the body is
+instead produced chunk by chunk while the transport sends it.
+"""
+
+import json
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+
+from .instrumentation import Instrumentation
+from .transport import TransportRequest
+
+if TYPE_CHECKING:
+    from .compression import RequestCompression
+
+_encode_scalar = json.JSONEncoder(separators=(",", ":")).encode
+
+
+class StreamingJSON:
+    """
+    Base class for payload values that serialize themselves incrementally.
+
+    Subclasses implement :meth:`iter_json` to yield their JSON text in pieces,
+    so that large values never need to exist as one string.
+    """
+
+    def iter_json(self) -> Iterator[str]:
+        """
+        Yield the JSON text of this value in pieces.
+        """
+        raise NotImplementedError
+
+
+def contains_streaming_json(obj: Any) -> bool:
+    """
+    Check whether a payload contains any :class:`StreamingJSON` values.
+
+    Args:
+        obj (Any): Payload to inspect.
+
+    Returns:
+        bool: True if at least one value has to be streamed.
+    """
+    if isinstance(obj, StreamingJSON):
+        return True
+    if isinstance(obj, dict):
+        return any(contains_streaming_json(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(contains_streaming_json(value) for value in obj)
+    return False
+
+
+def _iter_json(obj: Any) -> Iterator[str]:
+    if isinstance(obj, dict):
+        yield "{"
+        first = True
+        for key, value in obj.items():
+            if not first:
+                yield ","
+            first = False
+            yield _encode_scalar(str(key))
+            yield ":"
+            yield from _iter_json(value)
+        yield "}"
+    elif isinstance(obj, (list, tuple)):
+        yield "["
+        for i, value in enumerate(obj):
+            if i:
+                yield ","
+            yield from _iter_json(value)
+        yield "]"
+    elif isinstance(obj, StreamingJSON):
+        yield from obj.iter_json()
+    else:
+        yield _encode_scalar(obj)
+
+
+def iter_json(obj: Any, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Encode an object as compact JSON, incrementally.
+
+    Containers are walked in Python while strings and numbers go through the C
+    encoder, and the output is batched into chunks of roughly chunk_size bytes.
+
+    Args:
+        obj (Any): JSON-serializable object, possibly containing
+            :class:`StreamingJSON` values.
+        chunk_size (int, optional): Approximate size of the yielded chunks.
+
+    Yields:
+        bytes: UTF-8 encoded JSON chunks.
+    """
+    pieces: List[str] = []
+    size = 0
+    for piece in _iter_json(obj):
+        pieces.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(pieces).encode("utf-8")
+            pieces = []
+            size = 0
+    if pieces:
+        yield "".join(pieces).encode("utf-8")
+
+
+def encode_request(
+    request: TransportRequest,
+    compression: Optional["RequestCompression"],
+    instrumentation: Instrumentation,
+) -> TransportRequest:
+    """
+    Encode a request's JSON payload into a streamed body when needed.
+
+    With a compression policy the body is compressed above its threshold and
+    the statistics are emitted as "request.compressed" events. Without one,
+    payloads containing :class:`StreamingJSON` values are streamed as-is and
+    all others are left for the transport to serialize. The request keeps its
+    ``json`` payload either way, so record/replay fingerprints do not depend
+    on how the body was encoded.
+
+    Args:
+        request (TransportRequest): Request whose payload to encode.
+        compression (RequestCompression, optional): Compression policy.
+        instrumentation (Instrumentation): Receives the compression statistics.
+
+    Returns:
+        TransportRequest: The same request, with ``content`` and headers set.
+    """
+    if request.json is None:
+        return request
+
+    if compression is None:
+        if contains_streaming_json(request.json):
+            request.content = iter_json(request.json)
+        return request
+
+    def report(stats: Dict[str, Any]) -> None:
+        instrumentation.emit("request.compressed", **stats)
+
+    headers, body = compression.encode(request.json, report)
+    headers["accept-encoding"] = compression.accept_encoding
+    request.headers = {**request.headers, **headers}
+    request.content = body
+    return request
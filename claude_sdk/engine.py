@@ -0,0 +1,129 @@
+"""
+Background event loop that runs the requests of sync clients.
+
+A :class:`~claude_sdk.Claude` client created with ``engine=True`` does not
+send requests itself. It hands them to an :class:`AsyncClaude` running on an
+:class:`EventLoopThread` and waits for the result, or returns a
+``concurrent.futures.Future`` from :meth:`~claude_sdk.Claude.submit`. All
+threads of the process then share one loop and one pooled async transport,
+so hundreds of requests can be in flight without a thread per request.
+
+The shared loop is recreated in a forked child process, such as a Celery
+worker, since the loop thread of the parent does not survive the fork.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class EventLoopThread:
+    """
+    An asyncio event loop running forever in a daemon thread.
+
+    Args:
+        name (str, optional): Name of the thread.
+    """
+
+    def __init__(self, name: str = "claude-sdk-engine"):
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether the loop thread is alive in this process.
+        """
+        return self.pid == os.getpid() and self._thread.is_alive()
+
+    def submit(self, coroutine: Awaitable[T]) -> "concurrent.futures.Future[T]":
+        """
+        Schedule a coroutine on the loop.
+
+        Args:
+            coroutine (Awaitable[T]): The coroutine.
+
+        Returns:
+            concurrent.futures.Future[T]: Its result. Cancelling the future
+                cancels the coroutine.
+        """
+        if not self.running:
+            raise RuntimeError("Event loop thread is not running")
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)  # type: ignore[arg-type]
+
+    def run(self, coroutine: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """
+        Run a coroutine on the loop and wait for its result.
+
+        Args:
+            coroutine (Awaitable[T]): The coroutine.
+            timeout (float, optional): Seconds to wait before cancelling it and
+                raising ``TimeoutError``.
+
+        Returns:
+            T: Its result.
+        """
+        if threading.current_thread() is self._thread:
+            # Waiting here would block the loop the coroutine needs
+            close = getattr(coroutine, "close", None)
+            if close is not None:
+                close()
+            raise RuntimeError("Cannot wait for the engine from its own loop")
+        future = self.submit(coroutine)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def close(self) -> None:
+        """
+        Stop the loop and wait for its thread to exit.
+        """
+        if not self.running:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+_shared: Optional[EventLoopThread] = None
+_shared_lock = threading.Lock()
+
+
+def shared_loop() -> EventLoopThread:
+    """
+    Return the event loop thread shared by all engine clients of the process,
+    starting it on first use and again after a fork.
+
+    Returns:
+        EventLoopThread: The shared loop thread.
+    """
+    global _shared
+    loop = _shared
+    if loop is not None and loop.running:
+        return loop
+    with _shared_lock:
+        if _shared is None or not _shared.running:
+            _shared = EventLoopThread()
+        return _shared
+
+
+def _fork_reset() -> None:
+    # The lock may have been held by another thread at the time of the fork
+    global _shared_lock
+    _shared_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_fork_reset)
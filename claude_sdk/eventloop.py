@@ -0,0 +1,275 @@
+"""
+Keeping a server's event loop responsive while it handles large payloads.
+
+Decoding, validating and encoding a JSON body of several megabytes, such as a
+long conversation or base64 images, takes tens of milliseconds. Done on the
+event loop, it delays every other request in flight by as much. An
+:class:`Offloader` runs such work on a thread pool when the payload is above
+a size threshold, and inline otherwise, where a thread hop would cost more
+than it saves. CPython's ``json`` holds the GIL while it runs, so each call
+still stalls the loop. The loop can run between calls, so one large body
+no longer stalls it for the whole handler.
+
+A :class:`LoopLagMonitor` measures how late the loop wakes up from short
+sleeps, which is how long callbacks waited behind whatever was running. It
+reports lag percentiles, the longest lag and the total time lost to stalls,
+and emits a ``loop.stall`` event for every stall.
+
+Example:
+    >>> offloader = Offloader(threshold=256 * 1024)
+    >>> payload = await offloader.run(len(body), json.loads, body)
+    >>> async with LoopLagMonitor(instrumentation=instrumentation) as monitor:
+    ...     await serve()
+    >>> monitor.stats()["lag_p99"]
+"""
+
+import asyncio
+import collections
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+from .instrumentation import Instrumentation
+
+
+def estimate_size(value: Any, limit: Optional[int] = None) -> int:
+    """
+    Estimate the encoded JSON size of a value without encoding it.
+
+    Counts the characters of strings and keys plus a few bytes for every
+    other value. Stops early once the estimate reaches ``limit``, so checking
+    a large value against a threshold costs about as much as a small one.
+
+    Args:
+        value (Any): JSON-serializable value.
+        limit (int, optional): Size at which to stop counting.
+
+    Returns:
+        int: Estimated size in bytes, at least ``limit`` if the value is
+            larger.
+    """
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            size += len(item) + 2
+        elif isinstance(item, dict):
+            size += 2
+            for key, child in item.items():
+                size += len(key) + 4
+                stack.append(child)
+        elif isinstance(item, (list, tuple)):
+            size += 2 + len(item)
+            stack.extend(item)
+        else:
+            size += 8
+        if limit is not None and size >= limit:
+            break
+    return size
+
+
+class Offloader:
+    """
+    Runs work on large payloads on a thread pool.
+
+    Args:
+        threshold (int, optional): Payload size in bytes from which work is
+            offloaded. Smaller payloads are handled inline.
+        workers (int, optional): Threads of the pool created on first use.
+        executor (Executor, optional): Pool to use instead, e.g. one shared
+            with other work. It is not shut down by :meth:`close`.
+        instrumentation (Instrumentation, optional): Receives an
+            ``offload.completed`` event for every offloaded call.
+    """
+
+    def __init__(
+        self,
+        threshold: int = 256 * 1024,
+        workers: int = 4,
+        executor: Optional[Executor] = None,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        self.threshold = threshold
+        self.workers = workers
+        self.instrumentation = instrumentation or Instrumentation()
+        self.offloaded = 0
+        self.offloaded_bytes = 0
+        self.inline = 0
+        self._executor = executor
+        self._owned = executor is None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="offload"
+                )
+            return self._executor
+
+    async def run(self, size: int, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Call ``func(*args)``, on the pool if the payload is large.
+
+        Args:
+            size (int): Size of the payload in bytes, e.g. the length of a
+                body or an :func:`estimate_size`.
+            func (Callable[..., Any]): Function to call.
+            *args: Its arguments.
+
+        Returns:
+            Any: What ``func`` returns.
+        """
+        if size < self.threshold:
+            self.inline += 1
+            return func(*args)
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pool(), func, *args)
+        finally:
+            self.offloaded += 1
+            self.offloaded_bytes += size
+            self.instrumentation.emit(
+                "offload.completed",
+                size=size,
+                elapsed=time.perf_counter() - started,
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return how many calls were offloaded and handled inline.
+
+        Returns:
+            Dict[str, Any]: Offloaded calls, their total payload bytes and
+                inline calls.
+        """
+        return {
+            "offloaded": self.offloaded,
+            "offloaded_bytes": self.offloaded_bytes,
+            "inline": self.inline,
+        }
+
+    def close(self) -> None:
+        """
+        Shut down the pool, if the offloader created it.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._owned:
+            executor.shutdown(wait=False)
+
+
+class LoopLagMonitor:
+    """
+    Measures the lag of the running event loop.
+
+    Args:
+        interval (float, optional): Seconds between samples. Lag shorter
+            than this can be missed between samples.
+        stall_threshold (float, optional): Lag in seconds counted as a
+            stall.
+        window (int, optional): Recent samples the percentiles are computed
+            over.
+        instrumentation (Instrumentation, optional): Receives a
+            ``loop.stall`` event with the lag of every stall.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.05,
+        stall_threshold: float = 0.1,
+        window: int = 1200,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.instrumentation = instrumentation or Instrumentation()
+        self.samples: Deque[float] = collections.deque(maxlen=window)
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.stall_time = 0.0
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def record(self, lag: float) -> None:
+        """
+        Record one lag sample.
+
+        Args:
+            lag (float): Seconds the loop woke up late.
+        """
+        lag = max(0.0, lag)
+        self.samples.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.stall_threshold:
+            self.stalls += 1
+            self.stall_time += lag
+            self.instrumentation.emit("loop.stall", lag=lag)
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.record(loop.time() - started - self.interval)
+
+    async def start(self) -> None:
+        """
+        Start sampling the running loop in the background.
+        """
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._sample())
+
+    async def stop(self) -> None:
+        """
+        Stop sampling.
+        """
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def percentile(self, q: float) -> float:
+        """
+        Return a percentile of the recent lag samples.
+
+        Args:
+            q (float): Percentile, from 0 to 100.
+
+        Returns:
+            float: Lag in seconds, or 0.0 without samples.
+        """
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        rank = max(0, min(len(ordered) - 1, int(round(q / 100.0 * len(ordered))) - 1))
+        return ordered[rank]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the lag percentiles and stalls.
+
+        Returns:
+            Dict[str, Any]: Median, 99th percentile and longest lag, number
+                of stalls and the seconds lost to them, in seconds.
+        """
+        return {
+            "lag_p50": self.percentile(50),
+            "lag_p99": self.percentile(99),
+            "lag_max": self.max_lag,
+            "stalls": self.stalls,
+            "stall_time": self.stall_time,
+            "running": self._task is not None,
+        }
+
+    async def __aenter__(self) -> "LoopLagMonitor":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.stop()
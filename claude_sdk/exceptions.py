@@ -39,6 +39,23 @@ class InvalidRequestError(ClaudeAPIError):
         super().__init__(message, status_code, "invalid_request", **kwargs)
 
 
+class ContextWindowExceededError(InvalidRequestError):
+    """
+    Request rejected locally because its prompt cannot fit the context window.
+    """
+
+    def __init__(
+        self,
+        message="Context window exceeded",
+        status_code=400,
+        estimated_tokens=None,
+        **kwargs,
+    ):
+        super().__init__(message, status_code, **kwargs)
+        self.error_type = "context_window_exceeded"
+        self.estimated_tokens = estimated_tokens
+
+
 class AuthenticationError(ClaudeAPIError):
     """
     Authentication error.
@@ -75,6 +92,103 @@ class ServiceUnavailableError(ClaudeAPIError):
         super().__init__(message, status_code, "service_unavailable", **kwargs)
 
 
+class CircuitOpenError(ServiceUnavailableError):
+    """
+    Request rejected locally because the circuit for its endpoint and model is open.
+    """
+
+    def __init__(
+        self,
+        message="Circuit open",
+        base_url=None,
+        model=None,
+        retry_after=None,
+        **kwargs,
+    ):
+        super().__init__(message, **kwargs)
+        self.error_type = "circuit_open"
+        self.base_url = base_url
+        self.model = model
+        self.retry_after = retry_after
+
+
+class QueueFullError(RateLimitError):
+    """
+    Request rejected locally because its scheduling queue is full.
+    """
+
+    def __init__(self, message="Queue full", status_code=429, **kwargs):
+        super().__init__(message, status_code, **kwargs)
+        self.error_type = "queue_full"
+
+
+class DeadlineExceededError(ClaudeAPIError):
+    """
+    Request shed locally because it could not start before its deadline.
+    """
+
+    def __init__(self, message="Deadline exceeded", status_code=504, **kwargs):
+        super().__init__(message, status_code, "deadline_exceeded", **kwargs)
+
+
+class SlowSubscriberError(ClaudeAPIError):
+    """
+    Subscriber of a shared stream dropped because it fell too far behind.
+    """
+
+    def __init__(self, message="Subscriber too slow", status_code=None, **kwargs):
+        super().__init__(message, status_code, "slow_subscriber", **kwargs)
+
+
+class BudgetExceededError(ClaudeAPIError):
+    """
+    Request rejected locally because a spending budget is exhausted.
+    """
+
+    def __init__(
+        self, message="Budget exceeded", status_code=429, budget=None, **kwargs
+    ):
+        super().__init__(message, status_code, "budget_exceeded", **kwargs)
+        self.budget = budget
+
+
+class IdempotencyConflictError(InvalidRequestError):
+    """
+    Request rejected locally because its idempotency key was used for a
+    different request.
+    """
+
+    def __init__(
+        self,
+        message="Idempotency key reused for a different request",
+        status_code=409,
+        key=None,
+        **kwargs,
+    ):
+        super().__init__(message, status_code, **kwargs)
+        self.error_type = "idempotency_conflict"
+        self.key = key
+
+
+class ToolInputError(ClaudeAPIError):
+    """
+    Tool call rejected locally because the tool is unknown or its input does
+    not match the tool's input schema.
+    """
+
+    def __init__(
+        self,
+        message="Invalid tool input",
+        status_code=None,
+        tool=None,
+        errors=None,
+        **kwargs,
+    ):
+        super().__init__(message, status_code, "tool_input_invalid", **kwargs)
+        self.tool = tool
+        self.errors = errors or []
+
+
 class ModelNotAvailableError(ClaudeAPIError):
     """
     Model not available error.
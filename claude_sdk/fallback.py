@@ -0,0 +1,127 @@
+"""
+Model fallback cascades.
+
+A :class:`FallbackPolicy` lets ``messages_create`` spill over to other models
+when the requested one is overloaded (529), unavailable, behind an open circuit
+or slower than a latency budget, so callers do not have to catch
+:class:`~claude_sdk.exceptions.ServiceUnavailableError` and retry themselves.
+
+Every call is reported as a ``model.served`` event with the requested model,
+the model that served it and the number of attempts, and every spill-over as a
+``model.fallback`` event. The policy also keeps its own counters; see
+:meth:`FallbackPolicy.stats`.
+
+Example:
+    >>> policy = FallbackPolicy(
+    ...     ["claude-3-7-sonnet-20250219", "claude-3-5-haiku-20241022"],
+    ...     latency_budget=10.0,
+    ... )
+    >>> client = Claude(fallback=policy)
+"""
+
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+from .exceptions import CircuitOpenError, ServiceUnavailableError
+from .transport import is_timeout
+
+
+class FallbackPolicy:
+    """
+    Which models to fall back to, and when.
+
+    Args:
+        chain (Union[Sequence[str], Mapping[str, Sequence[str]]]): Either one
+            ordered chain of models, where a request for a model falls back to
+            the models after it, or a mapping from a model to its fallbacks.
+        latency_budget (float, optional): Seconds to wait for a model before
+            trying the next one. For non-streaming requests of the async client
+            this bounds the whole response, for streams the time until the
+            response starts. The sync client enforces it as the transport's read
+            timeout. The last model in a chain is never cut off.
+        statuses (Iterable[int], optional): Status codes of
+            ServiceUnavailableError that trigger a fallback. Open circuits and
+            timeouts always do.
+    """
+
+    def __init__(
+        self,
+        chain: Union[Sequence[str], Mapping[str, Sequence[str]]],
+        latency_budget: Optional[float] = None,
+        statuses: Iterable[int] = (503, 529),
+    ):
+        self.chain = chain
+        self.latency_budget = latency_budget
+        self.statuses = frozenset(statuses)
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._fallbacks = 0
+        self._served: Dict[str, int] = defaultdict(int)
+
+    def models(self, model: str) -> List[str]:
+        """
+        Return the models to try for a request, in order.
+
+        Args:
+            model (str): Requested model.
+
+        Returns:
+            List[str]: The requested model followed by its fallbacks.
+        """
+        if isinstance(self.chain, Mapping):
+            return [model, *self.chain.get(model, ())]
+        chain = list(self.chain)
+        if model in chain:
+            return chain[chain.index(model) :]
+        return [model, *chain]
+
+    def reason(self, error: BaseException) -> Optional[str]:
+        """
+        Return why an error should trigger a fallback, or None if it should not.
+
+        Args:
+            error (BaseException): Error raised by an attempt.
+
+        Returns:
+            str, optional: "circuit_open", "timeout" or "status_<code>".
+        """
+        if isinstance(error, CircuitOpenError):
+            return "circuit_open"
+        if isinstance(error, ServiceUnavailableError):
+            if error.status_code in self.statuses:
+                return f"status_{error.status_code}"
+            return None
+        if is_timeout(error):
+            return "timeout"
+        return None
+
+    def record(self, model: str, attempts: int) -> None:
+        """
+        Count a call served by ``model`` after ``attempts`` attempts.
+
+        Args:
+            model (str): Model that served the call.
+            attempts (int): Number of models tried.
+        """
+        with self._lock:
+            self._calls += 1
+            self._served[model] += 1
+            if attempts > 1:
+                self._fallbacks += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the calls served so far.
+
+        Returns:
+            Dict[str, Any]: Number of calls, how many were served by a fallback
+                model, the fallback rate and the calls served per model.
+        """
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "fallbacks": self._fallbacks,
+                "fallback_rate": self._fallbacks / self._calls if self._calls else 0.0,
+                "served": dict(self._served),
+            }
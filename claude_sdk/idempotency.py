@@ -0,0 +1,463 @@
+"""
+Idempotency keys for message requests.
+
+A client that times out and retries would otherwise run the same generation
+upstream twice. Requests that carry an idempotency key are recorded with
+their result in an :class:`IdempotencyStore`. A duplicate request with the
+same key then attaches to the call still in flight, or gets the stored
+response back without calling the API again. Reusing a key for a different
+request raises :class:`~claude_sdk.exceptions.IdempotencyConflictError`.
+
+Failed calls are not stored, so retrying after an error runs the request
+again. Requests waiting on a failed call get its error. Stored responses
+expire after a TTL, and the store holds at most ``max_entries`` of them.
+
+:class:`IdempotencyStore` keeps responses in memory. A
+:class:`SQLiteIdempotencyStore` can be shared by the worker processes of a
+server: a request in flight in one worker holds its key in the database, and
+duplicates in other workers wait for its response.
+
+Example:
+    >>> client = Claude(idempotency=IdempotencyStore(ttl=3600))
+    >>> client.messages_create(model, messages, idempotency_key=request_id)
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .exceptions import IdempotencyConflictError
+from .instrumentation import Instrumentation
+
+# Outcomes of reserving a key
+_RESERVED = "reserved"
+_DONE = "done"
+_IN_FLIGHT = "in_flight"
+# Held by a call in another process
+_PENDING = "pending"
+
+
+class _Abandoned(Exception):
+    """
+    Set on a flight whose call was cancelled, so that waiters run it again.
+    """
+
+
+def fingerprint(payload: Any) -> str:
+    """
+    Return a digest identifying a request, to detect keys reused for different
+    requests.
+
+    Args:
+        payload (Any): JSON-serializable request.
+
+    Returns:
+        str: Hex digest of the canonical JSON of the request.
+    """
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    In-memory store of the responses of requests with idempotency keys.
+
+    A store can be shared between clients and threads, and between sync and
+    async clients.
+
+    Args:
+        ttl (float, optional): Seconds a response is kept for replaying.
+        max_entries (int, optional): Most responses kept; the oldest are
+            evicted first.
+        pending_timeout (float, optional): Seconds after which a call that
+            holds a key in another process is presumed dead and the key is
+            reclaimed. Only used by stores shared between processes.
+        poll_interval (float, optional): Seconds between checks for the
+            response of a call in another process.
+    """
+
+    # Whether reserving and completing keys blocks on I/O, so that async
+    # calls do it on a worker thread instead of the event loop
+    blocking = False
+
+    def __init__(
+        self,
+        ttl: float = 24 * 3600.0,
+        max_entries: int = 10_000,
+        pending_timeout: float = 600.0,
+        poll_interval: float = 0.05,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.pending_timeout = pending_timeout
+        self.poll_interval = poll_interval
+        self.replayed = 0
+        self._lock = threading.Lock()
+        # Counts replays without waiting for a worker holding the store lock
+        self._replays_lock = threading.Lock()
+        # Calls in flight in this process, with their request fingerprint
+        self._flights: Dict[str, Tuple[str, Future]] = {}
+        # Fingerprint, encoded response and expiry time, oldest first
+        self._entries: "OrderedDict[str, Tuple[str, bytes, float]]" = OrderedDict()
+
+    def _reserve(
+        self, key: str, digest: str, now: float
+    ) -> Tuple[str, Optional[bytes]]:
+        """
+        Look up a stored response, or reserve the key for a new call. Called
+        with the lock held.
+        """
+        entries = self._entries
+        while entries:
+            oldest = next(iter(entries.values()))
+            if oldest[2] > now:
+                break
+            entries.popitem(last=False)
+        entry = entries.get(key)
+        if entry is None:
+            return _RESERVED, None
+        if entry[0] != digest:
+            raise IdempotencyConflictError(key=key)
+        return _DONE, entry[1]
+
+    def _complete(self, key: str, digest: str, data: bytes, now: float) -> None:
+        """
+        Store the response of a reserved key. Called with the lock held.
+        """
+        self._entries[key] = (digest, data, now + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _release(self, key: str) -> None:
+        """
+        Give up a reserved key after a failed call. Called with the lock held.
+        """
+
+    def _count(self) -> int:
+        return len(self._entries)
+
+    def _begin(self, key: str, digest: str) -> Tuple[str, Any]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                if flight[0] != digest:
+                    raise IdempotencyConflictError(key=key)
+                return _IN_FLIGHT, flight[1]
+            state, data = self._reserve(key, digest, time.time())
+            if state != _RESERVED:
+                return state, data
+            future: Future = Future()
+            self._flights[key] = (digest, future)
+            return _RESERVED, future
+
+    def _end(
+        self,
+        key: str,
+        digest: str,
+        future: Future,
+        response: Any = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        data = None
+        if error is None:
+            try:
+                data = json.dumps(response).encode("utf-8")
+            except (TypeError, ValueError) as e:
+                # Not replayable: waiters get the error, the caller its response
+                error = e
+        with self._lock:
+            del self._flights[key]
+            if data is not None:
+                self._complete(key, digest, data, time.time())
+            else:
+                self._release(key)
+        if data is not None:
+            future.set_result(data)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            future.set_exception(_Abandoned())
+
+    async def _abegin(self, key: str, digest: str) -> Tuple[str, Any]:
+        if not self.blocking:
+            return self._begin(key, digest)
+        begin = asyncio.get_running_loop().run_in_executor(
+            None, self._begin, key, digest
+        )
+        try:
+            return await asyncio.shield(begin)
+        except asyncio.CancelledError:
+            # The key may still get reserved; give it back once it is
+            begin.add_done_callback(functools.partial(self._abandon, key, digest))
+            raise
+
+    def _abandon(self, key: str, digest: str, begin: "asyncio.Future[Any]") -> None:
+        if begin.cancelled() or begin.exception() is not None:
+            return
+        state, future = begin.result()
+        if state == _RESERVED:
+            end = functools.partial(
+                self._end, key, digest, future, error=asyncio.CancelledError()
+            )
+            begin.get_loop().run_in_executor(None, end)
+
+    async def _aend(
+        self,
+        key: str,
+        digest: str,
+        future: Future,
+        response: Any = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        end = functools.partial(self._end, key, digest, future, response, error)
+        if not self.blocking:
+            end()
+            return
+        await asyncio.get_running_loop().run_in_executor(None, end)
+
+    def _replayed(
+        self, state: str, data: bytes, instrumentation: Optional[Instrumentation]
+    ) -> Any:
+        with self._replays_lock:
+            self.replayed += 1
+        if instrumentation is not None:
+            source = "in_flight" if state == _IN_FLIGHT else "store"
+            instrumentation.emit("idempotency.replayed", source=source)
+        return json.loads(data)
+
+    def run(
+        self,
+        key: str,
+        payload: Any,
+        call: Callable[[], Any],
+        instrumentation: Optional[Instrumentation] = None,
+    ) -> Any:
+        """
+        Run a call once per idempotency key.
+
+        Args:
+            key (str): Idempotency key of the request.
+            payload (Any): The request, to detect a key reused for another one.
+            call (Callable[[], Any]): Sends the request and returns its
+                JSON-serializable response.
+            instrumentation (Instrumentation, optional): Receives an
+                ``idempotency.replayed`` event for every duplicate answered
+                without calling the API.
+
+        Returns:
+            Any: The response of the call, or of the earlier call with the key.
+        """
+        digest = fingerprint(payload)
+        while True:
+            state, value = self._begin(key, digest)
+            if state == _RESERVED:
+                break
+            if state == _DONE:
+                return self._replayed(state, value, instrumentation)
+            if state == _IN_FLIGHT:
+                try:
+                    data = value.result()
+                except _Abandoned:
+                    continue
+                return self._replayed(state, data, instrumentation)
+            time.sleep(self.poll_interval)
+        try:
+            response = call()
+        except BaseException as e:
+            self._end(key, digest, value, error=e)
+            raise
+        self._end(key, digest, value, response)
+        return response
+
+    async def arun(
+        self,
+        key: str,
+        payload: Any,
+        call: Callable[[], Awaitable[Any]],
+        instrumentation: Optional[Instrumentation] = None,
+    ) -> Any:
+        """
+        Run an async call once per idempotency key. Stores that block on I/O,
+        such as :class:`SQLiteIdempotencyStore`, are accessed on the default
+        executor so that a locked database does not stall the event loop.
+
+        Args:
+            key (str): Idempotency key of the request.
+            payload (Any): The request, to detect a key reused for another one.
+            call (Callable[[], Awaitable[Any]]): Sends the request and returns
+                its JSON-serializable response.
+            instrumentation (Instrumentation, optional): Receives an
+                ``idempotency.replayed`` event for every duplicate answered
+                without calling the API.
+
+        Returns:
+            Any: The response of the call, or of the earlier call with the key.
+        """
+        digest = fingerprint(payload)
+        while True:
+            state, value = await self._abegin(key, digest)
+            if state == _RESERVED:
+                break
+            if state == _DONE:
+                return self._replayed(state, value, instrumentation)
+            if state == _IN_FLIGHT:
+                try:
+                    # A cancelled waiter must not cancel the call it waits for
+                    data = await asyncio.shield(asyncio.wrap_future(value))
+                except _Abandoned:
+                    continue
+                return self._replayed(state, data, instrumentation)
+            await asyncio.sleep(self.poll_interval)
+        try:
+            response = await call()
+        except BaseException as e:
+            await self._aend(key, digest, value, error=e)
+            raise
+        await self._aend(key, digest, value, response)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the number of stored responses, calls in flight and replays.
+
+        Returns:
+            Dict[str, Any]: Entries, in-flight calls of this process and
+                duplicates answered without calling the API.
+        """
+        with self._lock:
+            return {
+                "entries": self._count(),
+                "in_flight": len(self._flights),
+                "replayed": self.replayed,
+            }
+
+    def close(self) -> None:
+        """
+        Release the resources of the store.
+        """
+
+
+class SQLiteIdempotencyStore(IdempotencyStore):
+    """
+    Idempotency store in a SQLite database, shared by the processes that open
+    it, e.g. the workers of a server.
+
+    Args:
+        path (str): Path of the database.
+        table (str, optional): Name of the table, created if it does not exist.
+        ttl (float, optional): Seconds a response is kept for replaying.
+        max_entries (int, optional): Most responses kept; the oldest are
+            evicted first.
+        pending_timeout (float, optional): Seconds after which a call that
+            holds a key in another process is presumed dead and the key is
+            reclaimed.
+        poll_interval (float, optional): Seconds between checks for the
+            response of a call in another process.
+    """
+
+    # Expired and surplus rows are deleted every this many stored responses
+    sweep_every = 64
+    # Writes wait up to the busy timeout for other processes' transactions
+    blocking = True
+
+    def __init__(
+        self,
+        path: str,
+        table: str = "idempotency",
+        ttl: float = 24 * 3600.0,
+        max_entries: int = 10_000,
+        pending_timeout: float = 600.0,
+        poll_interval: float = 0.05,
+    ):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name {table!r}")
+        super().__init__(ttl, max_entries, pending_timeout, poll_interval)
+        self.path = path
+        self.table = table
+        self._stored = 0
+        # Transactions are managed explicitly, to lock the database on reads
+        self._connection = sqlite3.connect(
+            path, timeout=30.0, isolation_level=None, check_same_thread=False
+        )
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                "response BLOB, expires REAL NOT NULL)"
+            )
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_expires ON {table} (expires)"
+            )
+
+    def _reserve(
+        self, key: str, digest: str, now: float
+    ) -> Tuple[str, Optional[bytes]]:
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                f"SELECT fingerprint, response, expires FROM {self.table} "
+                "WHERE key = ?",
+                (key,),
+            ).fetchone()
+            result: Tuple[str, Optional[bytes]] = (_RESERVED, None)
+            if row is not None and row[2] > now:
+                if row[0] != digest:
+                    raise IdempotencyConflictError(key=key)
+                if row[1] is None:
+                    result = (_PENDING, None)
+                else:
+                    result = (_DONE, bytes(row[1]))
+            else:
+                connection.execute(
+                    f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, NULL, ?)",
+                    (key, digest, now + self.pending_timeout),
+                )
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return result
+
+    def _complete(self, key: str, digest: str, data: bytes, now: float) -> None:
+        connection = self._connection
+        connection.execute(
+            f"UPDATE {self.table} SET response = ?, expires = ? "
+            "WHERE key = ? AND fingerprint = ?",
+            (data, now + self.ttl, key, digest),
+        )
+        self._stored += 1
+        if self._stored % self.sweep_every:
+            return
+        connection.execute(f"DELETE FROM {self.table} WHERE expires <= ?", (now,))
+        surplus = self._count() - self.max_entries
+        if surplus > 0:
+            connection.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM "
+                f"{self.table} WHERE response IS NOT NULL ORDER BY expires LIMIT ?)",
+                (surplus,),
+            )
+
+    def _release(self, key: str) -> None:
+        self._connection.execute(
+            f"DELETE FROM {self.table} WHERE key = ? AND response IS NULL", (key,)
+        )
+
+    def _count(self) -> int:
+        (count,) = self._connection.execute(
+            f"SELECT COUNT(*) FROM {self.table} WHERE expires > ?", (time.time(),)
+        ).fetchone()
+        return int(count)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,126 @@
+"""
+Instrumentation hooks for the Claude SDK.
+
+Clients report what they do (compressed request bodies, state changes and so
+on) as named events with a dictionary of fields. Register hooks on an
+:class:`Instrumentation` instance and pass it to the client to receive them;
+:class:`MetricsCollector` is a ready-made hook that aggregates events into
+counters, totals and last-seen values.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+Hook = Callable[[str, Dict[str, Any]], None]
+
+logger = logging.getLogger(__name__)
+
+
+class Instrumentation:
+    """
+    Dispatches SDK events to registered hooks.
+
+    Emitting an event with no hooks registered is a cheap no-op, so clients can
+    emit unconditionally on hot paths.
+
+    Args:
+        hooks (Iterable[Hook], optional): Hooks to register. Each is called with the
+            event name and a dictionary of fields.
+    """
+
+    def __init__(self, hooks: Optional[Iterable[Hook]] = None):
+        self._hooks: List[Hook] = list(hooks or [])
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether any hooks are registered.
+        """
+        return bool(self._hooks)
+
+    def add_hook(self, hook: Hook) -> None:
+        """
+        Register a hook.
+
+        Args:
+            hook (Hook): Callable receiving the event name and fields.
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Hook) -> None:
+        """
+        Unregister a hook.
+
+        Args:
+            hook (Hook): A previously registered hook.
+        """
+        self._hooks.remove(hook)
+
+    def emit(self, event: str, **fields: Any) -> None:
+        """
+        Send an event to every hook. Exceptions raised by hooks are logged and
+        never propagate into the request path.
+
+        Args:
+            event (str): Event name, e.g. "request.compressed".
+            **fields: Event fields.
+        """
+        for hook in self._hooks:
+            try:
+                hook(event, fields)
+            except Exception:
+                logger.exception("Instrumentation hook failed for %s", event)
+
+
+class MetricsCollector:
+    """
+    Hook aggregating events into counters, totals and last-seen values.
+
+    Every event increments ``counters[event]``. Numeric fields are summed into
+    ``totals["event.field"]``, and the latest value of every field is kept in
+    ``last["event.field"]``, which serves as a gauge for state-like events.
+
+    Example:
+        >>> metrics = MetricsCollector()
+        >>> client = Claude(instrumentation=Instrumentation([metrics]))
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.totals: Dict[str, float] = defaultdict(float)
+        self.last: Dict[str, Any] = {}
+
+    def __call__(self, event: str, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            self.counters[event] += 1
+            for name, value in fields.items():
+                key = f"{event}.{name}"
+                self.last[key] = value
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self.totals[key] += value
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return a copy of the collected metrics.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: The counters, totals and last-seen values.
+        """
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "totals": dict(self.totals),
+                "last": dict(self.last),
+            }
+
+    def reset(self) -> None:
+        """
+        Clear all collected metrics.
+        """
+        with self._lock:
+            self.counters.clear()
+            self.totals.clear()
+            self.last.clear()
@@ -0,0 +1,328 @@
+"""
+Load balancing across API keys and endpoints.
+
+A :class:`LoadBalancer` holds a pool of :class:`Target` (API key, base URL)
+pairs, for example several workspaces or regional gateways, and picks one for
+every request. Targets are chosen by least outstanding requests or by the
+remaining rate-limit headroom reported in the ``anthropic-ratelimit-*``
+response headers. Targets that keep failing are ejected for a back-off period
+and reinstated afterwards; targets answering 429 are skipped until their
+``retry-after`` has passed.
+
+Example:
+    >>> balancer = LoadBalancer(
+    ...     [
+    ...         Target("sk-ant-workspace-a", "https://api.anthropic.com"),
+    ...         Target("sk-ant-workspace-b", "https://gateway.eu.example.com"),
+    ...     ],
+    ...     strategy="headroom",
+    ... )
+    >>> client = Claude(load_balancer=balancer)
+"""
+
+import itertools
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .instrumentation import Instrumentation
+from .utils import validate_api_key
+
+STRATEGIES = ("least_outstanding", "headroom")
+
+# Rate-limit categories reported by the API, e.g.
+# anthropic-ratelimit-requests-remaining or anthropic-ratelimit-tokens-limit
+_CATEGORIES = ("requests", "tokens", "input-tokens", "output-tokens")
+
+
+def _parse_reset(value: str, now: float) -> float:
+    """
+    Convert a rate-limit reset header to a monotonic time.
+
+    The API sends RFC 3339 timestamps; plain numbers are read as seconds from
+    now, which is what the stub server sends.
+    """
+    try:
+        return now + float(value)
+    except ValueError:
+        pass
+    try:
+        reset = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return now
+    return now + max(0.0, reset.timestamp() - time.time())
+
+
+class Target:
+    """
+    An API key and base URL that requests can be routed to.
+
+    Args:
+        api_key (str): Anthropic API key.
+        base_url (str, optional): Base URL for the Anthropic API.
+    """
+
+    def __init__(self, api_key: str, base_url: str = "https://api.anthropic.com"):
+        self.api_key = validate_api_key(api_key)
+        self.base_url = base_url
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.throttled_until = 0.0
+        # category -> (limit, remaining, monotonic reset time)
+        self.limits: Dict[str, Tuple[int, int, float]] = {}
+
+    @property
+    def name(self) -> str:
+        """
+        Identifier safe for logs and metrics: the base URL and the key's last
+        four characters.
+        """
+        return f"{self.base_url}#{self.api_key[-4:]}"
+
+    def headroom(self, now: Optional[float] = None) -> float:
+        """
+        Fraction of the tightest rate limit still available, counting requests
+        in flight. Limits that have not been reported count as fully available.
+
+        Args:
+            now (float, optional): Monotonic time. Defaults to the current time.
+
+        Returns:
+            float: Headroom between 0.0 and 1.0.
+        """
+        now = time.monotonic() if now is None else now
+        headroom = 1.0
+        for category, (limit, remaining, reset_at) in self.limits.items():
+            if now >= reset_at or limit <= 0:
+                continue
+            if category == "requests":
+                remaining -= self.outstanding
+            headroom = min(headroom, max(0, remaining) / limit)
+        return headroom
+
+    def __repr__(self) -> str:
+        return f"Target({self.name!r}, outstanding={self.outstanding})"
+
+
+class Lease:
+    """
+    A request routed to a target, returned by :meth:`LoadBalancer.acquire`.
+
+    Record the response with :meth:`record` and call :meth:`release` once the
+    response, including any stream, has been consumed. Releasing twice is a
+    no-op.
+    """
+
+    def __init__(
+        self,
+        balancer: "LoadBalancer",
+        target: Target,
+        instrumentation: Optional[Instrumentation],
+    ):
+        self.balancer = balancer
+        self.target = target
+        self._instrumentation = instrumentation
+        self._released = False
+
+    def record(self, status_code: Optional[int], headers: Any = None) -> None:
+        """
+        Record the response status and rate-limit headers.
+
+        Args:
+            status_code (int, optional): HTTP status, or None if the transport
+                failed.
+            headers (Mapping, optional): Response headers.
+        """
+        self.balancer._record(self.target, status_code, headers, self._instrumentation)
+
+    def release(self) -> None:
+        """
+        Mark the request as no longer outstanding.
+        """
+        if not self._released:
+            self._released = True
+            self.balancer._release(self.target)
+
+
+class LoadBalancer:
+    """
+    Routes requests across a pool of targets.
+
+    Args:
+        targets (Sequence[Target]): Targets to balance across.
+        strategy (str, optional): "least_outstanding" picks the target with the
+            fewest requests in flight; "headroom" picks the one with the most
+            remaining rate-limit headroom.
+        max_failures (int, optional): Consecutive failures (transport errors,
+            401, 403 and 5xx responses) after which a target is ejected.
+        ejection_time (float, optional): Seconds a target is ejected for the
+            first time. Doubles with every further ejection in a row.
+        max_ejection_time (float, optional): Upper bound of the ejection time.
+        default_retry_after (float, optional): Seconds a target answering 429
+            without a retry-after header is skipped.
+    """
+
+    def __init__(
+        self,
+        targets: Sequence[Target],
+        strategy: str = "least_outstanding",
+        max_failures: int = 3,
+        ejection_time: float = 10.0,
+        max_ejection_time: float = 300.0,
+        default_retry_after: float = 1.0,
+    ):
+        if not targets:
+            raise ValueError("At least one target is required")
+        if strategy not in STRATEGIES:
+            raise ValueError(
+                f"Unknown strategy {strategy!r}, expected one of {STRATEGIES}"
+            )
+        self.targets: List[Target] = list(targets)
+        self.strategy = strategy
+        self.max_failures = max(1, max_failures)
+        self.ejection_time = ejection_time
+        self.max_ejection_time = max_ejection_time
+        self.default_retry_after = default_retry_after
+        self._lock = threading.Lock()
+        self._rotation = itertools.count()
+
+    def acquire(self, instrumentation: Optional[Instrumentation] = None) -> Lease:
+        """
+        Pick a target for a request.
+
+        Ejected and throttled targets are skipped. If every target is ejected or
+        throttled, the one that becomes available first is used rather than
+        failing the request.
+
+        Args:
+            instrumentation (Instrumentation, optional): Receives ejection and
+                reinstatement events.
+
+        Returns:
+            Lease: The chosen target, to be recorded and released.
+        """
+        reinstated: List[Target] = []
+        with self._lock:
+            now = time.monotonic()
+            for target in self.targets:
+                if target.ejected_until and now >= target.ejected_until:
+                    target.ejected_until = 0.0
+                    # One more failure ejects it again, for longer
+                    target.consecutive_failures = self.max_failures - 1
+                    reinstated.append(target)
+
+            available = [
+                t
+                for t in self.targets
+                if not t.ejected_until and now >= t.throttled_until
+            ]
+            if available:
+                # Rotate so that ties are broken round-robin
+                offset = next(self._rotation) % len(available)
+                available = available[offset:] + available[:offset]
+                if self.strategy == "headroom":
+                    target = max(
+                        available, key=lambda t: (t.headroom(now), -t.outstanding)
+                    )
+                else:
+                    target = min(available, key=lambda t: t.outstanding)
+            else:
+                target = min(
+                    self.targets, key=lambda t: max(t.ejected_until, t.throttled_until)
+                )
+            target.outstanding += 1
+            target.requests += 1
+
+        if instrumentation is not None:
+            for t in reinstated:
+                instrumentation.emit("balancer.reinstated", target=t.name)
+        return Lease(self, target, instrumentation)
+
+    def _record(
+        self,
+        target: Target,
+        status_code: Optional[int],
+        headers: Any,
+        instrumentation: Optional[Instrumentation],
+    ) -> None:
+        ejected = 0.0
+        with self._lock:
+            now = time.monotonic()
+            if headers is not None:
+                self._update_limits(target, headers, now)
+            if status_code == 429:
+                retry_after = headers.get("retry-after") if headers else None
+                try:
+                    delay = float(retry_after or self.default_retry_after)
+                except ValueError:
+                    delay = self.default_retry_after
+                target.throttled_until = now + delay
+
+            if status_code is None or status_code in (401, 403) or status_code >= 500:
+                target.failures += 1
+                target.consecutive_failures += 1
+                if (
+                    target.consecutive_failures >= self.max_failures
+                    and not target.ejected_until
+                ):
+                    ejected = min(
+                        self.ejection_time * 2**target.ejections,
+                        self.max_ejection_time,
+                    )
+                    target.ejections += 1
+                    target.ejected_until = now + ejected
+            else:
+                target.consecutive_failures = 0
+                if status_code < 400:
+                    target.ejections = 0
+
+        if ejected and instrumentation is not None:
+            instrumentation.emit(
+                "balancer.ejected", target=target.name, duration=ejected
+            )
+
+    @staticmethod
+    def _update_limits(target: Target, headers: Any, now: float) -> None:
+        for category in _CATEGORIES:
+            prefix = f"anthropic-ratelimit-{category}-"
+            limit = headers.get(prefix + "limit")
+            remaining = headers.get(prefix + "remaining")
+            if limit is None or remaining is None:
+                continue
+            reset = headers.get(prefix + "reset")
+            reset_at = _parse_reset(reset, now) if reset else now + 60.0
+            try:
+                target.limits[category] = (int(limit), int(remaining), reset_at)
+            except ValueError:
+                continue
+
+    def _release(self, target: Target) -> None:
+        with self._lock:
+            target.outstanding -= 1
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Return the routing state of every target.
+
+        Returns:
+            List[Dict[str, Any]]: Name, outstanding and total requests, failures,
+                headroom and whether the target is ejected, per target.
+        """
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "target": t.name,
+                    "outstanding": t.outstanding,
+                    "requests": t.requests,
+                    "failures": t.failures,
+                    "headroom": t.headroom(now),
+                    "ejected": bool(t.ejected_until),
+                }
+                for t in self.targets
+            ]
@@ -0,0 +1,526 @@
+"""
+Near-duplicate prompt caching.
+
+Prompts that differ only in whitespace, timestamps, UUIDs or a few words miss
+an exact-match cache. A :class:`PromptCache` normalizes the messages of a
+request, computes a 64-bit SimHash of their word shingles and returns the
+cached response of the closest earlier request within a Hamming distance set
+by ``threshold``. All other request parameters (model, system prompt,
+max_tokens, temperature, tools, ...) must match exactly, and so must the
+numbers in the prompt: "What is 17 * 23?" never gets the answer cached for
+"What is 99 * 4?". The clients only use the cache for requests with
+``temperature=0``.
+
+Signatures are indexed by splitting them into ``max_distance + 1`` bands: by
+the pigeonhole principle, a signature within the distance shares at least one
+band exactly with the query, so only those candidates are scored. With NumPy
+installed (``pip install 'claude-sdk[cache]'``) the bands are kept as sorted
+arrays and candidates are scored in one vectorized pass, keeping lookups below
+a millisecond at a million entries; without it, dictionaries of buckets are
+used. Entries are evicted least recently used first and after an optional TTL,
+and the cache can be saved to and loaded from a JSON-lines file.
+
+Example:
+    >>> cache = PromptCache(threshold=0.9, max_entries=100_000)
+    >>> client = Claude(cache=cache)
+    >>> client.messages_create(model, messages, temperature=0)
+"""
+
+import copy
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Volatile substrings replaced by placeholders before hashing
+_VOLATILE = [
+    (
+        re.compile(
+            r"\d{4}-\d{2}-\d{2}[t ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(z|[+-]\d{2}:?\d{2})?"
+        ),
+        " <ts> ",
+    ),
+    (re.compile(r"\d{4}-\d{2}-\d{2}"), " <date> "),
+    (re.compile(r"[0-9a-f]{8}(-[0-9a-f]{4}){3}-[0-9a-f]{12}"), " <uuid> "),
+]
+_TOKEN = re.compile(r"<\w+>|\w+|[^\w\s]")
+_DIGIT = re.compile(r"\d")
+
+
+@functools.lru_cache(maxsize=None)
+def _import_numpy() -> Any:
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def normalize_prompt(text: str) -> List[str]:
+    """
+    Normalize a prompt into tokens: lowercase, with timestamps, ISO dates and
+    UUIDs replaced by placeholders.
+
+    Args:
+        text (str): Prompt text.
+
+    Returns:
+        List[str]: Tokens of the normalized prompt.
+    """
+    text = text.lower()
+    for pattern, placeholder in _VOLATILE:
+        text = pattern.sub(placeholder, text)
+    return _TOKEN.findall(text)
+
+
+def _prompt_text(payload: Dict[str, Any]) -> str:
+    parts = []
+    for message in payload.get("messages") or []:
+        parts.append(
+            f"<{message.get('role')}> " + _content_text(message.get("content"))
+        )
+    return "\n".join(parts)
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    parts = []
+    for block in content or []:
+        if block.get("type") == "text":
+            parts.append(block.get("text", ""))
+        else:
+            # Non-text blocks, e.g. images, must match exactly
+            encoded = json.dumps(block, sort_keys=True, default=str).encode("utf-8")
+            digest = hashlib.sha256(encoded).hexdigest()[:16]
+            parts.append(f"<{block.get('type')} {digest}>")
+    return " ".join(parts)
+
+
+def _feature_hashes(tokens: List[str], shingle_size: int) -> List[int]:
+    if len(tokens) < shingle_size:
+        shingles = [" ".join(tokens)]
+    else:
+        shingles = [
+            " ".join(tokens[i : i + shingle_size])
+            for i in range(len(tokens) - shingle_size + 1)
+        ]
+    return [
+        int.from_bytes(
+            hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little"
+        )
+        for s in shingles
+    ]
+
+
+def simhash(tokens: List[str], shingle_size: int = 3) -> int:
+    """
+    Compute the 64-bit SimHash of word shingles of a token list.
+
+    Args:
+        tokens (List[str]): Tokens, e.g. from :func:`normalize_prompt`.
+        shingle_size (int, optional): Tokens per shingle.
+
+    Returns:
+        int: The signature.
+    """
+    return _signature(_feature_hashes(tokens, shingle_size), _import_numpy())
+
+
+def _signature(hashes: List[int], np: Any) -> int:
+    if np is not None:
+        bits = np.unpackbits(
+            np.array(hashes, dtype="<u8").view(np.uint8).reshape(-1, 8),
+            axis=1,
+            bitorder="little",
+        )
+        ones = bits.sum(axis=0, dtype=np.int64)
+        weights = np.packbits(ones * 2 > len(hashes), bitorder="little")
+        return int.from_bytes(weights.tobytes(), "little")
+    signature = 0
+    threshold = len(hashes) / 2
+    for bit in range(64):
+        if sum((h >> bit) & 1 for h in hashes) > threshold:
+            signature |= 1 << bit
+    return signature
+
+
+def _popcount(value: int) -> int:
+    return bin(value).count("1")
+
+
+def _bands(max_distance: int) -> List[Tuple[int, int]]:
+    count = max_distance + 1
+    bands = []
+    start = 0
+    for i in range(count):
+        width = 64 // count + (1 if i < 64 % count else 0)
+        bands.append((start, (1 << width) - 1))
+        start += width
+    return bands
+
+
+class _Entry:
+    __slots__ = ("scope", "signature", "response", "created", "slot")
+
+    def __init__(
+        self, scope: str, signature: int, response: Dict[str, Any], created: float
+    ):
+        self.scope = scope
+        self.signature = signature
+        self.response = response
+        self.created = created
+        self.slot = -1
+
+
+class _BucketIndex:
+    """
+    Index of signatures in dictionaries of buckets, one per band.
+    """
+
+    def __init__(self, bands: List[Tuple[int, int]]):
+        self.bands = bands
+        self.buckets: Dict[Tuple[int, int], Set[_Entry]] = defaultdict(set)
+        self.size = 0
+
+    def _keys(self, signature: int) -> Iterable[Tuple[int, int]]:
+        for i, (shift, mask) in enumerate(self.bands):
+            yield i, (signature >> shift) & mask
+
+    def add(self, entry: _Entry) -> None:
+        for key in self._keys(entry.signature):
+            self.buckets[key].add(entry)
+        self.size += 1
+
+    def discard(self, entry: _Entry) -> None:
+        found = False
+        for key in self._keys(entry.signature):
+            bucket = self.buckets.get(key)
+            if bucket is not None and entry in bucket:
+                found = True
+                bucket.discard(entry)
+                if not bucket:
+                    del self.buckets[key]
+        if found:
+            self.size -= 1
+
+    def search(self, signature: int, max_distance: int) -> Optional[Tuple[int, _Entry]]:
+        best: Optional[Tuple[int, _Entry]] = None
+        for key in self._keys(signature):
+            for entry in self.buckets.get(key, ()):
+                distance = _popcount(entry.signature ^ signature)
+                if distance <= max_distance and (best is None or distance < best[0]):
+                    best = (distance, entry)
+        return best
+
+
+class _ArrayIndex:
+    """
+    Index of signatures in NumPy arrays.
+
+    Signatures are appended to one array. Per band, a sorted copy of the band
+    values and their slots is rebuilt once enough signatures have been
+    appended since the last rebuild; those recent signatures are scanned
+    directly. Removed entries are skipped and compacted away on rebuilds.
+    The signature array starts small and doubles as it fills, since most
+    scopes hold only a few entries.
+    """
+
+    TAIL = 16384
+    INITIAL = 16
+
+    def __init__(self, bands: List[Tuple[int, int]], np: Any):
+        self.np = np
+        self.bands = bands
+        self.signatures = np.zeros(self.INITIAL, dtype=np.uint64)
+        self.entries: List[Optional[_Entry]] = []
+        self.indexed = 0
+        self.removed = 0
+        self.sorted_values: List[Any] = []
+        self.sorted_slots: List[Any] = []
+        if hasattr(np, "bitwise_count"):
+            self._popcount = np.bitwise_count
+        else:
+            table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+            self._popcount = (
+                lambda x: table[x.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+            )
+
+    def add(self, entry: _Entry) -> None:
+        slot = len(self.entries)
+        if slot == len(self.signatures):
+            grown = self.np.zeros(slot * 2, dtype=self.np.uint64)
+            grown[:slot] = self.signatures
+            self.signatures = grown
+        self.signatures[slot] = entry.signature
+        self.entries.append(entry)
+        entry.slot = slot
+        if slot + 1 - self.indexed >= self.TAIL:
+            self._rebuild()
+
+    def discard(self, entry: _Entry) -> None:
+        if entry.slot >= 0 and self.entries[entry.slot] is entry:
+            self.entries[entry.slot] = None
+            self.removed += 1
+
+    @property
+    def size(self) -> int:
+        return len(self.entries) - self.removed
+
+    def _rebuild(self) -> None:
+        np = self.np
+        start = self.indexed
+        if self.removed * 4 > len(self.entries):
+            kept = np.array([e is not None for e in self.entries], dtype=bool)
+            live = self.signatures[: len(self.entries)][kept]
+            self.entries = [e for e in self.entries if e is not None]
+            for slot, entry in enumerate(self.entries):
+                if entry is not None:
+                    entry.slot = slot
+            self.signatures = np.zeros(
+                max(self.INITIAL, len(live) * 2), dtype=np.uint64
+            )
+            self.signatures[: len(live)] = live
+            self.removed = 0
+            self.sorted_values, self.sorted_slots = [], []
+            start = 0
+
+        count = len(self.entries)
+        tail = self.signatures[start:count]
+        for band, (shift, mask) in enumerate(self.bands):
+            values = (tail >> np.uint64(shift)) & np.uint64(mask)
+            order = np.argsort(values, kind="stable")
+            values, slots = values[order], order + start
+            if start:
+                # Merge the sorted tail in, in linear time instead of resorting
+                at = np.searchsorted(self.sorted_values[band], values, side="right")
+                values = np.insert(self.sorted_values[band], at, values)
+                slots = np.insert(self.sorted_slots[band], at, slots)
+                self.sorted_values[band], self.sorted_slots[band] = values, slots
+            else:
+                self.sorted_values.append(values)
+                self.sorted_slots.append(slots)
+        self.indexed = count
+
+    def search(self, signature: int, max_distance: int) -> Optional[Tuple[int, _Entry]]:
+        np = self.np
+        query = np.uint64(signature)
+        candidates = [np.arange(self.indexed, len(self.entries))]
+        for (shift, mask), values, slots in zip(
+            self.bands, self.sorted_values, self.sorted_slots
+        ):
+            value = np.uint64((signature >> shift) & mask)
+            lo = np.searchsorted(values, value, side="left")
+            hi = np.searchsorted(values, value, side="right")
+            candidates.append(slots[lo:hi])
+        slots = np.concatenate(candidates)
+        if not len(slots):
+            return None
+        distances = self._popcount(self.signatures[slots] ^ query)
+        for i in np.argsort(distances, kind="stable"):
+            distance = int(distances[i])
+            if distance > max_distance:
+                break
+            entry = self.entries[int(slots[i])]
+            if entry is not None:
+                return distance, entry
+        return None
+
+
+class PromptCache:
+    """
+    Cache of responses keyed by near-duplicate prompts.
+
+    Cache hits and misses are emitted as ``cache.hit`` events, with the
+    ``similarity`` of the matched prompt, and ``cache.miss`` events by the
+    clients using the cache. The cache is thread-safe.
+
+    Args:
+        threshold (float, optional): Minimum similarity, the fraction of equal
+            signature bits, of a cached prompt to count as a hit. 1.0 matches
+            only prompts that are equal after normalization. Lower thresholds
+            catch larger edits but index signatures in narrower bands, which
+            makes lookups slower.
+        max_entries (int, optional): Entries kept; the least recently used are
+            evicted first.
+        ttl (float, optional): Seconds after which entries expire.
+        shingle_size (int, optional): Words per shingle of the SimHash.
+        use_numpy (bool, optional): Whether to use NumPy arrays. Defaults to
+            using NumPy if it is installed.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        max_entries: int = 100_000,
+        ttl: Optional[float] = None,
+        shingle_size: int = 3,
+        use_numpy: Optional[bool] = None,
+    ):
+        if not 0.5 <= threshold <= 1.0:
+            raise ValueError("threshold must be between 0.5 and 1.0")
+        self.threshold = threshold
+        self.max_distance = int((1.0 - threshold) * 64 + 1e-9)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shingle_size = shingle_size
+        self._np = _import_numpy() if use_numpy is not False else None
+        if use_numpy and self._np is None:
+            raise ImportError(
+                "Vectorized prompt caching requires the 'numpy' package. "
+                "Install it with: pip install 'claude-sdk[cache]'"
+            )
+        self._bands = _bands(self.max_distance)
+        self._indexes: Dict[str, Any] = {}
+        self._entries: "OrderedDict[_Entry, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _key(self, payload: Dict[str, Any]) -> Tuple[str, int]:
+        params = {k: v for k, v in payload.items() if k not in ("messages", "stream")}
+        tokens = normalize_prompt(_prompt_text(payload))
+        # Prompts that differ in a number are different questions
+        numbers = [token for token in tokens if _DIGIT.search(token)]
+        encoded = json.dumps([params, numbers], sort_keys=True, default=str)
+        scope = hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+        hashes = _feature_hashes(tokens, self.shingle_size)
+        return scope, _signature(hashes, self._np)
+
+    def _index(self, scope: str) -> Any:
+        index = self._indexes.get(scope)
+        if index is None:
+            if self._np is not None:
+                index = _ArrayIndex(self._bands, self._np)
+            else:
+                index = _BucketIndex(self._bands)
+            self._indexes[scope] = index
+        return index
+
+    def _remove(self, entry: _Entry) -> None:
+        del self._entries[entry]
+        index = self._indexes[entry.scope]
+        index.discard(entry)
+        if not index.size:
+            # Every set of numbers has its own scope; drop the empty ones
+            del self._indexes[entry.scope]
+
+    def lookup(self, payload: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Find the cached response of a near-duplicate request.
+
+        Args:
+            payload (Dict[str, Any]): Request payload of ``/v1/messages``.
+
+        Returns:
+            Optional[Tuple[Dict[str, Any], float]]: A copy of the cached
+                response and the similarity of its prompt, or None.
+        """
+        scope, signature = self._key(payload)
+        with self._lock:
+            index = self._indexes.get(scope)
+            found = index.search(signature, self.max_distance) if index else None
+            if found is not None and self.ttl is not None:
+                if time.time() - found[1].created > self.ttl:
+                    self._remove(found[1])
+                    found = None
+            if found is None:
+                self.misses += 1
+                return None
+            distance, entry = found
+            self._entries.move_to_end(entry)
+            self.hits += 1
+            response = entry.response
+        return copy.deepcopy(response), 1.0 - distance / 64
+
+    def store(self, payload: Dict[str, Any], response: Dict[str, Any]) -> None:
+        """
+        Cache the response of a request.
+
+        Args:
+            payload (Dict[str, Any]): Request payload of ``/v1/messages``.
+            response (Dict[str, Any]): Response to return for near-duplicates.
+        """
+        scope, signature = self._key(payload)
+        self._add(_Entry(scope, signature, copy.deepcopy(response), time.time()))
+
+    def _add(self, entry: _Entry) -> None:
+        with self._lock:
+            self._index(entry.scope).add(entry)
+            self._entries[entry] = None
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the size and hit rate of the cache.
+
+        Returns:
+            Dict[str, Any]: Entries, hits, misses and hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def save(self, path: str) -> None:
+        """
+        Write the cache to a JSON-lines file, least recently used first.
+
+        Args:
+            path (str): File to write. Replaced atomically.
+        """
+        with self._lock:
+            entries = list(self._entries)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entry in entries:
+                record = {
+                    "scope": entry.scope,
+                    "signature": entry.signature,
+                    "created": entry.created,
+                    "response": entry.response,
+                }
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp, path)
+
+    def load(self, path: str) -> int:
+        """
+        Add the entries of a file written by :meth:`save`. Expired entries are
+        skipped.
+
+        Args:
+            path (str): File to read.
+
+        Returns:
+            int: Number of entries added.
+        """
+        now = time.time()
+        added = 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if self.ttl is not None and now - record["created"] > self.ttl:
+                    continue
+                self._add(
+                    _Entry(
+                        record["scope"],
+                        record["signature"],
+                        record["response"],
+                        record["created"],
+                    )
+                )
+                added += 1
+        return added
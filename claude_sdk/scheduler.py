@@ -0,0 +1,322 @@
+"""
+Priority and fair-share scheduling of requests.
+
+A :class:`FairScheduler` admits a bounded number of requests at a time and
+queues the rest. Queued requests are served strictly by priority class, so
+interactive traffic always goes ahead of batch traffic, and within a class by
+weighted fair queuing across tenants, so a tenant sending a burst of requests
+cannot starve the others. Queues are bounded, and requests that cannot start
+before their deadline are shed instead of being sent late.
+
+Example:
+    >>> scheduler = FairScheduler(concurrency=32, weights={"dashboard": 4})
+    >>> async with scheduler.slot(tenant="dashboard", priority="interactive"):
+    ...     response = await client.messages_create(...)
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .exceptions import DeadlineExceededError, QueueFullError
+from .instrumentation import Instrumentation
+
+
+@dataclass
+class PriorityClass:
+    """
+    A priority class of requests.
+
+    Attributes:
+        rank: Classes with a lower rank are always served first.
+        max_queue: Requests of this class that may wait at the same time.
+        max_wait: Default deadline, in seconds, for requests of this class to
+            start. None means they may wait indefinitely.
+    """
+
+    rank: int
+    max_queue: int = 1000
+    max_wait: Optional[float] = None
+
+
+DEFAULT_CLASSES = {
+    "interactive": PriorityClass(rank=0, max_queue=1000, max_wait=10.0),
+    "default": PriorityClass(rank=1, max_queue=1000, max_wait=60.0),
+    "batch": PriorityClass(rank=2, max_queue=10000, max_wait=None),
+}
+
+
+class _Entry:
+    __slots__ = ("future", "tenant", "priority", "deadline", "enqueued", "active")
+
+    def __init__(
+        self,
+        future: "asyncio.Future[None]",
+        tenant: str,
+        priority: str,
+        deadline: Optional[float],
+    ):
+        self.future = future
+        self.tenant = tenant
+        self.priority = priority
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.active = True
+
+
+class _Queue:
+    """
+    Weighted fair queue of one priority class.
+
+    Every request gets a virtual finish time: the later of the class's virtual
+    time and the tenant's previous finish time, plus cost / weight. Serving
+    requests in order of finish time gives every tenant with waiting requests a
+    share of the class proportional to its weight.
+    """
+
+    def __init__(self, name: str, config: PriorityClass):
+        self.name = name
+        self.config = config
+        self.heap: List[Tuple[float, int, _Entry]] = []
+        self.size = 0
+        self.virtual_time = 0.0
+        self.finish: Dict[str, float] = {}
+
+    def push(self, entry: _Entry, cost: float, weight: float, seq: int) -> None:
+        start = max(self.virtual_time, self.finish.get(entry.tenant, 0.0))
+        finish = start + cost / weight
+        self.finish[entry.tenant] = finish
+        heapq.heappush(self.heap, (finish, seq, entry))
+        self.size += 1
+
+    def pop(self) -> Optional[_Entry]:
+        while self.heap:
+            finish, _, entry = heapq.heappop(self.heap)
+            if entry.active:
+                self.virtual_time = finish
+                self.size -= 1
+                if not self.size:
+                    # Idle tenants must not bank credit for later bursts
+                    self.finish.clear()
+                return entry
+        return None
+
+
+class FairScheduler:
+    """
+    Schedules requests by priority class and weighted fair share per tenant.
+
+    Args:
+        concurrency (Union[int, Callable[[], int]], optional): Requests allowed
+            to run at once, or a callable returning the current allowance, e.g.
+            the limit of an :class:`~claude_sdk.concurrency.AdaptiveLimiter`.
+            Queued requests start when it grows once :meth:`dispatch` is
+            called, a request is released or another one is queued.
+        classes (Mapping[str, PriorityClass], optional): Priority classes by
+            name. Defaults to "interactive", "default" and "batch".
+        weights (Mapping[str, float], optional): Weights of tenants. Tenants not
+            listed have a weight of 1.
+        instrumentation (Instrumentation, optional): Receives
+            ``scheduler.dispatched`` events with the time spent queued and
+            ``scheduler.shed`` events for rejected requests.
+    """
+
+    def __init__(
+        self,
+        concurrency: Union[int, Callable[[], int]] = 64,
+        classes: Optional[Mapping[str, PriorityClass]] = None,
+        weights: Optional[Mapping[str, float]] = None,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        self._concurrency = concurrency
+        self.classes: Dict[str, PriorityClass] = dict(classes or DEFAULT_CLASSES)
+        self._queues = {
+            name: _Queue(name, config) for name, config in self.classes.items()
+        }
+        self._order = sorted(self._queues.values(), key=lambda q: q.config.rank)
+        self.weights: Dict[str, float] = dict(weights or {})
+        self.instrumentation = instrumentation or Instrumentation()
+        self._in_flight = 0
+        self._seq = itertools.count()
+
+    @property
+    def concurrency(self) -> int:
+        """
+        Requests currently allowed to run at once.
+        """
+        if callable(self._concurrency):
+            return max(1, self._concurrency())
+        return self._concurrency
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Requests currently running.
+        """
+        return self._in_flight
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the current load of the scheduler.
+
+        Returns:
+            Dict[str, Any]: Requests in flight, the concurrency and the number
+                of queued requests per priority class.
+        """
+        return {
+            "in_flight": self._in_flight,
+            "concurrency": self.concurrency,
+            "queued": {queue.name: queue.size for queue in self._order},
+        }
+
+    def _shed(self, reason: str, tenant: str, priority: str) -> None:
+        self.instrumentation.emit(
+            "scheduler.shed", reason=reason, tenant=tenant, priority=priority
+        )
+
+    async def acquire(
+        self,
+        tenant: str = "default",
+        priority: str = "default",
+        timeout: Optional[float] = None,
+        cost: float = 1.0,
+    ) -> None:
+        """
+        Wait for a slot. Every successful call must be paired with
+        :meth:`release`; prefer :meth:`slot`.
+
+        Args:
+            tenant (str, optional): Tenant the request belongs to.
+            priority (str, optional): Name of the priority class.
+            timeout (float, optional): Seconds the request may wait to start.
+                Defaults to the class's max_wait.
+            cost (float, optional): Relative cost of the request in fair-share
+                accounting.
+
+        Raises:
+            ValueError: If the priority class is unknown.
+            QueueFullError: If the class's queue is full.
+            DeadlineExceededError: If the request could not start in time.
+        """
+        queue = self._queues.get(priority)
+        if queue is None:
+            raise ValueError(
+                f"Unknown priority class {priority!r}, "
+                f"expected one of {tuple(self._queues)}"
+            )
+        if timeout is None:
+            timeout = queue.config.max_wait
+
+        # Run immediately if nothing of the same or a higher class is waiting
+        if self._in_flight < self.concurrency and not any(
+            q.size for q in self._order if q.config.rank <= queue.config.rank
+        ):
+            self._in_flight += 1
+            self.instrumentation.emit(
+                "scheduler.dispatched", tenant=tenant, priority=priority, wait=0.0
+            )
+            return
+
+        if timeout is not None and timeout <= 0:
+            self._shed("deadline", tenant, priority)
+            raise DeadlineExceededError("Request deadline passed before it was queued")
+        if queue.size >= queue.config.max_queue:
+            self._shed("queue_full", tenant, priority)
+            raise QueueFullError(f"The {priority} queue is full")
+
+        future = asyncio.get_running_loop().create_future()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        entry = _Entry(future, tenant, priority, deadline)
+        queue.push(entry, cost, self.weights.get(tenant, 1.0), next(self._seq))
+        # A callable limit may have grown since the last release
+        self.dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Dispatched at the same moment; give the slot back
+                self.release()
+            elif entry.active:
+                entry.active = False
+                queue.size -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                self._shed("deadline", tenant, priority)
+                raise DeadlineExceededError(
+                    f"Request could not start within {timeout:g}s"
+                ) from None
+            raise
+        self.instrumentation.emit(
+            "scheduler.dispatched",
+            tenant=tenant,
+            priority=priority,
+            wait=time.monotonic() - entry.enqueued,
+        )
+
+    def release(self) -> None:
+        """
+        Free the slot of a finished request and start queued ones.
+        """
+        self._in_flight -= 1
+        self.dispatch()
+
+    def dispatch(self) -> None:
+        """
+        Start queued requests while the concurrency allows. Call it when a
+        callable concurrency grows, e.g. from
+        :meth:`~claude_sdk.concurrency.AdaptiveLimiter.add_limit_callback`, so
+        queued requests need not wait for a release or a new request.
+        """
+        now = time.monotonic()
+        while self._in_flight < self.concurrency:
+            for queue in self._order:
+                entry = queue.pop()
+                while entry is not None and entry.deadline is not None:
+                    if entry.deadline > now:
+                        break
+                    # Expired while queued; its own timeout sheds it
+                    entry.active = False
+                    entry = queue.pop()
+                if entry is not None:
+                    entry.active = False
+                    self._in_flight += 1
+                    entry.future.set_result(None)
+                    break
+            else:
+                return
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        tenant: str = "default",
+        priority: str = "default",
+        timeout: Optional[float] = None,
+        cost: float = 1.0,
+    ) -> AsyncIterator[None]:
+        """
+        Hold a slot for the duration of an ``async with`` block.
+
+        Args:
+            tenant (str, optional): Tenant the request belongs to.
+            priority (str, optional): Name of the priority class.
+            timeout (float, optional): Seconds the request may wait to start.
+            cost (float, optional): Relative cost of the request.
+        """
+        await self.acquire(tenant, priority, timeout, cost)
+        try:
+            yield
+        finally:
+            self.release()
@@ -0,0 +1,261 @@
+"""
+Server-side state of interactive chat sessions.
+
+A client that calls ``/messages`` over HTTP uploads the whole conversation on
+every turn, so request sizes grow with the conversation. A
+:class:`ChatSession` keeps the conversation and its request options on the
+server instead. A client sends only each new user turn and gets the streamed
+events of the answer back. A turn is added to the history only when its
+answer completes, so a failed or cancelled turn can simply be sent again.
+
+A :class:`SessionStore` holds sessions by ID. Sessions idle for longer than
+the TTL expire, and the least recently used ones are evicted when the store
+is full. Both happen lazily when sessions are created or looked up, so the
+store needs no background task.
+
+Example:
+    >>> sessions = SessionStore(max_sessions=1000, ttl=1800)
+    >>> session = sessions.create(model="claude-3-7-sonnet-20250219")
+    >>> async for data in session.turn(client, "Hello!"):
+    ...     await websocket.send_text(data)
+"""
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from .instrumentation import Instrumentation
+from .streaming import AsyncStream
+
+
+class ChatSession:
+    """
+    Conversation and request options of one client.
+
+    Args:
+        session_id (str): ID the client resumes the session with.
+        model (str): Model to use.
+        messages (List[Dict[str, Any]], optional): Earlier turns.
+        max_tokens (int, optional): Maximum tokens of each answer.
+        temperature (float, optional): Sampling temperature.
+        system (str, optional): System prompt.
+        tools (List[Dict[str, Any]], optional): Tools offered on every turn.
+        tenant (str, optional): Tenant the session belongs to, for servers to
+            check when it is resumed.
+        instrumentation (Instrumentation, optional): Receives a
+            ``session.turn`` event after each completed turn.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        model: str,
+        messages: Optional[List[Dict[str, Any]]] = None,
+        max_tokens: int = 1000,
+        temperature: float = 0.7,
+        system: Optional[str] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tenant: Optional[str] = None,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        self.session_id = session_id
+        self.model = model
+        self.messages: List[Dict[str, Any]] = list(messages or [])
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.system = system
+        self.tools = tools
+        self.tenant = tenant
+        self.instrumentation = instrumentation or Instrumentation()
+        self.turns = 0
+        # Encoded size of the history, which clients no longer upload
+        self.history_bytes = sum(len(json.dumps(m)) for m in self.messages)
+        self.last_used = time.monotonic()
+        # Turns of one session run one at a time, in the order sent
+        self._lock = asyncio.Lock()
+
+    async def turn(
+        self,
+        client: Any,
+        content: Union[str, List[Dict[str, Any]]],
+        **kwargs: Any,
+    ) -> AsyncIterator[str]:
+        """
+        Send a user turn with the history and yield the events of the answer.
+
+        The turn and the answer are added to the history once the stream
+        completes. If it fails or is closed early, the history is unchanged.
+
+        Args:
+            client: :class:`~claude_sdk.AsyncClaude` client.
+            content (Union[str, List[Dict[str, Any]]]): Content of the user
+                message.
+            **kwargs: More arguments of ``messages_create``, e.g. ``tenant``.
+
+        Yields:
+            str: Payloads of the streamed events.
+        """
+        async with self._lock:
+            user = {"role": "user", "content": content}
+            sent = len(json.dumps(user))
+            stream: AsyncStream = await client.messages_create(
+                model=self.model,
+                messages=self.messages + [user],
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                system=self.system,
+                tools=self.tools,
+                stream=True,
+                **kwargs,
+            )
+            async with stream:
+                async for data in stream:
+                    yield data
+            if not stream.accumulator.done:
+                return
+            message = stream.message
+            assistant = {"role": message.role, "content": message.content}
+            self.messages += [user, assistant]
+            self.turns += 1
+            self.instrumentation.emit(
+                "session.turn",
+                messages=len(self.messages),
+                sent_bytes=sent,
+                history_bytes=self.history_bytes,
+            )
+            self.history_bytes += sent + len(json.dumps(assistant))
+            self.last_used = time.monotonic()
+
+
+class SessionStore:
+    """
+    Chat sessions by ID, with LRU eviction and an idle TTL.
+
+    A store can be shared between the connections of a server. Connections
+    keep using their session after it is evicted, but cannot resume it.
+
+    Args:
+        max_sessions (int, optional): Most sessions kept; the least recently
+            used are evicted first.
+        ttl (float, optional): Seconds a session is kept after its last use.
+        instrumentation (Instrumentation, optional): Passed to sessions.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10_000,
+        ttl: float = 1800.0,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.instrumentation = instrumentation or Instrumentation()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        # Least recently used first
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+
+    def _expire(self, now: float) -> None:
+        """
+        Drop sessions idle for longer than the TTL. Called with the lock held.
+        """
+        sessions = self._sessions
+        while sessions:
+            oldest = next(iter(sessions.values()))
+            if oldest.last_used + self.ttl > now:
+                break
+            sessions.popitem(last=False)
+            self.expired += 1
+
+    def create(self, model: str, **options: Any) -> ChatSession:
+        """
+        Start a session.
+
+        Args:
+            model (str): Model to use.
+            **options: Other arguments of :class:`ChatSession`, e.g.
+                ``system`` or earlier ``messages``.
+
+        Returns:
+            ChatSession: The new session.
+        """
+        session = ChatSession(
+            uuid.uuid4().hex, model, instrumentation=self.instrumentation, **options
+        )
+        with self._lock:
+            self._expire(session.last_used)
+            self._sessions[session.session_id] = session
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        """
+        Look up a session and mark it as used.
+
+        Args:
+            session_id (str): ID of the session.
+
+        Returns:
+            Optional[ChatSession]: The session, or None if it does not exist
+                or has expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def touch(self, session: ChatSession) -> None:
+        """
+        Mark a session as used, adding it back if it was evicted.
+
+        Args:
+            session (ChatSession): The session.
+        """
+        with self._lock:
+            session.last_used = time.monotonic()
+            if session.session_id not in self._sessions:
+                self._sessions[session.session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evicted += 1
+            self._sessions.move_to_end(session.session_id)
+
+    def remove(self, session_id: str) -> None:
+        """
+        End a session.
+
+        Args:
+            session_id (str): ID of the session.
+        """
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the number of sessions and how many were created and dropped.
+
+        Returns:
+            Dict[str, Any]: Live sessions, sessions created, expired after
+                idling and evicted to make room.
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "sessions": len(self._sessions),
+                "created": self.created,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
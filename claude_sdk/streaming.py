@@ -0,0 +1,706 @@
+"""
+Reconstruction of messages from streamed responses.
+
+``messages_create(..., stream=True)`` yields the ``data:`` payloads of the
+server-sent events as strings. A :class:`MessageAccumulator` assembles them
+into the final :class:`Message`: text, thinking and tool-use blocks, the stop
+reason and the usage. Deltas are written to growing buffers rather than
+concatenated, so accumulating a stream costs amortized O(n) time and about one
+byte per byte of output, however long the stream is.
+
+The clients return streams as :class:`Stream` and :class:`AsyncStream`
+objects, which accumulate the message as they are iterated and can be ended
+early, by hand or by a :class:`StopCondition`, closing the connection so the
+API stops generating.
+
+Example:
+    >>> stream = client.messages_create(model, messages, stream=True)
+    >>> message = accumulate(stream, on_text=lambda text: print(text, end=""))
+    >>> message.stop_reason, message.usage["output_tokens"]
+    ('end_turn', 412)
+"""
+
+import asyncio
+import io
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Match,
+    Optional,
+    Pattern,
+    Union,
+)
+
+from .exceptions import ClaudeAPIError
+from .instrumentation import Instrumentation
+
+# Delta types that are accumulated, and the block field each one extends
+_TEXT_FIELDS = {
+    "text_delta": "text",
+    "thinking_delta": "thinking",
+    "signature_delta": "signature",
+    "input_json_delta": "partial_json",
+}
+
+
+@dataclass
+class Message:
+    """
+    A message reconstructed from a stream.
+
+    Attributes:
+        id: Message ID.
+        model: Model that generated the message.
+        role: Role of the author, "assistant".
+        content: Content blocks, shaped as in non-streaming responses.
+        stop_reason: Why generation stopped, or None if the stream ended early.
+        stop_sequence: Stop sequence that was matched, if any.
+        usage: Token usage, e.g. input_tokens and output_tokens.
+    """
+
+    id: Optional[str] = None
+    model: Optional[str] = None
+    role: str = "assistant"
+    content: List[Dict[str, Any]] = field(default_factory=list)
+    stop_reason: Optional[str] = None
+    stop_sequence: Optional[str] = None
+    usage: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def text(self) -> str:
+        """
+        Text of all text blocks.
+        """
+        return "".join(b["text"] for b in self.content if b.get("type") == "text")
+
+    @property
+    def tool_uses(self) -> List[Dict[str, Any]]:
+        """
+        Tool-use blocks.
+        """
+        return [b for b in self.content if b.get("type") == "tool_use"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert to the dictionary a non-streaming request returns.
+
+        Returns:
+            Dict[str, Any]: The message.
+        """
+        return {
+            "id": self.id,
+            "type": "message",
+            "role": self.role,
+            "model": self.model,
+            "content": self.content,
+            "stop_reason": self.stop_reason,
+            "stop_sequence": self.stop_sequence,
+            "usage": self.usage,
+        }
+
+
+class _Block:
+    __slots__ = ("data", "buffers", "done")
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.buffers: Dict[str, io.StringIO] = {}
+        self.done = False
+
+    def extend(self, name: str, text: str) -> None:
+        buffer = self.buffers.get(name)
+        if buffer is None:
+            buffer = self.buffers[name] = io.StringIO()
+        buffer.write(text)
+
+    def finish(self) -> Dict[str, Any]:
+        if not self.done:
+            self.done = True
+            for name, buffer in self.buffers.items():
+                value = buffer.getvalue()
+                if name == "partial_json":
+                    self.data["input"] = json.loads(value) if value else {}
+                else:
+                    self.data[name] = self.data.get(name, "") + value
+            self.buffers.clear()
+        return self.data
+
+
+class MessageAccumulator:
+    """
+    Assembles the events of a stream into a :class:`Message`.
+
+    Callbacks receive deltas as they arrive. Tool-use blocks are passed to
+    ``on_tool_use`` once their input is complete.
+
+    Args:
+        on_text (Callable[[str], None], optional): Called with every text delta.
+        on_thinking (Callable[[str], None], optional): Called with every
+            thinking delta.
+        on_tool_use (Callable[[Dict[str, Any]], None], optional): Called with
+            every completed tool-use block.
+        on_event (Callable[[Dict[str, Any]], None], optional): Called with every
+            parsed event.
+    """
+
+    def __init__(
+        self,
+        on_text: Optional[Callable[[str], None]] = None,
+        on_thinking: Optional[Callable[[str], None]] = None,
+        on_tool_use: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.on_text = on_text
+        self.on_thinking = on_thinking
+        self.on_tool_use = on_tool_use
+        self.on_event = on_event
+        self.events = 0
+        self.done = False
+        self.output_chars = 0
+        self.output_deltas = 0
+        self._message = Message()
+        self._blocks: Dict[int, _Block] = {}
+
+    def feed(self, data: Union[str, bytes, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Add one event of the stream.
+
+        Args:
+            data (Union[str, bytes, Dict[str, Any]]): The event's ``data:``
+                payload, as yielded by ``messages_create(..., stream=True)``,
+                or the parsed event.
+
+        Returns:
+            Dict[str, Any]: The parsed event.
+
+        Raises:
+            ClaudeAPIError: If the event is an error event.
+        """
+        event = json.loads(data) if isinstance(data, (str, bytes)) else data
+        self.events += 1
+        if self.on_event is not None:
+            self.on_event(event)
+
+        kind = event.get("type")
+        if kind == "content_block_delta":
+            delta = event["delta"]
+            name = _TEXT_FIELDS.get(delta.get("type"))
+            if name is None:
+                return event
+            text = delta[name]
+            self._blocks[event["index"]].extend(name, text)
+            if name != "signature":
+                self.output_chars += len(text)
+                self.output_deltas += 1
+            if name == "text" and self.on_text is not None:
+                self.on_text(text)
+            elif name == "thinking" and self.on_thinking is not None:
+                self.on_thinking(text)
+        elif kind == "content_block_start":
+            self._blocks[event["index"]] = _Block(dict(event["content_block"]))
+        elif kind == "content_block_stop":
+            block = self._blocks[event["index"]].finish()
+            if block.get("type") == "tool_use" and self.on_tool_use is not None:
+                self.on_tool_use(block)
+        elif kind == "message_start":
+            start = event["message"]
+            self._message.id = start.get("id")
+            self._message.model = start.get("model")
+            self._message.role = start.get("role", "assistant")
+            self._message.usage.update(start.get("usage") or {})
+        elif kind == "message_delta":
+            delta = event.get("delta") or {}
+            self._message.stop_reason = delta.get("stop_reason")
+            self._message.stop_sequence = delta.get("stop_sequence")
+            # Usage in message_delta is cumulative
+            self._message.usage.update(event.get("usage") or {})
+        elif kind == "message_stop":
+            self.done = True
+        elif kind == "error":
+            error = event.get("error") or {}
+            raise ClaudeAPIError(
+                error.get("message", "Stream error"),
+                error_type=error.get("type"),
+                error_detail=error,
+            )
+        return event
+
+    @property
+    def output_tokens(self) -> int:
+        """
+        Output tokens so far: the count the API reported, or an estimate from
+        the deltas received if the stream has not reported one yet.
+        """
+        reported = self._message.usage.get("output_tokens")
+        if self._message.stop_reason is not None and reported is not None:
+            return int(reported)
+        estimate = max(self.output_deltas, -(-self.output_chars // 4))
+        return max(reported or 0, estimate)
+
+    @property
+    def message(self) -> Message:
+        """
+        The message received so far. Blocks still streaming are included with
+        their content so far, except incomplete tool input.
+        """
+        content = []
+        for index in sorted(self._blocks):
+            block = self._blocks[index]
+            if block.done:
+                content.append(block.data)
+                continue
+            partial = dict(block.data)
+            for name, buffer in block.buffers.items():
+                if name != "partial_json":
+                    partial[name] = partial.get(name, "") + buffer.getvalue()
+            content.append(partial)
+        message = self._message
+        return Message(
+            id=message.id,
+            model=message.model,
+            role=message.role,
+            content=content,
+            stop_reason=message.stop_reason,
+            stop_sequence=message.stop_sequence,
+            usage=dict(message.usage),
+        )
+
+
+def accumulate(
+    stream: Iterable[Union[str, bytes, Dict[str, Any]]], **callbacks: Any
+) -> Message:
+    """
+    Consume a stream and return its message.
+
+    Args:
+        stream (Iterable): Stream from ``Claude.messages_create(..., stream=True)``.
+        **callbacks: Callbacks of :class:`MessageAccumulator`.
+
+    Returns:
+        Message: The message.
+    """
+    accumulator = MessageAccumulator(**callbacks)
+    for data in stream:
+        accumulator.feed(data)
+    return accumulator.message
+
+
+async def aaccumulate(
+    stream: AsyncIterable[Union[str, bytes, Dict[str, Any]]], **callbacks: Any
+) -> Message:
+    """
+    Consume an async stream and return its message.
+
+    Args:
+        stream (AsyncIterable): Stream from
+            ``AsyncClaude.messages_create(..., stream=True)``.
+        **callbacks: Callbacks of :class:`MessageAccumulator`.
+
+    Returns:
+        Message: The message.
+    """
+    accumulator = MessageAccumulator(**callbacks)
+    async for data in stream:
+        accumulator.feed(data)
+    return accumulator.message
+
+
+class StopCondition:
+    """
+    Base class for conditions that end a stream early.
+
+    A condition is called with every event and the stream's accumulator and
+    returns True to stop. Plain callables with the same signature work too.
+
+    Attributes:
+        reason: Reported as the reason the stream was stopped.
+    """
+
+    reason = "stop_condition"
+
+    def __call__(self, event: Dict[str, Any], accumulator: MessageAccumulator) -> bool:
+        raise NotImplementedError
+
+
+class StopOnMatch(StopCondition):
+    """
+    Stop once the generated text matches a regular expression.
+
+    Only the last ``window`` characters are searched after every delta, so
+    checking stays O(window) per delta however long the output grows; matches
+    longer than the window are not found.
+
+    Args:
+        pattern (Union[str, Pattern[str]]): Regular expression.
+        window (int, optional): Characters of trailing text to search.
+    """
+
+    reason = "match"
+
+    def __init__(self, pattern: Union[str, Pattern[str]], window: int = 4096):
+        self.pattern = re.compile(pattern)
+        self.window = window
+        self.match: Optional[Match[str]] = None
+        self._tail = ""
+
+    def __call__(self, event: Dict[str, Any], accumulator: MessageAccumulator) -> bool:
+        delta = event.get("delta") or {}
+        if event.get("type") != "content_block_delta" or "text" not in delta:
+            return False
+        self._tail = (self._tail + delta["text"])[-self.window :]
+        self.match = self.pattern.search(self._tail)
+        return self.match is not None
+
+
+class StopAfterTokens(StopCondition):
+    """
+    Stop once the output reaches a number of tokens, as estimated from the
+    deltas received.
+
+    Args:
+        max_tokens (int): Output tokens after which to stop.
+    """
+
+    reason = "max_tokens"
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+
+    def __call__(self, event: Dict[str, Any], accumulator: MessageAccumulator) -> bool:
+        return accumulator.output_tokens >= self.max_tokens
+
+
+class StopAtDeadline(StopCondition):
+    """
+    Stop once a number of seconds has passed since the condition was created.
+
+    Async streams also stop when no event arrives before the deadline; sync
+    streams check it as events arrive, with the transport's read timeout
+    bounding a stalled stream.
+
+    Args:
+        seconds (float): Seconds from now.
+    """
+
+    reason = "deadline"
+
+    def __init__(self, seconds: float):
+        self.deadline = time.monotonic() + seconds
+
+    def __call__(self, event: Dict[str, Any], accumulator: MessageAccumulator) -> bool:
+        return time.monotonic() >= self.deadline
+
+
+Condition = Callable[[Dict[str, Any], MessageAccumulator], bool]
+
+
+class _BaseStream:
+    """
+    State shared by sync and async streams.
+    """
+
+    def __init__(self, instrumentation: Optional[Instrumentation] = None):
+        self.accumulator = MessageAccumulator()
+        self.instrumentation = instrumentation or Instrumentation()
+        self.conditions: List[Condition] = []
+        self.closed = False
+        self.stopped: Optional[str] = None
+        # Exception that ended the stream, e.g. a connection lost mid-body
+        self.error: Optional[BaseException] = None
+        self._callbacks: List[Callable[[Any], None]] = []
+
+    @property
+    def message(self) -> Message:
+        """
+        The message received so far.
+        """
+        return self.accumulator.message
+
+    @property
+    def usage(self) -> Dict[str, Any]:
+        """
+        Token usage so far. Output tokens of a stream that was stopped early
+        are estimated from the deltas received.
+        """
+        return {
+            **self.accumulator.message.usage,
+            "output_tokens": self.accumulator.output_tokens,
+        }
+
+    def add_done_callback(self, callback: Callable[[Any], None]) -> None:
+        """
+        Call ``callback`` with the stream once it has ended, been closed or
+        failed. A failed stream has its exception in :attr:`error`, and its
+        :attr:`usage` counts the tokens received before it failed.
+
+        Args:
+            callback (Callable[[Any], None]): Receives the stream.
+        """
+        if self.closed:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def _finish(self) -> None:
+        self.closed = True
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def _check(self, data: str) -> None:
+        event = self.accumulator.feed(data)
+        if self.accumulator.done:
+            return
+        for condition in self.conditions:
+            if condition(event, self.accumulator):
+                self.stopped = getattr(condition, "reason", "stop_condition")
+                return
+
+    def _fail(self, error: BaseException) -> None:
+        self.error = error
+        self._stop("error")
+        self._finish()
+
+    def _stop(self, reason: str) -> None:
+        self.closed = True
+        if self.accumulator.done:
+            return
+        if self.stopped is None:
+            self.stopped = reason
+        usage = self.usage
+        self.instrumentation.emit(
+            "stream.stopped",
+            reason=self.stopped,
+            input_tokens=usage.get("input_tokens", 0),
+            output_tokens=usage["output_tokens"],
+        )
+
+
+class Stream(_BaseStream):
+    """
+    A streamed response of :class:`~claude_sdk.Claude`.
+
+    Iterating yields the ``data:`` payload of every event, as a string. The
+    stream can be ended early with :meth:`close`, or automatically with
+    :meth:`stop_when`; either closes the connection right away, so the API
+    stops generating, and :attr:`usage` reports the tokens used so far.
+
+    Args:
+        iterator (Iterator[str]): Payloads of the events.
+        close (Callable[[], None], optional): Closes the connection.
+        instrumentation (Instrumentation, optional): Receives
+            ``stream.stopped`` events when a stream is ended early.
+    """
+
+    def __init__(
+        self,
+        iterator: Iterator[str],
+        close: Optional[Callable[[], None]] = None,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        super().__init__(instrumentation)
+        self._iterator = iterator
+        self._close = close
+
+    def stop_when(self, *conditions: Condition) -> "Stream":
+        """
+        End the stream as soon as any of the conditions is met. The event that
+        met it is still yielded.
+
+        Args:
+            *conditions: :class:`StopCondition` instances or callables.
+
+        Returns:
+            Stream: This stream.
+        """
+        self.conditions.extend(conditions)
+        return self
+
+    def __iter__(self) -> "Stream":
+        return self
+
+    def __next__(self) -> str:
+        if self.closed:
+            raise StopIteration
+        if self.stopped is not None:
+            self.close()
+            raise StopIteration
+        try:
+            data = next(self._iterator)
+            # Raises on error events, e.g. an overloaded error mid-stream
+            self._check(data)
+        except StopIteration:
+            self._finish()
+            raise
+        except BaseException as error:
+            try:
+                close = getattr(self._iterator, "close", None)
+                if close is not None:
+                    close()
+                if self._close is not None:
+                    self._close()
+            except Exception:
+                pass
+            self._fail(error)
+            raise
+        return data
+
+    def close(self) -> None:
+        """
+        Close the stream and its connection. Does nothing if it has ended.
+        """
+        if self.closed:
+            return
+        self._stop("cancelled")
+        close = getattr(self._iterator, "close", None)
+        if close is not None:
+            close()
+        if self._close is not None:
+            self._close()
+        self._finish()
+
+    cancel = close
+
+    def get_final_message(self) -> Message:
+        """
+        Consume the rest of the stream and return its message.
+
+        Returns:
+            Message: The message, partial if the stream was stopped early.
+        """
+        for _ in self:
+            pass
+        return self.message
+
+    def __enter__(self) -> "Stream":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class AsyncStream(_BaseStream):
+    """
+    A streamed response of :class:`~claude_sdk.AsyncClaude`.
+
+    Iterating yields the ``data:`` payload of every event, as a string. The
+    stream can be ended early with :meth:`aclose`, or automatically with
+    :meth:`stop_when`; either closes the connection right away, so the API
+    stops generating, and :attr:`usage` reports the tokens used so far.
+
+    Args:
+        iterator (AsyncIterator[str]): Payloads of the events.
+        close (Callable[[], Awaitable[None]], optional): Closes the connection.
+        instrumentation (Instrumentation, optional): Receives
+            ``stream.stopped`` events when a stream is ended early.
+    """
+
+    def __init__(
+        self,
+        iterator: AsyncIterator[str],
+        close: Optional[Callable[[], Awaitable[None]]] = None,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        super().__init__(instrumentation)
+        self._iterator = iterator
+        self._close = close
+
+    def stop_when(self, *conditions: Condition) -> "AsyncStream":
+        """
+        End the stream as soon as any of the conditions is met. The event that
+        met it is still yielded.
+
+        Args:
+            *conditions: :class:`StopCondition` instances or callables.
+
+        Returns:
+            AsyncStream: This stream.
+        """
+        self.conditions.extend(conditions)
+        return self
+
+    def __aiter__(self) -> "AsyncStream":
+        return self
+
+    async def __anext__(self) -> str:
+        if self.closed:
+            raise StopAsyncIteration
+        if self.stopped is not None:
+            await self.aclose()
+            raise StopAsyncIteration
+        deadlines = [
+            c.deadline for c in self.conditions if isinstance(c, StopAtDeadline)
+        ]
+        try:
+            if deadlines:
+                timeout = max(0.0, min(deadlines) - time.monotonic())
+                data = await asyncio.wait_for(self._iterator.__anext__(), timeout)
+            else:
+                data = await self._iterator.__anext__()
+            # Raises on error events, e.g. an overloaded error mid-stream
+            self._check(data)
+        except StopAsyncIteration:
+            self._finish()
+            raise
+        except asyncio.TimeoutError:
+            self.stopped = StopAtDeadline.reason
+            await self.aclose()
+            raise StopAsyncIteration from None
+        except BaseException as error:
+            # Cancelled consumers and lost connections still account usage
+            try:
+                aclose = getattr(self._iterator, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+                if self._close is not None:
+                    await self._close()
+            except Exception:
+                pass
+            self._fail(error)
+            raise
+        return data
+
+    async def aclose(self) -> None:
+        """
+        Close the stream and its connection. Does nothing if it has ended.
+        """
+        if self.closed:
+            return
+        self._stop("cancelled")
+        aclose = getattr(self._iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+        if self._close is not None:
+            await self._close()
+        self._finish()
+
+    close = aclose
+    cancel = aclose
+
+    async def get_final_message(self) -> Message:
+        """
+        Consume the rest of the stream and return its message.
+
+        Returns:
+            Message: The message, partial if the stream was stopped early.
+        """
+        async for _ in self:
+            pass
+        return self.message
+
+    async def __aenter__(self) -> "AsyncStream":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
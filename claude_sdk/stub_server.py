@@ -0,0 +1,992 @@
+"""
+Local Anthropic-compatible stub server for benchmarking and load testing.
+
+The stub implements enough of the Messages API (``/v1/messages`` with and
+without streaming, ``/v1/messages/count_tokens`` and message batches) for the
+SDK clients and ``api_server.py`` to run against it, and can inject latency,
+token rates, rate-limit/overload errors and connection resets. ``GET
+/_stub/stats`` reports how many requests, connections and request body bytes
+it has received. Request bodies may be gzip or zstd encoded.
+
+Run it standalone with::
+
+    python -m claude_sdk.stub_server --port 8080 --latency lognormal:-3,0.5 \\
+        --tokens-per-second 200 --rate-429 0.02 --rate-529 0.01
+"""
+
+import argparse
+import asyncio
+import heapq
+import json
+import random
+import socket
+import struct
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, Union
+
+_WORDS = (
+    "the quick brown fox jumps over a lazy dog while claude writes some "
+    "plausible looking text for benchmarking purposes only"
+).split()
+
+
+class LatencyDistribution:
+    """
+    Distribution of artificial latencies, in seconds.
+
+    Args:
+        kind (str): One of "fixed", "uniform", "normal", "lognormal" or "exponential".
+        params (Tuple[float, ...]): Distribution parameters. "fixed" takes a value,
+            "uniform" a low and high bound, "normal" a mean and standard deviation,
+            "lognormal" the mu and sigma of the underlying normal and "exponential"
+            a mean.
+    """
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+    def __init__(self, kind: str = "fixed", params: Tuple[float, ...] = (0.0,)):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.params = tuple(params)
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        """
+        Parse a distribution from a ``kind:param,param`` string.
+
+        Args:
+            spec (str): Specification such as "fixed:0.05" or "uniform:0.01,0.2".
+                A bare number is treated as a fixed latency.
+
+        Returns:
+            LatencyDistribution: The parsed distribution.
+        """
+        if ":" not in spec:
+            return cls("fixed", (float(spec),))
+        kind, _, raw = spec.partition(":")
+        return cls(kind, tuple(float(p) for p in raw.split(",") if p))
+
+    def sample(self, rng: random.Random) -> float:
+        """
+        Draw a latency from the distribution.
+
+        Args:
+            rng (random.Random): Random number generator to draw from.
+
+        Returns:
+            float: Latency in seconds, never negative.
+        """
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = rng.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            value = rng.lognormvariate(p[0], p[1])
+        else:
+            value = rng.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0
+        return max(0.0, value)
+
+    def __repr__(self) -> str:
+        return f"LatencyDistribution({self.kind!r}, {self.params!r})"
+
+
+@dataclass
+class StubConfig:
+    """
+    Behaviour of the stub server.
+
+    Attributes:
+        latency: Delay before the response headers (and first token) are sent.
+        tokens_per_second: Output token rate. Zero means tokens are produced instantly.
+        output_tokens: Number of tokens generated per message, capped by max_tokens.
+        rate_429: Probability of answering with a 429 rate-limit error.
+        rate_529: Probability of answering with a 529 overloaded error.
+        retry_after: Value of the retry-after header on 429/529 responses, in seconds.
+        reset_rate: Probability of resetting the connection instead of answering.
+        requests_per_minute: Optional request quota; requests above it get a 429 and
+            the anthropic-ratelimit-* headers report the remaining headroom.
+        batch_processing_time: Seconds before a created message batch has ended.
+        seed: Seed for the random number generator, for reproducible runs.
+        overloaded_models: Models that always answer with a 529 overloaded error.
+        capacity: Optional number of messages the stub serves concurrently at full
+            speed. Above it, latency and token generation slow down in proportion
+            to the load, and messages arriving while twice the capacity is in
+            flight get a 429.
+        model_latency: Latency distributions overriding ``latency`` per model.
+    """
+
+    latency: LatencyDistribution = field(default_factory=LatencyDistribution)
+    tokens_per_second: float = 0.0
+    output_tokens: int = 64
+    rate_429: float = 0.0
+    rate_529: float = 0.0
+    retry_after: float = 1.0
+    reset_rate: float = 0.0
+    requests_per_minute: Optional[int] = None
+    batch_processing_time: float = 0.0
+    seed: Optional[int] = None
+    overloaded_models: Tuple[str, ...] = ()
+    model_latency: Dict[str, LatencyDistribution] = field(default_factory=dict)
+    capacity: Optional[int] = None
+
+
+@dataclass
+class StubResponse:
+    """
+    Protocol-independent response produced by the stub.
+
+    Attributes:
+        status: HTTP status code.
+        headers: Response headers.
+        body: Complete response body, for non-streaming responses.
+        events: Iterator of (delay, chunk) pairs for streaming responses. The
+            delay is how long to wait before sending the chunk.
+        reset: Whether the connection should be reset instead of answered.
+        delay: Seconds to wait before sending the response. Front ends do the
+            waiting, so the engine itself never blocks.
+    """
+
+    status: int = 200
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+    events: Optional[Iterator[Tuple[float, bytes]]] = None
+    reset: bool = False
+    delay: float = 0.0
+
+
+def estimate_tokens(payload: Dict[str, Any]) -> int:
+    """
+    Roughly estimate the number of input tokens of a Messages API payload.
+
+    Args:
+        payload (Dict[str, Any]): Request payload.
+
+    Returns:
+        int: Estimated token count, using about four characters per token.
+    """
+    chars = 0
+    system = payload.get("system")
+    if isinstance(system, str):
+        chars += len(system)
+    for message in payload.get("messages") or []:
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            for block in content:
+                if isinstance(block, dict):
+                    chars += len(block.get("text") or "")
+    return max(1, chars // 4)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+def _error_body(error_type: str, message: str) -> bytes:
+    return json.dumps(
+        {"type": "error", "error": {"type": error_type, "message": message}}
+    ).encode("utf-8")
+
+
+def _text(value: Union[str, bytes]) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _decode_body(body: bytes, content_encoding: Optional[str]) -> bytes:
+    if not content_encoding or content_encoding == "identity":
+        return body
+    if content_encoding == "gzip":
+        return zlib.decompress(body, 31)
+    if content_encoding == "zstd":
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    raise ValueError(f"Unsupported content-encoding {content_encoding}")
+
+
+class StubEngine:
+    """
+    Request handling logic of the stub, shared by its HTTP front ends.
+
+    Args:
+        config (StubConfig): Behaviour of the stub.
+    """
+
+    def __init__(self, config: Optional[StubConfig] = None):
+        self.config = config or StubConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._request_times: Deque[float] = deque()
+        self._batches: Dict[str, Dict[str, Any]] = {}
+        # End times of the messages being served, for the capacity model
+        self._active: List[float] = []
+        self.request_count = 0
+        self.connection_count = 0
+        self.bytes_received = 0
+
+    def connection_opened(self) -> None:
+        """
+        Count a new client connection; front ends call this on accept.
+        """
+        with self._lock:
+            self.connection_count += 1
+
+    def _random(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def _latency(self, model: Optional[str] = None) -> float:
+        latency = self.config.model_latency.get(model or "", self.config.latency)
+        with self._lock:
+            return latency.sample(self._rng)
+
+    def _in_flight(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            while self._active and self._active[0] <= now:
+                heapq.heappop(self._active)
+            return len(self._active)
+
+    def _slowdown(self) -> float:
+        capacity = self.config.capacity
+        if not capacity:
+            return 1.0
+        return max(1.0, (self._in_flight() + 1) / capacity)
+
+    def _serve_for(self, duration: float) -> None:
+        if self.config.capacity:
+            with self._lock:
+                heapq.heappush(self._active, time.monotonic() + duration)
+
+    def _ratelimit_headers(self) -> Tuple[Dict[str, str], bool]:
+        limit = self.config.requests_per_minute
+        if not limit:
+            return {}, False
+        now = time.monotonic()
+        with self._lock:
+            window = self._request_times
+            while window and window[0] <= now - 60.0:
+                window.popleft()
+            exceeded = len(window) >= limit
+            if not exceeded:
+                window.append(now)
+            remaining = max(0, limit - len(window))
+            reset = 60.0 - (now - window[0]) if window else 0.0
+        headers = {
+            "anthropic-ratelimit-requests-limit": str(limit),
+            "anthropic-ratelimit-requests-remaining": str(remaining),
+            "anthropic-ratelimit-requests-reset": f"{reset:.3f}",
+        }
+        return headers, exceeded
+
+    def handle(
+        self,
+        method: str,
+        path: str,
+        body: bytes,
+        content_encoding: Optional[str] = None,
+    ) -> StubResponse:
+        """
+        Produce the response for a request.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Request path, without the query string.
+            body (bytes): Raw request body.
+            content_encoding (str, optional): Content-Encoding of the body, either
+                "gzip" or "zstd".
+
+        Returns:
+            StubResponse: The response to send.
+        """
+        if method == "GET" and path == "/_stub/stats":
+            return self._json(
+                200,
+                {
+                    "requests": self.request_count,
+                    "connections": self.connection_count,
+                    "bytes_received": self.bytes_received,
+                },
+            )
+        with self._lock:
+            self.request_count += 1
+
+        if self.config.reset_rate and self._random() < self.config.reset_rate:
+            return StubResponse(reset=True)
+
+        with self._lock:
+            self.bytes_received += len(body)
+        try:
+            body = _decode_body(body, content_encoding)
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            return self._json(400, _error_body("invalid_request_error", "Invalid JSON"))
+
+        if method == "POST" and path == "/v1/messages":
+            return self._guarded(
+                lambda headers: self._messages(payload, headers), payload.get("model")
+            )
+        if method == "POST" and path == "/v1/messages/count_tokens":
+            return self._json(200, {"input_tokens": estimate_tokens(payload)})
+        if method == "POST" and path == "/v1/messages/batches":
+            return self._create_batch(payload)
+        if method == "GET" and path.startswith("/v1/messages/batches/"):
+            return self._get_batch(path[len("/v1/messages/batches/") :])
+        return self._json(404, _error_body("not_found_error", f"No route {path}"))
+
+    def _json(
+        self, status: int, data: Any, headers: Optional[Dict[str, str]] = None
+    ) -> StubResponse:
+        body = data if isinstance(data, bytes) else json.dumps(data).encode("utf-8")
+        response_headers = {"content-type": "application/json"}
+        response_headers.update(headers or {})
+        return StubResponse(status=status, headers=response_headers, body=body)
+
+    def _guarded(
+        self,
+        respond: Callable[[Dict[str, str]], StubResponse],
+        model: Optional[str] = None,
+    ) -> StubResponse:
+        headers, exceeded = self._ratelimit_headers()
+        retry = {"retry-after": f"{self.config.retry_after:g}"}
+        capacity = self.config.capacity
+        if exceeded or (self.config.rate_429 and self._random() < self.config.rate_429):
+            headers.update(retry)
+            response = self._json(
+                429, _error_body("rate_limit_error", "Rate limit exceeded"), headers
+            )
+        elif capacity and self._in_flight() >= 2 * capacity:
+            headers.update(retry)
+            response = self._json(
+                429,
+                _error_body("rate_limit_error", "Too many concurrent requests"),
+                headers,
+            )
+        elif model in self.config.overloaded_models or (
+            self.config.rate_529 and self._random() < self.config.rate_529
+        ):
+            headers.update(retry)
+            response = self._json(
+                529, _error_body("overloaded_error", "Overloaded"), headers
+            )
+        else:
+            return respond(headers)
+        response.delay = self._latency(model)
+        return response
+
+    def _message(
+        self, payload: Dict[str, Any], text: str, output_tokens: int
+    ) -> Dict[str, Any]:
+        max_tokens = int(payload.get("max_tokens") or self.config.output_tokens)
+        return {
+            "id": f"msg_stub_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": payload.get("model", "stub"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "max_tokens" if output_tokens >= max_tokens else "end_turn",
+            "stop_sequence": None,
+            "usage": {
+                "input_tokens": estimate_tokens(payload),
+                "output_tokens": output_tokens,
+            },
+        }
+
+    def _tokens(self, payload: Dict[str, Any]) -> List[str]:
+        count = min(
+            self.config.output_tokens,
+            int(payload.get("max_tokens") or self.config.output_tokens),
+        )
+        return [" " + _WORDS[i % len(_WORDS)] for i in range(count)]
+
+    def _messages(
+        self, payload: Dict[str, Any], headers: Dict[str, str]
+    ) -> StubResponse:
+        tokens = self._tokens(payload)
+        slowdown = self._slowdown()
+        latency = self._latency(payload.get("model")) * slowdown
+        rate = self.config.tokens_per_second
+        interval = slowdown / rate if rate else 0.0
+        self._serve_for(latency + len(tokens) * interval)
+
+        if not payload.get("stream"):
+            message = self._message(payload, "".join(tokens).strip(), len(tokens))
+            response = self._json(200, message, headers)
+            response.delay = latency + len(tokens) * interval
+            return response
+
+        response_headers = {
+            "content-type": "text/event-stream",
+            "cache-control": "no-cache",
+        }
+        response_headers.update(headers)
+        return StubResponse(
+            status=200,
+            headers=response_headers,
+            events=self._stream_events(payload, tokens, latency, interval),
+        )
+
+    def _stream_events(
+        self,
+        payload: Dict[str, Any],
+        tokens: List[str],
+        latency: float,
+        interval: float,
+    ) -> Iterator[Tuple[float, bytes]]:
+        message = self._message(payload, "", 0)
+        content = message.pop("content")
+        message["content"] = []
+        message["stop_reason"] = None
+        yield latency, _sse(
+            "message_start", {"type": "message_start", "message": message}
+        )
+        yield 0.0, _sse(
+            "content_block_start",
+            {"type": "content_block_start", "index": 0, "content_block": content[0]},
+        )
+        for token in tokens:
+            yield interval, _sse(
+                "content_block_delta",
+                {
+                    "type": "content_block_delta",
+                    "index": 0,
+                    "delta": {"type": "text_delta", "text": token},
+                },
+            )
+        yield 0.0, _sse(
+            "content_block_stop", {"type": "content_block_stop", "index": 0}
+        )
+        max_tokens = int(payload.get("max_tokens") or self.config.output_tokens)
+        yield 0.0, _sse(
+            "message_delta",
+            {
+                "type": "message_delta",
+                "delta": {
+                    "stop_reason": (
+                        "max_tokens" if len(tokens) >= max_tokens else "end_turn"
+                    ),
+                    "stop_sequence": None,
+                },
+                "usage": {"output_tokens": len(tokens)},
+            },
+        )
+        yield 0.0, _sse("message_stop", {"type": "message_stop"})
+
+    def _create_batch(self, payload: Dict[str, Any]) -> StubResponse:
+        batch_id = f"msgbatch_stub_{uuid.uuid4().hex[:24]}"
+        requests_ = payload.get("requests") or []
+        results = []
+        for item in requests_:
+            params = item.get("params") or {}
+            tokens = self._tokens(params)
+            message = self._message(params, "".join(tokens).strip(), len(tokens))
+            results.append(
+                {
+                    "custom_id": item.get("custom_id"),
+                    "result": {"type": "succeeded", "message": message},
+                }
+            )
+        self._batches[batch_id] = {"created": time.monotonic(), "results": results}
+        return self._json(200, self._batch_object(batch_id))
+
+    def _batch_object(self, batch_id: str) -> Dict[str, Any]:
+        batch = self._batches[batch_id]
+        count = len(batch["results"])
+        ended = time.monotonic() - batch["created"] >= self.config.batch_processing_time
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else count,
+                "succeeded": count if ended else 0,
+                "errored": 0,
+                "canceled": 0,
+                "expired": 0,
+            },
+            "results_url": (
+                f"/v1/messages/batches/{batch_id}/results" if ended else None
+            ),
+        }
+
+    def _get_batch(self, rest: str) -> StubResponse:
+        batch_id, _, suffix = rest.partition("/")
+        if batch_id not in self._batches:
+            return self._json(404, _error_body("not_found_error", "Batch not found"))
+        if suffix == "results":
+            lines = b"\n".join(
+                json.dumps(r).encode("utf-8")
+                for r in self._batches[batch_id]["results"]
+            )
+            return StubResponse(
+                status=200, headers={"content-type": "application/x-jsonl"}, body=lines
+            )
+        return self._json(200, self._batch_object(batch_id))
+
+
+class _StubRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP/1.1 front end for the stub engine.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "_StubHTTPServer"
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.engine.connection_opened()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("transfer-encoding", "").lower() != "chunked":
+            length = int(self.headers.get("content-length") or 0)
+            return self.rfile.read(length) if length else b""
+        chunks: List[bytes] = []
+        while True:
+            size = int(self.rfile.readline().split(b";", 1)[0], 16)
+            if size == 0:
+                while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def _dispatch(self, method: str) -> None:
+        body = self._read_body()
+        response = self.server.engine.handle(
+            method,
+            self.path.split("?", 1)[0],
+            body,
+            self.headers.get("content-encoding"),
+        )
+
+        if response.reset:
+            self.connection.setsockopt(
+                socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+            )
+            self.close_connection = True
+            return
+
+        if response.delay:
+            time.sleep(response.delay)
+        self.send_response(response.status)
+        for name, value in response.headers.items():
+            self.send_header(name, value)
+
+        if response.events is None:
+            self.send_header("content-length", str(len(response.body)))
+            self.end_headers()
+            self.wfile.write(response.body)
+            return
+
+        self.send_header("transfer-encoding", "chunked")
+        headers_sent = False
+        for delay, chunk in response.events:
+            if delay:
+                time.sleep(delay)
+            if not headers_sent:
+                self.end_headers()
+                headers_sent = True
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        if not headers_sent:
+            self.end_headers()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _handle(self, method: str) -> None:
+        try:
+            self._dispatch(method)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away, e.g. it abandoned a stream half-way
+            self.close_connection = True
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address: Tuple[str, int], engine: StubEngine):
+        self.engine = engine
+        super().__init__(address, _StubRequestHandler)
+
+
+class StubServer:
+    """
+    Local Anthropic-compatible server running in a background thread.
+
+    Args:
+        config (StubConfig, optional): Behaviour of the stub.
+        host (str, optional): Interface to bind to.
+        port (int, optional): Port to bind to. Zero picks a free port.
+
+    Example:
+        >>> with StubServer(StubConfig(tokens_per_second=500)) as stub:
+        ...     client = Claude(api_key="sk-test", base_url=stub.url)
+    """
+
+    def __init__(
+        self,
+        config: Optional[StubConfig] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.engine = StubEngine(config)
+        self._httpd = _StubHTTPServer((host, port), self.engine)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def config(self) -> StubConfig:
+        return self.engine.config
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode("utf-8")
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        """
+        Start serving in a background thread.
+
+        Returns:
+            StubServer: The server itself.
+        """
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="claude-sdk-stub", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop serving and release the socket.
+        """
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+class _H2StubProtocol(asyncio.Protocol):
+    """
+    HTTP/2 (cleartext, prior knowledge) front end for the stub engine.
+    """
+
+    def __init__(self, engine: StubEngine):
+        from h2.config import H2Configuration
+        from h2.connection import H2Connection
+
+        self.engine = engine
+        self.conn = H2Connection(
+            H2Configuration(client_side=False, header_encoding="utf-8")
+        )
+        self.transport: Optional[asyncio.Transport] = None
+        self.requests: Dict[int, Tuple[Dict[str, str], bytearray]] = {}
+        self.window_updated = asyncio.Event()
+        self.closed = False
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport  # type: ignore[assignment]
+        self.engine.connection_opened()
+        self.conn.initiate_connection()
+        self._flush()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.closed = True
+        self.window_updated.set()
+
+    def _flush(self) -> None:
+        if self.transport is not None and not self.closed:
+            self.transport.write(self.conn.data_to_send())
+
+    def data_received(self, data: bytes) -> None:
+        from h2 import events as h2_events
+        from h2.exceptions import ProtocolError
+
+        try:
+            events = self.conn.receive_data(data)
+        except ProtocolError:
+            self._flush()
+            if self.transport is not None:
+                self.transport.close()
+            return
+
+        for event in events:
+            if isinstance(event, h2_events.RequestReceived):
+                headers = {_text(name): _text(value) for name, value in event.headers}
+                self.requests[event.stream_id] = (headers, bytearray())
+            elif isinstance(event, h2_events.DataReceived):
+                self.requests[event.stream_id][1].extend(event.data)
+                self.conn.acknowledge_received_data(
+                    event.flow_controlled_length, event.stream_id
+                )
+            elif isinstance(event, h2_events.StreamEnded):
+                headers, body = self.requests.pop(event.stream_id)
+                asyncio.ensure_future(
+                    self._respond(event.stream_id, headers, bytes(body))
+                )
+            elif isinstance(event, h2_events.StreamReset):
+                self.requests.pop(event.stream_id, None)
+            elif isinstance(event, h2_events.WindowUpdated):
+                self.window_updated.set()
+            elif isinstance(event, h2_events.ConnectionTerminated):
+                if self.transport is not None:
+                    self.transport.close()
+        self._flush()
+
+    async def _send_data(self, stream_id: int, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            window = self.conn.local_flow_control_window(stream_id)
+            if window < 1:
+                self.window_updated.clear()
+                await self.window_updated.wait()
+                if self.closed:
+                    return
+                continue
+            size = min(window, len(view), self.conn.max_outbound_frame_size)
+            self.conn.send_data(stream_id, view[:size].tobytes())
+            self._flush()
+            view = view[size:]
+
+    async def _respond(
+        self, stream_id: int, headers: Dict[str, str], body: bytes
+    ) -> None:
+        from h2.exceptions import ProtocolError, StreamClosedError
+
+        path = headers.get(":path", "/").split("?", 1)[0]
+        response = self.engine.handle(
+            headers.get(":method", "GET"), path, body, headers.get("content-encoding")
+        )
+        try:
+            if response.reset:
+                self.conn.reset_stream(stream_id)
+                self._flush()
+                return
+            if response.delay:
+                await asyncio.sleep(response.delay)
+
+            response_headers = [(":status", str(response.status))]
+            response_headers += list(response.headers.items())
+            if response.events is None:
+                response_headers.append(("content-length", str(len(response.body))))
+            self.conn.send_headers(stream_id, response_headers)
+            self._flush()
+
+            if response.events is None:
+                await self._send_data(stream_id, response.body)
+            else:
+                for delay, chunk in response.events:
+                    if delay:
+                        await asyncio.sleep(delay)
+                    await self._send_data(stream_id, chunk)
+            if not self.closed:
+                self.conn.end_stream(stream_id)
+                self._flush()
+        except (StreamClosedError, ProtocolError):
+            # The client reset the stream, e.g. it abandoned it half-way
+            pass
+
+
+class H2StubServer:
+    """
+    Local Anthropic-compatible HTTP/2 server running in a background thread.
+
+    The server speaks cleartext HTTP/2 with prior knowledge (h2c), so clients must
+    be configured to use HTTP/2 without negotiation. It requires the optional
+    ``h2`` package.
+
+    Args:
+        config (StubConfig, optional): Behaviour of the stub.
+        host (str, optional): Interface to bind to.
+        port (int, optional): Port to bind to. Zero picks a free port.
+    """
+
+    def __init__(
+        self,
+        config: Optional[StubConfig] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        try:
+            import h2  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                "The HTTP/2 stub server requires the 'h2' package. "
+                "Install it with: pip install 'claude-sdk[http2]'"
+            ) from e
+        self.engine = StubEngine(config)
+        self.host = host
+        self.port = port
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def config(self) -> StubConfig:
+        return self.engine.config
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def _run(self, ready: threading.Event) -> None:
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        self._server = loop.run_until_complete(
+            loop.create_server(
+                lambda: _H2StubProtocol(self.engine), self.host, self.port, backlog=1024
+            )
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            self._server.close()
+            loop.run_until_complete(self._server.wait_closed())
+            loop.close()
+
+    def start(self) -> "H2StubServer":
+        """
+        Start serving in a background thread.
+
+        Returns:
+            H2StubServer: The server itself.
+        """
+        ready = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(ready,), name="claude-sdk-h2-stub", daemon=True
+        )
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop serving and release the socket.
+        """
+        if self._loop is not None and self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "H2StubServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def config_from_args(args: argparse.Namespace) -> StubConfig:
+    """
+    Build a stub configuration from parsed command line arguments.
+
+    Args:
+        args (argparse.Namespace): Arguments added by :func:`add_stub_arguments`.
+
+    Returns:
+        StubConfig: The configuration.
+    """
+    return StubConfig(
+        latency=LatencyDistribution.parse(args.latency),
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        rate_429=args.rate_429,
+        rate_529=args.rate_529,
+        retry_after=args.retry_after,
+        reset_rate=args.reset_rate,
+        requests_per_minute=args.requests_per_minute,
+        batch_processing_time=args.batch_processing_time,
+        seed=args.seed,
+        capacity=args.capacity,
+    )
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
+    """
+    Add the options controlling stub behaviour to a command line parser.
+
+    Args:
+        parser (argparse.ArgumentParser): Parser to extend, so benchmarks can
+            accept the same options as the standalone stub.
+
+    Returns:
+        argparse.ArgumentParser: The extended parser.
+    """
+    parser.add_argument("--latency", default="fixed:0", help="e.g. lognormal:-3,0.5")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--output-tokens", type=int, default=64)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-529", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--reset-rate", type=float, default=0.0)
+    parser.add_argument("--requests-per-minute", type=int, default=None)
+    parser.add_argument("--batch-processing-time", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--capacity", type=int, default=None)
+    return parser
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Build the command line parser of the standalone stub.
+
+    Returns:
+        argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(description="Local Anthropic API stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--http2", action="store_true", help="serve cleartext HTTP/2 (h2c)"
+    )
+    return add_stub_arguments(parser)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the stub server in the foreground.
+    """
+    args = build_parser().parse_args(argv)
+    server_class = H2StubServer if args.http2 else StubServer
+    server = server_class(config_from_args(args), host=args.host, port=args.port)
+    server.start()
+    print(f"Claude API stub listening on {server.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
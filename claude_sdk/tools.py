@@ -0,0 +1,1215 @@
+"""
+Tool registry with compiled validation of tool inputs.
+
+A :class:`ToolRegistry` holds the tools offered to Claude and their handlers.
+It validates the input of every ``tool_use`` block against the tool's
+``input_schema`` before calling the handler. An invalid input is answered with
+an error ``tool_result`` listing what is wrong, so Claude can correct the call.
+
+Schemas are compiled once into a tree of validator nodes. Each node checks
+only the keywords that apply to the JSON type of the value, found by a single
+dictionary lookup. Valid inputs only run boolean predicates; the checks that
+collect errors with their paths run for inputs that fail. ``$ref`` pointers
+are resolved at compile time. Compiled schemas are cached by the SHA-256 of
+their canonical JSON, so identical schemas used by several tools or
+registries are compiled once.
+
+Inputs streamed as ``input_json_delta`` events are checked as they arrive by
+a :class:`StreamingValidator`. Scalars, unexpected properties and missing
+required properties are reported as soon as they are complete, before the
+rest of the input has been generated.
+
+The supported keywords are ``type``, ``enum``, ``const``, ``properties``,
+``required``, ``additionalProperties``, ``patternProperties``,
+``minProperties``, ``maxProperties``, ``items``, ``prefixItems``,
+``additionalItems``, ``minItems``, ``maxItems``, ``uniqueItems``,
+``minLength``, ``maxLength``, ``pattern``, ``minimum``, ``maximum``,
+``exclusiveMinimum``, ``exclusiveMaximum``, ``multipleOf``, ``allOf``,
+``anyOf``, ``oneOf``, ``not`` and local ``$ref`` pointers. Other keywords,
+such as ``format``, are ignored.
+
+Example:
+    >>> registry = ToolRegistry()
+    >>> @registry.tool(input_schema={"type": "object", ...})
+    ... def get_weather(location, unit="celsius"):
+    ...     return f"22 degrees in {location}"
+    >>> response = client.messages_create(model, messages, tools=registry.definitions())
+    >>> messages.append({"role": "user", "content": registry.results(response)})
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import operator
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from fractions import Fraction
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+    Union,
+)
+
+from .exceptions import ToolInputError
+
+Path = Tuple[Union[str, int], ...]
+Check = Callable[[Any, List[Union[str, int]], List["ValidationError"]], None]
+Test = Callable[[Any], bool]
+
+# Compiled schemas kept by compile_schema()
+_CACHE_SIZE = 512
+
+_JSON_TYPES = {
+    "object": (dict,),
+    "array": (list,),
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "null": (type(None),),
+}
+_PYTHON_TYPES = (dict, list, str, int, float, bool, type(None))
+
+
+@dataclass(frozen=True)
+class ValidationError:
+    """
+    A way in which a value does not match its schema.
+
+    Attributes:
+        path: Keys and indexes leading from the input to the value.
+        message: What is wrong.
+        keyword: Schema keyword that failed, e.g. "required" or "type".
+    """
+
+    path: Path
+    message: str
+    keyword: str
+
+    def __str__(self) -> str:
+        location = "$" + "".join(
+            f"[{part}]" if isinstance(part, int) else f".{part}" for part in self.path
+        )
+        return f"{location}: {self.message}"
+
+
+def _freeze(value: Any) -> Any:
+    """
+    Make a JSON value hashable, keeping booleans apart from numbers.
+    """
+    if isinstance(value, bool):
+        return ("b", value)
+    if isinstance(value, (int, float)):
+        return ("n", value)
+    if isinstance(value, list):
+        return ("a", tuple(_freeze(item) for item in value))
+    if isinstance(value, dict):
+        return ("o", frozenset((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def _type_name(value: Any) -> str:
+    for name, types in _JSON_TYPES.items():
+        if type(value) in types:
+            return name
+    return type(value).__name__
+
+
+class _Node:
+    """
+    Compiled schema.
+
+    ``tests`` maps a Python type to predicates that apply to values of that
+    type and ``checks`` to the matching checks that report errors. Valid
+    values only run the predicates; the checks run when a predicate fails.
+    The other attributes let a streaming validator find the schemas of
+    nested values.
+    """
+
+    __slots__ = (
+        "tests",
+        "checks",
+        "types",
+        "properties",
+        "patterns",
+        "additional",
+        "prefix",
+        "items",
+        "required",
+    )
+
+    def __init__(self) -> None:
+        self.tests: Dict[type, Tuple[Test, ...]] = {}
+        self.checks: Dict[type, Tuple[Check, ...]] = {}
+        self.types: Optional[FrozenSet[str]] = None
+        self.properties: Dict[str, "_Node"] = {}
+        self.patterns: List[Tuple[Pattern, "_Node"]] = []
+        # True allows any additional property, False none
+        self.additional: Union[bool, "_Node"] = True
+        self.prefix: List["_Node"] = []
+        self.items: Union[bool, "_Node"] = True
+        self.required: Tuple[str, ...] = ()
+
+    def ok(self, value: Any) -> bool:
+        tests = self.tests.get(type(value))
+        if tests is None:
+            return False
+        for test in tests:
+            if not test(value):
+                return False
+        return True
+
+    def validate(
+        self,
+        value: Any,
+        path: List[Union[str, int]],
+        errors: List[ValidationError],
+    ) -> None:
+        checks = self.checks.get(type(value))
+        if checks is None:
+            errors.append(
+                ValidationError(
+                    tuple(path),
+                    f"{_type_name(value)} is not of type "
+                    + " or ".join(sorted(self.types or ())),
+                    "type",
+                )
+            )
+            return
+        for check in checks:
+            check(value, path, errors)
+
+    def child(self, key: Union[str, int]) -> Optional["_Node"]:
+        """
+        Return the schema of a property or item, or None if it is unknown
+        or not allowed.
+        """
+        if isinstance(key, int):
+            if key < len(self.prefix):
+                return self.prefix[key]
+            return self.items if isinstance(self.items, _Node) else None
+        node = self.properties.get(key)
+        if node is not None:
+            return node
+        for pattern, node in self.patterns:
+            if pattern.search(key):
+                return node
+        return self.additional if isinstance(self.additional, _Node) else None
+
+    def allows(self, key: str) -> bool:
+        """
+        Whether an object may have a property.
+        """
+        if self.additional is not False or key in self.properties:
+            return True
+        return any(pattern.search(key) for pattern, _ in self.patterns)
+
+    def accepts(self, json_type: str) -> bool:
+        """
+        Whether values of a JSON type can match.
+        """
+        return _JSON_TYPES[json_type][0] in self.checks
+
+
+# A predicate and the check reporting why it fails
+Rule = Tuple[Test, Check]
+
+
+class _Compiler:
+    """
+    Compiles a schema and the schemas its ``$ref`` pointers point to.
+    """
+
+    def __init__(self, root: Any):
+        self.root = root
+        self.refs: Dict[str, _Node] = {}
+
+    def ref(self, pointer: str) -> _Node:
+        node = self.refs.get(pointer)
+        if node is None:
+            if not pointer.startswith("#"):
+                raise ValueError(f"Only local $ref pointers are supported: {pointer}")
+            target = self.root
+            for part in pointer[1:].split("/")[1:]:
+                part = part.replace("~1", "/").replace("~0", "~")
+                target = target[int(part) if isinstance(target, list) else part]
+            # Registered before compiling, so recursive schemas terminate
+            node = self.refs[pointer] = _Node()
+            self.fill(node, target)
+        return node
+
+    def compile(self, schema: Any) -> _Node:
+        if isinstance(schema, dict) and set(schema) <= {"$ref", "description"}:
+            if "$ref" in schema:
+                return self.ref(schema["$ref"])
+        node = _Node()
+        self.fill(node, schema)
+        return node
+
+    def fill(self, node: _Node, schema: Any) -> None:
+        if schema is True or schema == {}:
+            node.tests = {t: () for t in _PYTHON_TYPES}
+            node.checks = {t: () for t in _PYTHON_TYPES}
+            return
+        if schema is False:
+            node.types = frozenset()
+            return
+        if not isinstance(schema, dict):
+            raise ValueError(f"Invalid schema: {schema!r}")
+
+        generic: List[Rule] = []
+        by_type: Dict[type, List[Rule]] = {t: [] for t in _PYTHON_TYPES}
+
+        types = schema.get("type")
+        if types is not None:
+            names = [types] if isinstance(types, str) else list(types)
+            node.types = frozenset(names)
+            allowed = {t for name in names for t in _JSON_TYPES[name]}
+            if "integer" in names and "number" not in names:
+                # 1.0 is an integer in JSON Schema
+                allowed.add(float)
+                by_type[float].append((float.is_integer, self._integral))
+            by_type = {t: rules for t, rules in by_type.items() if t in allowed}
+
+        if "$ref" in schema:
+            generic.append(self._allof([self.ref(schema["$ref"])]))
+        if "enum" in schema:
+            generic.append(self._enum(schema["enum"]))
+        if "const" in schema:
+            generic.append(self._enum([schema["const"]], "const"))
+        for keyword in ("allOf", "anyOf", "oneOf"):
+            if keyword in schema:
+                nodes = [self.compile(s) for s in schema[keyword]]
+                generic.append(getattr(self, "_" + keyword.lower())(nodes))
+        if "not" in schema:
+            generic.append(self._not(self.compile(schema["not"])))
+
+        self._object(node, schema, by_type)
+        self._array(node, schema, by_type)
+        if str in by_type:
+            by_type[str].extend(self._string(schema))
+        for rule in self._number(schema):
+            for numeric in (int, float):
+                if numeric in by_type:
+                    by_type[numeric].append(rule)
+
+        for t, rules in by_type.items():
+            rules = rules + generic
+            node.tests[t] = tuple(test for test, _ in rules)
+            node.checks[t] = tuple(check for _, check in rules)
+
+    @staticmethod
+    def _integral(value: float, path: List[Any], errors: List[ValidationError]) -> None:
+        if not value.is_integer():
+            errors.append(
+                ValidationError(tuple(path), f"{value} is not an integer", "type")
+            )
+
+    @staticmethod
+    def _enum(options: List[Any], keyword: str = "enum") -> Rule:
+        frozen = {_freeze(option) for option in options}
+
+        def test(value: Any) -> bool:
+            return _freeze(value) in frozen
+
+        def check(value: Any, path: List[Any], errors: List[ValidationError]) -> None:
+            if _freeze(value) not in frozen:
+                message = f"{json.dumps(value)} is not one of {json.dumps(options)}"
+                errors.append(ValidationError(tuple(path), message, keyword))
+
+        return test, check
+
+    @staticmethod
+    def _allof(nodes: List[_Node]) -> Rule:
+        def test(value: Any) -> bool:
+            for node in nodes:
+                if not node.ok(value):
+                    return False
+            return True
+
+        def check(value: Any, path: List[Any], errors: List[ValidationError]) -> None:
+            for node in nodes:
+                node.validate(value, path, errors)
+
+        return test, check
+
+    @staticmethod
+    def _anyof(nodes: List[_Node]) -> Rule:
+        def test(value: Any) -> bool:
+            for node in nodes:
+                if node.ok(value):
+                    return True
+            return False
+
+        def check(value: Any, path: List[Any], errors: List[ValidationError]) -> None:
+            if not test(value):
+                message = "does not match any of the allowed schemas"
+                errors.append(ValidationError(tuple(path), message, "anyOf"))
+
+        return test, check
+
+    @staticmethod
+    def _oneof(nodes: List[_Node]) -> Rule:
+        def test(value: Any) -> bool:
+            return sum(node.ok(value) for node in nodes) == 1
+
+        def check(value: Any, path: List[Any], errors: List[ValidationError]) -> None:
+            matches = sum(node.ok(value) for node in nodes)
+            if matches != 1:
+                message = f"matches {matches} of the schemas instead of exactly one"
+                errors.append(ValidationError(tuple(path), message, "oneOf"))
+
+        return test, check
+
+    @staticmethod
+    def _not(node: _Node) -> Rule:
+        def test(value: Any) -> bool:
+            return not node.ok(value)
+
+        def check(value: Any, path: List[Any], errors: List[ValidationError]) -> None:
+            if node.ok(value):
+                message = "matches a schema it must not match"
+                errors.append(ValidationError(tuple(path), message, "not"))
+
+        return test, check
+
+    def _object(
+        self, node: _Node, schema: Dict[str, Any], by_type: Dict[type, List[Rule]]
+    ) -> None:
+        node.properties = {
+            name: self.compile(s) for name, s in schema.get("properties", {}).items()
+        }
+        node.patterns = [
+            (re.compile(pattern), self.compile(s))
+            for pattern, s in schema.get("patternProperties", {}).items()
+        ]
+        additional = schema.get("additionalProperties", True)
+        if additional is not True and additional is not False:
+            additional = self.compile(additional)
+        node.additional = additional
+        node.required = tuple(schema.get("required", ()))
+        min_properties = schema.get("minProperties")
+        max_properties = schema.get("maxProperties")
+        if dict not in by_type:
+            return
+        low = min_properties or 0
+        high = max_properties if max_properties is not None else float("inf")
+
+        properties = node.properties
+        patterns = node.patterns
+        required = node.required
+        required_set = frozenset(required)
+
+        def test(value: Dict[str, Any]) -> bool:
+            if not required_set.issubset(value) or not low <= len(value) <= high:
+                return False
+            for key, item in value.items():
+                child = properties.get(key)
+                if child is not None:
+                    if not child.ok(item):
+                        return False
+                    continue
+                matched = False
+                for pattern, pattern_node in patterns:
+                    if pattern.search(key):
+                        if not pattern_node.ok(item):
+                            return False
+                        matched = True
+                if matched or additional is True:
+                    continue
+                if additional is False or not additional.ok(item):
+                    return False
+            return True
+
+        def check(value: Dict[str, Any], path: List[Any], errors: List[Any]) -> None:
+            for name in required:
+                if name not in value:
+                    message = f"{name!r} is a required property"
+                    errors.append(ValidationError(tuple(path), message, "required"))
+            for key, item in value.items():
+                child = properties.get(key)
+                if child is None:
+                    for pattern, pattern_node in patterns:
+                        if pattern.search(key):
+                            path.append(key)
+                            pattern_node.validate(item, path, errors)
+                            path.pop()
+                            child = pattern_node
+                    if child is not None:
+                        continue
+                    if additional is True:
+                        continue
+                    if additional is False:
+                        message = f"unexpected property {key!r}"
+                        errors.append(
+                            ValidationError(
+                                tuple(path), message, "additionalProperties"
+                            )
+                        )
+                        continue
+                    child = additional
+                path.append(key)
+                child.validate(item, path, errors)
+                path.pop()
+            if len(value) < low:
+                message = f"has fewer than {low} properties"
+                errors.append(ValidationError(tuple(path), message, "minProperties"))
+            if len(value) > high:
+                message = f"has more than {high} properties"
+                errors.append(ValidationError(tuple(path), message, "maxProperties"))
+
+        by_type[dict].append((test, check))
+
+    def _array(
+        self, node: _Node, schema: Dict[str, Any], by_type: Dict[type, List[Rule]]
+    ) -> None:
+        items = schema.get("items", True)
+        prefix = schema.get("prefixItems", [])
+        if isinstance(items, list):
+            # Draft 7 tuple validation
+            prefix, items = items, schema.get("additionalItems", True)
+        node.prefix = [self.compile(s) for s in prefix]
+        if items is not True and items is not False:
+            items = self.compile(items)
+        node.items = items
+        min_items = schema.get("minItems")
+        max_items = schema.get("maxItems")
+        unique = schema.get("uniqueItems", False)
+        if list not in by_type:
+            return
+        low = min_items or 0
+        high = max_items if max_items is not None else float("inf")
+        if items is False:
+            high = min(high, len(prefix))
+
+        prefix_nodes = node.prefix
+        item_ok = items.ok if isinstance(items, _Node) else None
+
+        def test(value: List[Any]) -> bool:
+            if not low <= len(value) <= high:
+                return False
+            for item, child in zip(value, prefix_nodes):
+                if not child.ok(item):
+                    return False
+            if item_ok is not None:
+                for index in range(len(prefix_nodes), len(value)):
+                    if not item_ok(value[index]):
+                        return False
+            if unique and len({_freeze(item) for item in value}) < len(value):
+                return False
+            return True
+
+        def check(value: List[Any], path: List[Any], errors: List[Any]) -> None:
+            for index, item in enumerate(value):
+                child = prefix_nodes[index] if index < len(prefix_nodes) else items
+                if child is True:
+                    continue
+                if child is False:
+                    message = f"has more than {len(prefix_nodes)} items"
+                    errors.append(ValidationError(tuple(path), message, "items"))
+                    break
+                path.append(index)
+                child.validate(item, path, errors)
+                path.pop()
+            if len(value) < low:
+                message = f"has fewer than {low} items"
+                errors.append(ValidationError(tuple(path), message, "minItems"))
+            if max_items is not None and len(value) > max_items:
+                message = f"has more than {max_items} items"
+                errors.append(ValidationError(tuple(path), message, "maxItems"))
+            if unique and len({_freeze(item) for item in value}) < len(value):
+                message = "has non-unique items"
+                errors.append(ValidationError(tuple(path), message, "uniqueItems"))
+
+        by_type[list].append((test, check))
+
+    @staticmethod
+    def _string(schema: Dict[str, Any]) -> List[Rule]:
+        rules: List[Rule] = []
+        min_length = schema.get("minLength")
+        max_length = schema.get("maxLength")
+        pattern = schema.get("pattern")
+        if min_length is not None or max_length is not None:
+            low = min_length or 0
+            high = max_length if max_length is not None else float("inf")
+
+            def length(value: str, path: List[Any], errors: List[Any]) -> None:
+                if len(value) < low:
+                    message = f"{value!r} is shorter than {low} characters"
+                    errors.append(ValidationError(tuple(path), message, "minLength"))
+                elif len(value) > high:
+                    message = f"{value!r} is longer than {high} characters"
+                    errors.append(ValidationError(tuple(path), message, "maxLength"))
+
+            rules.append((lambda value: low <= len(value) <= high, length))
+        if pattern is not None:
+            search = re.compile(pattern).search
+
+            def matches(value: str, path: List[Any], errors: List[Any]) -> None:
+                if search(value) is None:
+                    message = f"{value!r} does not match {pattern!r}"
+                    errors.append(ValidationError(tuple(path), message, "pattern"))
+
+            rules.append((lambda value: search(value) is not None, matches))
+        return rules
+
+    @staticmethod
+    def _number(schema: Dict[str, Any]) -> List[Rule]:
+        rules: List[Rule] = []
+        bounds = [
+            (keyword, schema[keyword], compare)
+            for keyword, compare in (
+                ("minimum", operator.ge),
+                ("maximum", operator.le),
+                ("exclusiveMinimum", operator.gt),
+                ("exclusiveMaximum", operator.lt),
+            )
+            if isinstance(schema.get(keyword), (int, float))
+            and not isinstance(schema.get(keyword), bool)
+        ]
+        if bounds:
+
+            def within(value: Any) -> bool:
+                for _, bound, compare in bounds:
+                    if not compare(value, bound):
+                        return False
+                return True
+
+            def bounded(value: Any, path: List[Any], errors: List[Any]) -> None:
+                for keyword, bound, compare in bounds:
+                    if not compare(value, bound):
+                        message = f"{value} violates {keyword} {bound}"
+                        errors.append(ValidationError(tuple(path), message, keyword))
+
+            rules.append((within, bounded))
+        multiple = schema.get("multipleOf")
+        if multiple is not None:
+
+            def divides(value: Any) -> bool:
+                try:
+                    quotient = value / multiple
+                except OverflowError:
+                    quotient = math.inf
+                finite = not isinstance(value, float) or math.isfinite(value)
+                if math.isinf(quotient) and finite:
+                    # Past the float range; divide exactly instead
+                    return Fraction(value) % Fraction(multiple) == 0
+                return float(quotient).is_integer()
+
+            def multiple_of(value: Any, path: List[Any], errors: List[Any]) -> None:
+                if not divides(value):
+                    message = f"{value} is not a multiple of {multiple}"
+                    errors.append(ValidationError(tuple(path), message, "multipleOf"))
+
+            rules.append((divides, multiple_of))
+        return rules
+
+
+class Validator:
+    """
+    Compiled JSON Schema. Create it with :func:`compile_schema`.
+
+    Args:
+        schema (Dict[str, Any]): The schema.
+    """
+
+    def __init__(self, schema: Any):
+        self.schema = schema
+        self.root = _Compiler(schema).compile(schema)
+
+    def validate(self, instance: Any) -> List[ValidationError]:
+        """
+        Validate a value.
+
+        Args:
+            instance (Any): Decoded JSON value.
+
+        Returns:
+            List[ValidationError]: Every error found; empty if the value is valid.
+        """
+        if self.root.ok(instance):
+            return []
+        errors: List[ValidationError] = []
+        self.root.validate(instance, [], errors)
+        return errors
+
+    def is_valid(self, instance: Any) -> bool:
+        """
+        Whether a value matches the schema.
+        """
+        return self.root.ok(instance)
+
+    def streaming(self) -> "StreamingValidator":
+        """
+        Return a validator for a value that arrives as chunks of JSON text.
+        """
+        return StreamingValidator(self)
+
+
+_cache: "OrderedDict[str, Validator]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def schema_hash(schema: Any) -> str:
+    """
+    Return the SHA-256 of the canonical JSON of a schema.
+    """
+    canonical = json.dumps(schema, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def compile_schema(schema: Any) -> Validator:
+    """
+    Compile a JSON Schema, or return the cached validator of an identical one.
+
+    Args:
+        schema (Dict[str, Any]): The schema.
+
+    Returns:
+        Validator: The compiled schema.
+
+    Raises:
+        ValueError: If the schema is invalid or has a non-local ``$ref``.
+    """
+    key = schema_hash(schema)
+    with _cache_lock:
+        validator = _cache.get(key)
+        if validator is not None:
+            _cache.move_to_end(key)
+            return validator
+    validator = Validator(schema)
+    with _cache_lock:
+        validator = _cache.setdefault(key, validator)
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return validator
+
+
+class _Frame:
+    __slots__ = ("node", "is_object", "key", "index", "seen", "state")
+
+    def __init__(self, node: Optional[_Node], is_object: bool):
+        self.node = node
+        self.is_object = is_object
+        self.key: Optional[str] = None
+        self.index = 0
+        self.seen: List[str] = []
+        # Objects: "key", "colon", "value", "comma". Arrays: "value", "comma".
+        self.state = "key" if is_object else "value"
+
+
+_WHITESPACE = " \t\r\n"
+_SCALAR_END = re.compile(r"[\s,\]}]")
+
+
+class StreamingValidator:
+    """
+    Validates a JSON value whose text arrives in chunks, such as the
+    ``input_json_delta`` events of a streamed ``tool_use`` block.
+
+    Errors in complete scalars, unexpected properties and missing required
+    properties are reported by :meth:`feed` as soon as they can be seen.
+    :meth:`close` validates the whole value and returns every error.
+
+    Args:
+        validator (Validator): The compiled schema.
+    """
+
+    def __init__(self, validator: Validator):
+        self.validator = validator
+        self.errors: List[ValidationError] = []
+        self._text: List[str] = []
+        self._stack: List[_Frame] = []
+        self._started = False
+        self._token: Optional[List[str]] = None
+        self._in_string = False
+        self._escaped = False
+        self._broken = False
+
+    def _value_node(self) -> Optional[_Node]:
+        """
+        Return the schema of the value starting now.
+        """
+        if not self._stack:
+            return None if self._started else self.validator.root
+        frame = self._stack[-1]
+        if frame.node is None:
+            return None
+        key = frame.key if frame.is_object else frame.index
+        return frame.node.child(key)  # type: ignore[arg-type]
+
+    def _child_path(self) -> List[Any]:
+        """
+        Return the path of the value starting now.
+        """
+        return [frame.key if frame.is_object else frame.index for frame in self._stack]
+
+    def _end_value(self) -> None:
+        if not self._stack:
+            self._started = True
+            return
+        frame = self._stack[-1]
+        frame.state = "comma"
+
+    def _scalar(self, text: str) -> None:
+        try:
+            value = json.loads(text)
+        except ValueError:
+            self._broken = True
+            return
+        frame = self._stack[-1] if self._stack else None
+        if frame is not None and frame.is_object and frame.state == "key":
+            frame.key = value
+            frame.seen.append(value)
+            frame.state = "colon"
+            if frame.node is not None and not frame.node.allows(value):
+                message = f"unexpected property {value!r}"
+                self.errors.append(
+                    ValidationError(
+                        tuple(self._child_path()[:-1]), message, "additionalProperties"
+                    )
+                )
+            return
+        node = self._value_node()
+        if node is not None:
+            node.validate(value, self._child_path(), self.errors)
+        self._end_value()
+
+    def _close_container(self) -> None:
+        frame = self._stack.pop()
+        if frame.is_object and frame.node is not None:
+            path = tuple(self._child_path())
+            for name in frame.node.required:
+                if name not in frame.seen:
+                    message = f"{name!r} is a required property"
+                    self.errors.append(ValidationError(path, message, "required"))
+        self._end_value()
+
+    def feed(self, chunk: str) -> List[ValidationError]:
+        """
+        Add a chunk of the JSON text.
+
+        Args:
+            chunk (str): The chunk.
+
+        Returns:
+            List[ValidationError]: Errors found in this chunk.
+        """
+        self._text.append(chunk)
+        if self._broken:
+            return []
+        found = len(self.errors)
+        i = 0
+        n = len(chunk)
+        while i < n and not self._broken:
+            if self._in_string:
+                token = self._token
+                assert token is not None
+                while i < n:
+                    char = chunk[i]
+                    if self._escaped:
+                        self._escaped = False
+                    elif char == "\\":
+                        self._escaped = True
+                    elif char == '"':
+                        break
+                    else:
+                        # Copy the run of ordinary characters at once
+                        end = i + 1
+                        while end < n and chunk[end] not in '"\\':
+                            end += 1
+                        token.append(chunk[i:end])
+                        i = end
+                        continue
+                    token.append(char)
+                    i += 1
+                if i < n:
+                    token.append('"')
+                    i += 1
+                    self._in_string = False
+                    self._token = None
+                    self._scalar("".join(token))
+                continue
+            if self._token is not None:
+                match = _SCALAR_END.search(chunk, i)
+                end = match.start() if match else n
+                self._token.append(chunk[i:end])
+                i = end
+                if match:
+                    text = "".join(self._token)
+                    self._token = None
+                    self._scalar(text)
+                continue
+            char = chunk[i]
+            i += 1
+            if char in _WHITESPACE:
+                continue
+            frame = self._stack[-1] if self._stack else None
+            if char == '"':
+                if frame is None or frame.state in ("key", "value"):
+                    self._in_string = True
+                    self._token = ['"']
+                    continue
+            elif frame is not None and char == ":" and frame.state == "colon":
+                frame.state = "value"
+                continue
+            elif frame is not None and char == "," and frame.state == "comma":
+                if frame.is_object:
+                    frame.state = "key"
+                else:
+                    frame.index += 1
+                    frame.state = "value"
+                continue
+            elif (
+                frame is not None and char in "}]" and frame.is_object == (char == "}")
+            ):
+                if frame.state in ("comma", "key" if frame.is_object else "value"):
+                    self._close_container()
+                    continue
+            elif frame is None or frame.state == "value":
+                if frame is None and self._started:
+                    self._broken = True
+                    continue
+                node = self._value_node()
+                path = self._child_path()
+                if char in "{[":
+                    kind = "object" if char == "{" else "array"
+                    if node is not None and not node.accepts(kind):
+                        message = f"{kind} is not of type " + " or ".join(
+                            sorted(node.types or ())
+                        )
+                        self.errors.append(
+                            ValidationError(tuple(path), message, "type")
+                        )
+                        node = None
+                    self._stack.append(_Frame(node, char == "{"))
+                    continue
+                if char in "-0123456789tfn":
+                    self._token = [char]
+                    continue
+            self._broken = True
+        return self.errors[found:]
+
+    def close(self) -> Tuple[Any, List[ValidationError]]:
+        """
+        Parse and validate the complete text.
+
+        Returns:
+            Tuple[Any, List[ValidationError]]: The decoded value, or None if
+                the text is not valid JSON, and every error found.
+        """
+        text = "".join(self._text)
+        try:
+            value = json.loads(text) if text.strip() else {}
+        except ValueError as e:
+            return None, [ValidationError((), f"invalid JSON: {e}", "json")]
+        return value, self.validator.validate(value)
+
+
+@dataclass
+class Tool:
+    """
+    A tool of a :class:`ToolRegistry`.
+
+    Attributes:
+        name: Name of the tool.
+        input_schema: JSON Schema of its input.
+        handler: Called with the input as keyword arguments. May be a
+            coroutine function.
+        description: Description shown to Claude.
+        validator: The compiled input schema.
+    """
+
+    name: str
+    input_schema: Dict[str, Any]
+    handler: Optional[Callable[..., Any]] = None
+    description: Optional[str] = None
+    validator: Validator = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.validator = compile_schema(self.input_schema)
+
+    def definition(self) -> Dict[str, Any]:
+        """
+        Return the tool as passed in the ``tools`` of a request.
+        """
+        definition: Dict[str, Any] = {"name": self.name}
+        if self.description:
+            definition["description"] = self.description
+        definition["input_schema"] = self.input_schema
+        return definition
+
+
+def _error_result(tool_use_id: str, text: str) -> Dict[str, Any]:
+    return {
+        "type": "tool_result",
+        "tool_use_id": tool_use_id,
+        "content": text,
+        "is_error": True,
+    }
+
+
+def _content(result: Any) -> Any:
+    if isinstance(result, (str, list)):
+        return result
+    if result is None:
+        return ""
+    return json.dumps(result)
+
+
+class ToolRegistry:
+    """
+    Tools offered to Claude, with validated calls to their handlers.
+
+    Example:
+        >>> registry = ToolRegistry()
+        >>> registry.register("get_weather", schema, handler=get_weather)
+        >>> registry.check("get_weather", {"location": "Paris"})
+    """
+
+    def __init__(self) -> None:
+        self.tools: Dict[str, Tool] = {}
+
+    def register(
+        self,
+        name: str,
+        input_schema: Dict[str, Any],
+        handler: Optional[Callable[..., Any]] = None,
+        description: Optional[str] = None,
+    ) -> Tool:
+        """
+        Add a tool, replacing any tool of the same name.
+
+        Args:
+            name (str): Name of the tool.
+            input_schema (Dict[str, Any]): JSON Schema of its input.
+            handler (Callable, optional): Called with the input as keyword
+                arguments by :meth:`run`.
+            description (str, optional): Description shown to Claude.
+
+        Returns:
+            Tool: The tool.
+        """
+        tool = Tool(name, input_schema, handler, description)
+        self.tools[name] = tool
+        return tool
+
+    def tool(
+        self,
+        input_schema: Dict[str, Any],
+        name: Optional[str] = None,
+        description: Optional[str] = None,
+    ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """
+        Decorator registering a function as the handler of a tool. The name
+        and description default to the function's name and docstring.
+        """
+
+        def decorator(function: Callable[..., Any]) -> Callable[..., Any]:
+            doc = (function.__doc__ or "").strip() or None
+            self.register(
+                name or function.__name__, input_schema, function, description or doc
+            )
+            return function
+
+        return decorator
+
+    def definitions(self) -> List[Dict[str, Any]]:
+        """
+        Return the ``tools`` argument of a request offering every tool.
+        """
+        return [tool.definition() for tool in self.tools.values()]
+
+    def _tool(self, name: str) -> Tool:
+        tool = self.tools.get(name)
+        if tool is None:
+            raise ToolInputError(f"Unknown tool {name!r}", tool=name)
+        return tool
+
+    def validate(self, name: str, tool_input: Any) -> List[ValidationError]:
+        """
+        Validate the input of a tool call.
+
+        Args:
+            name (str): Name of the tool.
+            tool_input (Any): The input.
+
+        Returns:
+            List[ValidationError]: Every error found.
+
+        Raises:
+            ToolInputError: If there is no tool with that name.
+        """
+        return self._tool(name).validator.validate(tool_input)
+
+    def check(self, name: str, tool_input: Any) -> None:
+        """
+        Validate the input of a tool call, raising if it is invalid.
+
+        Raises:
+            ToolInputError: If the tool is unknown or the input is invalid.
+        """
+        errors = self.validate(name, tool_input)
+        if errors:
+            raise ToolInputError(
+                f"Invalid input for tool {name!r}: " + "; ".join(map(str, errors)),
+                tool=name,
+                errors=errors,
+            )
+
+    def _prepare(self, tool_use: Dict[str, Any]) -> Union[Tool, Dict[str, Any]]:
+        try:
+            self.check(tool_use["name"], tool_use.get("input") or {})
+        except ToolInputError as e:
+            return _error_result(tool_use["id"], e.message)
+        tool = self.tools[tool_use["name"]]
+        if tool.handler is None:
+            return _error_result(tool_use["id"], f"Tool {tool.name!r} has no handler")
+        return tool
+
+    def run(self, tool_use: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validate a ``tool_use`` block and call its tool's handler.
+
+        Args:
+            tool_use (Dict[str, Any]): The block.
+
+        Returns:
+            Dict[str, Any]: The ``tool_result`` block. It is an error result
+                listing what is wrong if the input is invalid, and holds the
+                message of the exception if the handler raises.
+        """
+        tool = self._prepare(tool_use)
+        if isinstance(tool, dict):
+            return tool
+        assert tool.handler is not None
+        try:
+            result = tool.handler(**(tool_use.get("input") or {}))
+            if asyncio.iscoroutine(result):
+                result.close()
+                raise TypeError(f"Handler of {tool.name!r} is async; use arun()")
+        except Exception as e:
+            return _error_result(tool_use["id"], str(e))
+        return {
+            "type": "tool_result",
+            "tool_use_id": tool_use["id"],
+            "content": _content(result),
+        }
+
+    async def arun(self, tool_use: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Like :meth:`run`, awaiting handlers that are coroutine functions.
+        """
+        tool = self._prepare(tool_use)
+        if isinstance(tool, dict):
+            return tool
+        assert tool.handler is not None
+        try:
+            result = tool.handler(**(tool_use.get("input") or {}))
+            if asyncio.iscoroutine(result):
+                result = await result
+        except Exception as e:
+            return _error_result(tool_use["id"], str(e))
+        return {
+            "type": "tool_result",
+            "tool_use_id": tool_use["id"],
+            "content": _content(result),
+        }
+
+    def results(self, response: Any) -> List[Dict[str, Any]]:
+        """
+        Run every tool call of a response.
+
+        Args:
+            response (Any): A response dictionary, or a streamed
+                :class:`~claude_sdk.streaming.Message`.
+
+        Returns:
+            List[Dict[str, Any]]: The ``tool_result`` blocks, in order.
+        """
+        content = (
+            response["content"] if isinstance(response, dict) else response.content
+        )
+        return [self.run(b) for b in content if b.get("type") == "tool_use"]
+
+    def event_validator(
+        self,
+        on_error: Optional[
+            Callable[[Dict[str, Any], List[ValidationError]], None]
+        ] = None,
+    ) -> "ToolEventValidator":
+        """
+        Return a callback validating tool inputs as they stream, for the
+        ``on_event`` argument of :class:`~claude_sdk.streaming.MessageAccumulator`.
+
+        Args:
+            on_error (Callable, optional): Called with the ``tool_use`` block
+                and the new errors whenever errors are found.
+        """
+        return ToolEventValidator(self, on_error)
+
+
+class ToolEventValidator:
+    """
+    Validates the inputs of ``tool_use`` blocks in a stream of events.
+
+    Args:
+        registry (ToolRegistry): Registry of the tools.
+        on_error (Callable, optional): Called with the ``tool_use`` block and
+            the new errors whenever errors are found.
+
+    Attributes:
+        errors: Errors found so far, by content block index.
+    """
+
+    def __init__(
+        self,
+        registry: ToolRegistry,
+        on_error: Optional[
+            Callable[[Dict[str, Any], List[ValidationError]], None]
+        ] = None,
+    ):
+        self.registry = registry
+        self.on_error = on_error
+        self.errors: Dict[int, List[ValidationError]] = {}
+        self._blocks: Dict[int, Tuple[Dict[str, Any], StreamingValidator]] = {}
+
+    def _report(self, index: int, errors: List[ValidationError]) -> None:
+        if not errors:
+            return
+        self.errors.setdefault(index, []).extend(errors)
+        if self.on_error is not None:
+            self.on_error(self._blocks[index][0], errors)
+
+    def __call__(self, event: Dict[str, Any]) -> None:
+        kind = event.get("type")
+        if kind == "content_block_start":
+            block = event["content_block"]
+            tool = self.registry.tools.get(block.get("name", ""))
+            if block.get("type") == "tool_use" and tool is not None:
+                self._blocks[event["index"]] = (block, tool.validator.streaming())
+        elif kind == "content_block_delta":
+            entry = self._blocks.get(event["index"])
+            delta = event["delta"]
+            if entry is not None and delta.get("type") == "input_json_delta":
+                self._report(event["index"], entry[1].feed(delta["partial_json"]))
+        elif kind == "content_block_stop":
+            entry = self._blocks.get(event["index"])
+            if entry is not None:
+                _, errors = entry[1].close()
+                index = event["index"]
+                known = set(self.errors.get(index, ()))
+                self._report(index, [e for e in errors if e not in known])
+                # The complete validation supersedes the early errors
+                self.errors[index] = errors
+                if not errors:
+                    del self.errors[index]
@@ -0,0 +1,790 @@
+"""
+Pluggable HTTP transports for the Claude clients.
+
+``Claude`` sends requests through a :class:`Transport` and ``AsyncClaude``
+through an :class:`AsyncTransport`. The default transports keep a pooled
+``requests.Session`` and ``aiohttp.ClientSession`` respectively. The recording
+and replay transports capture real exchanges, including the timing of every
+streamed line, to compact cassette files and serve them back without network
+access.
+
+Sync responses expose ``status_code``, ``headers``, ``content``, ``json()``,
+``iter_lines()`` and ``close()``, like ``requests.Response``. Async responses
+expose ``status_code``, ``headers``, ``await read()``, ``await json()``,
+``async for line in iter_lines()`` and ``await aclose()``.
+
+:class:`HTTPXTransport` and :class:`AsyncHTTPXTransport` multiplex many
+concurrent requests and streams over a few HTTP/2 connections. They require the
+optional ``httpx[http2]`` dependency.
+"""
+
+import asyncio
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    AsyncIterator,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from urllib.parse import urlsplit
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+# Response headers worth keeping in cassettes; everything else is noise
+_RECORDED_HEADERS = ("content-type", "retry-after", "request-id")
+
+
+@dataclass
+class TransportRequest:
+    """
+    A request handed to a transport.
+
+    Attributes:
+        method: HTTP method.
+        url: Absolute URL.
+        headers: Request headers.
+        json: JSON payload. Transports serialize it unless ``content`` is set.
+        content: Pre-encoded request body, either bytes or an iterable of chunks.
+        stream: Whether the response body should be streamed.
+        timeout: Timeout in seconds, or None for no timeout.
+    """
+
+    method: str
+    url: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    json: Any = None
+    content: Optional[Union[bytes, Iterable[bytes]]] = None
+    stream: bool = False
+    timeout: Optional[float] = None
+
+
+def is_timeout(error: BaseException) -> bool:
+    """
+    Check whether an exception raised by a transport is a timeout.
+
+    Args:
+        error (BaseException): Exception raised while sending a request.
+
+    Returns:
+        bool: True for timeouts of any of the supported HTTP libraries.
+    """
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, requests.Timeout)):
+        return True
+    # Only check httpx if it has been imported by an HTTP/2 transport
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(error, httpx.TimeoutException)
+
+
+class Transport:
+    """
+    Base class for synchronous transports.
+    """
+
+    def send(self, request: TransportRequest) -> Any:
+        """
+        Send a request.
+
+        Args:
+            request (TransportRequest): The request to send.
+
+        Returns:
+            A response object with the interface described in the module docstring.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        Release any pooled connections.
+        """
+
+
+class AsyncTransport:
+    """
+    Base class for asynchronous transports.
+    """
+
+    async def send(self, request: TransportRequest) -> Any:
+        """
+        Send a request.
+
+        Args:
+            request (TransportRequest): The request to send.
+
+        Returns:
+            A response object with the interface described in the module docstring.
+        """
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        """
+        Release any pooled connections.
+        """
+
+
+async def _aiter_content(chunks: Iterable[bytes]) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+def _async_content(content: Optional[Union[bytes, Iterable[bytes]]]) -> Any:
+    """
+    Adapt a request body for async HTTP libraries, which only stream
+    asynchronous iterables.
+    """
+    if content is None or isinstance(content, (bytes, bytearray)):
+        return content
+    if hasattr(content, "__aiter__"):
+        return content
+    return _aiter_content(content)
+
+
+class RequestsTransport(Transport):
+    """
+    Transport backed by a pooled ``requests.Session``.
+
+    Args:
+        session (requests.Session, optional): Session to use. A new one is created
+            if not provided.
+        pool_maxsize (int, optional): Maximum number of pooled connections per host.
+    """
+
+    def __init__(
+        self, session: Optional[requests.Session] = None, pool_maxsize: int = 100
+    ):
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=pool_maxsize)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+
+    def send(self, request: TransportRequest) -> requests.Response:
+        return self.session.request(
+            request.method,
+            request.url,
+            headers=request.headers,
+            json=request.json if request.content is None else None,
+            data=request.content,
+            stream=request.stream,
+            timeout=request.timeout,
+        )
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AiohttpResponse:
+    """
+    Adapter giving an ``aiohttp.ClientResponse`` the async response interface.
+
+    Args:
+        response (aiohttp.ClientResponse): The wrapped response.
+    """
+
+    def __init__(self, response: aiohttp.ClientResponse):
+        self._response = response
+        self.status_code = response.status
+        self.headers = response.headers
+
+    async def read(self) -> bytes:
+        try:
+            return await self._response.read()
+        finally:
+            self._response.release()
+
+    async def json(self) -> Any:
+        return json.loads(await self.read())
+
+    async def iter_lines(self) -> AsyncIterator[bytes]:
+        async for line in self._response.content:
+            yield line.rstrip(b"\r\n")
+
+    async def aclose(self) -> None:
+        # A fully read response can go back to the pool; otherwise drop the
+        # connection so the server stops sending
+        if self._response.content.at_eof():
+            self._response.release()
+        else:
+            self._response.close()
+
+
+class AiohttpTransport(AsyncTransport):
+    """
+    Transport backed by a pooled ``aiohttp.ClientSession``.
+
+    The session is created lazily on first use, and recreated if the client is
+    later used from a different event loop.
+
+    Args:
+        limit (int, optional): Maximum number of simultaneous connections.
+        **session_kwargs: Extra keyword arguments for ``aiohttp.ClientSession``.
+    """
+
+    def __init__(self, limit: int = 100, **session_kwargs: Any):
+        self.limit = limit
+        self.session_kwargs = session_kwargs
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit),
+                **self.session_kwargs,
+            )
+            self._loop = loop
+        return self._session
+
+    async def send(self, request: TransportRequest) -> AiohttpResponse:
+        session = self._get_session()
+        kwargs: Dict[str, Any] = {}
+        if request.timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=request.timeout)
+        response = await session.request(
+            request.method,
+            request.url,
+            headers=request.headers,
+            json=request.json if request.content is None else None,
+            data=_async_content(request.content),
+            **kwargs,
+        )
+        return AiohttpResponse(response)
+
+    async def aclose(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+def _import_httpx() -> Any:
+    try:
+        import httpx
+    except ImportError as e:
+        raise ImportError(
+            "HTTP/2 transports require httpx with HTTP/2 support. "
+            "Install it with: pip install 'claude-sdk[http2]'"
+        ) from e
+    return httpx
+
+
+class HTTPXResponse:
+    """
+    Adapter giving an ``httpx.Response`` the sync response interface.
+
+    Args:
+        response (httpx.Response): The wrapped response.
+    """
+
+    def __init__(self, response: Any):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    @property
+    def content(self) -> bytes:
+        content: bytes = self._response.read()
+        return content
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def iter_lines(self) -> Iterator[bytes]:
+        for line in self._response.iter_lines():
+            yield line.encode("utf-8")
+
+    def close(self) -> None:
+        self._response.close()
+
+
+class AsyncHTTPXResponse:
+    """
+    Adapter giving an ``httpx.Response`` the async response interface.
+
+    Args:
+        response (httpx.Response): The wrapped response.
+    """
+
+    def __init__(self, response: Any):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    async def read(self) -> bytes:
+        try:
+            body: bytes = await self._response.aread()
+            return body
+        finally:
+            await self._response.aclose()
+
+    async def json(self) -> Any:
+        return json.loads(await self.read())
+
+    async def iter_lines(self) -> AsyncIterator[bytes]:
+        async for line in self._response.aiter_lines():
+            yield line.encode("utf-8")
+
+    async def aclose(self) -> None:
+        await self._response.aclose()
+
+
+def _httpx_client_kwargs(
+    httpx: Any, http2: bool, max_connections: int, client_kwargs: Dict[str, Any]
+) -> Dict[str, Any]:
+    kwargs = {
+        "http2": http2,
+        "limits": httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+        "timeout": None,
+    }
+    kwargs.update(client_kwargs)
+    return kwargs
+
+
+class HTTPXTransport(Transport):
+    """
+    Synchronous transport backed by ``httpx``, multiplexing over HTTP/2.
+
+    Args:
+        http2 (bool, optional): Whether to negotiate HTTP/2.
+        max_connections (int, optional): Maximum number of connections. With
+            HTTP/2 each connection carries many concurrent streams.
+        **client_kwargs: Extra keyword arguments for ``httpx.Client``, e.g.
+            ``http1=False`` to use HTTP/2 with prior knowledge on cleartext URLs.
+    """
+
+    def __init__(
+        self, http2: bool = True, max_connections: int = 10, **client_kwargs: Any
+    ):
+        httpx = _import_httpx()
+        self.client = httpx.Client(
+            **_httpx_client_kwargs(httpx, http2, max_connections, client_kwargs)
+        )
+
+    def send(self, request: TransportRequest) -> HTTPXResponse:
+        built = self.client.build_request(
+            request.method,
+            request.url,
+            headers=request.headers,
+            json=request.json if request.content is None else None,
+            content=request.content,
+            timeout=request.timeout,
+        )
+        response = self.client.send(built, stream=True)
+        if not request.stream:
+            response.read()
+        return HTTPXResponse(response)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+class AsyncHTTPXTransport(AsyncTransport):
+    """
+    Asynchronous transport backed by ``httpx``, multiplexing over HTTP/2.
+
+    Args:
+        http2 (bool, optional): Whether to negotiate HTTP/2.
+        max_connections (int, optional): Maximum number of connections. With
+            HTTP/2 each connection carries many concurrent streams.
+        **client_kwargs: Extra keyword arguments for ``httpx.AsyncClient``, e.g.
+            ``http1=False`` to use HTTP/2 with prior knowledge on cleartext URLs.
+    """
+
+    def __init__(
+        self, http2: bool = True, max_connections: int = 10, **client_kwargs: Any
+    ):
+        httpx = _import_httpx()
+        self.client = httpx.AsyncClient(
+            **_httpx_client_kwargs(httpx, http2, max_connections, client_kwargs)
+        )
+
+    async def send(self, request: TransportRequest) -> AsyncHTTPXResponse:
+        built = self.client.build_request(
+            request.method,
+            request.url,
+            headers=request.headers,
+            json=request.json if request.content is None else None,
+            content=_async_content(request.content),
+            timeout=request.timeout,
+        )
+        response = await self.client.send(built, stream=True)
+        if not request.stream:
+            await response.aread()
+        return AsyncHTTPXResponse(response)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+def request_fingerprint(request: TransportRequest) -> str:
+    """
+    Compute the key under which a request is stored in a cassette.
+
+    The key covers the method, path and a hash of the canonical JSON payload, so
+    it does not depend on the host, headers or dictionary ordering.
+
+    Args:
+        request (TransportRequest): The request.
+
+    Returns:
+        str: The fingerprint.
+    """
+    if request.json is not None:
+        body = json.dumps(
+            request.json, sort_keys=True, separators=(",", ":"), default=str
+        ).encode("utf-8")
+    elif isinstance(request.content, bytes):
+        body = request.content
+    else:
+        body = b""
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return f"{request.method} {urlsplit(request.url).path} {digest}"
+
+
+class CassetteMissError(LookupError):
+    """
+    Raised when a replayed request has no recorded interaction.
+    """
+
+
+class Cassette:
+    """
+    A JSON-lines file of recorded request/response interactions.
+
+    Each line holds one interaction: the request fingerprint, status, a subset
+    of the response headers, the time to the response headers and either the
+    full body or the streamed lines with the delay before each of them.
+
+    Args:
+        path (str): Path of the cassette file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, Deque[Dict[str, Any]]]:
+        """
+        Load the interactions grouped by request fingerprint, in recorded order.
+
+        Returns:
+            Dict[str, Deque[Dict[str, Any]]]: Interactions per fingerprint.
+        """
+        interactions: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    interaction = json.loads(line)
+                    interactions[interaction["request"]].append(interaction)
+        return interactions
+
+    def append(self, interaction: Dict[str, Any]) -> None:
+        """
+        Append an interaction to the cassette.
+
+        Args:
+            interaction (Dict[str, Any]): The interaction to write.
+        """
+        line = json.dumps(interaction, separators=(",", ":"))
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def _recorded_headers(headers: Any) -> Dict[str, str]:
+    return {
+        name.lower(): value
+        for name, value in headers.items()
+        if name.lower() in _RECORDED_HEADERS
+        or name.lower().startswith("anthropic-ratelimit-")
+    }
+
+
+class ReplayResponse:
+    """
+    Synchronous response served from a cassette interaction.
+
+    Args:
+        interaction (Dict[str, Any]): The recorded interaction.
+        realtime (bool, optional): Whether to reproduce the recorded line timing.
+    """
+
+    def __init__(self, interaction: Dict[str, Any], realtime: bool = False):
+        self._interaction = interaction
+        self._realtime = realtime
+        self.status_code = interaction["status"]
+        self.headers = interaction["headers"]
+
+    @property
+    def content(self) -> bytes:
+        if "lines" in self._interaction:
+            return b"\n".join(line.encode("utf-8") for _, line in self._lines())
+        body: str = self._interaction["body"]
+        return body.encode("utf-8")
+
+    def _lines(self) -> List[Tuple[float, str]]:
+        lines: List[Tuple[float, str]] = self._interaction.get("lines", [])
+        return lines
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def iter_lines(self) -> Iterator[bytes]:
+        if "lines" not in self._interaction:
+            yield from self.content.splitlines()
+            return
+        for delay, line in self._lines():
+            if self._realtime and delay:
+                time.sleep(delay)
+            yield line.encode("utf-8")
+
+    def close(self) -> None:
+        pass
+
+
+class AsyncReplayResponse(ReplayResponse):
+    """
+    Asynchronous response served from a cassette interaction.
+    """
+
+    async def read(self) -> bytes:  # type: ignore[override]
+        return self.content
+
+    async def json(self) -> Any:  # type: ignore[override]
+        return json.loads(self.content)
+
+    async def iter_lines(self) -> AsyncIterator[bytes]:  # type: ignore[override]
+        if "lines" not in self._interaction:
+            for chunk in self.content.splitlines():
+                yield chunk
+            return
+        for delay, line in self._lines():
+            if self._realtime and delay:
+                await asyncio.sleep(delay)
+            yield line.encode("utf-8")
+
+    async def aclose(self) -> None:
+        pass
+
+
+class _Recorder:
+    """
+    Collects one interaction while its response is being consumed.
+    """
+
+    def __init__(
+        self, cassette: Cassette, request: TransportRequest, response: Any, start: float
+    ):
+        self.cassette = cassette
+        self.last = time.perf_counter()
+        self.interaction: Dict[str, Any] = {
+            "request": request_fingerprint(request),
+            "status": response.status_code,
+            "headers": _recorded_headers(response.headers),
+            "ttfb": round(self.last - start, 6),
+        }
+        self.lines: List[Tuple[float, str]] = []
+        self.saved = False
+
+    def line(self, line: bytes) -> None:
+        now = time.perf_counter()
+        self.lines.append((round(now - self.last, 6), line.decode("utf-8")))
+        self.last = now
+
+    def save(self, body: Optional[bytes] = None) -> Dict[str, Any]:
+        if body is not None:
+            self.interaction["body"] = body.decode("utf-8")
+        else:
+            self.interaction["lines"] = self.lines
+        if not self.saved:
+            self.cassette.append(self.interaction)
+            self.saved = True
+        return self.interaction
+
+
+class _RecordingStreamResponse:
+    """
+    Proxy for a streamed sync response that records lines as they are read.
+    """
+
+    def __init__(self, response: Any, recorder: _Recorder):
+        self._response = response
+        self._recorder = recorder
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    def json(self) -> Any:
+        return ReplayResponse(self._recorder.save(self._response.content)).json()
+
+    def iter_lines(self) -> Iterator[bytes]:
+        for line in self._response.iter_lines():
+            self._recorder.line(line)
+            yield line
+        self._recorder.save()
+
+    def close(self) -> None:
+        self._response.close()
+
+
+class _AsyncRecordingStreamResponse:
+    """
+    Proxy for a streamed async response that records lines as they are read.
+    """
+
+    def __init__(self, response: Any, recorder: _Recorder):
+        self._response = response
+        self._recorder = recorder
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    async def read(self) -> bytes:
+        body: bytes = await self._response.read()
+        self._recorder.save(body)
+        return body
+
+    async def json(self) -> Any:
+        return json.loads(await self.read())
+
+    async def iter_lines(self) -> AsyncIterator[bytes]:
+        async for line in self._response.iter_lines():
+            self._recorder.line(line)
+            yield line
+        self._recorder.save()
+
+    async def aclose(self) -> None:
+        await self._response.aclose()
+
+
+class RecordingTransport(Transport):
+    """
+    Synchronous transport that records every exchange to a cassette.
+
+    Args:
+        path (str): Cassette file to append to.
+        transport (Transport, optional): Transport performing the real requests.
+            Defaults to a :class:`RequestsTransport`.
+    """
+
+    def __init__(self, path: str, transport: Optional[Transport] = None):
+        self.cassette = Cassette(path)
+        self.transport = transport or RequestsTransport()
+
+    def send(self, request: TransportRequest) -> Any:
+        start = time.perf_counter()
+        response = self.transport.send(request)
+        recorder = _Recorder(self.cassette, request, response, start)
+        if request.stream:
+            return _RecordingStreamResponse(response, recorder)
+        try:
+            return ReplayResponse(recorder.save(response.content))
+        finally:
+            response.close()
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncRecordingTransport(AsyncTransport):
+    """
+    Asynchronous transport that records every exchange to a cassette.
+
+    Args:
+        path (str): Cassette file to append to.
+        transport (AsyncTransport, optional): Transport performing the real
+            requests. Defaults to an :class:`AiohttpTransport`.
+    """
+
+    def __init__(self, path: str, transport: Optional[AsyncTransport] = None):
+        self.cassette = Cassette(path)
+        self.transport = transport or AiohttpTransport()
+
+    async def send(self, request: TransportRequest) -> Any:
+        start = time.perf_counter()
+        response = await self.transport.send(request)
+        recorder = _Recorder(self.cassette, request, response, start)
+        if request.stream:
+            return _AsyncRecordingStreamResponse(response, recorder)
+        return AsyncReplayResponse(recorder.save(await response.read()))
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class _ReplayIndex:
+    """
+    Hands out recorded interactions in order, repeating the last one per request.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._interactions = Cassette(path).load()
+        self._lock = threading.Lock()
+
+    def next(self, request: TransportRequest) -> Dict[str, Any]:
+        key = request_fingerprint(request)
+        with self._lock:
+            queue = self._interactions.get(key)
+            if not queue:
+                raise CassetteMissError(
+                    f"No recorded interaction for {key} in {self.path}"
+                )
+            return queue.popleft() if len(queue) > 1 else queue[0]
+
+
+class ReplayTransport(Transport):
+    """
+    Synchronous transport serving responses from a cassette, without network.
+
+    Args:
+        path (str): Cassette file recorded by :class:`RecordingTransport`.
+        realtime (bool, optional): Reproduce the recorded time to first byte and
+            delays between streamed lines. Defaults to replaying at full speed.
+    """
+
+    def __init__(self, path: str, realtime: bool = False):
+        self._index = _ReplayIndex(path)
+        self.realtime = realtime
+
+    def send(self, request: TransportRequest) -> ReplayResponse:
+        interaction = self._index.next(request)
+        if self.realtime:
+            time.sleep(interaction.get("ttfb", 0.0))
+        return ReplayResponse(interaction, self.realtime)
+
+
+class AsyncReplayTransport(AsyncTransport):
+    """
+    Asynchronous transport serving responses from a cassette, without network.
+
+    Args:
+        path (str): Cassette file recorded by a recording transport.
+        realtime (bool, optional): Reproduce the recorded time to first byte and
+            delays between streamed lines. Defaults to replaying at full speed.
+    """
+
+    def __init__(self, path: str, realtime: bool = False):
+        self._index = _ReplayIndex(path)
+        self.realtime = realtime
+
+    async def send(self, request: TransportRequest) -> AsyncReplayResponse:
+        interaction = self._index.next(request)
+        if self.realtime:
+            await asyncio.sleep(interaction.get("ttfb", 0.0))
+        return AsyncReplayResponse(interaction, self.realtime)
@@ -0,0 +1,543 @@
+"""
+Usage and cost accounting.
+
+A :class:`UsageTracker` records the ``usage`` block of every response a client
+receives, including streams, which are recorded when they end. Input, output
+and prompt-cache tokens and their cost are aggregated per model, tenant and
+tag. :class:`Budget` limits the spending of a model, tenant or tag: past a soft
+limit requests are downgraded to a cheaper model, past the hard limit they are
+rejected before they are sent.
+
+Recording a call only updates counters in memory. With a sink, the individual
+calls are also written to a JSONL file or a SQLite database by a background
+thread every few seconds, so slow disks never hold up requests.
+
+Example:
+    >>> tracker = UsageTracker(
+    ...     budgets=[Budget(limit=50.0, soft_limit=40.0, tenant="reports",
+    ...                     period=86400, downgrade_to="claude-3-5-haiku-20241022")],
+    ...     sink=SQLiteSink("usage.db"),
+    ... )
+    >>> client = Claude(usage_tracker=tracker)
+    >>> client.messages_create(model, messages, tenant="reports", tag="daily")
+    >>> tracker.totals(by=("tenant",))
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from .exceptions import BudgetExceededError
+from .instrumentation import Instrumentation
+
+logger = logging.getLogger(__name__)
+
+TOKEN_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+GROUPS = ("model", "tenant", "tag")
+
+
+@dataclass
+class ModelPrice:
+    """
+    Price of a model in US dollars per million tokens.
+
+    Attributes:
+        input: Price of input tokens.
+        output: Price of output tokens.
+        cache_write: Price of input tokens written to the prompt cache.
+            Defaults to 1.25 times the input price.
+        cache_read: Price of input tokens read from the prompt cache. Defaults
+            to a tenth of the input price.
+    """
+
+    input: float
+    output: float
+    cache_write: Optional[float] = None
+    cache_read: Optional[float] = None
+
+    def __post_init__(self) -> None:
+        if self.cache_write is None:
+            self.cache_write = self.input * 1.25
+        if self.cache_read is None:
+            self.cache_read = self.input * 0.1
+
+    def cost(self, usage: Mapping[str, Any]) -> float:
+        """
+        Return the cost of a usage block.
+
+        Args:
+            usage (Mapping[str, Any]): Token counts by field name.
+
+        Returns:
+            float: Cost in US dollars.
+        """
+        cache_write = self.cache_write or 0.0
+        cache_read = self.cache_read or 0.0
+        return (
+            (usage.get("input_tokens") or 0) * self.input
+            + (usage.get("output_tokens") or 0) * self.output
+            + (usage.get("cache_creation_input_tokens") or 0) * cache_write
+            + (usage.get("cache_read_input_tokens") or 0) * cache_read
+        ) / 1e6
+
+
+# Keys are model names or prefixes; the longest matching prefix wins
+DEFAULT_PRICES = {
+    "claude-3-7-sonnet": ModelPrice(3.0, 15.0),
+    "claude-3-5-sonnet": ModelPrice(3.0, 15.0),
+    "claude-3-5-haiku": ModelPrice(0.8, 4.0),
+    "claude-3-opus": ModelPrice(15.0, 75.0),
+    "claude-3-sonnet": ModelPrice(3.0, 15.0),
+    "claude-3-haiku": ModelPrice(0.25, 1.25, 0.3, 0.03),
+}
+
+
+class Budget:
+    """
+    Spending limit for the calls of a model, tenant or tag.
+
+    Spending is counted from recorded responses, so requests still in flight
+    when a limit is reached can overshoot it by their cost.
+
+    Args:
+        limit (float, optional): Hard limit in US dollars. Requests are
+            rejected with :class:`~claude_sdk.exceptions.BudgetExceededError`
+            once it is reached.
+        soft_limit (float, optional): Soft limit in US dollars. Once it is
+            reached, requests are sent to ``downgrade_to`` if given, and
+            reported as ``budget.exceeded`` events either way.
+        downgrade_to (str, optional): Model used past the soft limit.
+        model (str, optional): Only count calls whose model starts with this.
+        tenant (str, optional): Only count calls of this tenant.
+        tag (str, optional): Only count calls with this tag.
+        period (float, optional): Length in seconds of the windows the budget
+            applies to, e.g. 86400 for a budget per (UTC) day. Windows are
+            aligned to the epoch. None applies the budget to all calls.
+        name (str, optional): Name used in events and errors.
+    """
+
+    def __init__(
+        self,
+        limit: Optional[float] = None,
+        soft_limit: Optional[float] = None,
+        downgrade_to: Optional[str] = None,
+        model: Optional[str] = None,
+        tenant: Optional[str] = None,
+        tag: Optional[str] = None,
+        period: Optional[float] = None,
+        name: Optional[str] = None,
+    ):
+        if limit is None and soft_limit is None:
+            raise ValueError("A budget needs a limit or a soft_limit")
+        self.limit = limit
+        self.soft_limit = soft_limit
+        self.downgrade_to = downgrade_to
+        self.model = model
+        self.tenant = tenant
+        self.tag = tag
+        self.period = period
+        if name is None:
+            scope = [f"{k}={v}" for k, v in zip(GROUPS, (model, tenant, tag)) if v]
+            name = ",".join(scope) or "total"
+        self.name = name
+        self._window = 0
+        self._spent = 0.0
+
+    def matches(self, model: str, tenant: Optional[str], tag: Optional[str]) -> bool:
+        """
+        Whether the budget applies to a call.
+
+        Args:
+            model (str): Model of the call.
+            tenant (str, optional): Tenant of the call.
+            tag (str, optional): Tag of the call.
+
+        Returns:
+            bool: True if the budget counts the call.
+        """
+        return (
+            (self.model is None or model.startswith(self.model))
+            and (self.tenant is None or tenant == self.tenant)
+            and (self.tag is None or tag == self.tag)
+        )
+
+    def _current(self, now: float) -> float:
+        if self.period is not None:
+            window = int(now // self.period)
+            if window != self._window:
+                self._window = window
+                self._spent = 0.0
+        return self._spent
+
+    def _add(self, cost: float, now: float) -> None:
+        self._current(now)
+        self._spent += cost
+
+
+class UsageSink:
+    """
+    Base class for destinations of recorded calls.
+    """
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Write a batch of recorded calls.
+
+        Args:
+            records (List[Dict[str, Any]]): The calls, with a timestamp, the
+                model, tenant and tag, the token counts and the cost.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        Release the sink's resources.
+        """
+
+
+class JSONLSink(UsageSink):
+    """
+    Appends recorded calls to a file, one JSON object per line.
+
+    Args:
+        path (str): Path of the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+class SQLiteSink(UsageSink):
+    """
+    Inserts recorded calls into a SQLite table, created if it does not exist.
+
+    Args:
+        path (str): Path of the database.
+        table (str, optional): Name of the table.
+    """
+
+    def __init__(self, path: str, table: str = "usage"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name {table!r}")
+        self.path = path
+        self.table = table
+        self.columns = ("timestamp", *GROUPS, *TOKEN_FIELDS, "cost")
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "timestamp REAL, model TEXT, tenant TEXT, tag TEXT, "
+                "input_tokens INTEGER, output_tokens INTEGER, "
+                "cache_creation_input_tokens INTEGER, "
+                "cache_read_input_tokens INTEGER, cost REAL)"
+            )
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        rows = [tuple(record[column] for column in self.columns) for record in records]
+        placeholders = ", ".join("?" * len(self.columns))
+        with self._lock, self._connection:
+            self._connection.executemany(
+                f"INSERT INTO {self.table} VALUES ({placeholders})", rows
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class UsageTracker:
+    """
+    Aggregates token usage and cost, and enforces budgets.
+
+    Pass it to a client as ``usage_tracker``; ``messages_create`` then checks
+    the budgets before sending a request and records its usage. A tracker can
+    be shared between clients and threads.
+
+    Args:
+        prices (Mapping[str, ModelPrice], optional): Prices by model name or
+            prefix. Calls to models without a price are counted at no cost.
+        budgets (Iterable[Budget], optional): Budgets to enforce.
+        sink (UsageSink, optional): Receives every recorded call.
+        flush_interval (float, optional): Seconds between writes to the sink.
+    """
+
+    def __init__(
+        self,
+        prices: Optional[Mapping[str, ModelPrice]] = None,
+        budgets: Iterable[Budget] = (),
+        sink: Optional[UsageSink] = None,
+        flush_interval: float = 5.0,
+    ):
+        self.prices = dict(DEFAULT_PRICES if prices is None else prices)
+        self.budgets = list(budgets)
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._resolved: Dict[str, Optional[ModelPrice]] = {}
+        # (model, tenant, tag) -> [calls, *token counts, cost]
+        self._totals: Dict[Tuple[str, Optional[str], Optional[str]], List[float]] = {}
+        self._pending: List[Dict[str, Any]] = []
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if sink is not None:
+            self._thread = threading.Thread(
+                target=self._run, name="claude-sdk-usage", daemon=True
+            )
+            self._thread.start()
+
+    def price(self, model: str) -> Optional[ModelPrice]:
+        """
+        Return the price of a model.
+
+        Args:
+            model (str): Model name.
+
+        Returns:
+            ModelPrice, optional: The price under the longest matching key, or
+                None if no key matches.
+        """
+        try:
+            return self._resolved[model]
+        except KeyError:
+            pass
+        keys = [key for key in self.prices if model.startswith(key)]
+        price = self.prices[max(keys, key=len)] if keys else None
+        self._resolved[model] = price
+        return price
+
+    def check(
+        self,
+        model: str,
+        tenant: Optional[str] = None,
+        tag: Optional[str] = None,
+        instrumentation: Optional[Instrumentation] = None,
+    ) -> str:
+        """
+        Check the budgets of a call before it is sent.
+
+        Args:
+            model (str): Requested model.
+            tenant (str, optional): Tenant of the call.
+            tag (str, optional): Tag of the call.
+            instrumentation (Instrumentation, optional): Receives
+                ``budget.exceeded`` events.
+
+        Returns:
+            str: The model to send the call to, which is ``downgrade_to`` of
+                the first budget past its soft limit.
+
+        Raises:
+            BudgetExceededError: If a budget is past its hard limit.
+        """
+        if not self.budgets:
+            return model
+        instrumentation = instrumentation or Instrumentation()
+        selected = model
+        now = time.time()
+        for budget in self.budgets:
+            if not budget.matches(model, tenant, tag):
+                continue
+            with self._lock:
+                spent = budget._current(now)
+            if budget.limit is not None and spent >= budget.limit:
+                instrumentation.emit(
+                    "budget.exceeded",
+                    budget=budget.name,
+                    spent=spent,
+                    action="reject",
+                )
+                raise BudgetExceededError(
+                    f"Budget {budget.name} exceeded: spent ${spent:.4f} "
+                    f"of ${budget.limit:.4f}",
+                    budget=budget,
+                )
+            if budget.soft_limit is not None and spent >= budget.soft_limit:
+                action = "warn"
+                if selected == model and budget.downgrade_to is not None:
+                    selected, action = budget.downgrade_to, "downgrade"
+                instrumentation.emit(
+                    "budget.exceeded", budget=budget.name, spent=spent, action=action
+                )
+        return selected
+
+    def record(
+        self,
+        model: str,
+        usage: Mapping[str, Any],
+        tenant: Optional[str] = None,
+        tag: Optional[str] = None,
+    ) -> float:
+        """
+        Record the usage of a call.
+
+        Args:
+            model (str): Model that served the call.
+            usage (Mapping[str, Any]): The ``usage`` block of the response.
+            tenant (str, optional): Tenant of the call.
+            tag (str, optional): Tag of the call.
+
+        Returns:
+            float: Cost of the call in US dollars.
+        """
+        price = self.price(model)
+        cost = price.cost(usage) if price is not None else 0.0
+        counts = [int(usage.get(name) or 0) for name in TOKEN_FIELDS]
+        now = time.time()
+        with self._lock:
+            row = self._totals.get((model, tenant, tag))
+            if row is None:
+                row = self._totals[(model, tenant, tag)] = [0] * (len(counts) + 2)
+            row[0] += 1
+            for i, count in enumerate(counts, 1):
+                row[i] += count
+            row[-1] += cost
+            for budget in self.budgets:
+                if budget.matches(model, tenant, tag):
+                    budget._add(cost, now)
+            if self.sink is not None:
+                record: Dict[str, Any] = dict(zip(TOKEN_FIELDS, counts))
+                record.update(
+                    timestamp=now, model=model, tenant=tenant, tag=tag, cost=cost
+                )
+                self._pending.append(record)
+        return cost
+
+    def track(
+        self,
+        response: Any,
+        model: str,
+        tenant: Optional[str] = None,
+        tag: Optional[str] = None,
+    ) -> None:
+        """
+        Record a response now, or a stream when it ends.
+
+        Args:
+            response (Any): A response dictionary, or a
+                :class:`~claude_sdk.streaming.Stream` or
+                :class:`~claude_sdk.streaming.AsyncStream`.
+            model (str): Model the request was sent to, used if the response
+                does not name one.
+            tenant (str, optional): Tenant of the call.
+            tag (str, optional): Tag of the call.
+        """
+        if isinstance(response, dict):
+            usage = response.get("usage")
+            if usage:
+                self.record(response.get("model") or model, usage, tenant, tag)
+            return
+
+        def finished(stream: Any) -> None:
+            self.record(stream.message.model or model, stream.usage, tenant, tag)
+
+        response.add_done_callback(finished)
+
+    def totals(self, by: Sequence[str] = GROUPS) -> List[Dict[str, Any]]:
+        """
+        Return the aggregated usage.
+
+        Args:
+            by (Sequence[str], optional): Fields to group by, any of "model",
+                "tenant" and "tag".
+
+        Returns:
+            List[Dict[str, Any]]: One entry per group, with the group's fields,
+                the number of calls, the token counts and the cost.
+        """
+        positions = [GROUPS.index(name) for name in by]
+        groups: Dict[Tuple[Any, ...], List[float]] = {}
+        with self._lock:
+            for key, row in self._totals.items():
+                group = tuple(key[i] for i in positions)
+                total = groups.setdefault(group, [0] * len(row))
+                for i, value in enumerate(row):
+                    total[i] += value
+        return [
+            {
+                **dict(zip(by, group)),
+                **dict(zip(("calls", *TOKEN_FIELDS, "cost"), total)),
+            }
+            for group, total in groups.items()
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return overall usage and the state of the budgets.
+
+        Returns:
+            Dict[str, Any]: Calls, token counts and cost over all groups, and
+                the spending and limits of every budget.
+        """
+        (total,) = self.totals(by=()) or [
+            dict.fromkeys(("calls", *TOKEN_FIELDS, "cost"), 0)
+        ]
+        now = time.time()
+        with self._lock:
+            total["budgets"] = [
+                {
+                    "name": budget.name,
+                    "spent": budget._current(now),
+                    "limit": budget.limit,
+                    "soft_limit": budget.soft_limit,
+                }
+                for budget in self.budgets
+            ]
+        return total
+
+    def flush(self) -> None:
+        """
+        Write the calls recorded since the last flush to the sink.
+        """
+        if self.sink is None:
+            return
+        with self._flush_lock:
+            with self._lock:
+                records, self._pending = self._pending, []
+            if not records:
+                return
+            try:
+                self.sink.write(records)
+            except Exception:
+                logger.exception("Writing %d usage records failed", len(records))
+                with self._lock:
+                    self._pending[:0] = records
+
+    def _run(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def close(self) -> None:
+        """
+        Stop the background thread, flush pending calls and close the sink.
+        """
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        if self.sink is not None:
+            self.sink.close()
+
+    def __enter__(self) -> "UsageTracker":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
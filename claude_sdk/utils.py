@@ -5,7 +5,7 @@ Utility functions for the Claude SDK.
 import os
 import sys
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Mapping, Optional, Sequence
 
 
 def load_env(env_file: Optional[str] = None) -> Dict[str, str]:
@@ -98,3 +98,23 @@ def validate_api_key(api_key: Optional[str] = None) -> str:
         raise ValueError("Invalid API key format. API keys typically start with 'sk-'")
 
     return api_key
+
+
+def beta_headers(headers: Mapping[str, str], betas: Sequence[str]) -> Dict[str, str]:
+    """
+    Return the ``anthropic-beta`` header enabling betas for one request.
+
+    Betas already in the client's header are kept, and each one is listed once.
+
+    Args:
+        headers (Mapping[str, str]): Headers of the client.
+        betas (Sequence[str]): Betas to enable, e.g. "computer-use-2025-01-24".
+
+    Returns:
+        Dict[str, str]: The header, to send on top of the client's headers.
+    """
+    enabled = [beta.strip() for beta in headers.get("anthropic-beta", "").split(",")]
+    for beta in betas:
+        if beta not in enabled:
+            enabled.append(beta)
+    return {"anthropic-beta": ",".join(beta for beta in enabled if beta)}
@@ -0,0 +1,161 @@
+"""
+Pre-opening and keeping warm the upstream connections of an async client.
+
+The first requests after a process starts pay for new TCP connections and TLS
+handshakes. A :class:`ConnectionWarmer` opens a number of pooled connections
+to every endpoint of an :class:`~claude_sdk.AsyncClaude` before traffic
+arrives. It then pings them periodically, so the pool does not close them
+as idle.
+
+Pings are ``GET /v1/models`` requests, which do not use any tokens. They go
+straight to the transport, bypassing the circuit breaker, load balancer
+accounting and concurrency limiter.
+
+Example:
+    >>> async with ConnectionWarmer(client, connections=16):
+    ...     await serve()
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .instrumentation import Instrumentation
+from .transport import TransportRequest
+
+
+class ConnectionWarmer:
+    """
+    Opens upstream connections of an async client and keeps them warm.
+
+    Args:
+        client (AsyncClaude): Client whose connection pool is warmed.
+        connections (int, optional): Connections opened to every endpoint.
+        interval (float, optional): Seconds between pings. Keep it below the
+            keep-alive timeout of the client's transport (15 seconds for
+            :class:`~claude_sdk.transport.AiohttpTransport`).
+        path (str, optional): Path of the ping request.
+        timeout (float, optional): Seconds a ping may take.
+        instrumentation (Instrumentation, optional): Receives a
+            ``connections.warmed`` event for every endpoint warmed. Defaults
+            to the client's.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        connections: int = 8,
+        interval: float = 10.0,
+        path: str = "/v1/models",
+        timeout: float = 10.0,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        self.client = client
+        self.connections = connections
+        self.interval = interval
+        self.path = path
+        self.timeout = timeout
+        self.instrumentation = instrumentation or client.instrumentation
+        self.pings = 0
+        self.failures = 0
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def _endpoints(self) -> List[Tuple[str, str]]:
+        balancer = self.client.load_balancer
+        if balancer is not None:
+            return [(target.base_url, target.api_key) for target in balancer.targets]
+        return [(self.client.base_url, self.client.api_key)]
+
+    async def _ping(self, base_url: str, api_key: str) -> bool:
+        request = TransportRequest(
+            "GET",
+            f"{base_url}{self.path}",
+            {**self.client.headers, "x-api-key": api_key},
+            timeout=self.timeout,
+        )
+        try:
+            response = await self.client.transport.send(request)
+            # Reading the body returns the connection to the pool
+            await response.read()
+        except Exception:
+            return False
+        return True
+
+    async def warm(self) -> int:
+        """
+        Open or refresh ``connections`` pooled connections to every endpoint.
+
+        Pings are sent concurrently, so each one holds its own connection:
+        idle pooled connections are reused and only the missing ones are
+        opened.
+
+        Returns:
+            int: Number of successful pings.
+        """
+        warmed = 0
+        for base_url, api_key in self._endpoints():
+            started = time.perf_counter()
+            results = await asyncio.gather(
+                *(self._ping(base_url, api_key) for _ in range(self.connections))
+            )
+            succeeded = sum(results)
+            self.pings += len(results)
+            self.failures += len(results) - succeeded
+            warmed += succeeded
+            self.instrumentation.emit(
+                "connections.warmed",
+                base_url=base_url,
+                connections=succeeded,
+                failures=len(results) - succeeded,
+                elapsed=time.perf_counter() - started,
+            )
+        return warmed
+
+    async def _keep_warm(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.warm()
+
+    async def start(self) -> int:
+        """
+        Warm the connections and start pinging them in the background.
+
+        Returns:
+            int: Number of successful pings of the initial warm-up.
+        """
+        warmed = await self.warm()
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.ensure_future(self._keep_warm())
+        return warmed
+
+    async def stop(self) -> None:
+        """
+        Stop the background pings.
+        """
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the number of pings sent and failed.
+
+        Returns:
+            Dict[str, Any]: Pings, failed pings and whether pinging is running.
+        """
+        return {
+            "pings": self.pings,
+            "failures": self.failures,
+            "running": self._task is not None,
+        }
+
+    async def __aenter__(self) -> "ConnectionWarmer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.stop()
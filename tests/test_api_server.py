@@ -0,0 +1,137 @@
+"""
+Tests for the API server, against the stub server.
+"""
+
+import importlib
+import os
+import sys
+import unittest
+from unittest import mock
+
+from claude_sdk.stub_server import StubConfig, StubServer
+
+try:
+    from fastapi import Request
+    from fastapi.testclient import TestClient
+except ImportError:
+    TestClient = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL = "claude-3-7-sonnet-20250219"
+
+
+@unittest.skipIf(TestClient is None, "fastapi is not installed")
+class TestAPIServer(unittest.TestCase):
+    """
+    Tests for the endpoints of api_server.py.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.stub = StubServer(StubConfig()).start()
+        env = {
+            "ANTHROPIC_API_KEY": "sk-test",
+            "BASE_URL": cls.stub.url,
+            "WARM_CONNECTIONS": "0",
+        }
+        if ROOT not in sys.path:
+            sys.path.insert(0, ROOT)
+        # The server reads its settings when it is imported
+        with mock.patch.dict(os.environ, env):
+            if "api_server" in sys.modules:
+                cls.server = importlib.reload(sys.modules["api_server"])
+            else:
+                cls.server = importlib.import_module("api_server")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.stop()
+
+    def setUp(self):
+        self.client = TestClient(self.server.app)
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+    def test_compute_use(self):
+        """
+        Test that /compute_use is sent upstream through the async client.
+        """
+        requests = self.stub.engine.request_count
+        response = self.client.post(
+            "/compute_use",
+            json={"model": MODEL, "prompt": "Open the browser", "max_tokens": 16},
+        )
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.json()["type"], "message")
+        self.assertEqual(self.stub.engine.request_count, requests + 1)
+
+    def test_messages(self):
+        """
+        Test /messages and the validation of its body.
+        """
+        body = {
+            "model": MODEL,
+            "max_tokens": 16,
+            "messages": [{"role": "user", "content": "Hi"}],
+        }
+        response = self.client.post("/messages", json=body)
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.json()["role"], "assistant")
+
+        response = self.client.post("/messages", json={"model": MODEL})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()["detail"][0]["loc"], ["body", "messages"])
+
+    def test_fanout_key(self):
+        """
+        Test that streams are only shared within a tenant and usage tag.
+        """
+        body = self.server.MessageRequest(
+            model=MODEL,
+            messages=[{"role": "user", "content": "Hi"}],
+            temperature=0,
+            stream=True,
+        )
+
+        def key(*headers):
+            scope = {
+                "type": "http",
+                "method": "POST",
+                "path": "/messages",
+                "query_string": b"",
+                "headers": [(k.encode(), v.encode()) for k, v in headers],
+            }
+            return self.server.fanout_key(Request(scope), body)
+
+        tenant = ("x-tenant-id", "a")
+        self.assertEqual(key(tenant), key(tenant))
+        self.assertNotEqual(key(tenant), key(("x-tenant-id", "b")))
+        self.assertNotEqual(key(tenant), key(tenant, ("x-usage-tag", "batch")))
+
+    def test_sessions_are_per_tenant(self):
+        """
+        Test that a chat session can only be resumed by its tenant.
+        """
+        start = {"model": MODEL, "max_tokens": 16}
+        with self.client.websocket_connect(
+            "/ws/messages", headers={"x-tenant-id": "a"}
+        ) as websocket:
+            websocket.send_json(start)
+            session_id = websocket.receive_json()["session_id"]
+
+        resume = {"session_id": session_id}
+        with self.client.websocket_connect(
+            "/ws/messages", headers={"x-tenant-id": "b"}
+        ) as websocket:
+            websocket.send_json(resume)
+            frame = websocket.receive_json()
+            self.assertEqual(frame["error"]["type"], "session_not_found")
+        with self.client.websocket_connect(
+            "/ws/messages", headers={"x-tenant-id": "a"}
+        ) as websocket:
+            websocket.send_json(resume)
+            self.assertEqual(websocket.receive_json()["session_id"], session_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
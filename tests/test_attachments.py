@@ -0,0 +1,155 @@
+"""
+Tests for streamed file attachments.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+from claude_sdk import Claude
+from claude_sdk.attachments import Attachment, document, image
+from claude_sdk.transport import ReplayResponse, Transport
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 8
+
+
+class CapturingTransport(Transport):
+    """
+    Transport that consumes request bodies and answers with an empty message.
+    """
+
+    def __init__(self):
+        self.bodies = []
+        self.chunk_sizes = []
+
+    def send(self, request):
+        content = request.content
+        if isinstance(content, bytes) or content is None:
+            body = content or json.dumps(request.json).encode("utf-8")
+        else:
+            digest = hashlib.sha256()
+            for chunk in content:
+                self.chunk_sizes.append(len(chunk))
+                digest.update(chunk)
+            body = digest.hexdigest().encode("ascii")
+        self.bodies.append(body)
+        return ReplayResponse({"status": 200, "headers": {}, "body": "{}"})
+
+
+class TestAttachments(unittest.TestCase):
+    """
+    Tests for Attachment and the content block helpers.
+    """
+
+    def setUp(self):
+        """
+        Create temporary files.
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+
+    def _write(self, name, data):
+        path = os.path.join(self.dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_media_types(self):
+        """
+        Test media types guessed from file names and sniffed from contents.
+        """
+        self.assertEqual(
+            image(self._write("a.png", PNG))["source"].media_type, "image/png"
+        )
+        self.assertEqual(image(PNG)["source"].media_type, "image/png")
+        self.assertEqual(
+            document(self._write("notes", b"%PDF-1.7"))["source"].media_type,
+            "application/pdf",
+        )
+        with self.assertRaises(ValueError):
+            image(b"not an image")
+
+    def test_deduplication(self):
+        """
+        Test that identical content shares one attachment.
+        """
+        first = Attachment.from_path(self._write("a.png", PNG))
+        second = Attachment.from_path(self._write("b.png", PNG))
+        third = Attachment.from_buffer(bytearray(PNG), "image/png")
+
+        self.assertIs(first, second)
+        self.assertIs(first, third)
+        self.assertIsNot(first, Attachment.from_buffer(PNG + b"x", "image/png"))
+
+    def test_serialization(self):
+        """
+        Test that a request body carries the base64-encoded file.
+        """
+        data = os.urandom(1_000_001)
+        path = self._write("big.jpg", data)
+        transport = CapturingTransport()
+        client = Claude(api_key="sk-test", transport=transport)
+
+        client.messages_create(
+            model="claude-3-7-sonnet-20250219",
+            messages=[
+                {
+                    "role": "user",
+                    "content": [image(path), {"type": "text", "text": "?"}],
+                }
+            ],
+        )
+
+        payload = {
+            "model": "claude-3-7-sonnet-20250219",
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "image",
+                            "source": {
+                                "type": "base64",
+                                "media_type": "image/jpeg",
+                                "data": base64.b64encode(data).decode("ascii"),
+                            },
+                        },
+                        {"type": "text", "text": "?"},
+                    ],
+                }
+            ],
+            "max_tokens": 1000,
+            "temperature": 0.7,
+        }
+        expected = hashlib.sha256(json.dumps(payload, separators=(",", ":")).encode())
+        self.assertEqual(transport.bodies[0].decode(), expected.hexdigest())
+        self.assertGreater(len(transport.chunk_sizes), 1)
+
+    def test_peak_memory(self):
+        """
+        Test that sending a large attachment does not copy it into Python memory.
+        """
+        size = 8 * 1024 * 1024
+        path = self._write("large.pdf", os.urandom(size))
+        client = Claude(api_key="sk-test", transport=CapturingTransport())
+        messages = [{"role": "user", "content": [document(path)]}]
+
+        tracemalloc.start()
+        try:
+            client.messages_create(
+                model="claude-3-7-sonnet-20250219", messages=messages
+            )
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        self.assertLess(peak, size / 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,235 @@
+"""
+Tests for the JSONL batch runner and the claude-sdk run command.
+"""
+
+import asyncio
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from claude_sdk import AsyncClaude
+from claude_sdk.batch import BatchRunner
+from claude_sdk.exceptions import InvalidRequestError, RateLimitError
+from claude_sdk.instrumentation import Instrumentation
+from claude_sdk.stub_server import LatencyDistribution, StubConfig, StubServer
+
+try:
+    from click.testing import CliRunner
+
+    from claude_sdk.cli import main
+except ImportError:
+    CliRunner = None
+
+MODEL = "claude-3-7-sonnet-20250219"
+
+
+def requests_jsonl(count):
+    """
+    Return JSONL requests, with a blank line after the first one.
+    """
+    lines = [
+        json.dumps(
+            {
+                "custom_id": f"r{i}",
+                "params": {"messages": [{"role": "user", "content": f"Hi {i}"}]},
+            }
+        )
+        for i in range(count)
+    ]
+    lines.insert(1, "")
+    return "\n".join(lines) + "\n"
+
+
+class FlakyClient:
+    """
+    Client that answers after a delay depending on the request, fails some
+    requests, and can be stopped after a number of answers.
+    """
+
+    def __init__(self, stop_after=None):
+        self.instrumentation = Instrumentation()
+        self.calls = []
+        self.stop_after = stop_after
+        self.answered = 0
+        self.stopped = asyncio.Event()
+
+    async def messages_create(self, model, messages, max_tokens=1000):
+        content = messages[0]["content"]
+        self.calls.append(content)
+        if content == "Hi 3" and self.calls.count(content) < 3:
+            raise RateLimitError()
+        if content == "Hi 5":
+            raise InvalidRequestError("Bad request")
+        await asyncio.sleep(0.01 * (len(self.calls) % 4))
+        self.answered += 1
+        if self.answered == self.stop_after:
+            self.stopped.set()
+        return {"content": [{"type": "text", "text": content}], "model": model}
+
+
+class TestBatchRunner(unittest.TestCase):
+    """
+    Tests for running batches with retries, ordering and checkpoints.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.output = os.path.join(self.directory.name, "out.jsonl")
+        self.checkpoint = self.output + ".checkpoint"
+
+    def read_output(self):
+        with open(self.output) as f:
+            return [json.loads(line) for line in f]
+
+    def test_ordered_with_retries(self):
+        """
+        Test that results are written in input order, that transient errors
+        are retried and that other errors are written as results.
+        """
+        client = FlakyClient()
+        runner = BatchRunner(
+            client, concurrency=4, backoff=0.01, defaults={"model": MODEL}
+        )
+        sink = io.BytesIO()
+        stats = asyncio.run(runner.run(io.StringIO(requests_jsonl(12)), sink))
+        results = [json.loads(line) for line in sink.getvalue().splitlines()]
+
+        self.assertEqual(
+            [r["custom_id"] for r in results], [f"r{i}" for i in range(12)]
+        )
+        self.assertEqual(results[1]["index"], 2)
+        self.assertEqual(results[3]["response"]["content"][0]["text"], "Hi 3")
+        self.assertEqual(results[5]["error"]["type"], "invalid_request")
+        self.assertEqual(results[5]["error"]["status_code"], 400)
+        self.assertEqual(stats["succeeded"], 11)
+        self.assertEqual(stats["failed"], 1)
+        self.assertEqual(stats["retries"], 2)
+
+    def test_resume_from_checkpoint(self):
+        """
+        Test that an interrupted run resumes without resending the requests
+        whose results were written, and that every request appears once.
+        """
+        source = requests_jsonl(40)
+
+        async def interrupted():
+            client = FlakyClient(stop_after=20)
+            runner = BatchRunner(
+                client,
+                concurrency=4,
+                backoff=0.01,
+                ordered=False,
+                checkpoint=self.checkpoint,
+                checkpoint_interval=0,
+                defaults={"model": MODEL},
+            )
+            with open(self.output, "ab") as sink:
+                task = asyncio.ensure_future(
+                    runner.run(io.StringIO(source), sink, name="in.jsonl")
+                )
+                await client.stopped.wait()
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+            return client
+
+        asyncio.run(interrupted())
+        written = {r["custom_id"] for r in self.read_output()}
+        self.assertGreaterEqual(len(written), 20)
+
+        second = FlakyClient()
+        runner = BatchRunner(
+            second, concurrency=4, backoff=0.01, checkpoint=self.checkpoint
+        )
+        with open(self.output, "ab") as sink:
+            stats = asyncio.run(
+                runner.run(
+                    io.StringIO(source),
+                    sink,
+                    name="in.jsonl",
+                    progress=lambda stats: None,
+                )
+            )
+
+        results = self.read_output()
+        self.assertEqual(sorted(r["index"] for r in results), [0, *range(2, 41)])
+        resent = {f"Hi {custom_id[1:]}" for custom_id in written} & set(second.calls)
+        self.assertEqual(resent, set())
+        # The blank line was finished too
+        self.assertEqual(stats["skipped"], len(written) + 1)
+
+        with open(self.output, "ab") as sink:
+            runner = BatchRunner(FlakyClient(), checkpoint=self.checkpoint)
+            with self.assertRaises(ValueError):
+                asyncio.run(runner.run(io.StringIO(source), sink, name="other.jsonl"))
+
+    def test_stub_server_with_rate_limit(self):
+        """
+        Test a batch against the stub server with a request rate limit.
+        """
+        stub = StubServer(
+            StubConfig(latency=LatencyDistribution("fixed", (0.01,)))
+        ).start()
+        self.addCleanup(stub.stop)
+
+        async def run():
+            async with AsyncClaude(api_key="sk-test", base_url=stub.url) as client:
+                runner = BatchRunner(
+                    client, concurrency=8, rate=10, defaults={"model": MODEL}
+                )
+                sink = io.BytesIO()
+                stats = await runner.run(io.StringIO(requests_jsonl(15)), sink)
+                return stats, sink.getvalue().splitlines()
+
+        stats, lines = asyncio.run(run())
+        self.assertEqual(stats["succeeded"], 15)
+        self.assertEqual(len(lines), 15)
+        # A burst of 10 requests, then 10 per second
+        self.assertGreaterEqual(stats["elapsed"], 0.4)
+        self.assertLess(stats["elapsed"], 2.0)
+        self.assertEqual(stub.engine.request_count, 15)
+
+
+@unittest.skipIf(CliRunner is None, "click and rich are not installed")
+class TestRunCommand(unittest.TestCase):
+    """
+    Tests for the claude-sdk run command.
+    """
+
+    def test_run(self):
+        """
+        Test a run from stdin to stdout, and a run to a file that is resumed.
+        """
+        stub = StubServer(StubConfig()).start()
+        self.addCleanup(stub.stop)
+        env = {"ANTHROPIC_API_KEY": "sk-test", "BASE_URL": stub.url}
+        args = ["run", "--model", MODEL, "--max-tokens", "16"]
+
+        result = CliRunner().invoke(main, args, input=requests_jsonl(5), env=env)
+        self.assertEqual(result.exit_code, 0, result.output)
+        lines = [json.loads(line) for line in result.output.splitlines()[:5]]
+        self.assertEqual(
+            [line["custom_id"] for line in lines], [f"r{i}" for i in range(5)]
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "in.jsonl")
+            output = os.path.join(directory, "out.jsonl")
+            with open(source, "w") as f:
+                f.write(requests_jsonl(5))
+            for _ in range(2):
+                result = CliRunner().invoke(
+                    main, args + [source, "-o", output], env=env
+                )
+                self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("0 succeeded, 0 failed, 6 resumed", result.output)
+            with open(output) as f:
+                self.assertEqual(len(f.readlines()), 5)
+        self.assertEqual(stub.engine.request_count, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+"""
+Tests for fanning out streams to several subscribers.
+"""
+
+import asyncio
+import unittest
+
+from claude_sdk.broadcast import StreamBroadcaster, stream_key
+from claude_sdk.exceptions import QueueFullError, SlowSubscriberError
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+
+
+class Upstream:
+    """
+    Fake upstream stream that records how far it has been read.
+    """
+
+    def __init__(self, count, size=1, error=None, delay=0.0):
+        self.count = count
+        self.size = size
+        self.error = error
+        self.delay = delay
+        self.opened = 0
+        self.produced = 0
+        self.closed = False
+
+    async def __call__(self):
+        self.opened += 1
+        try:
+            if self.error is not None and not self.count:
+                raise self.error
+            for i in range(self.count):
+                await asyncio.sleep(self.delay)
+                self.produced += 1
+                yield str(i).ljust(self.size)
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.closed = True
+
+
+async def collect(subscription, limit=None, delay=0.0):
+    """
+    Read a subscription to the end, or up to a number of events.
+    """
+    events = []
+    async for event in subscription:
+        events.append(event.strip())
+        if len(events) == limit:
+            await subscription.aclose()
+            break
+        await asyncio.sleep(delay)
+    return events
+
+
+class TestStreamBroadcaster(unittest.TestCase):
+    """
+    Tests for sharing, replaying and bounding streams.
+    """
+
+    def test_late_subscriber_replays(self):
+        """
+        Test that identical requests share one upstream stream and that a
+        late subscriber receives every event.
+        """
+        metrics = MetricsCollector()
+        upstream = Upstream(10, delay=0.001)
+
+        async def run():
+            broadcaster = StreamBroadcaster(instrumentation=Instrumentation([metrics]))
+            key = stream_key("/v1/messages", {"model": "m", "temperature": 0})
+            first = await broadcaster.subscribe(key, upstream)
+            early = asyncio.create_task(collect(first))
+            while upstream.produced < 5:
+                await asyncio.sleep(0.001)
+            second = await broadcaster.subscribe(key, upstream)
+            self.assertEqual(broadcaster.stats()["subscribers"], 2)
+            return await asyncio.gather(early, collect(second))
+
+        early, late = asyncio.run(run())
+        expected = [str(i) for i in range(10)]
+        self.assertEqual((early, late), (expected, expected))
+        self.assertEqual(upstream.opened, 1)
+        self.assertEqual(metrics.counters["broadcast.joined"], 1)
+        self.assertGreaterEqual(metrics.last["broadcast.joined.replayed"], 5)
+
+    def test_replay_buffer_is_bounded(self):
+        """
+        Test that a stream longer than the replay buffer is not joined and
+        only keeps the events its subscribers have yet to read.
+        """
+        upstream = Upstream(50, size=100)
+
+        async def run():
+            broadcaster = StreamBroadcaster(max_replay_bytes=1000, max_lag=4)
+            first = await broadcaster.subscribe("key", upstream)
+            reader = asyncio.create_task(collect(first, delay=0.001))
+            while upstream.produced < 20:
+                await asyncio.sleep(0.001)
+                self.assertLessEqual(broadcaster.stats()["buffered_events"], 11)
+            second = await broadcaster.subscribe("key", upstream)
+            await asyncio.gather(reader, collect(second))
+            return broadcaster
+
+        broadcaster = asyncio.run(run())
+        self.assertEqual(upstream.opened, 2)
+        self.assertEqual(broadcaster.stats()["streams"], 0)
+
+    def test_backpressure_and_slow_subscribers(self):
+        """
+        Test that a lone slow subscriber paces the upstream stream, and that a
+        slow subscriber holding back others is dropped.
+        """
+        upstream = Upstream(100)
+
+        async def paced():
+            broadcaster = StreamBroadcaster(max_lag=5, slow_timeout=0.01)
+            subscription = await broadcaster.subscribe(None, upstream)
+            await asyncio.sleep(0.05)
+            self.assertLessEqual(upstream.produced, 6)
+            return await collect(subscription)
+
+        self.assertEqual(len(asyncio.run(paced())), 100)
+
+        metrics = MetricsCollector()
+        upstream = Upstream(100)
+
+        async def dropped():
+            broadcaster = StreamBroadcaster(
+                max_lag=5, slow_timeout=0.01, instrumentation=Instrumentation([metrics])
+            )
+            slow = await broadcaster.subscribe("key", upstream)
+            fast = await broadcaster.subscribe("key", upstream)
+            reader = asyncio.create_task(collect(fast))
+            with self.assertRaises(SlowSubscriberError):
+                await collect(slow, delay=0.2)
+            return await reader
+
+        self.assertEqual(len(asyncio.run(dropped())), 100)
+        self.assertEqual(metrics.counters["broadcast.dropped"], 1)
+
+    def test_errors_and_closing(self):
+        """
+        Test that errors opening a stream are raised on subscribing, errors
+        midway after the events before them, and that the upstream stream is
+        closed when its last subscriber leaves.
+        """
+        broadcaster = StreamBroadcaster()
+
+        async def run(upstream, limit=None):
+            subscription = await broadcaster.subscribe("key", upstream)
+            events = await collect(subscription, limit)
+            await asyncio.sleep(0)
+            return events
+
+        with self.assertRaises(QueueFullError):
+            asyncio.run(run(Upstream(0, error=QueueFullError())))
+
+        upstream = Upstream(3, error=ConnectionError("reset"))
+        with self.assertRaises(ConnectionError):
+            asyncio.run(run(upstream))
+        self.assertEqual(upstream.produced, 3)
+
+        upstream = Upstream(1000)
+        self.assertEqual(asyncio.run(run(upstream, limit=2)), ["0", "1"])
+        self.assertTrue(upstream.closed)
+        self.assertLess(upstream.produced, 1000)
+        self.assertEqual(broadcaster.stats()["streams"], 0)
+
+    def test_cancelled_subscribe(self):
+        """
+        Test that a subscriber cancelled before the first event leaves, and
+        that the upstream stream is closed when it was the only one.
+        """
+        broadcaster = StreamBroadcaster()
+        upstream = Upstream(1000, delay=0.05)
+
+        async def run():
+            subscribing = asyncio.ensure_future(broadcaster.subscribe("key", upstream))
+            await asyncio.sleep(0.01)
+            subscribing.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await subscribing
+            await asyncio.sleep(0.1)
+
+        asyncio.run(run())
+        self.assertTrue(upstream.closed)
+        self.assertEqual(upstream.produced, 0)
+        self.assertEqual(broadcaster.stats()["subscribers"], 0)
+        self.assertEqual(broadcaster.stats()["streams"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Tests for the circuit breaker.
+"""
+
+import asyncio
+import time
+import unittest
+
+from claude_sdk import AsyncClaude, Claude
+from claude_sdk.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from claude_sdk.exceptions import (
+    CircuitOpenError,
+    RateLimitError,
+    ServiceUnavailableError,
+)
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+from claude_sdk.stub_server import StubConfig, StubServer
+
+MODEL = "claude-3-7-sonnet-20250219"
+MESSAGES = [{"role": "user", "content": "Are you up?"}]
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """
+    Tests for opening, probing and closing circuits against the stub server.
+    """
+
+    def setUp(self):
+        """
+        Start an overloaded stub server and a client with a circuit breaker.
+        """
+        self.stub = StubServer(StubConfig(output_tokens=1, rate_529=1.0)).start()
+        self.addCleanup(self.stub.stop)
+        self.breaker = CircuitBreaker(minimum_calls=4, open_duration=0.2)
+        self.metrics = MetricsCollector()
+        self.client = Claude(
+            api_key="sk-test",
+            base_url=self.stub.url,
+            circuit_breaker=self.breaker,
+            instrumentation=Instrumentation([self.metrics]),
+        )
+        self.addCleanup(self.client.close)
+
+    def _fail(self, times):
+        for _ in range(times):
+            with self.assertRaises(ServiceUnavailableError):
+                self.client.messages_create(model=MODEL, messages=MESSAGES)
+
+    def test_open_half_open_closed(self):
+        """
+        Test the full cycle from closed to open, half-open and closed again.
+        """
+        self._fail(4)
+        self.assertEqual(self.breaker.state(self.stub.url, MODEL), OPEN)
+        served = self.stub.engine.request_count
+
+        start = time.perf_counter()
+        with self.assertRaises(CircuitOpenError) as context:
+            self.client.messages_create(model=MODEL, messages=MESSAGES)
+        self.assertLess(time.perf_counter() - start, 0.01)
+        self.assertEqual(self.stub.engine.request_count, served)
+        self.assertGreater(context.exception.retry_after, 0)
+
+        # Other models have their own circuit
+        with self.assertRaises(ServiceUnavailableError) as context:
+            self.client.messages_create(
+                model="claude-3-5-haiku-latest", messages=MESSAGES
+            )
+        self.assertNotIsInstance(context.exception, CircuitOpenError)
+
+        time.sleep(0.25)
+        self.assertEqual(self.breaker.state(self.stub.url, MODEL), HALF_OPEN)
+        self.stub.config.rate_529 = 0.0
+        self.client.messages_create(model=MODEL, messages=MESSAGES)
+        self.assertEqual(self.breaker.state(self.stub.url, MODEL), CLOSED)
+
+        self.assertEqual(self.metrics.last["circuit.state_change.state"], CLOSED)
+        self.assertEqual(self.metrics.counters["circuit.state_change"], 3)
+        self.assertEqual(self.metrics.counters["circuit.rejected"], 1)
+
+    def test_failed_trial_reopens(self):
+        """
+        Test that a failing trial call re-opens the circuit.
+        """
+        self._fail(4)
+        time.sleep(0.25)
+        self._fail(1)
+
+        self.assertEqual(self.breaker.state(self.stub.url, MODEL), OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.client.messages_create(model=MODEL, messages=MESSAGES)
+
+    def test_rate_limits_are_not_failures(self):
+        """
+        Test that 429 responses do not open the circuit.
+        """
+        self.stub.config.rate_529 = 0.0
+        self.stub.config.rate_429 = 1.0
+        for _ in range(6):
+            with self.assertRaises(RateLimitError):
+                self.client.messages_create(model=MODEL, messages=MESSAGES)
+
+        self.assertEqual(self.breaker.state(self.stub.url, MODEL), CLOSED)
+
+    def test_async_fail_fast(self):
+        """
+        Test that the async client shares the breaker and fails fast.
+        """
+        self._fail(4)
+
+        async def run():
+            async with AsyncClaude(
+                api_key="sk-test",
+                base_url=self.stub.url,
+                circuit_breaker=self.breaker,
+            ) as client:
+                await client.messages_create(model=MODEL, messages=MESSAGES)
+
+        with self.assertRaises(CircuitOpenError):
+            asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -19,18 +19,19 @@ class TestClaude(unittest.TestCase):
         Set up the test environment.
         """
         # Set a dummy API key for testing
-        os.environ["ANTHROPIC_API_KEY"] = "test_api_key"
+        os.environ["ANTHROPIC_API_KEY"] = "sk-test_api_key"
         
         # Create a client
         self.client = Claude()
     
-    @patch("requests.post")
+    @patch("requests.Session.request")
     def test_generate(self, mock_post):
         """
         Test the generate method.
         """
         # Mock the response
         mock_response = MagicMock()
+        mock_response.status_code = 200
         mock_response.json.return_value = {"content": "This is a test response."}
         mock_response.raise_for_status.return_value = None
         mock_post.return_value = mock_response
@@ -59,13 +60,14 @@ class TestClaude(unittest.TestCase):
         self.assertEqual(payload["messages"][0]["role"], "user")
         self.assertEqual(payload["messages"][0]["content"], "This is a test prompt.")
     
-    @patch("requests.post")
+    @patch("requests.Session.request")
     def test_messages_create(self, mock_post):
         """
         Test the messages_create method.
         """
         # Mock the response
         mock_response = MagicMock()
+        mock_response.status_code = 200
         mock_response.json.return_value = {"content": "This is a test response."}
         mock_response.raise_for_status.return_value = None
         mock_post.return_value = mock_response
@@ -96,5 +98,36 @@ class TestClaude(unittest.TestCase):
         self.assertEqual(payload["messages"][0]["role"], "user")
         self.assertEqual(payload["messages"][0]["content"], "This is a test message.")
 
+    @patch("requests.Session.request")
+    def test_betas(self, mock_post):
+        """
+        Test that betas are sent with one call, after the client's betas.
+        """
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"content": "This is a test response."}
+        mock_post.return_value = mock_response
+        self.client.headers["anthropic-beta"] = "prompt-caching-2024-07-31"
+        messages = [{"role": "user", "content": "This is a test message."}]
+
+        self.client.messages_create(
+            model="claude-3-7-sonnet-20250219",
+            messages=messages,
+            betas=["computer-use-2025-01-24", "prompt-caching-2024-07-31"],
+        )
+        self.client.messages_create(
+            model="claude-3-7-sonnet-20250219", messages=messages
+        )
+
+        first, second = [kwargs["headers"] for _, kwargs in mock_post.call_args_list]
+        self.assertEqual(
+            first["anthropic-beta"],
+            "prompt-caching-2024-07-31,computer-use-2025-01-24",
+        )
+        self.assertEqual(second["anthropic-beta"], "prompt-caching-2024-07-31")
+        self.assertEqual(
+            self.client.headers["anthropic-beta"], "prompt-caching-2024-07-31"
+        )
+
 if __name__ == "__main__":
     unittest.main()
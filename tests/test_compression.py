@@ -0,0 +1,153 @@
+"""
+Tests for request body compression.
+"""
+
+import asyncio
+import json
+import unittest
+import zlib
+
+from claude_sdk import AsyncClaude, Claude
+from claude_sdk.compression import RequestCompression
+from claude_sdk.encoding import iter_json
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+from claude_sdk.stub_server import StubConfig, StubServer
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MODEL = "claude-3-7-sonnet-20250219"
+
+
+def _history(turns):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"Turn {i} " * 50}
+        for i in range(turns)
+    ]
+
+
+class TestRequestCompression(unittest.TestCase):
+    """
+    Tests for RequestCompression.
+    """
+
+    def test_iter_json(self):
+        """
+        Test that incremental encoding produces equivalent JSON.
+        """
+        payload = {
+            "model": MODEL,
+            "messages": [{"role": "user", "content": "héllo \"quoted\" ✓"}],
+            "temperature": 0.5,
+            "stream": False,
+            "tools": None,
+            "nested": [[1, 2], {"a": []}],
+        }
+        encoded = b"".join(iter_json(payload, chunk_size=8))
+
+        self.assertEqual(json.loads(encoded), payload)
+
+    def test_below_threshold(self):
+        """
+        Test that small bodies are sent as plain bytes.
+        """
+        headers, body = RequestCompression(threshold=1024).encode({"a": 1})
+
+        self.assertEqual(headers, {})
+        self.assertEqual(json.loads(body), {"a": 1})
+
+    def test_gzip_streaming(self):
+        """
+        Test that large bodies are compressed chunk by chunk and reported.
+        """
+        payload = {"messages": _history(200)}
+        stats = []
+        compression = RequestCompression(threshold=1024, chunk_size=4096)
+        headers, body = compression.encode(payload, stats.append)
+
+        self.assertEqual(headers, {"content-encoding": "gzip"})
+        chunks = list(body)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(json.loads(zlib.decompress(b"".join(chunks), 31)), payload)
+        self.assertEqual(stats[0]["bytes_out"], sum(len(c) for c in chunks))
+        self.assertGreater(stats[0]["bytes_saved"], stats[0]["bytes_out"])
+
+    @unittest.skipIf(zstandard is None, "requires zstandard")
+    def test_zstd(self):
+        """
+        Test zstd compression.
+        """
+        payload = {"messages": _history(50)}
+        headers, body = RequestCompression("zstd", threshold=1).encode(payload)
+        data = zstandard.ZstdDecompressor().decompressobj().decompress(b"".join(body))
+
+        self.assertEqual(headers, {"content-encoding": "zstd"})
+        self.assertEqual(json.loads(data), payload)
+
+    def test_invalid_encoding(self):
+        """
+        Test that unknown encodings are rejected up front.
+        """
+        with self.assertRaises(ValueError):
+            RequestCompression("brotli")
+
+
+class TestClientCompression(unittest.TestCase):
+    """
+    Tests for compressed requests sent by the clients.
+    """
+
+    def setUp(self):
+        """
+        Start a stub server and an instrumented compression policy.
+        """
+        self.stub = StubServer(StubConfig(output_tokens=2)).start()
+        self.addCleanup(self.stub.stop)
+        self.metrics = MetricsCollector()
+        self.options = {
+            "api_key": "sk-test",
+            "base_url": self.stub.url,
+            "compression": RequestCompression(threshold=1024),
+            "instrumentation": Instrumentation([self.metrics]),
+        }
+        self.messages = _history(100)
+        self.raw_size = len(json.dumps(self.messages))
+
+    def test_sync_client(self):
+        """
+        Test that the sync client sends compressed bodies the server understands.
+        """
+        with Claude(**self.options) as client:
+            response = client.messages_create(model=MODEL, messages=self.messages)
+
+        self.assertEqual(response["type"], "message")
+        self.assertLess(self.stub.engine.bytes_received, self.raw_size / 5)
+        self.assertEqual(self.metrics.counters["request.compressed"], 1)
+        self.assertEqual(
+            self.metrics.totals["request.compressed.bytes_out"],
+            self.stub.engine.bytes_received,
+        )
+
+    def test_async_client(self):
+        """
+        Test that the async client streams compressed bodies.
+        """
+
+        async def run():
+            async with AsyncClaude(**self.options) as client:
+                stream = await client.messages_create(
+                    model=MODEL, messages=self.messages, stream=True
+                )
+                return [chunk async for chunk in stream]
+
+        chunks = asyncio.run(run())
+
+        self.assertEqual(json.loads(chunks[-1])["type"], "message_stop")
+        self.assertLess(self.stub.engine.bytes_received, self.raw_size / 5)
+        self.assertGreater(self.metrics.totals["request.compressed.cpu_seconds"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
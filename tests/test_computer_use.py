@@ -0,0 +1,172 @@
+"""
+Tests for the computer-use agent loop.
+"""
+
+import io
+import unittest
+
+from claude_sdk.attachments import Attachment
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:
+    Image = None
+
+if Image is not None:
+    from claude_sdk.computer_use import (
+        Computer,
+        ComputerUseSession,
+        ScreenshotEncoder,
+        hash_distance,
+        perceptual_hash,
+    )
+else:
+    Computer = object
+
+MODEL = "claude-3-7-sonnet-20250219"
+
+
+class FakeComputer(Computer):
+    """
+    A 2560x1600 screen that draws a box wherever it is clicked.
+    """
+
+    def __init__(self):
+        self.screen = Image.new("RGB", (2560, 1600), "white")
+        self.actions = []
+
+    def screenshot(self):
+        buffer = io.BytesIO()
+        self.screen.save(buffer, "PNG")
+        return buffer.getvalue()
+
+    def perform(self, action):
+        self.actions.append(action)
+        if action["action"] == "left_click":
+            x, y = action["coordinate"]
+            ImageDraw.Draw(self.screen).rectangle(
+                (x - 50, y - 50, x + 50, y + 50), fill="black"
+            )
+        elif action["action"] == "fail":
+            raise RuntimeError("Unknown action")
+
+
+class ScriptedClient:
+    """
+    Client returning the given tool calls one response at a time, and
+    recording the images of every request.
+    """
+
+    def __init__(self, actions):
+        self.headers = {}
+        self.metrics = MetricsCollector()
+        self.instrumentation = Instrumentation([self.metrics])
+        self.actions = list(actions)
+        self.images = []
+        self.betas = []
+
+    def messages_create(self, model, messages, **kwargs):
+        self.betas.append(kwargs.get("betas"))
+        images = []
+        for message in messages:
+            for block in message["content"]:
+                images.extend(
+                    part["source"]
+                    for part in [block, *(block.get("content") or [])]
+                    if part.get("type") == "image"
+                )
+        self.images.append(images)
+        if not self.actions:
+            return {
+                "content": [{"type": "text", "text": "Done"}],
+                "stop_reason": "end_turn",
+            }
+        tool_use = {
+            "type": "tool_use",
+            "id": f"toolu_{len(self.images)}",
+            "name": "computer",
+            "input": self.actions.pop(0),
+        }
+        return {"content": [tool_use], "stop_reason": "tool_use"}
+
+
+@unittest.skipIf(Image is None, "Pillow is not installed")
+class TestComputerUse(unittest.TestCase):
+    """
+    Tests for screenshot encoding and the session loop.
+    """
+
+    def test_encoder(self):
+        """
+        Test that screenshots are downscaled and recompressed, that unchanged
+        screens are skipped, and that coordinates map back to the screen.
+        """
+        computer = FakeComputer()
+        encoder = ScreenshotEncoder(max_size=(1280, 800), quality=60)
+        attachment = encoder.encode(computer.screenshot())
+        self.assertIsInstance(attachment, Attachment)
+        self.assertEqual(attachment.media_type, "image/jpeg")
+        self.assertEqual(encoder.size, (1280, 800))
+        self.assertEqual(encoder.screen_size, (2560, 1600))
+        self.assertEqual(encoder.to_screen([640, 400]), [1280, 800])
+        self.assertEqual(encoder.to_screen([1300, -5]), [2559, 0])
+
+        self.assertIsNone(encoder.encode(computer.screenshot()))
+        computer.perform({"action": "left_click", "coordinate": [1280, 800]})
+        self.assertIsNotNone(encoder.encode(computer.screenshot()))
+        encoder.reset()
+        self.assertIsNotNone(encoder.encode(computer.screen))
+
+        first = perceptual_hash(computer.screen)
+        computer.perform({"action": "left_click", "coordinate": [300, 300]})
+        self.assertGreater(hash_distance(first, perceptual_hash(computer.screen)), 0)
+        with self.assertRaises(ValueError):
+            ScreenshotEncoder(format="BMP")
+
+    def test_session(self):
+        """
+        Test that the session performs the actions with scaled coordinates,
+        prunes old screenshots, skips unchanged ones and reports errors.
+        """
+        computer = FakeComputer()
+        actions = [
+            {"action": "left_click", "coordinate": [100 * i, 100 * i]}
+            for i in range(1, 6)
+        ]
+        actions[2:2] = [{"action": "screenshot"}, {"action": "fail"}]
+        client = ScriptedClient(actions)
+        session = ComputerUseSession(client, computer, MODEL, keep_images=2)
+
+        response = session.run("Draw some boxes.")
+        self.assertEqual(response["stop_reason"], "end_turn")
+        self.assertEqual(client.betas[0], ["computer-use-2025-01-24"])
+        self.assertEqual(client.headers, {})
+        self.assertEqual(computer.actions[0]["coordinate"], [200, 200])
+        self.assertEqual(session.tool()["display_width_px"], 1280)
+        # The screenshot and the failed action left the screen unchanged
+        self.assertEqual(session.stats(), {"steps": 8, "skipped": 1, "images": 2})
+        self.assertEqual(
+            [len(images) for images in client.images], [1, 2, 2, 2, 2, 2, 2, 2]
+        )
+        failed = session.messages[8]["content"][0]
+        self.assertTrue(failed["is_error"])
+        self.assertIn(session.placeholder, str(session.messages[0]["content"]))
+
+        metrics = client.metrics
+        self.assertEqual(metrics.last["computer_use.step.step"], 8)
+        self.assertEqual(metrics.last["computer_use.step.images"], 2)
+
+    def test_max_steps(self):
+        """
+        Test that the loop stops after max_steps requests.
+        """
+        client = ScriptedClient([{"action": "screenshot"}] * 10)
+        session = ComputerUseSession(client, FakeComputer(), MODEL, max_steps=3)
+        self.assertEqual(session.run("Wait.")["stop_reason"], "tool_use")
+        self.assertEqual(session.steps, 3)
+        self.assertEqual(session.skipped, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
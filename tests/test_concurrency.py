@@ -0,0 +1,130 @@
+"""
+Tests for the adaptive concurrency limiter.
+"""
+
+import asyncio
+import unittest
+
+from claude_sdk import AsyncClaude
+from claude_sdk.concurrency import AIMD, AdaptiveLimiter, Gradient
+from claude_sdk.exceptions import RateLimitError
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+from claude_sdk.stub_server import LatencyDistribution, StubConfig, StubServer
+
+MESSAGES = [{"role": "user", "content": "How busy are you?"}]
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    """
+    Tests for limiting and adapting concurrency.
+    """
+
+    def test_limits_in_flight(self):
+        """
+        Test that waiters start in order as permits are released.
+        """
+
+        async def run():
+            limiter = AdaptiveLimiter(AIMD(), initial_limit=2)
+            limits = []
+            limiter.add_limit_callback(limits.append)
+            first = await limiter.acquire()
+            await limiter.acquire()
+            order = []
+
+            async def wait(name):
+                permit = await limiter.acquire()
+                order.append(name)
+                return permit
+
+            tasks = [asyncio.create_task(wait(n)) for n in "abc"]
+            await asyncio.sleep(0)
+            self.assertEqual((limiter.in_flight, limiter.waiting), (2, 3))
+
+            tasks[1].cancel()
+            first.release()
+            first.release()
+            await asyncio.sleep(0)
+            self.assertEqual(order, ["a"])
+
+            # A drop shrinks the limit, so releasing does not admit "c" yet
+            first.record(0.01, dropped=True)
+            self.assertEqual(limiter.limit, 1)
+            self.assertEqual(limits, [1])
+            (await tasks[0]).release()
+            await asyncio.sleep(0)
+            self.assertEqual(order, ["a"])
+            return limiter
+
+        limiter = asyncio.run(run())
+        self.assertEqual(limiter.in_flight, 1)
+
+    def test_gradient_shrinks_on_latency(self):
+        """
+        Test that the gradient algorithm backs off as latency grows.
+        """
+        gradient = Gradient()
+        limit = 50.0
+        for _ in range(20):
+            limit = gradient.update(limit, 0.02, 50, False)
+        self.assertGreater(limit, 50)
+
+        grown = limit
+        for _ in range(50):
+            limit = gradient.update(limit, 0.1, int(limit), False)
+        self.assertLess(limit, grown / 2)
+
+    def _drive(self, algorithm):
+        """
+        Run bursts against a stub whose capacity changes, returning the limit
+        after each burst.
+        """
+        config = StubConfig(
+            latency=LatencyDistribution("fixed", (0.02,)), output_tokens=1
+        )
+        metrics = MetricsCollector()
+        limiter = AdaptiveLimiter(algorithm, initial_limit=4)
+        limits = []
+
+        async def run(stub):
+            async with AsyncClaude(
+                api_key="sk-test",
+                base_url=stub.url,
+                concurrency_limiter=limiter,
+                instrumentation=Instrumentation([metrics]),
+            ) as client:
+
+                async def worker():
+                    for _ in range(10):
+                        try:
+                            await client.messages_create(
+                                model="claude-3-5-haiku-20241022", messages=MESSAGES
+                            )
+                        except RateLimitError:
+                            pass
+
+                for capacity in (4, 32, 4):
+                    stub.config.capacity = capacity
+                    await asyncio.gather(*(worker() for _ in range(48)))
+                    limits.append(limiter.limit)
+
+        with StubServer(config) as stub:
+            asyncio.run(run(stub))
+
+        self.assertEqual(metrics.last["concurrency.limit.limit"], limiter.limit)
+        return limits
+
+    def test_varying_capacity(self):
+        """
+        Test that both algorithms follow the capacity of the stub server.
+        """
+        for algorithm in ("aimd", "gradient"):
+            with self.subTest(algorithm=algorithm):
+                low, high, low_again = self._drive(algorithm)
+                self.assertLess(low, 24)
+                self.assertGreater(high, 32)
+                self.assertLess(low_again, 24)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,216 @@
+"""
+Tests for the context-window manager.
+"""
+
+import asyncio
+import time
+import unittest
+
+from claude_sdk import AsyncClaude, Claude
+from claude_sdk.context import (
+    ContextWindow,
+    DropOldestTurns,
+    StripImages,
+    StripToolResults,
+    Summarize,
+    estimate_tokens,
+)
+from claude_sdk.exceptions import ContextWindowExceededError, InvalidRequestError
+from claude_sdk.stub_server import StubConfig, StubServer
+
+MODEL = "claude-3-7-sonnet-20250219"
+IMAGE = {"type": "image", "source": {"type": "base64", "data": "iVBORw0KGgo="}}
+
+
+def tool_turn(index):
+    """
+    Messages of a turn in which the assistant calls a tool and answers.
+    """
+    return [
+        {"role": "user", "content": [{"type": "text", "text": f"Step {index}"}, IMAGE]},
+        {
+            "role": "assistant",
+            "content": [
+                {"type": "tool_use", "id": f"t{index}", "name": "run", "input": {}}
+            ],
+        },
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "tool_result",
+                    "tool_use_id": f"t{index}",
+                    "content": "x" * 400,
+                }
+            ],
+        },
+        {"role": "assistant", "content": f"Done with step {index}."},
+    ]
+
+
+class TestContextWindow(unittest.TestCase):
+    """
+    Tests for token accounting and compaction.
+    """
+
+    def assertConsistent(self, window):
+        """
+        Assert that the running estimate matches the messages it covers.
+        """
+        recomputed = sum(estimate_tokens(window[i]) for i in range(len(window)))
+        if window.summary is not None:
+            recomputed += estimate_tokens(window.summary_prefix + window.summary)
+        self.assertEqual(window.estimated_tokens, recomputed)
+
+    def test_policies(self):
+        """
+        Test stripping old tool results and images before dropping turns, and
+        keeping tool calls together with their results.
+        """
+        window = ContextWindow(target_tokens=10**6)
+        for index in range(6):
+            for message in tool_turn(index):
+                window.append(message)
+        self.assertEqual(window.turns, 6)
+        self.assertEqual(len(window), 24)
+        self.assertConsistent(window)
+        full = window.estimated_tokens
+
+        window.target_tokens = full - 1000
+        messages = window.prepare()
+        self.assertConsistent(window)
+        self.assertEqual(len(messages), 24)
+        self.assertEqual(
+            messages[2]["content"][0]["content"],
+            StripToolResults.placeholder,
+        )
+        self.assertEqual(messages[0]["content"][1]["text"], StripImages.placeholder)
+        self.assertEqual(messages[-2]["content"][0]["content"], "x" * 400)
+        self.assertEqual(messages[-4]["content"][1], IMAGE)
+
+        window.target_tokens = 3500
+        messages = window.prepare()
+        self.assertConsistent(window)
+        self.assertLessEqual(window.estimated_tokens, 3500)
+        self.assertEqual(messages[0]["content"][0]["text"], "Step 4")
+        self.assertEqual(window.turns, 2)
+
+        window.policies = [DropOldestTurns(keep_recent=2)]
+        window.target_tokens = 10
+        self.assertEqual(len(window.prepare()), 8)
+        with self.assertRaises(ContextWindowExceededError) as cm:
+            window.prepare(max_output=200_000)
+        self.assertIsInstance(cm.exception, InvalidRequestError)
+
+    def test_summary(self):
+        """
+        Test that summaries are computed once, reused, and folded into the next
+        summary, by sync and async summarizers.
+        """
+        calls = []
+
+        def summarize(messages):
+            calls.append(messages)
+            return f"summary {len(calls)}"
+
+        async def asummarize(messages):
+            return summarize(messages)
+
+        for summarizer in (summarize, asummarize):
+            calls.clear()
+            window = ContextWindow(
+                target_tokens=120, policies=[Summarize(summarizer, keep_recent=1)]
+            )
+
+            def prepare():
+                if summarizer is summarize:
+                    return window.prepare()
+                return asyncio.run(window.prepare_async())
+
+            for index in range(3):
+                window.append({"role": "user", "content": f"Question {index} " * 10})
+                window.append({"role": "assistant", "content": "Answer " * 20})
+            messages = prepare()
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(len(calls[0]), 4)
+            self.assertEqual(len(messages), 2)
+            self.assertEqual(
+                messages[0]["content"][0]["text"],
+                window.summary_prefix + "summary 1",
+            )
+            self.assertEqual(prepare(), messages)
+            self.assertEqual(len(calls), 1)
+            self.assertConsistent(window)
+
+            window.append({"role": "user", "content": "One more " * 30})
+            prepare()
+            self.assertEqual(len(calls), 2)
+            self.assertIn("summary 1", calls[1][0]["content"][0]["text"])
+            self.assertEqual(window.turns, 1)
+
+        window = ContextWindow(
+            [{"role": "user", "content": "x" * 400}] * 2,
+            target_tokens=10,
+            policies=[Summarize(asummarize, keep_recent=1)],
+        )
+        with self.assertRaises(TypeError):
+            window.prepare()
+
+    def test_constant_work_per_turn(self):
+        """
+        Test that compacting after every appended turn takes constant time per
+        turn, not time proportional to the history.
+        """
+
+        def run(turns):
+            window = ContextWindow(target_tokens=20_000)
+            started = time.perf_counter()
+            for index in range(turns):
+                for message in tool_turn(index):
+                    window.append(message)
+                window.prepare()
+            return time.perf_counter() - started
+
+        short, long = run(500), run(5000)
+        self.assertLess(long, short * 30)
+
+    def test_clients(self):
+        """
+        Test that both clients compact the window, append replies and calibrate
+        the estimate from reported usage.
+        """
+        stub = StubServer(StubConfig(output_tokens=5)).start()
+        self.addCleanup(stub.stop)
+        window = ContextWindow(target_tokens=1000)
+        window.append({"role": "user", "content": "Hello there."})
+
+        with Claude(api_key="sk-test", base_url=stub.url) as client:
+            response = client.messages_create(MODEL, window, system="Be brief.")
+            self.assertEqual(window[-1]["content"], response["content"])
+            window.append({"role": "user", "content": "And then?"})
+            stream = client.messages_create(MODEL, window, stream=True)
+            self.assertEqual(len(window), 3)
+            stream.get_final_message()
+            self.assertEqual(len(window), 4)
+            self.assertEqual(window[-1]["role"], "assistant")
+            self.assertNotEqual(window.scale, 1.0)
+
+            window.append({"role": "user", "content": "word " * 10_000})
+            with self.assertRaises(ContextWindowExceededError):
+                client.messages_create(MODEL, window, max_tokens=199_000)
+
+        async def run():
+            async with AsyncClaude(api_key="sk-test", base_url=stub.url) as client:
+                window.policies = [DropOldestTurns(keep_recent=1)]
+                window.append({"role": "assistant", "content": "OK."})
+                window.append({"role": "user", "content": "Last question."})
+                await client.messages_create(MODEL, window)
+
+        asyncio.run(run())
+        self.assertEqual(window.turns, 1)
+        self.assertEqual(window[0]["content"], "Last question.")
+        self.assertEqual(len(window), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
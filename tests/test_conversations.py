@@ -0,0 +1,153 @@
+"""
+Tests for the append-only conversation store.
+"""
+
+import mmap
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from claude_sdk.conversations import ConversationStore, response_message
+
+
+def message(role, index):
+    """
+    Build a message with recognizable content.
+    """
+    return {"role": role, "content": f"{role} message {index}"}
+
+
+class TestConversationStore(unittest.TestCase):
+    """
+    Tests for appending, resuming, recovering and compacting conversations.
+    """
+
+    def setUp(self):
+        """
+        Create a directory for the log.
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_append_resume_and_compact(self):
+        """
+        Test reading conversations back after reopening, and that compaction
+        drops deleted and replaced messages only.
+        """
+        with ConversationStore(self.directory) as store:
+            for index in range(3):
+                store.append("a", message("user", index))
+                store.extend("b", [message("user", index), message("assistant", index)])
+            store.append("a", response_message({"content": [{"text": "hi"}]}))
+            self.assertEqual(store.messages("a", last=1)[0]["role"], "assistant")
+            self.assertEqual(store.messages("missing"), [])
+
+        with ConversationStore(self.directory) as store:
+            self.assertEqual(store.conversations(), ["a", "b"])
+            self.assertEqual(len(store.messages("a")), 4)
+            self.assertEqual(store.messages("b")[5], message("assistant", 2))
+            self.assertEqual(
+                store.messages("b", last=2),
+                [message("user", 2), message("assistant", 2)],
+            )
+
+            store.delete("a")
+            store.replace("b", [message("user", 9)])
+            self.assertNotIn("a", store)
+            stats = store.stats()
+            self.assertGreater(stats["bytes"], stats["live_bytes"])
+            store.compact()
+            self.assertEqual(store.stats()["bytes"], stats["live_bytes"])
+            self.assertEqual(store.messages("b"), [message("user", 9)])
+            store.append("b", message("assistant", 9))
+
+        with ConversationStore(self.directory) as store:
+            self.assertEqual(store.conversations(), ["b"])
+            self.assertEqual(
+                store.messages("b"), [message("user", 9), message("assistant", 9)]
+            )
+
+    def test_recovery(self):
+        """
+        Test that torn and corrupt appends are truncated on reopening, and
+        that batches survive whole or not at all.
+        """
+        with ConversationStore(self.directory, sync=True) as store:
+            store.append("a", message("user", 0))
+            committed = os.path.getsize(store.path)
+            store.extend("a", [message("assistant", 0), message("user", 1)])
+            path = store.path
+        size = os.path.getsize(path)
+
+        for cut in range(committed + 1, size):
+            with open(path, "r+b") as f:
+                f.truncate(cut)
+            with ConversationStore(self.directory) as store:
+                self.assertEqual(store.messages("a"), [message("user", 0)])
+                self.assertEqual(os.path.getsize(path), committed)
+                store.extend("a", [message("assistant", 0), message("user", 1)])
+            self.assertEqual(os.path.getsize(path), size)
+
+        with open(path, "r+b") as f:
+            f.seek(size - 3)
+            f.write(b"X")
+        with ConversationStore(self.directory) as store:
+            self.assertEqual(len(store.messages("a")), 1)
+            store.append("a", message("assistant", 0))
+            self.assertEqual(len(store.messages("a")), 2)
+
+    def test_concurrent_conversations(self):
+        """
+        Test many threads appending to thousands of conversations while
+        reading them back.
+        """
+        store = ConversationStore(self.directory)
+        self.addCleanup(store.close)
+        errors = []
+
+        def worker(thread):
+            try:
+                for index in range(10):
+                    for conversation in range(thread, 2000, 8):
+                        store.append(str(conversation), message("user", index))
+                    messages = store.messages(str(thread))
+                    self.assertEqual(messages[-1], message("user", index))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(store), 2000)
+        self.assertEqual(store.stats()["messages"], 20000)
+        expected = [message("user", index) for index in range(10)]
+        self.assertEqual(store.messages("1999"), expected)
+        store.close()
+        with ConversationStore(self.directory) as reopened:
+            self.assertEqual(reopened.messages("1234"), expected)
+
+    def test_reads_after_appends(self):
+        """
+        Test that reading after every append does not remap the log each
+        time.
+        """
+        content = "x" * 10_000
+        with mock.patch("mmap.mmap", wraps=mmap.mmap) as mapped:
+            with ConversationStore(self.directory) as store:
+                for index in range(300):
+                    store.append("a", {"role": "user", "content": content})
+                    messages = store.messages("a", last=2)
+                    self.assertEqual(messages[-1]["content"], content)
+                self.assertEqual(len(store.messages("a")), 300)
+        self.assertGreater(store.stats()["bytes"], 2 * 1024 * 1024)
+        self.assertLessEqual(mapped.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Tests for sync clients backed by the background engine.
+"""
+
+import threading
+import time
+import unittest
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from claude_sdk import Claude
+from claude_sdk.engine import EventLoopThread, shared_loop
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+from claude_sdk.stub_server import LatencyDistribution, StubConfig, StubServer
+from claude_sdk.streaming import StopAfterTokens
+from claude_sdk.transport import RequestsTransport
+from claude_sdk.usage import UsageTracker
+
+MODEL = "claude-3-7-sonnet-20250219"
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+
+def client_threads():
+    """
+    Threads of the process, other than the stub server's connection handlers.
+    """
+    return [t for t in threading.enumerate() if "process_request" not in t.name]
+
+
+class TestEngine(unittest.TestCase):
+    """
+    Tests for running sync calls on the shared event loop.
+    """
+
+    def setUp(self):
+        """
+        Start a stub server with a fixed latency.
+        """
+        config = StubConfig(
+            latency=LatencyDistribution("fixed", (0.2,)),
+            output_tokens=20,
+            tokens_per_second=500,
+        )
+        self.stub = StubServer(config).start()
+        self.addCleanup(self.stub.stop)
+
+    def test_calls_and_futures(self):
+        """
+        Test sync calls from many threads and futures running concurrently on
+        the shared loop, without a thread per request.
+        """
+        tracker = UsageTracker()
+        client = Claude(
+            api_key="sk-test",
+            base_url=self.stub.url,
+            engine=True,
+            usage_tracker=tracker,
+        )
+        self.addCleanup(client.close)
+        self.assertIs(client._engine()[1], shared_loop())
+
+        response = client.messages_create(MODEL, MESSAGES)
+        self.assertEqual(response["role"], "assistant")
+        self.assertEqual(client.generate(MODEL, "Hi")["role"], "assistant")
+
+        threads = client_threads()
+        started = time.perf_counter()
+        futures = [
+            client.submit(client.messages_create, MODEL, MESSAGES, tenant="a")
+            for _ in range(100)
+        ]
+        self.assertIsInstance(futures[0], Future)
+        results = [future.result() for future in futures]
+        self.assertLess(time.perf_counter() - started, 5)
+        self.assertEqual(client_threads(), threads)
+        self.assertTrue(all(r["role"] == "assistant" for r in results))
+        (totals,) = [t for t in tracker.totals(by=("tenant",)) if t["tenant"] == "a"]
+        self.assertEqual(totals["calls"], 100)
+
+        with ThreadPoolExecutor(20) as pool:
+            results = list(
+                pool.map(lambda _: client.messages_create(MODEL, MESSAGES), range(40))
+            )
+        self.assertEqual(len(results), 40)
+
+        with self.assertRaises(TypeError):
+            client.submit(client.close)
+
+    def test_streams(self):
+        """
+        Test iterating and stopping a stream of an engine client.
+        """
+        metrics = MetricsCollector()
+        loop = EventLoopThread()
+        self.addCleanup(loop.close)
+        with Claude(
+            api_key="sk-test",
+            base_url=self.stub.url,
+            engine=loop,
+            instrumentation=Instrumentation([metrics]),
+        ) as client:
+            stream = client.messages_create(MODEL, MESSAGES, stream=True)
+            self.assertEqual(stream.get_final_message().stop_reason, "end_turn")
+
+            stream = client.submit(
+                client.messages_create, MODEL, MESSAGES, stream=True
+            ).result()
+            stream.stop_when(StopAfterTokens(3))
+            self.assertLess(len(list(stream)), 20)
+            self.assertEqual(stream.stopped, "max_tokens")
+            self.assertEqual(metrics.counters["stream.stopped"], 1)
+
+    def test_rejects_sync_transport(self):
+        """
+        Test that an engine client needs an async transport, and that sync
+        clients cannot submit.
+        """
+        with self.assertRaises(TypeError):
+            Claude(api_key="sk-test", transport=RequestsTransport(), engine=True)
+        with Claude(api_key="sk-test", base_url=self.stub.url) as client:
+            with self.assertRaises(RuntimeError):
+                client.submit(client.messages_create, MODEL, MESSAGES)
+
+
+if __name__ == "__main__":
+    unittest.main()
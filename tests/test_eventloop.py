@@ -0,0 +1,118 @@
+"""
+Tests for offloading large payloads and measuring event-loop lag.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+
+from claude_sdk import AsyncClaude
+from claude_sdk.eventloop import LoopLagMonitor, Offloader, estimate_size
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+from claude_sdk.stub_server import StubConfig, StubServer
+
+MODEL = "claude-3-7-sonnet-20250219"
+
+
+class TestOffloader(unittest.TestCase):
+    """
+    Tests for running work on large payloads on worker threads.
+    """
+
+    def test_threshold(self):
+        """
+        Test that only payloads at or above the threshold leave the loop.
+        """
+        metrics = MetricsCollector()
+        offloader = Offloader(threshold=100, instrumentation=Instrumentation([metrics]))
+        self.addCleanup(offloader.close)
+
+        def thread_name(_):
+            return threading.current_thread().name
+
+        async def run():
+            return [await offloader.run(size, thread_name, size) for size in (99, 100)]
+
+        inline, offloaded = asyncio.run(run())
+        self.assertEqual(inline, threading.current_thread().name)
+        self.assertTrue(offloaded.startswith("offload"))
+        self.assertEqual(
+            offloader.stats(), {"offloaded": 1, "offloaded_bytes": 100, "inline": 1}
+        )
+        self.assertEqual(metrics.counters["offload.completed"], 1)
+
+    def test_estimate_size(self):
+        """
+        Test that estimates are close to the encoded size and stop at the
+        limit.
+        """
+        payload = {
+            "model": MODEL,
+            "messages": [{"role": "user", "content": "word " * 100}] * 50,
+            "max_tokens": 1000,
+        }
+        encoded = len(json.dumps(payload))
+        self.assertLess(abs(estimate_size(payload) - encoded), encoded * 0.1)
+        self.assertLess(estimate_size(payload, limit=1000), 1600)
+
+    def test_client(self):
+        """
+        Test that a client serializes large payloads on worker threads.
+        """
+        stub = StubServer(StubConfig()).start()
+        self.addCleanup(stub.stop)
+        offloader = Offloader(threshold=64 * 1024)
+        self.addCleanup(offloader.close)
+
+        async def run():
+            async with AsyncClaude(
+                api_key="sk-test", base_url=stub.url, offloader=offloader
+            ) as client:
+                for content in ("Hi", "x" * 100_000):
+                    messages = [{"role": "user", "content": content}]
+                    response = await client.messages_create(
+                        MODEL, messages, max_tokens=16
+                    )
+                    self.assertEqual(response["type"], "message")
+
+        asyncio.run(run())
+        self.assertEqual(offloader.offloaded, 1)
+        self.assertEqual(stub.engine.request_count, 2)
+
+
+class TestLoopLagMonitor(unittest.TestCase):
+    """
+    Tests for measuring event-loop lag.
+    """
+
+    def test_stall(self):
+        """
+        Test that blocking the loop is reported as a stall.
+        """
+        metrics = MetricsCollector()
+        monitor = LoopLagMonitor(
+            interval=0.01,
+            stall_threshold=0.1,
+            instrumentation=Instrumentation([metrics]),
+        )
+
+        async def run():
+            async with monitor:
+                await asyncio.sleep(0.05)
+                time.sleep(0.2)
+                await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+        stats = monitor.stats()
+        self.assertEqual(stats["stalls"], 1)
+        self.assertGreaterEqual(stats["lag_max"], 0.15)
+        self.assertGreaterEqual(stats["stall_time"], 0.15)
+        self.assertLess(stats["lag_p50"], 0.1)
+        self.assertFalse(stats["running"])
+        self.assertGreaterEqual(metrics.last["loop.stall.lag"], 0.15)
+
+
+if __name__ == "__main__":
+    unittest.main()
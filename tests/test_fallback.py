@@ -0,0 +1,140 @@
+"""
+Tests for model fallback cascades.
+"""
+
+import asyncio
+import json
+import time
+import unittest
+
+from claude_sdk import AsyncClaude, Claude
+from claude_sdk.circuit_breaker import CircuitBreaker
+from claude_sdk.exceptions import RateLimitError, ServiceUnavailableError
+from claude_sdk.fallback import FallbackPolicy
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+from claude_sdk.stub_server import LatencyDistribution, StubConfig, StubServer
+
+LARGE = "claude-3-7-sonnet-20250219"
+SMALL = "claude-3-5-haiku-20241022"
+MESSAGES = [{"role": "user", "content": "Anyone there?"}]
+
+
+class TestFallback(unittest.TestCase):
+    """
+    Tests for falling back from a large model to a smaller one.
+    """
+
+    def setUp(self):
+        """
+        Start a stub server and a client with a metrics hook.
+        """
+        self.stub = StubServer(StubConfig(output_tokens=2)).start()
+        self.addCleanup(self.stub.stop)
+        self.metrics = MetricsCollector()
+        self.client = Claude(
+            api_key="sk-test",
+            base_url=self.stub.url,
+            instrumentation=Instrumentation([self.metrics]),
+        )
+        self.addCleanup(self.client.close)
+
+    def test_models(self):
+        """
+        Test resolving chains and mappings.
+        """
+        chain = FallbackPolicy(["a", "b", "c"])
+        self.assertEqual(chain.models("b"), ["b", "c"])
+        self.assertEqual(chain.models("x"), ["x", "a", "b", "c"])
+        self.assertEqual(FallbackPolicy({"a": ["c"]}).models("a"), ["a", "c"])
+        self.assertEqual(FallbackPolicy({"a": ["c"]}).models("b"), ["b"])
+
+    def test_overloaded(self):
+        """
+        Test falling back on 529 with a per-call policy.
+        """
+        self.stub.config.overloaded_models = (LARGE,)
+        policy = FallbackPolicy([LARGE, SMALL])
+
+        response = self.client.messages_create(
+            model=LARGE, messages=MESSAGES, fallback=policy
+        )
+        chunks = list(
+            self.client.messages_create(
+                model=LARGE, messages=MESSAGES, stream=True, fallback=policy
+            )
+        )
+
+        self.assertEqual(response["model"], SMALL)
+        self.assertEqual(json.loads(chunks[0])["message"]["model"], SMALL)
+        self.assertEqual(self.metrics.last["model.fallback.reason"], "status_529")
+        self.assertEqual(self.metrics.last["model.served.model"], SMALL)
+        self.assertEqual(policy.stats()["fallback_rate"], 1.0)
+
+        # Without a policy the caller still sees the overload
+        with self.assertRaises(ServiceUnavailableError):
+            self.client.messages_create(model=LARGE, messages=MESSAGES)
+
+    def test_exhausted_and_unrelated_errors(self):
+        """
+        Test that the last model's error and non-fallback errors propagate.
+        """
+        self.stub.config.overloaded_models = (LARGE, SMALL)
+        self.client.fallback = FallbackPolicy([LARGE, SMALL])
+        with self.assertRaises(ServiceUnavailableError):
+            self.client.messages_create(model=LARGE, messages=MESSAGES)
+        self.assertEqual(self.stub.engine.request_count, 2)
+
+        self.stub.config.overloaded_models = ()
+        self.stub.config.rate_429 = 1.0
+        with self.assertRaises(RateLimitError):
+            self.client.messages_create(model=LARGE, messages=MESSAGES)
+        self.assertEqual(self.stub.engine.request_count, 3)
+        self.assertEqual(self.client.fallback.stats()["calls"], 0)
+
+    def test_latency_budget(self):
+        """
+        Test falling back when a model is slower than the latency budget.
+        """
+        self.stub.config.model_latency = {LARGE: LatencyDistribution("fixed", (1.0,))}
+        policy = FallbackPolicy([LARGE, SMALL], latency_budget=0.2)
+        self.client.fallback = policy
+
+        start = time.perf_counter()
+        response = self.client.messages_create(model=LARGE, messages=MESSAGES)
+        self.assertLess(time.perf_counter() - start, 0.8)
+        self.assertEqual(response["model"], SMALL)
+        self.assertEqual(self.metrics.last["model.fallback.reason"], "timeout")
+
+        async def run():
+            async with AsyncClaude(
+                api_key="sk-test", base_url=self.stub.url, fallback=policy
+            ) as client:
+                return await client.messages_create(model=LARGE, messages=MESSAGES)
+
+        start = time.perf_counter()
+        self.assertEqual(asyncio.run(run())["model"], SMALL)
+        self.assertLess(time.perf_counter() - start, 0.8)
+        self.assertEqual(policy.stats()["served"], {SMALL: 2})
+
+    def test_open_circuit(self):
+        """
+        Test that an open circuit spills over without touching the network.
+        """
+        self.stub.config.overloaded_models = (LARGE,)
+        self.client.circuit_breaker = CircuitBreaker(minimum_calls=2)
+        for _ in range(2):
+            with self.assertRaises(ServiceUnavailableError):
+                self.client.messages_create(model=LARGE, messages=MESSAGES)
+        served = self.stub.engine.request_count
+
+        response = self.client.messages_create(
+            model=LARGE, messages=MESSAGES, fallback=FallbackPolicy([SMALL])
+        )
+
+        self.assertEqual(response["model"], SMALL)
+        self.assertEqual(self.stub.engine.request_count, served + 1)
+        self.assertEqual(self.metrics.last["model.fallback.reason"], "circuit_open")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Tests for the HTTP/2 transports and HTTP/2 stub server.
+"""
+
+import asyncio
+import json
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import h2  # noqa: F401
+    import httpx  # noqa: F401
+
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+from claude_sdk import AsyncClaude, Claude
+from claude_sdk.exceptions import RateLimitError
+from claude_sdk.stub_server import LatencyDistribution, StubConfig
+
+if HAS_HTTP2:
+    from claude_sdk.stub_server import H2StubServer
+    from claude_sdk.transport import AsyncHTTPXTransport, HTTPXTransport
+
+MODEL = "claude-3-7-sonnet-20250219"
+
+
+@unittest.skipUnless(HAS_HTTP2, "requires httpx[http2]")
+class TestHTTP2(unittest.TestCase):
+    """
+    Tests for multiplexing requests over HTTP/2.
+    """
+
+    def setUp(self):
+        """
+        Start an HTTP/2 stub server.
+        """
+        config = StubConfig(
+            latency=LatencyDistribution("fixed", (0.05,)), output_tokens=4
+        )
+        self.stub = H2StubServer(config).start()
+        self.addCleanup(self.stub.stop)
+
+    def test_sync_client(self):
+        """
+        Test concurrent sync requests sharing one HTTP/2 connection.
+        """
+        client = Claude(
+            api_key="sk-test",
+            base_url=self.stub.url,
+            transport=HTTPXTransport(http1=False, max_connections=1),
+        )
+        self.addCleanup(client.close)
+
+        def ask(i):
+            return client.messages_create(
+                model=MODEL, messages=[{"role": "user", "content": str(i)}]
+            )
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(pool.map(ask, range(16)))
+
+        self.assertTrue(all(r["type"] == "message" for r in responses))
+        self.assertEqual(self.stub.engine.connection_count, 1)
+
+    def test_async_streams(self):
+        """
+        Test many concurrent async streams multiplexed over one connection.
+        """
+
+        async def run():
+            async with AsyncClaude(
+                api_key="sk-test",
+                base_url=self.stub.url,
+                transport=AsyncHTTPXTransport(http1=False, max_connections=1),
+            ) as client:
+
+                async def stream(i):
+                    chunks = await client.messages_create(
+                        model=MODEL,
+                        messages=[{"role": "user", "content": str(i)}],
+                        stream=True,
+                    )
+                    return [json.loads(chunk)["type"] async for chunk in chunks]
+
+                return await asyncio.gather(*(stream(i) for i in range(32)))
+
+        results = asyncio.run(run())
+
+        self.assertTrue(all(types[-1] == "message_stop" for types in results))
+        self.assertEqual(self.stub.engine.connection_count, 1)
+
+    def test_errors(self):
+        """
+        Test that API errors surface through the HTTP/2 transport.
+        """
+        self.stub.config.rate_429 = 1.0
+        client = Claude(
+            api_key="sk-test",
+            base_url=self.stub.url,
+            transport=HTTPXTransport(http1=False),
+        )
+        self.addCleanup(client.close)
+
+        with self.assertRaises(RateLimitError):
+            client.messages_create(model=MODEL, messages=[], stream=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
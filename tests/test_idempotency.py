@@ -0,0 +1,203 @@
+"""
+Tests for idempotency keys and the response replay stores.
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from claude_sdk import AsyncClaude, Claude
+from claude_sdk.exceptions import IdempotencyConflictError, InvalidRequestError
+from claude_sdk.idempotency import IdempotencyStore, SQLiteIdempotencyStore
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+from claude_sdk.stub_server import LatencyDistribution, StubConfig, StubServer
+
+MODEL = "claude-3-7-sonnet-20250219"
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+
+class TestIdempotency(unittest.TestCase):
+    """
+    Tests for running requests once per idempotency key.
+    """
+
+    def setUp(self):
+        """
+        Start a stub server that takes a while to answer.
+        """
+        config = StubConfig(latency=LatencyDistribution("fixed", (0.2,)))
+        self.stub = StubServer(config).start()
+        self.addCleanup(self.stub.stop)
+
+    def test_clients(self):
+        """
+        Test that duplicates attach to the call in flight or replay its
+        response, and that reused keys and streams are rejected.
+        """
+        metrics = MetricsCollector()
+        store = IdempotencyStore()
+        client = Claude(
+            api_key="sk-test",
+            base_url=self.stub.url,
+            idempotency=store,
+            instrumentation=Instrumentation([metrics]),
+        )
+        self.addCleanup(client.close)
+
+        responses = []
+
+        def create():
+            responses.append(
+                client.messages_create(MODEL, MESSAGES, idempotency_key="k1")
+            )
+
+        threads = [threading.Thread(target=create) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.stub.engine.request_count, 1)
+        self.assertEqual(len(responses), 8)
+        self.assertTrue(all(r == responses[0] for r in responses))
+
+        replayed = client.messages_create(MODEL, MESSAGES, idempotency_key="k1")
+        self.assertEqual(replayed, responses[0])
+        self.assertEqual(self.stub.engine.request_count, 1)
+        self.assertEqual(metrics.counters["idempotency.replayed"], 8)
+        self.assertEqual(store.stats()["replayed"], 8)
+
+        with self.assertRaises(IdempotencyConflictError) as cm:
+            client.messages_create(MODEL, MESSAGES, max_tokens=5, idempotency_key="k1")
+        self.assertIsInstance(cm.exception, InvalidRequestError)
+        with self.assertRaises(ValueError):
+            client.messages_create(MODEL, MESSAGES, stream=True, idempotency_key="k2")
+
+        async def run():
+            async with AsyncClaude(
+                api_key="sk-test", base_url=self.stub.url, idempotency=store
+            ) as aclient:
+                return await asyncio.gather(
+                    aclient.messages_create(MODEL, MESSAGES, idempotency_key="k1"),
+                    aclient.messages_create(MODEL, MESSAGES, idempotency_key="k3"),
+                    aclient.messages_create(MODEL, MESSAGES, idempotency_key="k3"),
+                )
+
+        results = asyncio.run(run())
+        self.assertEqual(results[0], responses[0])
+        self.assertEqual(results[1], results[2])
+        self.assertEqual(self.stub.engine.request_count, 2)
+
+    def test_failures_and_eviction(self):
+        """
+        Test that failed calls are run again, and that responses expire and
+        are evicted beyond the store's size.
+        """
+        store = IdempotencyStore(ttl=0.2, max_entries=2)
+        calls = []
+
+        def fail():
+            calls.append("fail")
+            raise RuntimeError("upstream failed")
+
+        with self.assertRaises(RuntimeError):
+            store.run("a", {"n": 1}, fail)
+        self.assertEqual(store.run("a", {"n": 1}, lambda: {"ok": 1}), {"ok": 1})
+        self.assertEqual(store.run("a", {"n": 1}, fail), {"ok": 1})
+        self.assertEqual(calls, ["fail"])
+
+        store.run("b", {}, lambda: 2)
+        store.run("c", {}, lambda: 3)
+        self.assertEqual(store.stats()["entries"], 2)
+        self.assertEqual(store.run("a", {"n": 1}, lambda: "again"), "again")
+        time.sleep(0.25)
+        self.assertEqual(store.run("b", {}, lambda: "expired"), "expired")
+        self.assertEqual(store.stats()["entries"], 1)
+
+    def test_sqlite_between_processes(self):
+        """
+        Test that stores opened on the same database, as by separate worker
+        processes, wait for each other's calls and replay their responses.
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "idempotency.db")
+        stores = [SQLiteIdempotencyStore(path, poll_interval=0.01) for _ in range(3)]
+        for store in stores:
+            self.addCleanup(store.close)
+        calls = []
+
+        def call():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"content": [{"type": "text", "text": "once"}]}
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda s=store: results.append(s.run("key", MESSAGES, call))
+            )
+            for store in stores
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(r == results[0] for r in results))
+
+        reopened = SQLiteIdempotencyStore(path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(reopened.run("key", MESSAGES, call), results[0])
+        with self.assertRaises(IdempotencyConflictError):
+            reopened.run("key", [], call)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(reopened.stats()["entries"], 1)
+
+    def test_sqlite_does_not_block_the_loop(self):
+        """
+        Test that async calls wait for a locked database on a worker thread,
+        letting the event loop run meanwhile.
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "idempotency.db")
+        store = SQLiteIdempotencyStore(path)
+        self.addCleanup(store.close)
+        # Another process holding the write lock for a while
+        other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.addCleanup(other.close)
+        other.execute("BEGIN IMMEDIATE")
+        timer = threading.Timer(0.3, other.execute, ("COMMIT",))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        async def call():
+            return {"content": [{"type": "text", "text": "once"}]}
+
+        async def run():
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticker = asyncio.ensure_future(tick())
+            response = await store.arun("key", MESSAGES, call)
+            ticker.cancel()
+            return response, ticks
+
+        response, ticks = asyncio.run(run())
+        self.assertEqual(response["content"][0]["text"], "once")
+        self.assertGreater(ticks, 10)
+        self.assertEqual(store.stats()["entries"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+"""
+Tests for load balancing across keys and endpoints.
+"""
+
+import asyncio
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from claude_sdk import AsyncClaude, Claude
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+from claude_sdk.load_balancer import LoadBalancer, Target
+from claude_sdk.stub_server import LatencyDistribution, StubConfig, StubServer
+
+MODEL = "claude-3-7-sonnet-20250219"
+MESSAGES = [{"role": "user", "content": "Route me."}]
+
+
+class TestLoadBalancer(unittest.TestCase):
+    """
+    Tests for routing requests across two stub servers.
+    """
+
+    def _stub(self, **config):
+        stub = StubServer(StubConfig(output_tokens=1, **config)).start()
+        self.addCleanup(stub.stop)
+        return stub
+
+    def _client(self, balancer, **kwargs):
+        client = Claude(load_balancer=balancer, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_least_outstanding(self):
+        """
+        Test that concurrent requests are spread across targets.
+        """
+        latency = LatencyDistribution("fixed", (0.05,))
+        first, second = self._stub(latency=latency), self._stub(latency=latency)
+        balancer = LoadBalancer(
+            [Target("sk-test-a", first.url), Target("sk-test-b", second.url)]
+        )
+        client = self._client(balancer)
+
+        with ThreadPoolExecutor(8) as pool:
+            list(
+                pool.map(
+                    lambda _: client.messages_create(model=MODEL, messages=MESSAGES),
+                    range(32),
+                )
+            )
+
+        self.assertGreaterEqual(first.engine.request_count, 12)
+        self.assertGreaterEqual(second.engine.request_count, 12)
+        self.assertEqual([s["outstanding"] for s in balancer.stats()], [0, 0])
+
+    def test_headroom(self):
+        """
+        Test that requests go to the target with the most rate-limit headroom.
+        """
+        small = self._stub(requests_per_minute=10)
+        large = self._stub(requests_per_minute=100)
+        balancer = LoadBalancer(
+            [Target("sk-test-a", small.url), Target("sk-test-b", large.url)],
+            strategy="headroom",
+        )
+        client = self._client(balancer)
+
+        for _ in range(20):
+            client.messages_create(model=MODEL, messages=MESSAGES)
+
+        # Both start unknown; once reported, the larger quota wins
+        self.assertLessEqual(small.engine.request_count, 2)
+        self.assertGreater(balancer.stats()[1]["headroom"], 0.7)
+
+    def test_throttled_target_is_skipped(self):
+        """
+        Test that a target answering 429 is skipped until retry-after passes.
+        """
+        limited = self._stub(rate_429=1.0, retry_after=30)
+        healthy = self._stub()
+        balancer = LoadBalancer(
+            [Target("sk-test-a", limited.url), Target("sk-test-b", healthy.url)]
+        )
+        client = self._client(balancer)
+
+        results = []
+        for _ in range(10):
+            try:
+                results.append(client.messages_create(model=MODEL, messages=MESSAGES))
+            except Exception:
+                pass
+
+        self.assertEqual(limited.engine.request_count, 1)
+        self.assertEqual(len(results), 9)
+
+    def test_ejection_and_reinstatement(self):
+        """
+        Test that a failing target is ejected and later reinstated.
+        """
+        down = self._stub(rate_529=1.0)
+        up = self._stub()
+        metrics = MetricsCollector()
+        balancer = LoadBalancer(
+            [Target("sk-test-a", down.url), Target("sk-test-b", up.url)],
+            max_failures=2,
+            ejection_time=0.2,
+        )
+        client = self._client(balancer, instrumentation=Instrumentation([metrics]))
+
+        def send(times):
+            for _ in range(times):
+                try:
+                    client.messages_create(model=MODEL, messages=MESSAGES)
+                except Exception:
+                    pass
+
+        send(10)
+        self.assertEqual(down.engine.request_count, 2)
+        self.assertTrue(balancer.stats()[0]["ejected"])
+        self.assertEqual(metrics.last["balancer.ejected.target"], f"{down.url}#st-a")
+
+        time.sleep(0.25)
+        down.config.rate_529 = 0.0
+        send(4)
+        self.assertEqual(metrics.counters["balancer.reinstated"], 1)
+        self.assertEqual(down.engine.request_count, 4)
+        self.assertFalse(balancer.stats()[0]["ejected"])
+
+    def test_async_streams(self):
+        """
+        Test that async streams hold their target until they are consumed.
+        """
+        first, second = self._stub(), self._stub()
+        balancer = LoadBalancer(
+            [Target("sk-test-a", first.url), Target("sk-test-b", second.url)]
+        )
+
+        async def run():
+            async with AsyncClaude(load_balancer=balancer) as client:
+                streams = [
+                    await client.messages_create(
+                        model=MODEL, messages=MESSAGES, stream=True
+                    )
+                    for _ in range(4)
+                ]
+                outstanding = [s["outstanding"] for s in balancer.stats()]
+                for stream in streams:
+                    async for _ in stream:
+                        pass
+                return outstanding
+
+        self.assertEqual(asyncio.run(run()), [2, 2])
+        self.assertEqual([s["outstanding"] for s in balancer.stats()], [0, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,231 @@
+"""
+Tests for the near-duplicate prompt cache.
+"""
+
+import asyncio
+import os
+import random
+import tempfile
+import unittest
+
+from claude_sdk import AsyncClaude, Claude
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+from claude_sdk.prompt_cache import (
+    PromptCache,
+    _Entry,
+    _feature_hashes,
+    _import_numpy,
+    _signature,
+    normalize_prompt,
+)
+from claude_sdk.stub_server import StubConfig, StubServer
+
+MODEL = "claude-3-7-sonnet-20250219"
+REPORT = (
+    "Summarize the report below for the operations dashboard in three bullet "
+    "points, focusing on what changed since yesterday. Report generated at "
+    "2024-05-01T12:00:03Z for request 7f9c2a1e-4b3d-4c8e-9a6f-0d1e2f3a4b5c. "
+    "Sales grew by 12 percent in the northern region while costs stayed flat. "
+    "Inventory levels were normal across all warehouses, with 1532 open orders "
+    "and no delayed shipments. Two stores reported payment terminal outages that "
+    "were resolved within the hour. Customer satisfaction scores held steady and "
+    "the support backlog shrank to 48 tickets."
+)
+
+
+def payload(text, **params):
+    """
+    Build a messages payload for a prompt.
+    """
+    return {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": text}],
+        "max_tokens": 500,
+        "temperature": 0,
+        **params,
+    }
+
+
+def backends():
+    """
+    Index backends available in this environment.
+    """
+    return [False, True] if _import_numpy() is not None else [False]
+
+
+class TestPromptCache(unittest.TestCase):
+    """
+    Tests for matching, evicting and persisting cached responses.
+    """
+
+    def test_near_duplicates(self):
+        """
+        Test that reformatted prompts with new timestamps, IDs and a changed
+        word hit, and that other prompts, numbers and parameters miss.
+        """
+        variant = (
+            REPORT.replace("2024-05-01T12:00:03Z", "2025-01-17T08:45:10Z")
+            .replace(
+                "7f9c2a1e-4b3d-4c8e-9a6f-0d1e2f3a4b5c",
+                "0b8e5d42-91c7-4f0a-b3e6-5a2c7d9e1f04",
+            )
+            .replace("grew", "increased")
+            .replace(". ", ".\n\n  ")
+            .upper()
+        )
+        for use_numpy in backends():
+            with self.subTest(use_numpy=use_numpy):
+                cache = PromptCache(threshold=0.9, use_numpy=use_numpy)
+                cache.store(payload(REPORT), {"content": [{"text": "cached"}]})
+
+                response, similarity = cache.lookup(payload(variant))
+                self.assertEqual(response, {"content": [{"text": "cached"}]})
+                self.assertGreaterEqual(similarity, 0.9)
+                # Callers get copies they can modify
+                response["content"].clear()
+                self.assertIsNotNone(cache.lookup(payload(REPORT))[0]["content"])
+
+                unrelated = "Write a haiku about the sea at night."
+                self.assertIsNone(cache.lookup(payload(unrelated)))
+                self.assertIsNone(cache.lookup(payload(REPORT, temperature=1)))
+                self.assertIsNone(cache.lookup(payload(REPORT.replace("1532", "1611"))))
+                self.assertIsNone(cache.lookup(payload(REPORT, system="Be terse.")))
+                self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_numbers_must_match(self):
+        """
+        Test that prompts differing only in a number do not share an entry.
+        """
+        for use_numpy in backends():
+            with self.subTest(use_numpy=use_numpy):
+                cache = PromptCache(threshold=0.9, use_numpy=use_numpy)
+                cache.store(payload("What is 17 * 23?"), {"content": [{"text": "391"}]})
+                self.assertIsNone(cache.lookup(payload("What is 99 * 4?")))
+                self.assertIsNone(cache.lookup(payload("What is 17 * 24?")))
+                self.assertIsNotNone(cache.lookup(payload("what is 17 * 23 ?")))
+
+    def test_indexes_are_evicted(self):
+        """
+        Test that evicting the last entry of a scope drops its index, so
+        prompts with ever new numbers do not grow the cache past max_entries.
+        """
+        for use_numpy in backends():
+            with self.subTest(use_numpy=use_numpy):
+                cache = PromptCache(max_entries=10, use_numpy=use_numpy)
+                for number in range(500):
+                    prompt = payload(f"What is {number} * 23?")
+                    cache.store(prompt, {"content": [{"text": str(number * 23)}]})
+                self.assertEqual(len(cache), 10)
+                self.assertEqual(len(cache._indexes), 10)
+                self.assertIsNotNone(cache.lookup(payload("What is 499 * 23?")))
+
+                cache.ttl = 0.0
+                for number in range(490, 500):
+                    self.assertIsNone(cache.lookup(payload(f"What is {number} * 23?")))
+                self.assertEqual(len(cache._indexes), 0)
+
+    def test_signatures_match_across_backends(self):
+        """
+        Test that the pure-Python and NumPy signatures agree, so persisted
+        caches load with either.
+        """
+        np = _import_numpy()
+        if np is None:
+            self.skipTest("numpy is not installed")
+        tokens = normalize_prompt(REPORT)
+        self.assertEqual(tokens[:2], ["summarize", "the"])
+        self.assertIn("<ts>", tokens)
+        self.assertIn("<uuid>", tokens)
+        hashes = _feature_hashes(tokens, 3)
+        self.assertEqual(_signature(hashes, np), _signature(hashes, None))
+
+    def test_eviction_ttl_and_persistence(self):
+        """
+        Test LRU eviction, expiry and saving and loading a cache.
+        """
+        prompts = [f"Question {word}: what is {word}?" for word in "abcd"]
+        cache = PromptCache(threshold=1.0, max_entries=3, use_numpy=False)
+        for prompt in prompts[:3]:
+            cache.store(payload(prompt), {"answer": prompt})
+        cache.lookup(payload(prompts[0]))
+        cache.store(payload(prompts[3]), {"answer": prompts[3]})
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.lookup(payload(prompts[1])))
+        self.assertIsNotNone(cache.lookup(payload(prompts[0])))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.jsonl")
+            cache.save(path)
+            for use_numpy in backends():
+                restored = PromptCache(threshold=1.0, use_numpy=use_numpy)
+                self.assertEqual(restored.load(path), 3)
+                self.assertEqual(
+                    restored.lookup(payload(prompts[3]))[0], {"answer": prompts[3]}
+                )
+            expired = PromptCache(ttl=0.0, use_numpy=False)
+            self.assertEqual(expired.load(path), 0)
+
+        cache.ttl = 0.0
+        self.assertIsNone(cache.lookup(payload(prompts[0])))
+        self.assertEqual(len(cache), 2)
+
+    def test_array_index_churn(self):
+        """
+        Test that the NumPy index finds entries after merges and compactions.
+        """
+        if _import_numpy() is None:
+            self.skipTest("numpy is not installed")
+        cache = PromptCache(threshold=0.95, max_entries=20000, use_numpy=True)
+        rnd = random.Random(7)
+        index = cache._index("scope")
+        entries = []
+        for _ in range(60000):
+            entry = _Entry("scope", rnd.getrandbits(64), {}, 0.0)
+            cache._add(entry)
+            entries.append(entry)
+        self.assertEqual(len(cache), 20000)
+        self.assertLess(len(index.entries), 60000)
+        for entry in entries[-20000::997]:
+            near = entry.signature ^ 0b101
+            self.assertIs(index.search(near, cache.max_distance)[1], entry)
+        for entry in entries[:20000:997]:
+            found = index.search(entry.signature, 0)
+            self.assertTrue(found is None or found[1] is not entry)
+
+    def test_clients(self):
+        """
+        Test that both clients answer near-duplicate calls from the cache and
+        never cache streams or sampled calls.
+        """
+        stub = StubServer(StubConfig(output_tokens=5)).start()
+        self.addCleanup(stub.stop)
+        metrics = MetricsCollector()
+        options = dict(
+            api_key="sk-test",
+            base_url=stub.url,
+            cache=PromptCache(),
+            instrumentation=Instrumentation([metrics]),
+        )
+        variant = REPORT.replace("2024-05-01T12:00:03Z", "2024-05-02T09:00:00Z")
+        messages = [[{"role": "user", "content": text}] for text in (REPORT, variant)]
+
+        with Claude(**options) as client:
+            first = client.messages_create(MODEL, messages[0], temperature=0)
+            second = client.messages_create(MODEL, messages[1], temperature=0)
+            list(client.messages_create(MODEL, messages[1], stream=True))
+            sampled = client.messages_create(MODEL, messages[0], temperature=0.7)
+        self.assertEqual(first["id"], second["id"])
+        self.assertNotEqual(sampled["id"], first["id"])
+
+        async def run():
+            async with AsyncClaude(**options) as client:
+                return await client.messages_create(MODEL, messages[1], temperature=0)
+
+        self.assertEqual(asyncio.run(run())["id"], first["id"])
+        self.assertEqual(metrics.counters["cache.hit"], 2)
+        self.assertEqual(metrics.counters["cache.miss"], 1)
+        self.assertEqual(options["cache"].stats()["entries"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+"""
+Tests for the priority and fair-share scheduler.
+"""
+
+import asyncio
+import unittest
+
+from claude_sdk.exceptions import DeadlineExceededError, QueueFullError
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+from claude_sdk.scheduler import FairScheduler, PriorityClass
+
+
+class TestFairScheduler(unittest.TestCase):
+    """
+    Tests for ordering, fair sharing and shedding of queued requests.
+    """
+
+    @staticmethod
+    async def _drain(scheduler, requests):
+        """
+        Queue requests behind one running request and return their start order.
+        """
+        order = []
+
+        async def run(tenant, priority):
+            async with scheduler.slot(tenant=tenant, priority=priority):
+                order.append((tenant, priority))
+                await asyncio.sleep(0)
+
+        await scheduler.acquire()
+        tasks = [asyncio.create_task(run(*request)) for request in requests]
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    def test_priority_order(self):
+        """
+        Test that interactive requests start before earlier batch requests.
+        """
+        scheduler = FairScheduler(concurrency=1)
+        requests = [("a", "batch"), ("a", "default"), ("a", "interactive")] * 2
+        order = asyncio.run(self._drain(scheduler, requests))
+        self.assertEqual(
+            [priority for _, priority in order],
+            ["interactive"] * 2 + ["default"] * 2 + ["batch"] * 2,
+        )
+        self.assertEqual(scheduler.in_flight, 0)
+
+    def test_weighted_fair_share(self):
+        """
+        Test that a burst from one tenant does not starve another, and that
+        weights set the share of each tenant.
+        """
+        scheduler = FairScheduler(concurrency=1, weights={"heavy": 3})
+        requests = [("noisy", "default")] * 20 + [("quiet", "default")] * 5
+        order = asyncio.run(self._drain(scheduler, requests))
+        # The quiet tenant alternates with the noisy one despite queuing last
+        self.assertEqual([tenant for tenant, _ in order[:10]], ["noisy", "quiet"] * 5)
+
+        requests = [("light", "default")] * 20 + [("heavy", "default")] * 20
+        order = asyncio.run(self._drain(scheduler, requests))
+        self.assertEqual([tenant for tenant, _ in order[:20]].count("heavy"), 15)
+
+    def test_queue_full(self):
+        """
+        Test that requests beyond a class's queue bound are rejected.
+        """
+        metrics = MetricsCollector()
+        scheduler = FairScheduler(
+            concurrency=1,
+            classes={"default": PriorityClass(rank=0, max_queue=2)},
+            instrumentation=Instrumentation([metrics]),
+        )
+
+        async def run():
+            await scheduler.acquire()
+            waiting = [asyncio.create_task(scheduler.acquire()) for _ in range(2)]
+            await asyncio.sleep(0)
+            with self.assertRaises(QueueFullError) as cm:
+                await scheduler.acquire(tenant="late")
+            self.assertEqual(cm.exception.status_code, 429)
+            self.assertEqual(scheduler.stats()["queued"], {"default": 2})
+            for _ in range(3):
+                scheduler.release()
+                await asyncio.sleep(0)
+            await asyncio.gather(*waiting)
+
+        asyncio.run(run())
+        self.assertEqual(scheduler.in_flight, 0)
+        self.assertEqual(metrics.counters["scheduler.shed"], 1)
+        self.assertEqual(metrics.last["scheduler.shed.reason"], "queue_full")
+
+    def test_deadline_and_cancellation(self):
+        """
+        Test that requests past their deadline are shed and cancelled requests
+        leave the queue, without either taking a slot.
+        """
+        metrics = MetricsCollector()
+        scheduler = FairScheduler(
+            concurrency=1, instrumentation=Instrumentation([metrics])
+        )
+
+        async def run():
+            await scheduler.acquire()
+            with self.assertRaises(DeadlineExceededError):
+                await scheduler.acquire(timeout=0)
+            with self.assertRaises(DeadlineExceededError) as cm:
+                await scheduler.acquire(priority="interactive", timeout=0.01)
+            self.assertEqual(cm.exception.status_code, 504)
+
+            cancelled = asyncio.create_task(scheduler.acquire(priority="batch"))
+            waiting = asyncio.create_task(scheduler.acquire(priority="batch"))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.sleep(0)
+            self.assertEqual(scheduler.stats()["queued"]["batch"], 1)
+
+            scheduler.release()
+            await waiting
+            self.assertEqual(scheduler.in_flight, 1)
+            scheduler.release()
+
+        asyncio.run(run())
+        self.assertEqual(scheduler.in_flight, 0)
+        self.assertEqual(metrics.counters["scheduler.shed"], 2)
+        self.assertEqual(metrics.counters["scheduler.dispatched"], 2)
+
+    def test_growing_limit(self):
+        """
+        Test that queued requests start when a callable limit grows, on
+        dispatch or when another request is queued.
+        """
+        limit = [1]
+        scheduler = FairScheduler(concurrency=lambda: limit[0])
+
+        async def run():
+            await scheduler.acquire()
+            waiting = [asyncio.create_task(scheduler.acquire()) for _ in range(3)]
+            await asyncio.sleep(0)
+            self.assertEqual(scheduler.stats()["queued"]["default"], 3)
+
+            limit[0] = 3
+            scheduler.dispatch()
+            await asyncio.sleep(0)
+            self.assertEqual(scheduler.in_flight, 3)
+            self.assertEqual(scheduler.stats()["queued"]["default"], 1)
+
+            limit[0] = 5
+            late = asyncio.create_task(scheduler.acquire(tenant="late"))
+            await asyncio.gather(*waiting, late)
+            self.assertEqual(scheduler.in_flight, 5)
+            for _ in range(5):
+                scheduler.release()
+
+        asyncio.run(run())
+        self.assertEqual(scheduler.in_flight, 0)
+        self.assertEqual(scheduler.stats()["queued"]["default"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+"""
+Tests for server-side chat sessions.
+"""
+
+import asyncio
+import json
+import time
+import unittest
+
+from claude_sdk import AsyncClaude
+from claude_sdk.exceptions import ServiceUnavailableError
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+from claude_sdk.sessions import SessionStore
+from claude_sdk.streaming import AsyncStream
+from claude_sdk.stub_server import StubConfig, StubServer
+
+MODEL = "claude-3-7-sonnet-20250219"
+
+
+def reply_events(text):
+    """
+    Return the event payloads of a streamed text reply.
+    """
+    events = [
+        {"type": "message_start", "message": {"id": "msg_1", "role": "assistant"}},
+        {
+            "type": "content_block_start",
+            "index": 0,
+            "content_block": {"type": "text", "text": ""},
+        },
+        {
+            "type": "content_block_delta",
+            "index": 0,
+            "delta": {"type": "text_delta", "text": text},
+        },
+        {"type": "content_block_stop", "index": 0},
+        {"type": "message_stop"},
+    ]
+    return [json.dumps(event) for event in events]
+
+
+class EchoClient:
+    """
+    Client that streams back the last user message, and fails on "fail".
+    """
+
+    def __init__(self):
+        self.requests = []
+
+    async def messages_create(self, **kwargs):
+        self.requests.append(kwargs)
+        content = kwargs["messages"][-1]["content"]
+        if content == "fail":
+            raise ServiceUnavailableError()
+
+        async def events():
+            for data in reply_events(content.upper()):
+                await asyncio.sleep(0)
+                yield data
+
+        return AsyncStream(events())
+
+
+class TestChatSession(unittest.TestCase):
+    """
+    Tests for turns of a chat session.
+    """
+
+    def test_turns(self):
+        """
+        Test that only completed turns are added to the history, and that
+        turns are sent with the history and the session's options.
+        """
+        metrics = MetricsCollector()
+        store = SessionStore(instrumentation=Instrumentation([metrics]))
+        session = store.create(MODEL, system="Be brief.", max_tokens=64)
+        client = EchoClient()
+
+        async def turn(content):
+            return [data async for data in session.turn(client, content)]
+
+        async def run():
+            self.assertEqual(len(await turn("hello")), 5)
+            with self.assertRaises(ServiceUnavailableError):
+                await turn("fail")
+            # A turn closed before it completes is dropped too
+            async for _ in session.turn(client, "abandoned"):
+                break
+            await turn("again")
+
+        asyncio.run(run())
+        self.assertEqual(
+            session.messages,
+            [
+                {"role": "user", "content": "hello"},
+                {"role": "assistant", "content": [{"type": "text", "text": "HELLO"}]},
+                {"role": "user", "content": "again"},
+                {"role": "assistant", "content": [{"type": "text", "text": "AGAIN"}]},
+            ],
+        )
+        last = client.requests[-1]
+        self.assertEqual(len(last["messages"]), 3)
+        self.assertEqual((last["system"], last["max_tokens"]), ("Be brief.", 64))
+        self.assertEqual(session.turns, 2)
+        self.assertEqual(metrics.counters["session.turn"], 2)
+        self.assertEqual(metrics.last["session.turn.messages"], 4)
+        self.assertGreater(metrics.last["session.turn.history_bytes"], 0)
+
+    def test_stub_server(self):
+        """
+        Test turns against the stub server.
+        """
+        stub = StubServer(StubConfig()).start()
+        self.addCleanup(stub.stop)
+        session = SessionStore().create(MODEL, max_tokens=16)
+
+        async def run():
+            async with AsyncClaude(api_key="sk-test", base_url=stub.url) as client:
+                for content in ("Hi", "Hi again"):
+                    async for _ in session.turn(client, content):
+                        pass
+
+        asyncio.run(run())
+        self.assertEqual(len(session.messages), 4)
+        self.assertEqual(session.messages[3]["role"], "assistant")
+        self.assertEqual(stub.engine.request_count, 2)
+
+
+class TestSessionStore(unittest.TestCase):
+    """
+    Tests for looking up and evicting sessions.
+    """
+
+    def test_lru_and_ttl(self):
+        """
+        Test that the least recently used sessions are evicted when the store
+        is full and that idle sessions expire.
+        """
+        store = SessionStore(max_sessions=2, ttl=0.2)
+        first = store.create(MODEL)
+        second = store.create(MODEL, messages=[{"role": "user", "content": "Hi"}])
+        self.assertIs(store.get(first.session_id), first)
+        third = store.create(MODEL)
+        self.assertIsNone(store.get(second.session_id))
+        self.assertIs(store.get(third.session_id), third)
+
+        store.touch(second)
+        self.assertIs(store.get(second.session_id), second)
+        self.assertIsNone(store.get(first.session_id))
+        store.remove(third.session_id)
+        self.assertIsNone(store.get(third.session_id))
+
+        time.sleep(0.25)
+        self.assertIsNone(store.get(second.session_id))
+        self.assertEqual(
+            store.stats(), {"sessions": 0, "created": 3, "expired": 1, "evicted": 2}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,386 @@
+"""
+Tests for reconstructing messages from streams.
+"""
+
+import asyncio
+import itertools
+import json
+import time
+import tracemalloc
+import unittest
+
+from claude_sdk import AsyncClaude, Claude
+from claude_sdk.exceptions import ClaudeAPIError
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+from claude_sdk.load_balancer import LoadBalancer, Target
+from claude_sdk.streaming import (
+    AsyncStream,
+    MessageAccumulator,
+    StopAfterTokens,
+    StopAtDeadline,
+    StopOnMatch,
+    Stream,
+    aaccumulate,
+    accumulate,
+)
+from claude_sdk.stub_server import StubConfig, StubServer
+from claude_sdk.usage import UsageTracker
+
+MODEL = "claude-3-7-sonnet-20250219"
+MESSAGES = [{"role": "user", "content": "Tell me a story."}]
+
+
+def delta(index, kind, name, text):
+    """
+    Build a content_block_delta event.
+    """
+    return json.dumps(
+        {
+            "type": "content_block_delta",
+            "index": index,
+            "delta": {"type": kind, name: text},
+        }
+    )
+
+
+def broken_events():
+    """
+    Yield the start of a streamed message, then fail as if the connection was
+    lost mid-body.
+    """
+    start = {
+        "type": "message_start",
+        "message": {"id": "msg_1", "model": MODEL, "usage": {"input_tokens": 100}},
+    }
+    yield json.dumps(start)
+    yield json.dumps(
+        {"type": "content_block_start", "index": 0, "content_block": {"type": "text"}}
+    )
+    for i in range(5):
+        yield delta(0, "text_delta", "text", f"word{i} ")
+    raise ConnectionResetError("Connection lost")
+
+
+def error_events(finished):
+    """
+    Yield the start of a streamed message, then an overloaded error event.
+    Appends to ``finished`` when the generator is closed.
+    """
+    try:
+        for data in itertools.islice(broken_events(), 4):
+            yield data
+        error = {"type": "overloaded_error", "message": "Overloaded"}
+        yield json.dumps({"type": "error", "error": error})
+        yield delta(0, "text_delta", "text", "never read")
+    finally:
+        finished.append(True)
+
+
+class TestMessageAccumulator(unittest.TestCase):
+    """
+    Tests for assembling streamed events into a message.
+    """
+
+    def setUp(self):
+        """
+        Start a stub server.
+        """
+        self.stub = StubServer(StubConfig(output_tokens=20)).start()
+        self.addCleanup(self.stub.stop)
+
+    def test_sync_and_async_streams(self):
+        """
+        Test that streams reconstruct the message a non-streaming call returns.
+        """
+        with Claude(api_key="sk-test", base_url=self.stub.url) as client:
+            expected = client.messages_create(model=MODEL, messages=MESSAGES)
+            deltas = []
+            message = accumulate(
+                client.messages_create(model=MODEL, messages=MESSAGES, stream=True),
+                on_text=deltas.append,
+            )
+
+        async def run():
+            async with AsyncClaude(api_key="sk-test", base_url=self.stub.url) as c:
+                stream = await c.messages_create(
+                    model=MODEL, messages=MESSAGES, stream=True
+                )
+                return await aaccumulate(stream)
+
+        async_message = asyncio.run(run())
+        for streamed in (message, async_message):
+            self.assertEqual(streamed.text.strip(), expected["content"][0]["text"])
+            self.assertEqual(streamed.model, MODEL)
+            self.assertEqual(streamed.stop_reason, expected["stop_reason"])
+            self.assertEqual(streamed.usage["output_tokens"], 20)
+            self.assertIn("input_tokens", streamed.usage)
+        self.assertEqual(len(deltas), 20)
+        self.assertEqual("".join(deltas), message.text)
+        self.assertEqual(message.to_dict()["type"], "message")
+
+    def test_thinking_and_tool_use(self):
+        """
+        Test thinking blocks with signatures and tool-use input split across
+        deltas.
+        """
+        tools, thinking = [], []
+        accumulator = MessageAccumulator(
+            on_tool_use=tools.append, on_thinking=thinking.append
+        )
+        events = [
+            {"type": "message_start", "message": {"id": "msg_1", "model": MODEL}},
+            {
+                "type": "content_block_start",
+                "index": 0,
+                "content_block": {"type": "thinking", "thinking": ""},
+            },
+            delta(0, "thinking_delta", "thinking", "Weather "),
+            delta(0, "thinking_delta", "thinking", "is needed."),
+            delta(0, "signature_delta", "signature", "c2ln"),
+            {"type": "content_block_stop", "index": 0},
+            {
+                "type": "content_block_start",
+                "index": 1,
+                "content_block": {
+                    "type": "tool_use",
+                    "id": "toolu_1",
+                    "name": "get_weather",
+                    "input": {},
+                },
+            },
+            delta(1, "input_json_delta", "partial_json", '{"city": "Par'),
+            delta(1, "input_json_delta", "partial_json", 'is", "days": 3}'),
+        ]
+        for event in events:
+            accumulator.feed(event)
+        # Incomplete tool input is left out of the partial message
+        self.assertEqual(accumulator.message.content[1]["input"], {})
+        self.assertEqual(tools, [])
+
+        accumulator.feed({"type": "content_block_stop", "index": 1})
+        accumulator.feed(
+            {
+                "type": "message_delta",
+                "delta": {"stop_reason": "tool_use", "stop_sequence": None},
+                "usage": {"output_tokens": 30},
+            }
+        )
+        accumulator.feed('{"type": "message_stop"}')
+
+        message = accumulator.message
+        self.assertTrue(accumulator.done)
+        self.assertEqual(thinking, ["Weather ", "is needed."])
+        self.assertEqual(message.content[0]["thinking"], "Weather is needed.")
+        self.assertEqual(message.content[0]["signature"], "c2ln")
+        self.assertEqual(message.tool_uses, tools)
+        self.assertEqual(tools[0]["input"], {"city": "Paris", "days": 3})
+        self.assertEqual(message.stop_reason, "tool_use")
+
+        error = {"type": "error", "error": {"type": "overloaded_error"}}
+        with self.assertRaises(ClaudeAPIError) as cm:
+            accumulator.feed(error)
+        self.assertEqual(cm.exception.error_type, "overloaded_error")
+
+    def test_long_output_is_linear(self):
+        """
+        Test that a 200k-delta stream accumulates in linear time and keeps about
+        one byte per byte of text.
+        """
+
+        def run(count):
+            events = [delta(0, "text_delta", "text", "token ")] * count
+            accumulator = MessageAccumulator()
+            accumulator.feed(
+                {
+                    "type": "content_block_start",
+                    "index": 0,
+                    "content_block": {"type": "text", "text": ""},
+                }
+            )
+            started = time.perf_counter()
+            for event in events:
+                accumulator.feed(event)
+            accumulator.feed({"type": "content_block_stop", "index": 0})
+            return time.perf_counter() - started, accumulator
+
+        short, _ = run(20000)
+        long, _ = run(200000)
+        # Ten times the output, not a hundred times the time
+        self.assertLess(long, short * 30)
+
+        tracemalloc.start()
+        try:
+            _, accumulator = run(200000)
+            retained, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(len(accumulator.message.text), 1200000)
+        self.assertLess(retained, 3 * 1200000)
+
+
+class TestStreamCancellation(unittest.TestCase):
+    """
+    Tests for ending streams early.
+    """
+
+    def setUp(self):
+        """
+        Start a stub server streaming 1000 tokens at 200 tokens per second.
+        """
+        self.stub = StubServer(
+            StubConfig(output_tokens=1000, tokens_per_second=200)
+        ).start()
+        self.addCleanup(self.stub.stop)
+        self.metrics = MetricsCollector()
+        self.balancer = LoadBalancer([Target("sk-test", self.stub.url)])
+        self.options = dict(
+            load_balancer=self.balancer,
+            instrumentation=Instrumentation([self.metrics]),
+        )
+
+    def test_failed_streams_record_usage(self):
+        """
+        Test that streams failing mid-body run their done callbacks, so the
+        tokens used before the failure are accounted.
+        """
+        tracker = UsageTracker()
+        closed = []
+        stream = Stream(broken_events(), close=lambda: closed.append(True))
+        tracker.track(stream, MODEL)
+        with self.assertRaises(ConnectionResetError):
+            for _ in stream:
+                pass
+        self.assertTrue(stream.closed)
+        self.assertIsInstance(stream.error, ConnectionResetError)
+        self.assertEqual(closed, [True])
+
+        async def events():
+            for data in broken_events():
+                yield data
+
+        async def run():
+            stream = AsyncStream(events())
+            tracker.track(stream, MODEL)
+            with self.assertRaises(ConnectionResetError):
+                await stream.get_final_message()
+            return stream
+
+        self.assertEqual(asyncio.run(run()).stopped, "error")
+        totals = tracker.totals(by=("model",))[0]
+        self.assertEqual(totals["calls"], 2)
+        self.assertEqual(totals["input_tokens"], 200)
+        self.assertGreater(totals["output_tokens"], 0)
+
+    def test_error_events_close_streams(self):
+        """
+        Test that an error event closes the stream and its connection and runs
+        the done callbacks.
+        """
+        tracker = UsageTracker()
+        finished, closed = [], []
+        stream = Stream(error_events(finished), close=lambda: closed.append(True))
+        tracker.track(stream, MODEL)
+        with self.assertRaises(ClaudeAPIError) as cm:
+            list(stream)
+        self.assertEqual(cm.exception.error_type, "overloaded_error")
+        self.assertTrue(stream.closed)
+        self.assertEqual((stream.stopped, finished, closed), ("error", [True], [True]))
+
+        async def events(finished):
+            for data in error_events(finished):
+                yield data
+
+        async def run():
+            finished, closed = [], []
+
+            async def close():
+                closed.append(True)
+
+            stream = AsyncStream(events(finished), close)
+            tracker.track(stream, MODEL)
+            with self.assertRaises(ClaudeAPIError):
+                await stream.get_final_message()
+            self.assertTrue(stream.closed)
+            self.assertEqual(closed, [True])
+            return stream
+
+        self.assertIsInstance(asyncio.run(run()).error, ClaudeAPIError)
+        totals = tracker.totals(by=("model",))[0]
+        self.assertEqual(totals["calls"], 2)
+        self.assertEqual(totals["input_tokens"], 200)
+
+    def test_sync_stop_conditions(self):
+        """
+        Test stopping on a token cap and a match, and closing an unread stream.
+        """
+        with Claude(**self.options) as client:
+            started = time.monotonic()
+            stream = client.messages_create(
+                model=MODEL, messages=MESSAGES, max_tokens=1000, stream=True
+            ).stop_when(StopAfterTokens(10))
+            message = stream.get_final_message()
+            self.assertLess(time.monotonic() - started, 2.0)
+            self.assertEqual(stream.stopped, "max_tokens")
+            self.assertIsNone(message.stop_reason)
+            self.assertEqual(stream.usage["output_tokens"], 10)
+            self.assertGreater(stream.usage["input_tokens"], 0)
+            self.assertEqual(self.balancer.stats()[0]["outstanding"], 0)
+
+            match = StopOnMatch(r"lazy\s+dog")
+            with client.messages_create(
+                model=MODEL, messages=MESSAGES, max_tokens=1000, stream=True
+            ) as stream:
+                stream.stop_when(match)
+                chunks = list(stream)
+            self.assertTrue(stream.message.text.endswith(" lazy dog"))
+            self.assertEqual(match.match.group(), "lazy dog")
+            self.assertEqual(len(chunks), 11)
+
+            stream = client.messages_create(
+                model=MODEL, messages=MESSAGES, max_tokens=1000, stream=True
+            )
+            self.assertEqual(self.balancer.stats()[0]["outstanding"], 1)
+            stream.cancel()
+            self.assertEqual(self.balancer.stats()[0]["outstanding"], 0)
+            self.assertEqual(list(stream), [])
+
+        self.assertEqual(self.metrics.counters["stream.stopped"], 3)
+        self.assertEqual(self.metrics.last["stream.stopped.reason"], "cancelled")
+
+    def test_async_deadline_and_close(self):
+        """
+        Test that a deadline ends an async stream on time, and that completed
+        streams are not reported as stopped.
+        """
+
+        async def run():
+            async with AsyncClaude(**self.options) as client:
+                stream = await client.messages_create(
+                    model=MODEL, messages=MESSAGES, max_tokens=1000, stream=True
+                )
+                started = time.monotonic()
+                stream.stop_when(StopAtDeadline(0.3))
+                message = await stream.get_final_message()
+                elapsed = time.monotonic() - started
+
+                complete = await client.messages_create(
+                    model=MODEL, messages=MESSAGES, max_tokens=3, stream=True
+                )
+                async with complete:
+                    async for _ in complete:
+                        pass
+                return stream, message, elapsed, complete
+
+        stream, message, elapsed, complete = asyncio.run(run())
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(stream.stopped, "deadline")
+        self.assertLess(stream.usage["output_tokens"], 1000)
+        self.assertTrue(message.text)
+        self.assertIsNone(complete.stopped)
+        self.assertEqual(complete.message.stop_reason, "max_tokens")
+        self.assertEqual(self.metrics.counters["stream.stopped"], 1)
+        self.assertEqual(self.balancer.stats()[0]["outstanding"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Tests for the local Anthropic API stub server.
+"""
+
+import json
+import random
+import unittest
+
+import requests
+
+from claude_sdk import Claude
+from claude_sdk.exceptions import RateLimitError, ServiceUnavailableError
+from claude_sdk.stub_server import LatencyDistribution, StubConfig, StubServer
+
+
+class TestStubServer(unittest.TestCase):
+    """
+    Tests for the stub server.
+    """
+
+    def setUp(self):
+        """
+        Start a stub server and a client pointed at it.
+        """
+        self.stub = StubServer(StubConfig(output_tokens=5, seed=1)).start()
+        self.addCleanup(self.stub.stop)
+        self.client = Claude(api_key="sk-test", base_url=self.stub.url)
+
+    def test_messages(self):
+        """
+        Test a non-streaming message.
+        """
+        response = self.client.messages_create(
+            model="claude-3-7-sonnet-20250219",
+            messages=[{"role": "user", "content": "Hello there, stub."}],
+            max_tokens=100,
+        )
+
+        self.assertEqual(response["type"], "message")
+        self.assertEqual(response["model"], "claude-3-7-sonnet-20250219")
+        self.assertEqual(response["usage"]["output_tokens"], 5)
+        self.assertEqual(response["stop_reason"], "end_turn")
+
+    def test_streaming(self):
+        """
+        Test a streaming message.
+        """
+        chunks = list(
+            self.client.messages_create(
+                model="claude-3-7-sonnet-20250219",
+                messages=[{"role": "user", "content": "Hello"}],
+                max_tokens=3,
+                stream=True,
+            )
+        )
+        events = [json.loads(chunk) for chunk in chunks]
+
+        self.assertEqual(events[0]["type"], "message_start")
+        self.assertEqual(events[-1]["type"], "message_stop")
+        deltas = [e for e in events if e["type"] == "content_block_delta"]
+        self.assertEqual(len(deltas), 3)
+        self.assertEqual(events[-2]["delta"]["stop_reason"], "max_tokens")
+
+    def test_injected_errors(self):
+        """
+        Test injected 429 and 529 errors.
+        """
+        self.stub.config.rate_429 = 1.0
+        self.stub.config.retry_after = 7
+        response = requests.post(
+            f"{self.stub.url}/v1/messages", json={"model": "m", "messages": []}
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["retry-after"], "7")
+        with self.assertRaises(RateLimitError):
+            self.client.messages_create(model="m", messages=[])
+
+        self.stub.config.rate_429 = 0.0
+        self.stub.config.rate_529 = 1.0
+        with self.assertRaises(ServiceUnavailableError):
+            self.client.messages_create(model="m", messages=[])
+
+    def test_requests_per_minute(self):
+        """
+        Test the request quota and rate-limit headers.
+        """
+        self.stub.config.requests_per_minute = 2
+        url = f"{self.stub.url}/v1/messages"
+        first = requests.post(url, json={"model": "m", "messages": []})
+        second = requests.post(url, json={"model": "m", "messages": []})
+        third = requests.post(url, json={"model": "m", "messages": []})
+
+        self.assertEqual(first.headers["anthropic-ratelimit-requests-remaining"], "1")
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(third.status_code, 429)
+
+    def test_count_tokens_and_batches(self):
+        """
+        Test the count-tokens and batch endpoints.
+        """
+        count = requests.post(
+            f"{self.stub.url}/v1/messages/count_tokens",
+            json={"messages": [{"role": "user", "content": "x" * 40}]},
+        ).json()
+        self.assertEqual(count["input_tokens"], 10)
+
+        batch = requests.post(
+            f"{self.stub.url}/v1/messages/batches",
+            json={"requests": [{"custom_id": "a", "params": {"max_tokens": 2}}]},
+        ).json()
+        self.assertEqual(batch["processing_status"], "ended")
+        results = requests.get(f"{self.stub.url}{batch['results_url']}").text
+        result = json.loads(results.splitlines()[0])
+        self.assertEqual(result["custom_id"], "a")
+        self.assertEqual(result["result"]["message"]["usage"]["output_tokens"], 2)
+
+    def test_latency_distribution(self):
+        """
+        Test parsing and sampling latency distributions.
+        """
+        rng = random.Random(0)
+        self.assertEqual(LatencyDistribution.parse("0.25").sample(rng), 0.25)
+        uniform = LatencyDistribution.parse("uniform:0.1,0.2")
+        self.assertTrue(all(0.1 <= uniform.sample(rng) <= 0.2 for _ in range(50)))
+        with self.assertRaises(ValueError):
+            LatencyDistribution.parse("bogus:1")
+
+
+if __name__ == "__main__":
+    unittest.main()
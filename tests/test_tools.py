@@ -0,0 +1,283 @@
+"""
+Tests for the tool registry and compiled tool-input validation.
+"""
+
+import asyncio
+import json
+import unittest
+
+from claude_sdk.exceptions import ToolInputError
+from claude_sdk.streaming import MessageAccumulator
+from claude_sdk.tools import ToolRegistry, compile_schema
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "location": {"type": "string", "minLength": 2},
+        "unit": {"enum": ["celsius", "fahrenheit"]},
+        "days": {"type": "integer", "minimum": 1, "maximum": 14},
+        "stations": {"type": "array", "items": {"$ref": "#/$defs/station"}},
+    },
+    "required": ["location"],
+    "additionalProperties": False,
+    "$defs": {
+        "station": {
+            "type": "object",
+            "properties": {
+                "id": {"type": "string", "pattern": "^[A-Z]{4}$"},
+                "tags": {"type": "array", "uniqueItems": True},
+                "nearby": {"type": "array", "items": {"$ref": "#/$defs/station"}},
+            },
+            "required": ["id"],
+        }
+    },
+}
+
+
+def stream_events(tool_input, name="get_weather", chunk_size=5):
+    """
+    Return the events of a stream with one tool_use block whose input is
+    sent in chunks.
+    """
+    text = json.dumps(tool_input)
+    events = [
+        {"type": "message_start", "message": {"id": "msg_1", "usage": {}}},
+        {
+            "type": "content_block_start",
+            "index": 0,
+            "content_block": {"type": "tool_use", "id": "toolu_1", "name": name},
+        },
+    ]
+    for start in range(0, len(text), chunk_size):
+        delta = {"type": "input_json_delta", "partial_json": text[start:][:chunk_size]}
+        events.append({"type": "content_block_delta", "index": 0, "delta": delta})
+    events.append({"type": "content_block_stop", "index": 0})
+    events.append({"type": "message_stop"})
+    return events
+
+
+class TestValidator(unittest.TestCase):
+    """
+    Tests for compiled schemas.
+    """
+
+    def test_validate(self):
+        """
+        Test that valid inputs pass and that every error is reported with
+        its path and keyword.
+        """
+        validator = compile_schema(SCHEMA)
+        valid = {
+            "location": "Paris",
+            "days": 3.0,
+            "stations": [{"id": "LFPG", "nearby": [{"id": "LFPO", "tags": [1, True]}]}],
+        }
+        self.assertEqual(validator.validate(valid), [])
+
+        invalid = {
+            "location": "P",
+            "unit": "kelvin",
+            "days": 2.5,
+            "stations": [{"id": "lfpg", "nearby": [{"tags": [1, 1]}]}, "LFPO"],
+            "extra": None,
+        }
+        errors = {(str(e), e.keyword) for e in validator.validate(invalid)}
+        self.assertEqual(
+            errors,
+            {
+                ("$.location: 'P' is shorter than 2 characters", "minLength"),
+                ('$.unit: "kelvin" is not one of ["celsius", "fahrenheit"]', "enum"),
+                ("$.days: 2.5 is not an integer", "type"),
+                ("$.stations[0].id: 'lfpg' does not match '^[A-Z]{4}$'", "pattern"),
+                ("$.stations[0].nearby[0]: 'id' is a required property", "required"),
+                ("$.stations[0].nearby[0].tags: has non-unique items", "uniqueItems"),
+                ("$.stations[1]: string is not of type object", "type"),
+                ("$: unexpected property 'extra'", "additionalProperties"),
+            },
+        )
+        self.assertFalse(validator.is_valid({"location": "Paris", "days": True}))
+        self.assertFalse(validator.is_valid([]))
+
+    def test_composition_and_cache(self):
+        """
+        Test anyOf, oneOf, not and const, and that identical schemas are
+        compiled once.
+        """
+        schema = {
+            "anyOf": [{"type": "string"}, {"type": "number", "multipleOf": 0.5}],
+            "not": {"const": "forbidden"},
+        }
+        validator = compile_schema(schema)
+        self.assertTrue(validator.is_valid("text"))
+        self.assertTrue(validator.is_valid(1.5))
+        self.assertEqual(validator.validate(1.2)[0].keyword, "anyOf")
+        # Quotients past the float range must not raise
+        self.assertTrue(validator.is_valid(1e308))
+        self.assertTrue(validator.is_valid(10**400))
+        self.assertFalse(validator.is_valid(float("inf")))
+        self.assertEqual(validator.validate(1e-320)[0].keyword, "anyOf")
+        self.assertEqual(validator.validate("forbidden")[0].keyword, "not")
+        one = compile_schema({"oneOf": [{"type": "integer"}, {"minimum": 0}]})
+        self.assertTrue(one.is_valid(-1))
+        self.assertEqual(one.validate(1)[0].keyword, "oneOf")
+
+        self.assertIs(compile_schema(json.loads(json.dumps(schema))), validator)
+        with self.assertRaises(ValueError):
+            compile_schema({"$ref": "https://example.com/schema.json"})
+
+    def test_streaming(self):
+        """
+        Test that streamed inputs get the same errors as complete ones, that
+        errors are found before the input is complete, and that chunk
+        boundaries do not matter.
+        """
+        validator = compile_schema(SCHEMA)
+        tool_input = {
+            "unit": "kelvin",
+            "stations": [{"id": 'A\\"B', "nearby": [{"id": "ABCD", "x": [1, {}]}]}],
+            "location": "Paris",
+            "days": -1e3,
+        }
+        text = json.dumps(tool_input, indent=1)
+        for size in (1, 2, 7, len(text)):
+            streaming = validator.streaming()
+            early = []
+            for start in range(0, len(text), size):
+                early.extend(streaming.feed(text[start : start + size]))
+            value, errors = streaming.close()
+            self.assertEqual(value, tool_input)
+            self.assertEqual(set(errors), set(validator.validate(tool_input)))
+            self.assertEqual(set(early), set(errors))
+
+        streaming = validator.streaming()
+        early = streaming.feed('{"location": "Paris", "extra": {"deep": [1, 2')
+        self.assertEqual([e.keyword for e in early], ["additionalProperties"])
+        streaming.feed('{"location": 5')
+        self.assertEqual(streaming.close()[1][0].keyword, "json")
+
+
+class TestToolRegistry(unittest.TestCase):
+    """
+    Tests for registering and running tools.
+    """
+
+    def setUp(self):
+        self.registry = ToolRegistry()
+
+        @self.registry.tool(SCHEMA)
+        def get_weather(location, unit="celsius", days=1, stations=()):
+            """Get the weather forecast."""
+            if location == "Atlantis":
+                raise LookupError("Unknown location")
+            return {"location": location, "unit": unit, "days": days}
+
+        async def get_time(zone):
+            await asyncio.sleep(0)
+            return f"12:00 {zone}"
+
+        self.registry.register(
+            "get_time", {"type": "object", "required": ["zone"]}, get_time
+        )
+
+    def test_run(self):
+        """
+        Test that valid calls run the handler and that invalid ones, unknown
+        tools and handler errors become error results.
+        """
+        definitions = self.registry.definitions()
+        self.assertEqual(definitions[0]["description"], "Get the weather forecast.")
+        self.assertEqual(
+            definitions[1],
+            {
+                "name": "get_time",
+                "input_schema": {"type": "object", "required": ["zone"]},
+            },
+        )
+
+        response = {
+            "content": [
+                {"type": "text", "text": "Let me check."},
+                {
+                    "type": "tool_use",
+                    "id": "t1",
+                    "name": "get_weather",
+                    "input": {"location": "Paris"},
+                },
+                {
+                    "type": "tool_use",
+                    "id": "t2",
+                    "name": "get_weather",
+                    "input": {"location": 7},
+                },
+                {
+                    "type": "tool_use",
+                    "id": "t3",
+                    "name": "get_weather",
+                    "input": {"location": "Atlantis"},
+                },
+                {"type": "tool_use", "id": "t4", "name": "get_news", "input": {}},
+            ]
+        }
+        results = self.registry.results(response)
+        self.assertEqual([r["tool_use_id"] for r in results], ["t1", "t2", "t3", "t4"])
+        self.assertEqual(
+            json.loads(results[0]["content"]),
+            {"location": "Paris", "unit": "celsius", "days": 1},
+        )
+        self.assertNotIn("is_error", results[0])
+        self.assertIn(
+            "$.location: integer is not of type string", results[1]["content"]
+        )
+        self.assertTrue(results[1]["is_error"])
+        self.assertEqual(results[2]["content"], "Unknown location")
+        self.assertIn("Unknown tool 'get_news'", results[3]["content"])
+
+        with self.assertRaises(ToolInputError) as raised:
+            self.registry.check("get_weather", {"location": "Paris", "days": 0})
+        self.assertEqual(raised.exception.tool, "get_weather")
+        self.assertEqual(raised.exception.errors[0].path, ("days",))
+
+        tool_use = {
+            "type": "tool_use",
+            "id": "t5",
+            "name": "get_time",
+            "input": {"zone": "UTC"},
+        }
+        self.assertEqual(
+            asyncio.run(self.registry.arun(tool_use))["content"], "12:00 UTC"
+        )
+        self.assertTrue(self.registry.run(tool_use)["is_error"])
+
+    def test_event_validator(self):
+        """
+        Test that streamed tool inputs are validated as the events arrive.
+        """
+        reported = []
+        validator = self.registry.event_validator(
+            on_error=lambda block, errors: reported.append((block["id"], errors))
+        )
+        accumulator = MessageAccumulator(on_event=validator)
+        tool_input = {"location": "Paris", "days": 30, "unit": "kelvin"}
+        events = stream_events(tool_input)
+        for event in events[:-2]:
+            accumulator.feed(event)
+        self.assertEqual(
+            [e.keyword for _, errors in reported for e in errors], ["maximum", "enum"]
+        )
+        for event in events[-2:]:
+            accumulator.feed(event)
+        self.assertEqual(len(reported), 2)
+        self.assertEqual(len(validator.errors[0]), 2)
+        self.assertEqual(accumulator.message.tool_uses[0]["input"], tool_input)
+
+        validator = self.registry.event_validator()
+        for event in stream_events({"location": "Paris"}):
+            validator(event)
+        self.assertEqual(validator.errors, {})
+        for event in stream_events({}, chunk_size=1):
+            validator(event)
+        self.assertEqual(validator.errors[0][0].keyword, "required")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+Tests for the record/replay transports.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from claude_sdk import AsyncClaude, Claude
+from claude_sdk.stub_server import LatencyDistribution, StubConfig, StubServer
+from claude_sdk.transport import (
+    AsyncRecordingTransport,
+    AsyncReplayTransport,
+    CassetteMissError,
+    RecordingTransport,
+    ReplayTransport,
+)
+
+MODEL = "claude-3-7-sonnet-20250219"
+MESSAGES = [{"role": "user", "content": "Record me."}]
+
+
+class TestRecordReplay(unittest.TestCase):
+    """
+    Tests for recording exchanges against the stub and replaying them offline.
+    """
+
+    def setUp(self):
+        """
+        Create a cassette path and a slow stub server.
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cassette = os.path.join(directory.name, "cassette.jsonl")
+        config = StubConfig(
+            latency=LatencyDistribution("fixed", (0.2,)),
+            tokens_per_second=50,
+            output_tokens=5,
+        )
+        self.stub = StubServer(config)
+
+    def _record_sync(self):
+        with self.stub:
+            with Claude(
+                api_key="sk-test",
+                base_url=self.stub.url,
+                transport=RecordingTransport(self.cassette),
+            ) as client:
+                message = client.messages_create(model=MODEL, messages=MESSAGES)
+                chunks = list(
+                    client.messages_create(model=MODEL, messages=MESSAGES, stream=True)
+                )
+        return message, chunks
+
+    def test_sync_replay(self):
+        """
+        Test replaying sync exchanges at full speed.
+        """
+        message, chunks = self._record_sync()
+
+        with open(self.cassette) as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+        client = Claude(
+            api_key="sk-test",
+            base_url="http://unreachable.invalid",
+            transport=ReplayTransport(self.cassette),
+        )
+        start = time.perf_counter()
+        replayed = client.messages_create(model=MODEL, messages=MESSAGES)
+        replayed_chunks = list(
+            client.messages_create(model=MODEL, messages=MESSAGES, stream=True)
+        )
+
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertEqual(replayed, message)
+        self.assertEqual(replayed_chunks, chunks)
+        self.assertEqual(json.loads(replayed_chunks[-1])["type"], "message_stop")
+
+    def test_realtime_replay(self):
+        """
+        Test replaying a stream with its original timing preserved.
+        """
+        self._record_sync()
+        client = Claude(api_key="sk-test", transport=ReplayTransport(self.cassette, True))
+
+        start = time.perf_counter()
+        list(client.messages_create(model=MODEL, messages=MESSAGES, stream=True))
+
+        # 0.2s of latency plus five tokens at 50 tokens/s
+        self.assertGreater(time.perf_counter() - start, 0.25)
+
+    def test_async_record_and_replay(self):
+        """
+        Test recording and replaying with the async client, including streams.
+        """
+
+        async def run(transport, base_url):
+            async with AsyncClaude(
+                api_key="sk-test", base_url=base_url, transport=transport
+            ) as client:
+                message = await client.messages_create(model=MODEL, messages=MESSAGES)
+                stream = await client.messages_create(
+                    model=MODEL, messages=MESSAGES, stream=True
+                )
+                return message, [chunk async for chunk in stream]
+
+        with self.stub:
+            recorded = asyncio.run(
+                run(AsyncRecordingTransport(self.cassette), self.stub.url)
+            )
+        replayed = asyncio.run(run(AsyncReplayTransport(self.cassette), "http://x"))
+
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(len(recorded[1]), 10)
+
+    def test_missing_interaction(self):
+        """
+        Test that unrecorded requests fail loudly.
+        """
+        self._record_sync()
+        client = Claude(api_key="sk-test", transport=ReplayTransport(self.cassette))
+
+        with self.assertRaises(CassetteMissError):
+            client.messages_create(model=MODEL, messages=[{"role": "user", "content": "?"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+"""
+Tests for usage and cost accounting.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from claude_sdk import AsyncClaude, Claude
+from claude_sdk.exceptions import BudgetExceededError
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+from claude_sdk.streaming import StopAfterTokens
+from claude_sdk.stub_server import StubConfig, StubServer
+from claude_sdk.usage import (
+    Budget,
+    JSONLSink,
+    ModelPrice,
+    SQLiteSink,
+    UsageTracker,
+)
+
+LARGE = "claude-3-7-sonnet-20250219"
+SMALL = "claude-3-5-haiku-20241022"
+MESSAGES = [{"role": "user", "content": "Count to fifty."}]
+
+
+class TestUsageTracker(unittest.TestCase):
+    """
+    Tests for recording usage, enforcing budgets and writing sinks.
+    """
+
+    def test_clients_and_streams(self):
+        """
+        Test that sync, async and streaming calls are recorded per model,
+        tenant and tag, including streams stopped early.
+        """
+        stub = StubServer(StubConfig(output_tokens=50)).start()
+        self.addCleanup(stub.stop)
+        tracker = UsageTracker()
+        options = dict(api_key="sk-test", base_url=stub.url, usage_tracker=tracker)
+
+        with Claude(**options) as client:
+            response = client.messages_create(LARGE, MESSAGES, tenant="a", tag="x")
+            stream = client.messages_create(
+                LARGE, MESSAGES, stream=True, tenant="a", tag="y"
+            ).stop_when(StopAfterTokens(10))
+            stream.get_final_message()
+
+        async def run():
+            async with AsyncClaude(**options) as client:
+                stream = await client.messages_create(
+                    SMALL, MESSAGES, stream=True, tenant="b"
+                )
+                async with stream:
+                    async for _ in stream:
+                        pass
+                await client.messages_create(SMALL, MESSAGES, tenant="b")
+
+        asyncio.run(run())
+
+        rows = {
+            (row["model"], row["tenant"], row["tag"]): row for row in tracker.totals()
+        }
+        self.assertEqual(
+            set(rows), {(LARGE, "a", "x"), (LARGE, "a", "y"), (SMALL, "b", None)}
+        )
+        self.assertEqual(rows[LARGE, "a", "x"]["output_tokens"], 50)
+        self.assertEqual(rows[LARGE, "a", "y"]["output_tokens"], 10)
+        self.assertEqual(rows[SMALL, "b", None]["calls"], 2)
+        self.assertEqual(rows[SMALL, "b", None]["output_tokens"], 100)
+        input_tokens = response["usage"]["input_tokens"]
+        self.assertAlmostEqual(
+            rows[LARGE, "a", "x"]["cost"], (input_tokens * 3.0 + 50 * 15.0) / 1e6
+        )
+
+        by_tenant = {row["tenant"]: row for row in tracker.totals(by=("tenant",))}
+        self.assertEqual(by_tenant["a"]["calls"], 2)
+        stats = tracker.stats()
+        self.assertEqual(stats["calls"], 4)
+        self.assertAlmostEqual(stats["cost"], sum(row["cost"] for row in rows.values()))
+
+    def test_budgets(self):
+        """
+        Test downgrading past a soft limit, rejecting past a hard limit and
+        starting over in a new period.
+        """
+        metrics = MetricsCollector()
+        instrumentation = Instrumentation([metrics])
+        budget = Budget(
+            limit=2.0, soft_limit=1.0, downgrade_to=SMALL, tenant="a", period=3600
+        )
+        tracker = UsageTracker(
+            prices={"claude-3-7": ModelPrice(input=0.0, output=1e6)},
+            budgets=[budget],
+        )
+
+        def check(tenant="a"):
+            return tracker.check(LARGE, tenant, None, instrumentation)
+
+        self.assertEqual(check(), LARGE)
+        self.assertEqual(tracker.record(LARGE, {"output_tokens": 1}, "a"), 1.0)
+        self.assertEqual(check(), SMALL)
+        self.assertEqual(metrics.last["budget.exceeded.action"], "downgrade")
+        tracker.record(LARGE, {"output_tokens": 1}, "a")
+        with self.assertRaises(BudgetExceededError) as cm:
+            check()
+        self.assertIs(cm.exception.budget, budget)
+        self.assertEqual(cm.exception.status_code, 429)
+        self.assertEqual(check("b"), LARGE)
+        self.assertEqual(tracker.stats()["budgets"][0]["spent"], 2.0)
+
+        budget._current(time.time() + 3600)
+        self.assertEqual(check(), LARGE)
+
+    def test_generate(self):
+        """
+        Test that generate calls are recorded and stopped by budgets.
+        """
+        stub = StubServer(StubConfig(output_tokens=20)).start()
+        self.addCleanup(stub.stop)
+        tracker = UsageTracker(
+            prices={"claude-3-7": ModelPrice(input=0.0, output=1e6)},
+            budgets=[Budget(limit=10.0)],
+        )
+        options = dict(api_key="sk-test", base_url=stub.url, usage_tracker=tracker)
+
+        with Claude(**options) as client:
+            client.generate(LARGE, "Count to twenty.")
+            with self.assertRaises(BudgetExceededError):
+                client.generate(LARGE, "Count to twenty.")
+
+        async def run():
+            async with AsyncClaude(**options) as client:
+                with self.assertRaises(BudgetExceededError):
+                    await client.generate(LARGE, "Count to twenty.")
+
+        asyncio.run(run())
+        self.assertEqual(tracker.stats()["calls"], 1)
+        self.assertEqual(tracker.totals()[0]["output_tokens"], 20)
+        self.assertEqual(stub.engine.request_count, 1)
+
+    def test_sinks(self):
+        """
+        Test that recorded calls reach JSONL and SQLite sinks, in the
+        background and on close.
+        """
+        usage = {"input_tokens": 10, "output_tokens": 20, "cache_read_input_tokens": 5}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "usage.jsonl")
+            tracker = UsageTracker(sink=JSONLSink(path), flush_interval=0.05)
+            tracker.record(SMALL, usage, "a", "x")
+            deadline = time.monotonic() + 5
+            while not os.path.exists(path) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            tracker.record(SMALL, usage)
+            tracker.close()
+            with open(path) as f:
+                records = [json.loads(line) for line in f]
+            self.assertEqual(len(records), 2)
+            self.assertEqual(records[0]["tenant"], "a")
+            self.assertEqual(records[0]["cache_read_input_tokens"], 5)
+            self.assertAlmostEqual(
+                records[0]["cost"], (10 * 0.8 + 20 * 4.0 + 5 * 0.08) / 1e6
+            )
+
+            path = os.path.join(directory, "usage.db")
+            with UsageTracker(sink=SQLiteSink(path), flush_interval=60) as tracker:
+                for _ in range(3):
+                    tracker.record(LARGE, usage, tag="x")
+            with sqlite3.connect(path) as connection:
+                rows = connection.execute(
+                    "SELECT model, tag, SUM(output_tokens) FROM usage"
+                ).fetchall()
+            self.assertEqual(rows, [(LARGE, "x", 60)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Tests for pre-opening and keeping warm upstream connections.
+"""
+
+import asyncio
+import unittest
+
+from claude_sdk import AsyncClaude
+from claude_sdk.instrumentation import Instrumentation, MetricsCollector
+from claude_sdk.load_balancer import LoadBalancer, Target
+from claude_sdk.stub_server import LatencyDistribution, StubConfig, StubServer
+from claude_sdk.warmup import ConnectionWarmer
+
+MODEL = "claude-3-7-sonnet-20250219"
+
+
+class TestConnectionWarmer(unittest.TestCase):
+    """
+    Tests for warming the connection pool of an async client.
+    """
+
+    def setUp(self):
+        """
+        Start two stub servers that answer after a short delay, so that
+        concurrent pings need their own connections.
+        """
+        config = StubConfig(latency=LatencyDistribution("fixed", (0.05,)))
+        self.stubs = [StubServer(config).start() for _ in range(2)]
+        for stub in self.stubs:
+            self.addCleanup(stub.stop)
+
+    def test_warm_and_keep_warm(self):
+        """
+        Test that warming opens the connections once, that requests reuse
+        them, and that pings keep running until stopped.
+        """
+        stub = self.stubs[0]
+        metrics = MetricsCollector()
+
+        async def run():
+            async with AsyncClaude(
+                api_key="sk-test",
+                base_url=stub.url,
+                instrumentation=Instrumentation([metrics]),
+            ) as client:
+                warmer = ConnectionWarmer(client, connections=6, interval=0.05)
+                self.assertEqual(await warmer.warm(), 6)
+                self.assertEqual(stub.engine.connection_count, 6)
+                await asyncio.gather(
+                    *(
+                        client.messages_create(
+                            MODEL, [{"role": "user", "content": "Hi"}]
+                        )
+                        for _ in range(6)
+                    )
+                )
+                self.assertEqual(stub.engine.connection_count, 6)
+
+                await warmer.start()
+                await asyncio.sleep(0.3)
+                await warmer.stop()
+                stats = warmer.stats()
+                self.assertGreater(stats["pings"], 18)
+                self.assertEqual(stats["failures"], 0)
+                self.assertFalse(stats["running"])
+                self.assertEqual(stub.engine.connection_count, 6)
+
+        asyncio.run(run())
+        self.assertEqual(metrics.last["connections.warmed.connections"], 6)
+
+    def test_load_balancer_and_failures(self):
+        """
+        Test that every load balancer target is warmed, and that unreachable
+        endpoints are counted as failures.
+        """
+        targets = [Target("sk-a", self.stubs[0].url), Target("sk-b", self.stubs[1].url)]
+
+        async def run():
+            async with AsyncClaude(load_balancer=LoadBalancer(targets)) as client:
+                warmer = ConnectionWarmer(client, connections=3, interval=0)
+                self.assertEqual(await warmer.start(), 6)
+                self.assertFalse(warmer.stats()["running"])
+
+            async with AsyncClaude(
+                api_key="sk-test", base_url="http://127.0.0.1:9"
+            ) as client:
+                warmer = ConnectionWarmer(client, connections=2, timeout=1)
+                self.assertEqual(await warmer.warm(), 0)
+                self.assertEqual(warmer.failures, 2)
+
+        asyncio.run(run())
+        for stub in self.stubs:
+            self.assertEqual(stub.engine.connection_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()